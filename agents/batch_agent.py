@@ -0,0 +1,192 @@
+import csv
+import json
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+from agents.router_agent import run_sequential_pipeline
+from agents.flow_agent import wait_for_refinement
+from core.config import load_settings
+from core.logger import init_logger
+from core.storage import artifact_store, background_writer, save_text
+from core.usage_ledger import usage_scope
+
+logger = init_logger()
+settings = load_settings()
+
+# Column / key names accepted as the problem statement in batch files
+INPUT_KEYS = ("problem_statement", "input", "text", "description")
+
+
+# ======================================================
+# 🔹 Input Loading
+# ======================================================
+def load_batch_inputs(path: str) -> list:
+    """
+    Load problem statements from a JSONL or CSV file.
+
+    JSONL lines may be plain strings or objects with a `problem_statement`
+    (or `input` / `text` / `description`) key and an optional `id`.
+    CSV files need a header row; the first matching column is used,
+    otherwise the first column.
+
+    Returns:
+        list[dict]: Items of the form {"id": str, "problem_statement": str}
+    """
+    path = Path(path)
+    if not path.exists():
+        raise FileNotFoundError(f"Batch input not found: {path}")
+
+    items = []
+    if path.suffix.lower() == ".csv":
+        with open(path, "r", encoding="utf-8-sig", newline="") as f:
+            reader = csv.DictReader(f)
+            fields = reader.fieldnames or []
+            key = next((k for k in INPUT_KEYS if k in fields), fields[0] if fields else None)
+            for row in reader:
+                items.append({"id": row.get("id"), "problem_statement": row.get(key) or ""})
+    else:
+        with open(path, "r", encoding="utf-8") as f:
+            for line_no, line in enumerate(f, start=1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    logger.warning(f"[BatchAgent] Skipping malformed JSONL line {line_no}")
+                    continue
+                if isinstance(record, str):
+                    items.append({"id": None, "problem_statement": record})
+                elif isinstance(record, dict):
+                    text = next((record[k] for k in INPUT_KEYS if record.get(k)), "")
+                    items.append({"id": record.get("id"), "problem_statement": text})
+
+    # Assign stable ids to items that did not carry one
+    for idx, item in enumerate(items, start=1):
+        item["id"] = str(item["id"] or f"item_{idx:04d}")
+
+    logger.info(f"[BatchAgent] Loaded {len(items)} problem statements from {path}")
+    return items
+
+
+# ======================================================
+# 🔹 Single Item Runner
+# ======================================================
+def _run_item(item: dict, item_dir: Path, run_id: str) -> dict:
+    """Run one pipeline in its own artifact run, capturing latency, tokens and errors."""
+    started = time.perf_counter()
+    record = {"id": item["id"], "run_id": run_id, "status": "ok", "error": None}
+
+    with artifact_store.run_scope(run_id), usage_scope(run_id) as usage:
+        try:
+            if not item["problem_statement"].strip():
+                raise ValueError("Empty problem statement")
+            result = run_sequential_pipeline(item["problem_statement"])
+            # Count the background flow refinement towards this item
+            wait_for_refinement(run_id)
+            if result.get("error"):
+                record["status"] = "failed"
+                record["error"] = result["error"]
+        except Exception as e:
+            logger.exception(f"[BatchAgent] Item {item['id']} failed: {e}")
+            result = {"error": str(e)}
+            record["status"] = "failed"
+            record["error"] = str(e)
+
+    record["latency_s"] = round(time.perf_counter() - started, 3)
+    record["token_usage"] = {k: v for k, v in usage.summary().items() if k != "agents"}
+
+    # Per-item usage replaces the (shared) global summary in the saved result
+    result["token_summary"] = usage.summary()
+    record["result_path"] = save_text(item_dir / "result.json", json.dumps(result, indent=2, default=str))
+    return record
+
+
+def _percentile(values: list, pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    idx = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[idx]
+
+
+# ======================================================
+# 🔹 Batch Runner
+# ======================================================
+def run_batch_pipeline(items: list, concurrency: int = None, output_dir: str = None) -> dict:
+    """
+    Run the sequential SDLC pipeline for many problem statements.
+
+    Args:
+        items (list): Items from `load_batch_inputs`.
+        concurrency (int): Max pipelines in flight (defaults to settings `batch.concurrency`).
+        output_dir (str): Root for batch outputs (defaults to `<outputs_dir>/batch`).
+    Returns:
+        dict: Batch summary with per-item latency, token usage and failures,
+              plus aggregate throughput in pipelines/minute.
+    """
+    batch_cfg = settings.get("batch", {})
+    concurrency = max(1, int(concurrency or batch_cfg.get("concurrency", 4)))
+    outputs_dir = settings.get("paths", {}).get("outputs_dir", "outputs")
+    batch_id = time.strftime("%Y%m%d-%H%M%S") + "-" + uuid.uuid4().hex[:6]
+    batch_dir = Path(output_dir or Path(outputs_dir) / "batch") / batch_id
+
+    logger.info(f"🚀 [BatchAgent] Starting batch {batch_id}: {len(items)} items, concurrency={concurrency}")
+    started = time.perf_counter()
+    records = []
+
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="batch") as pool:
+        futures = {
+            pool.submit(_run_item, item, batch_dir / f"{idx:04d}_{item['id']}", f"{batch_id}_{idx:04d}"): item
+            for idx, item in enumerate(items, start=1)
+        }
+        for future in as_completed(futures):
+            item = futures[future]
+            try:
+                record = future.result()
+            except Exception as e:
+                logger.exception(f"[BatchAgent] Item {item['id']} crashed: {e}")
+                record = {"id": item["id"], "status": "failed", "error": str(e), "latency_s": None}
+            records.append(record)
+            logger.info(
+                f"[BatchAgent] {len(records)}/{len(items)} done | {record['id']} "
+                f"{record['status']} in {record.get('latency_s')}s"
+            )
+
+    # Queued artifacts count towards the batch wall time
+    background_writer.flush()
+    wall_s = time.perf_counter() - started
+    order = {item["id"]: idx for idx, item in enumerate(items)}
+    records.sort(key=lambda r: order.get(r["id"], 0))
+    latencies = [r["latency_s"] for r in records if r.get("latency_s") is not None]
+    failed = [r for r in records if r["status"] != "ok"]
+
+    summary = {
+        "batch_id": batch_id,
+        "output_dir": str(batch_dir),
+        "concurrency": concurrency,
+        "total_items": len(items),
+        "succeeded": len(records) - len(failed),
+        "failed": len(failed),
+        "wall_time_s": round(wall_s, 3),
+        "throughput_per_min": round(len(records) / wall_s * 60, 2) if wall_s > 0 else 0.0,
+        "latency_s": {
+            "mean": round(sum(latencies) / len(latencies), 3) if latencies else 0.0,
+            "p50": _percentile(latencies, 50),
+            "p95": _percentile(latencies, 95),
+            "max": max(latencies, default=0.0),
+        },
+        "total_input_tokens": sum(r.get("token_usage", {}).get("total_input_tokens", 0) for r in records),
+        "total_output_tokens": sum(r.get("token_usage", {}).get("total_output_tokens", 0) for r in records),
+        "approx_cost_usd": round(sum(r.get("token_usage", {}).get("approx_cost_usd", 0.0) for r in records), 4),
+        "failures": [{"id": r["id"], "error": r["error"]} for r in failed],
+        "items": records,
+    }
+
+    save_text(batch_dir / "summary.json", json.dumps(summary, indent=2))
+    logger.success(
+        f"✅ [BatchAgent] Batch {batch_id} finished: {summary['succeeded']}/{len(items)} ok, "
+        f"{summary['throughput_per_min']} pipelines/min"
+    )
+    return summary
@@ -1,98 +1,262 @@
 import json
-import re
-import subprocess
-from pathlib import Path
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
 from core.llm import get_llm
 from core.prompts_loader import load_prompt
 from core.logger import init_logger
 from core.config import load_settings
-from core.storage import ensure_dirs, save_text
+from core.storage import active_run_id, save_artifact, save_artifact_async
+from core.tracing import detached_span, span, traced
+from core.diagram_render import DEFAULT_FORMAT, GraphvizNotInstalled, RenderError, render_dot
+from core.dot_repair import repair_dot, repair_stats, validate_dot
+from core.flow_template import build_flow_ir, has_flow_inputs
+from core.graph_ir import generate_graph_ir
+from core.incremental import IncrementalBuild, changed_items
 
 logger = init_logger()
 settings = load_settings()
 
+_diagram_cfg = settings.get("diagrams", {})
+MAX_REPROMPTS = int(_diagram_cfg.get("max_reprompts", 1))
 
-def run_flow_agent(requirements: dict) -> str:
+# fast | llm | fast_then_refine. fast_then_refine is opt-in: its refined render replaces
+# diagrams/system_flow.* after the pipeline has returned (see wait_for_refinement)
+FLOW_MODES = ("fast", "llm", "fast_then_refine")
+FLOW_MODE = _diagram_cfg.get("flow_mode", "fast")
+
+# ir: shared graph IR (one cached call for flow + mind map) | dot: free-form DOT
+GENERATOR = _diagram_cfg.get("generator", "ir")
+
+# Background LLM refinements (fast_then_refine), keyed by run id
+_refine_pool = ThreadPoolExecutor(max_workers=int(_diagram_cfg.get("refine_workers", 2)), thread_name_prefix="flow-refine")
+_refinements = {}
+_refinements_lock = threading.Lock()
+MAX_TRACKED_REFINEMENTS = 64
+
+# Requirement items the flow diagram is derived from (core/incremental.py selectors)
+FLOW_INPUTS = ("project", "FR*", "module:*", "actor:*")
+
+FALLBACK_DOT = (
+    "digraph G {\n"
+    "  label=\"System Flow\";\n"
+    "  node [shape=box, style=filled, color=lightblue];\n"
+    "  Start -> Process -> Output;\n"
+    "}"
+)
+
+
+def _repair_or_reprompt(llm, dot_code: str) -> str:
     """
-    Generate a Graphviz DOT script from structured requirements via LLM
-    and render a PNG diagram (if Graphviz 'dot' is installed).
+    Validate and locally repair the model's DOT. Only when repair fails is the
+    model asked again (up to `diagrams.max_reprompts`), with the parser errors.
 
-    Args:
-        requirements (dict): Output from requirement_agent (contains both readable_text and parsed_json)
     Returns:
-        str: Path to the generated PNG (preferred) or DOT file (fallback).
+        str: Valid DOT source, or FALLBACK_DOT when nothing could be salvaged.
     """
-    try:
-        logger.info("[FlowAgent] Starting flow diagram generation...")
-
-        # Handle both plain text and structured requirement output
-        if isinstance(requirements, dict):
-            requirements_json = (
-                json.dumps(requirements.get("parsed_json", {}), indent=2)
-                if requirements.get("parsed_json")
-                else requirements.get("readable_text", "")
-            )
-        else:
-            requirements_json = str(requirements)
-
-        # Load prompt templates
-        system_prompt = load_prompt("system_base.md")
-        user_prompt = load_prompt("flow.md").format(
-            system=system_prompt,
-            requirements_json=requirements_json
+    result = repair_dot(dot_code)
+    if result.valid:
+        repair_stats.record("flow", "repaired" if result.fixes else "valid")
+        if result.fixes:
+            logger.info(f"[FlowAgent] DOT repaired locally: {', '.join(result.fixes)}")
+        return result.dot
+
+    for attempt in range(1, MAX_REPROMPTS + 1):
+        logger.warning(f"[FlowAgent] DOT invalid after repair ({result.errors[0]}); re-prompt {attempt}/{MAX_REPROMPTS}")
+        repair_prompt = (
+            "The following Graphviz DOT code does not parse.\n"
+            "Errors:\n- " + "\n- ".join(result.errors) + "\n\n"
+            f"DOT:\n{result.dot}\n\n"
+            "Return only the corrected Graphviz DOT code, no Markdown or explanations."
         )
+        response = llm.invoke(repair_prompt, agent_name="flow_repair")
+        result = repair_dot(getattr(response, "content", str(response)))
+        if result.valid:
+            repair_stats.record("flow", "reprompted")
+            return result.dot
+
+    repair_stats.record("flow", "failed")
+    logger.warning("[FlowAgent] No valid Graphviz DOT code detected. Using fallback structure.")
+    return FALLBACK_DOT
 
-        # Initialize model
-        llm = get_llm("flow")
-        logger.info("[FlowAgent] Invoking model for flow generation...")
-
-        # Generate flow diagram text
-        response = llm.invoke(user_prompt, agent_name="flow")
-        dot_code = getattr(response, "content", str(response)).strip()
-
-        # Clean any markdown or code fences (```dot ... ```)
-        clean_dot = re.sub(r"^```[a-zA-Z]*\s*", "", dot_code)
-        clean_dot = re.sub(r"```$", "", clean_dot)
-        clean_dot = clean_dot.strip("` \n\r\t")
-
-        # Validate Graphviz syntax and fallback
-        if not clean_dot or "digraph" not in clean_dot:
-            logger.warning("[FlowAgent] No valid Graphviz DOT code detected. Using fallback structure.")
-            clean_dot = (
-                "digraph G {\n"
-                "  label=\"System Flow\";\n"
-                "  node [shape=box, style=filled, color=lightblue];\n"
-                "  Start -> Process -> Output;\n"
-                "}"
-            )
-
-        # Save .dot file
-        ensure_dirs()
-        dot_path = Path(settings["paths"]["diagrams_dir"]) / "system_flow.dot"
-        save_text(dot_path, clean_dot)
-        logger.info(f"[FlowAgent] DOT file saved at {dot_path}")
-
-        # Try rendering to PNG
-        png_path = Path(settings["paths"]["diagrams_dir"]) / "system_flow.png"
+
+def _llm_flow_dot(requirements) -> str:
+    """Flow DOT from the model: via the shared graph IR, or free-form DOT."""
+    if GENERATOR == "ir":
         try:
-            subprocess.run(
-                ["dot", "-Tpng", str(dot_path), "-o", str(png_path)],
-                check=True,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-            )
-            logger.info(f"[FlowAgent] Diagram rendered successfully: {png_path}")
-            return str(png_path)
-
-        except FileNotFoundError:
-            logger.warning("[FlowAgent] Graphviz 'dot' not found. Returning DOT file instead.")
-            return str(dot_path)
-        except subprocess.CalledProcessError as e:
-            logger.error(f"[FlowAgent] Graphviz rendering failed: {e.stderr.decode('utf-8', 'ignore')}")
-            return str(dot_path)
+            ir = generate_graph_ir(requirements)
+            save_artifact_async("diagrams/system_flow.mmd", ir.to_mermaid("flow"))
+            return ir.to_dot("flow")
         except Exception as e:
-            logger.exception(f"[FlowAgent] Unexpected rendering error: {e}")
-            return str(dot_path)
+            logger.warning(f"[FlowAgent] Graph IR unavailable ({e}); requesting free-form DOT.")
+    return _freeform_flow_dot(requirements)
+
+
+def _freeform_flow_dot(requirements) -> str:
+    """Ask the model for the flow DOT and validate/repair it."""
+    # Handle both plain text and structured requirement output
+    if isinstance(requirements, dict):
+        requirements_json = (
+            json.dumps(requirements.get("parsed_json", {}), indent=2)
+            if requirements.get("parsed_json")
+            else requirements.get("readable_text", "")
+        )
+    else:
+        requirements_json = str(requirements)
+
+    # Load prompt templates
+    system_prompt = load_prompt("system_base.md")
+    user_prompt = load_prompt("flow.md").format(
+        system=system_prompt,
+        requirements_json=requirements_json
+    )
+
+    # Initialize model
+    llm = get_llm("flow")
+    logger.info("[FlowAgent] Invoking model for flow generation...")
+
+    # Generate flow diagram text
+    response = llm.invoke(user_prompt, agent_name="flow")
+    dot_code = getattr(response, "content", str(response)).strip()
+
+    # Validate, repair locally, re-prompt only if repair fails
+    return _repair_or_reprompt(llm, dot_code)
+
+
+def _save_and_render(clean_dot: str) -> str:
+    """Queue the DOT artifact and render it; returns the image path or the DOT path."""
+    # Queue .dot file (run-scoped artifact, written in background)
+    dot_handle = save_artifact_async("diagrams/system_flow.dot", clean_dot)
+    logger.info(f"[FlowAgent] DOT file queued at {dot_handle.path}")
+
+    # Try rendering (shared, cached Graphviz renderer)
+    try:
+        image_bytes = render_dot(clean_dot, fmt=DEFAULT_FORMAT)
+        image_path = save_artifact(f"diagrams/system_flow.{DEFAULT_FORMAT}", image_bytes)
+        logger.info(f"[FlowAgent] Diagram rendered successfully: {image_path}")
+        return image_path
+
+    except GraphvizNotInstalled:
+        logger.warning("[FlowAgent] Graphviz 'dot' not found. Returning DOT file instead.")
+        return dot_handle.result()
+    except RenderError as e:
+        logger.error(f"[FlowAgent] Graphviz rendering failed: {e}")
+        return dot_handle.result()
+    except Exception as e:
+        logger.exception(f"[FlowAgent] Unexpected rendering error: {e}")
+        return dot_handle.result()
+
+
+def _record_flow(build, deps: dict, clean_dot: str):
+    """Remember the diagram for incremental runs (never the placeholder fallback)."""
+    if build is not None and clean_dot != FALLBACK_DOT:
+        build.record("flow_diagram", deps, clean_dot)
+
+
+def _refine(requirements, build=None, deps: dict = None) -> str:
+    with detached_span("agent.flow.refine"):
+        try:
+            clean_dot = _llm_flow_dot(requirements)
+            _record_flow(build, deps, clean_dot)
+            path = _save_and_render(clean_dot)
+            logger.info(f"[FlowAgent] Refined diagram replaced fast layout: {path}")
+            return path
+        except Exception as e:
+            logger.exception(f"[FlowAgent] Background refinement failed: {e}")
+            return ""
+
+
+def wait_for_refinement(run_id: str = None, timeout: float = None) -> str:
+    """
+    Block until the background LLM refinement of a fast_then_refine run
+    finishes. The refined render overwrites the fast one at the same path.
+
+    Returns:
+        str: Refined diagram path, or "" when no refinement is pending.
+    """
+    with _refinements_lock:
+        future = _refinements.pop(run_id or active_run_id(), None)
+    return future.result(timeout=timeout) if future else ""
+
+
+@traced("agent.flow")
+def run_flow_agent(requirements: dict, mode: str = None, incremental: bool = None) -> str:
+    """
+    Generate a Graphviz flow diagram from structured requirements and render
+    it (PNG or SVG, see `diagrams.format`) if Graphviz is installed.
+
+    Modes (`diagrams.flow_mode`, overridable per call):
+      - fast: deterministic actors → modules → requirements layout built from
+        `parsed_json`, no LLM call.
+      - llm: graph from the model via the shared graph IR (`diagrams.generator: ir`)
+        or free-form DOT validated and repaired locally (`dot`).
+      - fast_then_refine: return the fast diagram immediately and replace it
+        with the LLM version in the background (see wait_for_refinement).
+
+    Args:
+        requirements (dict): Output from requirement_agent (contains both readable_text and parsed_json)
+        mode (str): One of FLOW_MODES; defaults to the configured mode.
+        incremental (bool): Reuse the last diagram when its requirement items
+            (FLOW_INPUTS) are unchanged; defaults to `incremental.enabled`.
+    Returns:
+        str: Path to the rendered diagram (preferred) or DOT file (fallback).
+    """
+    try:
+        mode = mode or FLOW_MODE
+        if mode not in FLOW_MODES:
+            logger.warning(f"[FlowAgent] Unknown flow mode {mode!r}; using 'llm'.")
+            mode = "llm"
+
+        parsed_json = requirements.get("parsed_json", {}) if isinstance(requirements, dict) else {}
+        if mode != "llm" and not has_flow_inputs(parsed_json):
+            logger.info("[FlowAgent] No modules or requirements parsed; falling back to LLM mode.")
+            mode = "llm"
+
+        logger.info(f"[FlowAgent] Starting flow diagram generation (mode={mode})...")
+
+        build = IncrementalBuild(requirements, enabled=incremental)
+        deps = build.deps(FLOW_INPUTS, extra={"mode": mode, "generator": GENERATOR})
+        last = build.previous("flow_diagram")
+        if last is not None and last[0] == deps:
+            logger.info("[FlowAgent] Requirement items unchanged; reusing the last diagram.")
+            build.store.note("flow_diagram", "reused")
+            return _save_and_render(last[1])
+        build.store.note("flow_diagram", "rebuilt", changed_items(last[0], deps) if last else ["(new)"])
+
+        if mode == "llm":
+            clean_dot = _llm_flow_dot(requirements)
+            _record_flow(build, deps, clean_dot)
+            return _save_and_render(clean_dot)
+
+        with span("flow.template", modules=len(parsed_json.get("modules", []))):
+            ir = build_flow_ir(parsed_json)
+            clean_dot = ir.to_dot("flow")
+        save_artifact_async("diagrams/system_flow.mmd", ir.to_mermaid("flow"))
+        template_errors = validate_dot(clean_dot)
+        if template_errors:
+            logger.warning(f"[FlowAgent] Template DOT invalid ({template_errors[0]}); falling back to LLM mode.")
+            clean_dot = _llm_flow_dot(requirements)
+            _record_flow(build, deps, clean_dot)
+            return _save_and_render(clean_dot)
+        if mode == "fast":
+            _record_flow(build, deps, clean_dot)
+        path = _save_and_render(clean_dot)
+
+        if mode == "fast_then_refine":
+            run_id = active_run_id()
+            if run_id is None:
+                # Nothing could wait for it; an untracked refinement would overwrite files unseen
+                logger.warning("[FlowAgent] No active run; skipping background refinement.")
+                return path
+            # Only the refined diagram is recorded, so an unrefined layout is never reused
+            ctx = contextvars.copy_context()
+            future = _refine_pool.submit(ctx.run, _refine, requirements, build, deps)
+            with _refinements_lock:
+                _refinements[run_id] = future
+                while len(_refinements) > MAX_TRACKED_REFINEMENTS:
+                    _refinements.pop(next(iter(_refinements)))
+            logger.info("[FlowAgent] Fast diagram ready; LLM refinement queued.")
+        return path
 
     except Exception as e:
         logger.exception(f"[FlowAgent] Failed to generate flow diagram: {e}")
@@ -1,109 +1,506 @@
-import os
 import time
-import requests
+import queue
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
 from core.logger import init_logger
 from core.config import load_settings
+from pathlib import Path
+from core.jira_client import MAX_BULK, RETRYABLE, AdaptiveLimiter, JiraError, file_sha256, get_jira_client
+from core.jira_journal import content_hash, fingerprint_label, posting_journal, story_fingerprint
+from core.storage import artifact_store
+from core.tracing import span, traced
 
 logger = init_logger()
 settings = load_settings()
 
+_jira_cfg = settings.get("jira", {})
+# bulk: /issue/bulk in chunks | single: one request per story (servers without the bulk endpoint)
+POST_MODE = _jira_cfg.get("post_mode", "bulk")
+CHUNK_SIZE = max(1, min(MAX_BULK, int(_jira_cfg.get("chunk_size", MAX_BULK))))
+# Upper bound on concurrent requests; the AdaptiveLimiter lowers it when throttled
+WORKERS = int(_jira_cfg.get("workers", 4))
+MAX_ATTEMPTS = int(_jira_cfg.get("max_attempts", 8))
+# Journal story fingerprints → issue keys (idempotent, resumable posting)
+JOURNAL = bool(_jira_cfg.get("journal", True))
+# Run artifacts attached to posted issues (features.enable_jira_attachments)
+_attach_cfg = _jira_cfg.get("attachments", {})
+ATTACH_ARTIFACTS = list(_attach_cfg.get(
+    "artifacts", ["diagrams/system_flow.png", "diagrams/system_flow.svg", "docs/SRS.pdf"]
+))
+# Attach to this issue (e.g. the project epic); otherwise to ATTACH_TARGET
+ATTACH_ISSUE = _attach_cfg.get("issue_key")
+# first: the first posted issue only | all: every posted story (one copy per issue)
+ATTACH_TARGET = _attach_cfg.get("target", "first")
 
-def post_stories_to_jira(stories: list, project_key: str = None) -> list:
+
+def story_fields(story: dict, project_key: str, idx: int, label: str = None) -> dict:
+    """JIRA issue fields for one generated story (plus the journal's fingerprint label)."""
+    labels = list(story.get("labels", ["auto", "sdlc"]))
+    return {
+        "project": {"key": project_key},
+        "summary": story.get("summary", f"Auto-Generated Story {idx}"),
+        "description": story.get("bdd", story.get("description", "")),
+        "labels": labels + [label] if label else labels,
+        "issuetype": {"name": "Story"},
+    }
+
+
+def _retryable(result: dict) -> bool:
+    return result.get("status_code") in RETRYABLE or result.get("network_error", False)
+
+
+def _post_single(client, fields_list: list, limiter: AdaptiveLimiter, update_key: str = None) -> list:
+    """One request per issue over the pooled session (an update when `update_key` is given)."""
+    results = []
+    for fields in fields_list:
+        try:
+            if update_key:
+                results.append(client.update_issue(update_key, fields, on_response=limiter.observe))
+            else:
+                results.append(client.create_issue(fields, on_response=limiter.observe))
+        except JiraError as e:
+            results.append({"ok": False, "status_code": None, "error": str(e), "network_error": True})
+    return results
+
+
+def _post_unit(client, ops: list, limiter: AdaptiveLimiter, state: dict) -> list:
+    """Post one work unit (a bulk chunk, a single story or an update) within the concurrency limit."""
+    fields_list = [op["fields"] for op in ops]
+    limiter.acquire()
+    try:
+        if ops[0].get("key"):
+            return _post_single(client, fields_list, limiter, update_key=ops[0]["key"])
+        if state["mode"] != "bulk":
+            return _post_single(client, fields_list, limiter)
+        try:
+            return client.bulk_create(fields_list, on_response=limiter.observe)
+        except JiraError as e:
+            if e.status_code in (404, 405):
+                if state["mode"] == "bulk":
+                    logger.warning("[JiraPostAgent] Bulk endpoint unavailable; posting stories individually.")
+                state["mode"] = "single"
+                return _post_single(client, fields_list, limiter)
+            return [
+                {"ok": False, "status_code": e.status_code, "error": str(e), "network_error": e.status_code is None}
+                for _ in fields_list
+            ]
+    finally:
+        limiter.release()
+
+
+def _post_concurrently(client, ops: list, mode: str, workers: int, max_attempts: int, on_result=None) -> tuple:
+    """
+    Drain a work queue of create chunks (bulk) or stories (single), and
+    updates, with `workers` threads under an AdaptiveLimiter. Throttled
+    (429/503) and network-failed items go back on the queue as a smaller
+    unit until `max_attempts`.
+
+    Args:
+        ops (list): {"fields"} to create or {"fields", "key"} to update.
+        on_result (callable): Called as on_result(index, result) once an
+            item's outcome is final.
+    Returns:
+        tuple: (per-op results in input order, stats dict)
+    """
+    limiter = AdaptiveLimiter(max_limit=workers)
+    state = {"mode": mode}
+    unit_size = CHUNK_SIZE if mode == "bulk" else 1
+    results = [None] * len(ops)
+    stats = {"retried": 0}
+    stats_lock = threading.Lock()
+    work = queue.Queue()
+    creates = [i for i, op in enumerate(ops) if not op.get("key")]
+    for start in range(0, len(creates), unit_size):
+        work.put((creates[start:start + unit_size], 1))
+    for i, op in enumerate(ops):
+        if op.get("key"):
+            work.put(([i], 1))
+
+    def drain():
+        while True:
+            item = work.get()
+            if item is None:
+                work.task_done()
+                return
+            indices, attempt = item
+            try:
+                with span("jira.post_unit", mode=state["mode"], stories=len(indices), attempt=attempt):
+                    unit_results = _post_unit(client, [ops[i] for i in indices], limiter, state)
+                retry = []
+                for i, result in zip(indices, unit_results):
+                    if not result["ok"] and _retryable(result) and attempt < max_attempts:
+                        retry.append(i)
+                    else:
+                        results[i] = result
+                        if on_result:
+                            on_result(i, result)
+                if retry:
+                    # Retry queue: throttled stories are re-posted, never dropped
+                    with stats_lock:
+                        stats["retried"] += len(retry)
+                    work.put((retry, attempt + 1))
+            except Exception as e:
+                logger.exception(f"[JiraPostAgent] Unexpected error posting stories: {e}")
+                for i in indices:
+                    results[i] = {"ok": False, "status_code": None, "error": str(e)}
+            finally:
+                work.task_done()
+
+    if work.empty():
+        return results, {**stats, **limiter.stats, "mode": mode}
+    with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="jira-post") as pool:
+        for _ in range(max(1, workers)):
+            pool.submit(contextvars.copy_context().run, drain)
+        work.join()
+        for _ in range(max(1, workers)):
+            work.put(None)
+
+    stats.update(limiter.stats)
+    stats["mode"] = state["mode"]
+    return results, stats
+
+
+def _plan(client, stories: list, project_key: str, journal) -> tuple:
+    """
+    Match stories against the journal.
+
+    Returns:
+        tuple: (entries per story {"fp", "fields", "digest", "key"},
+            indices of unchanged stories, number recovered by label search)
+    """
+    entries, seen = [], {}
+    for idx, story in enumerate(stories, start=1):
+        fp = story_fingerprint(story, project_key)
+        # Same requirement IDs (or summary) twice in one batch: keep both stories distinct
+        seen[fp] = seen.get(fp, 0) + 1
+        if seen[fp] > 1:
+            fp = story_fingerprint(story, project_key, occurrence=seen[fp])
+        fields = story_fields(story, project_key, idx, fingerprint_label(fp) if journal else None)
+        entries.append({"fp": fp, "fields": fields, "digest": content_hash(fields), "key": None})
+
+    unchanged, recovered = set(), 0
+    if not journal:
+        return entries, unchanged, recovered
+    known = journal.lookup([e["fp"] for e in entries])
+    for i, entry in enumerate(entries):
+        row = known.get(entry["fp"])
+        if not row:
+            continue
+        if row["issue_key"]:
+            entry["key"] = row["issue_key"]
+            if row["content_hash"] == entry["digest"]:
+                unchanged.add(i)
+        elif row["status"] == "pending":
+            # A previous run died between POST and journal write: look for the issue first
+            try:
+                key = client.find_by_label(fingerprint_label(entry["fp"]))
+            except Exception as e:
+                logger.warning(f"[JiraPostAgent] Could not search for pending story {entry['fp']}: {e}")
+                key = None
+            if key:
+                entry["key"] = key
+                recovered += 1
+                logger.info(f"[JiraPostAgent] Recovered {key} for a story left pending by an earlier run")
+    return entries, unchanged, recovered
+
+
+@traced("agent.jira_post")
+def post_stories_to_jira(stories: list, project_key: str = None, client=None, mode: str = None,
+                         workers: int = None, journal=None) -> dict:
     """
     Posts user stories to a configured JIRA project using REST API.
 
+    Stories are created through the bulk endpoint in chunks of
+    `jira.chunk_size` (max 50) over a pooled keep-alive session, by up to
+    `jira.workers` concurrent requests. Concurrency adapts to `Retry-After`
+    and rate-limit headers, and throttled stories are retried rather than
+    skipped; per-item errors are mapped back to their stories.
+
+    Posting is idempotent: each story's fingerprint is journalled with its
+    issue key, so re-running skips unchanged stories, updates changed ones in
+    place and, after a crash, finds half-posted stories by their fingerprint
+    label instead of creating duplicates.
+
     Args:
         stories (list): List of story dicts (summary, description, etc.)
         project_key (str): Optional override for project key.
+        client (JiraClient): Defaults to the shared client for the JIRA_* env vars.
+        mode (str): "bulk" or "single"; defaults to `jira.post_mode`.
+        workers (int): Maximum concurrent requests; defaults to `jira.workers`.
+        journal (PostingJournal): Defaults to the shared journal; False disables it.
     Returns:
-        list: List of created JIRA issue keys (if successful).
+        dict: Summary (project, total_stories, created_count, updated_count,
+            unchanged_count, failed_count, created_keys, updated_keys,
+            issue_keys, failed, recovered, retried, throttled, elapsed_s,
+            stories_per_s).
     """
+    project_key = project_key or "SDLC"
+    summary = {
+        "project": project_key,
+        "total_stories": len(stories or []),
+        "created_count": 0,
+        "updated_count": 0,
+        "unchanged_count": 0,
+        "failed_count": 0,
+        "created_keys": [],
+        "updated_keys": [],
+        "issue_keys": [],
+        "failed": [],
+    }
     try:
         # -------------------------------
         # 1️⃣ Load credentials
         # -------------------------------
-        base = os.getenv("JIRA_BASE_URL")
-        email = os.getenv("JIRA_EMAIL")
-        token = os.getenv("JIRA_API_TOKEN")
-        project_key = project_key or "SDLC"
+        client = client or get_jira_client()
+        mode = mode or POST_MODE
+        if journal is None:
+            journal = posting_journal if JOURNAL else None
 
-        if not (base and email and token):
+        if client is None:
             logger.warning("[JiraPostAgent] Missing JIRA credentials; skipping post.")
-            return []
+            return summary
 
         if not stories:
             logger.warning("[JiraPostAgent] No stories provided for posting.")
-            return []
-
-        headers = {"Accept": "application/json", "Content-Type": "application/json"}
-        created = []
-        failed = []
+            return summary
 
         # -------------------------------
-        # 2️⃣ Post each story sequentially
+        # 2️⃣ Match against the journal (skip / update / create)
         # -------------------------------
-        for idx, story in enumerate(stories, start=1):
+        started = time.perf_counter()
+        entries, unchanged, recovered = _plan(client, stories, project_key, journal)
+        pending = [i for i in range(len(entries)) if i not in unchanged]
+        ops = [{"fields": entries[i]["fields"], "key": entries[i]["key"]} for i in pending]
+        if journal:
+            journal.mark_pending([
+                (entries[i]["fp"], project_key, entries[i]["fields"]["summary"])
+                for i in pending if not entries[i]["key"]
+            ])
+
+        def on_result(op_index, result):
+            # Journal each outcome as it arrives so a crash loses at most in-flight stories
+            if not journal:
+                return
+            entry = entries[pending[op_index]]
             try:
-                payload = {
-                    "fields": {
-                        "project": {"key": project_key},
-                        "summary": story.get("summary", f"Auto-Generated Story {idx}"),
-                        "description": story.get("bdd", story.get("description", "")),
-                        "labels": story.get("labels", ["auto", "sdlc"]),
-                        "issuetype": {"name": "Story"},
-                    }
-                }
-
-                url = f"{base}/rest/api/3/issue"
-                logger.info(f"[JiraPostAgent] Creating JIRA story {idx}/{len(stories)} → {url}")
-
-                resp = requests.post(url, json=payload, auth=(email, token), headers=headers)
-                if resp.status_code in (200, 201):
-                    issue_key = resp.json().get("key", "UNKNOWN_KEY")
-                    created.append(issue_key)
-                    logger.success(f"[JiraPostAgent] ✅ Created issue {issue_key}")
-                elif resp.status_code == 429:  # rate-limited
-                    logger.warning("[JiraPostAgent] Rate-limited by JIRA API, retrying after delay...")
-                    time.sleep(3)
-                    continue
+                if result["ok"]:
+                    journal.mark_created(entry["fp"], project_key, entry["fields"]["summary"],
+                                         result["key"], entry["digest"])
                 else:
-                    failed.append({
-                        "summary": story.get("summary"),
-                        "status_code": resp.status_code,
-                        "error": resp.text[:300],
-                    })
-                    logger.error(
-                        f"[JiraPostAgent] ❌ Failed: {resp.status_code} | {resp.text[:300]}"
-                    )
-
-            except requests.RequestException as e:
-                logger.exception(f"[JiraPostAgent] Network error posting story: {e}")
-                failed.append({"summary": story.get("summary"), "error": str(e)})
-
+                    journal.mark_failed(entry["fp"], result.get("error"))
             except Exception as e:
-                logger.exception(f"[JiraPostAgent] Unexpected error posting story: {e}")
-                failed.append({"summary": story.get("summary"), "error": str(e)})
+                logger.warning(f"[JiraPostAgent] Journal write failed for {entry['fp']}: {e}")
 
         # -------------------------------
-        # 3️⃣ Summary Logging
+        # 3️⃣ Post stories concurrently (chunks, single stories, updates)
         # -------------------------------
+        n_updates = sum(1 for op in ops if op["key"])
+        logger.info(
+            f"[JiraPostAgent] {len(ops) - n_updates} to create, {n_updates} to update, {len(unchanged)} unchanged "
+            f"({mode}, up to {workers or WORKERS} concurrent)"
+        )
+        op_results, stats = _post_concurrently(client, ops, mode, workers or WORKERS, MAX_ATTEMPTS, on_result)
+        results = [None] * len(entries)
+        for i, result in zip(pending, op_results):
+            results[i] = result
+
+        created, updated, issue_keys, failed = [], [], [], []
+        for i, (story, entry, result) in enumerate(zip(stories, entries, results)):
+            if i in unchanged:
+                issue_keys.append(entry["key"])
+            elif result["ok"]:
+                issue_keys.append(result["key"])
+                if entry["key"]:
+                    updated.append(result["key"])
+                    logger.success(f"[JiraPostAgent] ✅ Updated issue {result['key']}")
+                else:
+                    created.append(result["key"])
+                    logger.success(f"[JiraPostAgent] ✅ Created issue {result['key']}")
+            else:
+                issue_keys.append(entry["key"])
+                failed.append({
+                    "summary": story.get("summary"),
+                    "status_code": result.get("status_code"),
+                    "error": result.get("error"),
+                })
+                logger.error(
+                    f"[JiraPostAgent] ❌ Failed: {result.get('status_code')} | {result.get('error')}"
+                )
+
+        # -------------------------------
+        # 4️⃣ Summary Logging
+        # -------------------------------
+        elapsed = time.perf_counter() - started
         if created:
             logger.info(f"[JiraPostAgent] Successfully created {len(created)} stories.")
+        if updated:
+            logger.info(f"[JiraPostAgent] Updated {len(updated)} changed stories.")
+        if unchanged:
+            logger.info(f"[JiraPostAgent] Skipped {len(unchanged)} stories already posted.")
         if failed:
             logger.warning(f"[JiraPostAgent] {len(failed)} stories failed to post.")
 
-        summary = {
-            "project": project_key,
-            "total_stories": len(stories),
+        summary.update({
             "created_count": len(created),
+            "updated_count": len(updated),
+            "unchanged_count": len(unchanged),
             "failed_count": len(failed),
             "created_keys": created,
+            "updated_keys": updated,
+            "issue_keys": issue_keys,
             "failed": failed,
-        }
+            "recovered": recovered,
+            "retried": stats["retried"],
+            "throttled": stats["throttled"],
+            "mode": stats["mode"],
+            "elapsed_s": round(elapsed, 3),
+            "stories_per_s": round(len(created) / elapsed, 2) if elapsed else None,
+        })
 
         logger.info(f"[JiraPostAgent] Summary: {summary}")
-        return created
+        return summary
 
     except Exception as e:
         logger.exception(f"[JiraPostAgent] Critical failure posting to JIRA: {e}")
-        return []
+        summary["error"] = str(e)
+        return summary
+
+
+# ======================================================
+# 🔹 Artifact Attachments
+# ======================================================
+def run_artifacts(names: list = None, run_id: str = None) -> list:
+    """(name, path, sha256) of the run's artifacts listed in `names`, from the run manifest."""
+    manifest = artifact_store.manifest(run_id)
+    artifacts = []
+    for name in names or ATTACH_ARTIFACTS:
+        entry = manifest.get(name)
+        if entry and Path(entry["path"]).exists():
+            artifacts.append((name, entry["path"], entry["sha256"]))
+    return artifacts
+
+
+def _upload(client, key: str, path: str, limiter: AdaptiveLimiter, max_attempts: int) -> dict:
+    """One attachment upload, retried on throttling and network errors."""
+    result = {"ok": False, "status_code": None, "error": "not attempted"}
+    for attempt in range(1, max_attempts + 1):
+        limiter.acquire()
+        try:
+            with span("jira.attach", issue=key, file=Path(path).name, attempt=attempt):
+                result = client.add_attachment(key, path, on_response=limiter.observe)
+        except JiraError as e:
+            result = {"ok": False, "status_code": None, "error": str(e), "network_error": True}
+        finally:
+            limiter.release()
+        if result["ok"] or not _retryable(result):
+            return result
+    return result
+
+
+@traced("agent.jira_attach")
+def attach_artifacts(issue_keys: list, artifacts: list = None, client=None, workers: int = None,
+                     journal=None, target: str = None) -> dict:
+    """
+    Uploads run artifacts (flow diagram, SRS PDF) to JIRA issues as streamed
+    multipart attachments, concurrently across issues.
+
+    Uploads are de-duplicated by content hash: an artifact whose sha256 was
+    already attached to an issue (per the posting journal) is skipped, and
+    identical artifacts in one call are uploaded once per issue.
+
+    Args:
+        issue_keys (list): Posted issues; `jira.attachments.issue_key` overrides.
+        artifacts (list): (name, path, sha256) tuples; defaults to the active
+            run's `jira.attachments.artifacts` from its manifest.
+        client (JiraClient): Defaults to the shared client for the JIRA_* env vars.
+        workers (int): Maximum concurrent uploads; defaults to `jira.workers`.
+        journal (PostingJournal): Defaults to the shared journal; False disables dedupe.
+        target (str): "first" (default, one copy on the first issue) or "all"
+            (every issue gets its own copy); defaults to `jira.attachments.target`.
+    Returns:
+        dict: Summary (uploaded, skipped, failed, bytes, elapsed_s).
+    """
+    summary = {"uploaded": [], "skipped": 0, "failed": [], "bytes": 0}
+    try:
+        client = client or get_jira_client()
+        if journal is None:
+            journal = posting_journal if JOURNAL else None
+        if client is None:
+            logger.warning("[JiraPostAgent] Missing JIRA credentials; skipping attachments.")
+            return summary
+
+        keys = [ATTACH_ISSUE] if ATTACH_ISSUE else [k for k in dict.fromkeys(issue_keys or []) if k]
+        if (target or ATTACH_TARGET) != "all":
+            # Identical run artifacts on every story would just be N copies of the same files
+            keys = keys[:1]
+        if artifacts is None:
+            artifacts = run_artifacts()
+        if not keys or not artifacts:
+            logger.info("[JiraPostAgent] No issues or artifacts to attach.")
+            return summary
+
+        # -------------------------------
+        # 1️⃣ Skip content already attached
+        # -------------------------------
+        done = journal.attached(keys) if journal else set()
+        tasks, seen = [], set()
+        for key in keys:
+            for name, path, digest in artifacts:
+                digest = digest or file_sha256(path)
+                if (key, digest) in done or (key, digest) in seen:
+                    summary["skipped"] += 1
+                    continue
+                seen.add((key, digest))
+                tasks.append((key, name, path, digest))
+
+        # -------------------------------
+        # 2️⃣ Upload concurrently across issues
+        # -------------------------------
+        started = time.perf_counter()
+        workers = workers or WORKERS
+        limiter = AdaptiveLimiter(max_limit=workers)
+        logger.info(
+            f"[JiraPostAgent] Attaching {len(tasks)} files to {len(keys)} issues "
+            f"({summary['skipped']} already attached, up to {workers} concurrent)"
+        )
+
+        def upload(task):
+            key, name, path, digest = task
+            result = _upload(client, key, path, limiter, MAX_ATTEMPTS)
+            if result["ok"] and journal:
+                try:
+                    journal.mark_attached(key, digest, Path(path).name, result.get("id"))
+                except Exception as e:
+                    logger.warning(f"[JiraPostAgent] Journal write failed for {key}/{name}: {e}")
+            return result
+
+        if tasks:
+            with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="jira-attach") as pool:
+                results = list(pool.map(lambda t: contextvars.copy_context().run(upload, t), tasks))
+        else:
+            results = []
+
+        for (key, name, path, _digest), result in zip(tasks, results):
+            if result["ok"]:
+                summary["uploaded"].append({"issue": key, "artifact": name})
+                summary["bytes"] += Path(path).stat().st_size
+            else:
+                summary["failed"].append({
+                    "issue": key, "artifact": name,
+                    "status_code": result.get("status_code"), "error": result.get("error"),
+                })
+                logger.error(f"[JiraPostAgent] ❌ Attach {name} → {key} failed: {result.get('error')}")
+
+        summary["elapsed_s"] = round(time.perf_counter() - started, 3)
+        summary["throttled"] = limiter.stats["throttled"]
+        logger.info(
+            f"[JiraPostAgent] Attached {len(summary['uploaded'])} files ({summary['bytes']} bytes), "
+            f"skipped {summary['skipped']}, failed {len(summary['failed'])}"
+        )
+        return summary
+
+    except Exception as e:
+        logger.exception(f"[JiraPostAgent] Critical failure attaching artifacts: {e}")
+        summary["error"] = str(e)
+        return summary
@@ -1,109 +1,404 @@
 import json
+import time
+import threading
+import contextvars
 import pandas as pd
 import re
+from concurrent.futures import ThreadPoolExecutor
 from core.llm import get_llm
 from core.prompts_loader import load_prompt
 from core.logger import init_logger
 from core.config import load_settings
-from core.storage import ensure_dirs, save_text
+from core.storage import save_artifact_async
+from core.srs_template import numbered
+from core.flow_template import assign_requirements
+from core.utils import stem_words
+from core.incremental import IncrementalBuild, changed_items
+from core.tracing import span, traced
 
 logger = init_logger()
 settings = load_settings()
 
+# Requirement items stories are derived from (core/incremental.py selectors)
+STORY_INPUTS = ("FR*", "NFR*")
 
-def run_jira_story_agent(requirements: dict) -> list:
+_stories_cfg = settings.get("stories", {})
+# single: one completion for every story | modules: one call per module/FR group, concurrently
+STORY_MODE = _stories_cfg.get("mode", "modules")
+STORY_WORKERS = int(_stories_cfg.get("workers", 4))
+# Larger modules are split so no single call risks hitting max_tokens
+MAX_GROUP_SIZE = int(_stories_cfg.get("max_group_size", 6))
+# Summaries whose stemmed word sets overlap at least this much (Jaccard) are merged
+DEDUPE_THRESHOLD = float(_stories_cfg.get("dedupe_threshold", 0.8))
+
+_story_pool = ThreadPoolExecutor(max_workers=max(1, STORY_WORKERS), thread_name_prefix="jira-stories")
+
+
+# ======================================================
+# 🔹 Story Generation
+# ======================================================
+def _prompt_requirements(requirements: dict, only_ids=None) -> dict:
     """
-    Generate JIRA-ready user stories in BDD (Behavior-Driven Development) format
-    from structured software requirements or SRS documents.
+    Requirements as sent to the model, FR/NFR prefixed with the IDs used for
+    dependency tracking. With `only_ids`, only those requirements are kept
+    (and the prose report dropped) so the model writes stories for them alone.
+    """
+    if not isinstance(requirements, dict) or not requirements.get("parsed_json"):
+        return requirements
+    parsed = {k: v for k, v in requirements["parsed_json"].items() if k != "raw_response"}
+    for key, prefix in (("functional_requirements", "FR"), ("non_functional_requirements", "NFR")):
+        entries = [e for e in parsed.get(key, []) or [] if str(e).strip()]
+        parsed[key] = [
+            f"{req_id}: {text}" for req_id, text in numbered(entries, prefix)
+            if only_ids is None or req_id in only_ids
+        ]
+    if only_ids is not None:
+        return {"parsed_json": parsed}
+    return {**requirements, "parsed_json": parsed}
+
+
+def _clean_story(s: dict) -> dict:
+    ids = s.get("requirement_ids") or []
+    return {
+        "summary": s.get("summary", "Untitled Story"),
+        "description": s.get("description", s.get("bdd", "No description provided.")),
+        "bdd": s.get("bdd", ""),
+        "role": s.get("role", "Developer"),
+        "labels": s.get("labels", ["auto", "sdlc"]),
+        "requirement_ids": [str(i).strip().upper() for i in (ids if isinstance(ids, list) else [ids])],
+    }
+
+
+def generate_stories(requirements: dict, llm=None) -> tuple:
+    """
+    One completion producing stories for `requirements`.
 
     Returns:
-        list[dict]: List of JIRA story objects, each containing summary, description,
-                    BDD content, role, and labels.
+        tuple: (stories, complete) — `complete` is False when the response was
+            not valid JSON and a single draft story was substituted.
     """
+    # -------------------------------
+    # 1. Load Prompts
+    # -------------------------------
+    system_prompt = load_prompt("system_base.md")
+    user_prompt = load_prompt("jira.md").format(
+        system=system_prompt,
+        requirements_json=json.dumps(requirements, indent=2)
+    )
+
+    # -------------------------------
+    # 2. Initialize LLM
+    # -------------------------------
+    llm = llm or get_llm()
+    logger.info("[JiraStoryAgent] Generating user stories in BDD format...")
+
+    # -------------------------------
+    # 3. Invoke LLM with Token Tracking
+    # -------------------------------
+    if hasattr(llm, "run_with_usage"):
+        resp = llm.run_with_usage(user_prompt, "JiraStoryAgent")
+    else:
+        resp = llm.invoke(user_prompt)
+
+    text = resp.content if hasattr(resp, "content") else str(resp)
+
+    # -------------------------------
+    # 4. Clean JSON Markers (remove ```json ... ```)
+    # -------------------------------
+    cleaned_text = re.sub(r"```json|```", "", text).strip()
+
+    # -------------------------------
+    # 5. Parse LLM Response (JSON)
+    # -------------------------------
     try:
-        # -------------------------------
-        # 1. Load Prompts
-        # -------------------------------
-        system_prompt = load_prompt("system_base.md")
-        user_prompt = load_prompt("jira.md").format(
-            system=system_prompt,
-            requirements_json=json.dumps(requirements, indent=2)
-        )
+        stories = json.loads(cleaned_text)
+        if not isinstance(stories, list):
+            logger.warning("[JiraStoryAgent] Response was not a list. Wrapping as single story.")
+            stories = [stories]
+        complete = True
+    except json.JSONDecodeError:
+        logger.warning("[JiraStoryAgent] Invalid JSON response. Wrapping as single fallback story.")
+        stories = [
+            {
+                "summary": "Draft SDLC Story",
+                "description": text,
+                "bdd": text,
+                "role": "Developer",
+                "labels": ["auto", "sdlc"]
+            }
+        ]
+        complete = False
 
-        # -------------------------------
-        # 2. Initialize LLM
-        # -------------------------------
-        llm = get_llm()
-        logger.info("[JiraStoryAgent] Generating user stories in BDD format...")
+    # -------------------------------
+    # 6. Ensure Minimum Story Fields
+    # -------------------------------
+    return [_clean_story(s) for s in stories if isinstance(s, dict)], complete
 
-        # -------------------------------
-        # 3. Invoke LLM with Token Tracking
-        # -------------------------------
-        if hasattr(llm, "run_with_usage"):
-            resp = llm.run_with_usage(user_prompt, "JiraStoryAgent")
-        else:
-            resp = llm.invoke(user_prompt)
 
-        text = resp.content if hasattr(resp, "content") else str(resp)
+# ======================================================
+# 🔹 Per-Module Generation
+# ======================================================
+class StoryStats:
+    """Story generation throughput across runs (stories per second of wall time)."""
 
-        # -------------------------------
-        # 4. Clean JSON Markers (remove ```json ... ```)
-        # -------------------------------
-        cleaned_text = re.sub(r"```json|```", "", text).strip()
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.runs = 0
+        self.stories = 0
+        self.calls = 0
+        self.duplicates = 0
+        self.seconds = 0.0
+        self.last = {}
 
-        # -------------------------------
-        # 5. Parse LLM Response (JSON)
-        # -------------------------------
-        try:
-            stories = json.loads(cleaned_text)
-            if not isinstance(stories, list):
-                logger.warning("[JiraStoryAgent] Response was not a list. Wrapping as single story.")
-                stories = [stories]
-        except json.JSONDecodeError:
-            logger.warning("[JiraStoryAgent] Invalid JSON response. Wrapping as single fallback story.")
-            stories = [
-                {
-                    "summary": "Draft SDLC Story",
-                    "description": text,
-                    "bdd": text,
-                    "role": "Developer",
-                    "labels": ["auto", "sdlc"]
-                }
-            ]
+    def record(self, mode: str, stories: int, calls: int, duplicates: int, seconds: float):
+        with self._lock:
+            self.runs += 1
+            self.stories += stories
+            self.calls += calls
+            self.duplicates += duplicates
+            self.seconds += seconds
+            self.last = {
+                "mode": mode, "stories": stories, "calls": calls, "duplicates_merged": duplicates,
+                "seconds": round(seconds, 3), "stories_per_s": round(stories / seconds, 2) if seconds else None,
+            }
 
-        # -------------------------------
-        # 6. Ensure Minimum Story Fields
-        # -------------------------------
-        cleaned_stories = []
-        for s in stories:
-            story = {
-                "summary": s.get("summary", "Untitled Story"),
-                "description": s.get("description", s.get("bdd", "No description provided.")),
-                "bdd": s.get("bdd", ""),
-                "role": s.get("role", "Developer"),
-                "labels": s.get("labels", ["auto", "sdlc"])
+    def summary(self) -> dict:
+        with self._lock:
+            return {
+                "runs": self.runs,
+                "stories": self.stories,
+                "calls": self.calls,
+                "duplicates_merged": self.duplicates,
+                "stories_per_s": round(self.stories / self.seconds, 2) if self.seconds else None,
+                "last": dict(self.last),
             }
-            cleaned_stories.append(story)
+
+
+story_stats = StoryStats()
+
+
+def requirement_groups(requirements: dict, only_ids=None, max_size: int = None) -> list:
+    """
+    FR IDs grouped by module (as in the SRS table), NFRs as their own group;
+    groups above `max_size` are split.
+
+    Returns:
+        list: (group name, [requirement IDs]) in module order.
+    """
+    parsed = requirements.get("parsed_json", {}) if isinstance(requirements, dict) else {}
+    max_size = max(1, max_size or MAX_GROUP_SIZE)
+    frs = [e for e in parsed.get("functional_requirements", []) or [] if str(e).strip()]
+    nfrs = [e for e in parsed.get("non_functional_requirements", []) or [] if str(e).strip()]
+
+    grouped = [
+        (module, [req_id for req_id, _ in reqs])
+        for module, reqs in assign_requirements(parsed.get("modules", []) or [], frs).items()
+    ]
+    grouped.append(("Non-Functional", [req_id for req_id, _ in numbered(nfrs, "NFR")]))
+
+    groups = []
+    for name, ids in grouped:
+        ids = [i for i in ids if only_ids is None or i in only_ids]
+        for start in range(0, len(ids), max_size):
+            part = f" ({start // max_size + 1})" if len(ids) > max_size else ""
+            groups.append((name + part, ids[start:start + max_size]))
+    return groups
+
+
+def _summary_terms(summary: str) -> frozenset:
+    """Stemmed words of a summary ("Teachers mark attendance" ~ "Teacher marks attendance")."""
+    return frozenset(stem_words(summary))
+
+
+def _similar(a: frozenset, b: frozenset, threshold: float) -> bool:
+    if not a or not b:
+        return a == b
+    return len(a & b) / len(a | b) >= threshold
+
+
+def dedupe_stories(stories: list, threshold: float = None) -> tuple:
+    """
+    Merge stories with near-identical summaries, keeping the first and
+    combining requirement IDs and labels.
+
+    Returns:
+        tuple: (stories, number of duplicates merged)
+    """
+    threshold = DEDUPE_THRESHOLD if threshold is None else threshold
+    kept, keys, merged = [], [], 0
+    for story in stories:
+        key = _summary_terms(story.get("summary", ""))
+        match = next((i for i, k in enumerate(keys) if _similar(k, key, threshold)), None)
+        if match is None:
+            kept.append(story)
+            keys.append(key)
+            continue
+        merged += 1
+        first = kept[match]
+        first["requirement_ids"] = list(dict.fromkeys(first.get("requirement_ids", []) + story.get("requirement_ids", [])))
+        first["labels"] = list(dict.fromkeys(list(first.get("labels", [])) + list(story.get("labels", []))))
+    return kept, merged
+
+
+def _generate_group(requirements: dict, name: str, ids: list, llm=None) -> tuple:
+    with span("jira.story_group", group=name, requirements=len(ids)):
+        stories, complete = generate_stories(_prompt_requirements(requirements, only_ids=set(ids)), llm=llm)
+    # Stories naming no requirement belong to the group they were generated for
+    for story in stories:
+        story["requirement_ids"] = [i for i in story["requirement_ids"] if i in ids] or list(ids)
+    return stories, complete
+
+
+def generate_by_module(requirements: dict, only_ids=None, llm=None) -> tuple:
+    """
+    One story call per module/FR group, run concurrently (`stories.workers`),
+    then merged, de-duplicated and ordered by requirement ID.
+
+    Returns:
+        tuple: (stories, complete, calls, duplicates merged); `complete` is
+            False if any group failed or fell back to a draft story.
+    """
+    groups = [(name, ids) for name, ids in requirement_groups(requirements, only_ids) if ids]
+    if not groups:
+        return generate_stories(_prompt_requirements(requirements, only_ids), llm=llm) + (1, 0)
+
+    logger.info(f"[JiraStoryAgent] Generating stories for {len(groups)} requirement group(s) concurrently...")
+    futures = [
+        _story_pool.submit(contextvars.copy_context().run, _generate_group, requirements, name, ids, llm)
+        for name, ids in groups
+    ]
+    stories, complete, failed = [], True, 0
+    for (name, _), future in zip(groups, futures):
+        try:
+            group_stories, group_complete = future.result()
+            stories += group_stories
+            complete = complete and group_complete
+        except Exception as e:
+            complete, failed = False, failed + 1
+            logger.exception(f"[JiraStoryAgent] Story group '{name}' failed: {e}")
+    if failed == len(groups):
+        raise ValueError("All story groups failed to generate.")
+
+    stories, merged = dedupe_stories(stories)
+    if merged:
+        logger.info(f"[JiraStoryAgent] Merged {merged} near-duplicate stories.")
+    return stories, complete, len(groups), merged
+
+
+def _generate(requirements: dict, only_ids=None, mode: str = None) -> tuple:
+    """Stories for `requirements` (restricted to `only_ids`) in `mode`; records throughput."""
+    mode = mode or STORY_MODE
+    started = time.perf_counter()
+    if mode == "modules" and isinstance(requirements, dict) and requirements.get("parsed_json"):
+        stories, complete, calls, merged = generate_by_module(requirements, only_ids)
+    else:
+        (stories, complete), calls, merged = generate_stories(_prompt_requirements(requirements, only_ids)), 1, 0
+    elapsed = time.perf_counter() - started
+    story_stats.record(mode, len(stories), calls, merged, elapsed)
+    logger.info(
+        f"[JiraStoryAgent] {len(stories)} stories from {calls} call(s) in {elapsed:.2f}s "
+        f"({len(stories) / elapsed if elapsed else 0:.2f} stories/s, mode={mode})"
+    )
+    return stories, complete
+
+
+# ======================================================
+# 🔹 Incremental Regeneration
+# ======================================================
+def _story_deps(story: dict, items: dict) -> dict:
+    """Hashes of the requirement items a story implements (all items if it names none)."""
+    deps = {i: items[i] for i in story.get("requirement_ids", []) if i in items}
+    return deps or dict(items)
+
+
+def _order(entries: list, items: dict) -> list:
+    """Stories in requirement order (first implemented ID), stable otherwise."""
+    position = {item_id: i for i, item_id in enumerate(items)}
+    return sorted(entries, key=lambda e: min((position.get(i, len(position)) for i in e["deps"]), default=len(position)))
+
+
+def _incremental_stories(requirements: dict, build: IncrementalBuild, mode: str = None) -> list:
+    """
+    Keep recorded stories whose requirement items are unchanged and generate
+    stories only for requirements that changed, are new, or lost their story.
+    """
+    items = build.deps(STORY_INPUTS)
+    last = build.previous("jira_stories")
+    record = last[1] if last else {"stories": [], "inputs": {}}
+    kept, orphaned = [], set()
+    for entry in record["stories"]:
+        if all(items.get(i) == h for i, h in entry["deps"].items()):
+            kept.append(entry)
+        else:
+            # Unchanged requirements sharing a story with a changed one need a new story
+            orphaned.update(i for i in entry["deps"] if i in items)
+    # Requirements the model already saw (even those it wrote no story for) are not stale
+    stale = [i for i in items if record["inputs"].get(i) != items[i] or i in orphaned]
+
+    if last is not None and not stale and len(kept) == len(record["stories"]):
+        logger.info(f"[JiraStoryAgent] Requirements unchanged; reusing {len(kept)} stories.")
+        build.store.note("jira_stories", "reused")
+        return [e["story"] for e in kept]
+
+    if kept and stale:
+        logger.info(f"[JiraStoryAgent] Regenerating stories for {len(stale)} changed requirement(s); keeping {len(kept)}.")
+        stories, complete = _generate(requirements, only_ids=set(stale), mode=mode)
+        build.store.note("jira_stories", "partial", stale)
+    elif kept:
+        # Only removals: drop the affected stories, nothing to generate
+        stories, complete = [], True
+        build.store.note("jira_stories", "partial", changed_items(last[0], items))
+    else:
+        stories, complete = _generate(requirements, mode=mode)
+        build.store.note("jira_stories", "rebuilt", changed_items(last[0], items) if last else ["(new)"])
+
+    entries = _order(kept + [{"story": s, "deps": _story_deps(s, items)} for s in stories], items)
+    if complete:
+        build.record("jira_stories", items, {"stories": entries, "inputs": items})
+    return [e["story"] for e in entries]
+
+
+@traced("agent.jira_story")
+def run_jira_story_agent(requirements: dict, incremental: bool = None, mode: str = None) -> list:
+    """
+    Generate JIRA-ready user stories in BDD (Behavior-Driven Development) format
+    from structured software requirements or SRS documents.
+
+    Each story records the FR/NFR IDs it implements; with `incremental`
+    (default `incremental.enabled`) stories of unchanged requirements are
+    reused and only changed or new requirements go to the model.
+
+    Modes (`stories.mode`, overridable per call):
+      - modules: one call per module/FR group, `stories.workers` at a time,
+        merged, de-duplicated and ordered by requirement ID.
+      - single: every story in one completion.
+
+    Returns:
+        list[dict]: List of JIRA story objects, each containing summary, description,
+                    BDD content, role, labels and requirement_ids.
+    """
+    try:
+        build = IncrementalBuild(requirements, enabled=incremental)
+        if build.enabled:
+            cleaned_stories = _incremental_stories(requirements, build, mode)
+        else:
+            items = build.deps(STORY_INPUTS)
+            stories, _ = _generate(requirements, mode=mode)
+            cleaned_stories = [e["story"] for e in _order([{"story": s, "deps": _story_deps(s, items)} for s in stories], items)]
 
         # -------------------------------
-        # 7. Save Intermediate Outputs (JSON + CSV)
+        # 7. Queue Intermediate Outputs (JSON + CSV) for background write
         # -------------------------------
         if settings["features"].get("save_intermediate_json", True):
-            ensure_dirs()
-
-            # Save JSON
-            json_path = "outputs/jira_stories.json"
-            save_text(json_path, json.dumps(cleaned_stories, indent=2))
-            logger.info(f"[JiraStoryAgent] Saved JSON -> {json_path}")
-
-            # ✅ Save CSV
-            try:
-                df = pd.DataFrame(cleaned_stories)
-                csv_path = "outputs/jira_stories.csv"
-                df.to_csv(csv_path, index=False, encoding="utf-8-sig")
-                logger.info(f"[JiraStoryAgent] Saved CSV -> {csv_path}")
-            except Exception as e:
-                logger.warning(f"[JiraStoryAgent] Failed to save CSV: {e}")
+            json_handle = save_artifact_async("jira_stories.json", lambda: json.dumps(cleaned_stories, indent=2))
+            logger.info(f"[JiraStoryAgent] Queued JSON -> {json_handle.path}")
+
+            # ✅ CSV (serialised by the writer thread)
+            csv_handle = save_artifact_async(
+                "jira_stories.csv",
+                lambda: "\ufeff" + pd.DataFrame(cleaned_stories).to_csv(index=False),
+            )
+            logger.info(f"[JiraStoryAgent] Queued CSV -> {csv_handle.path}")
 
         # -------------------------------
         # 8. Return Final Stories
@@ -1,36 +1,108 @@
 import os
-import re
 import base64
 import json
-from loguru import logger
+import hashlib
+import contextvars
 from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+from loguru import logger
 from openai import OpenAI
 from core.llm import tracker
 from core.config import load_settings
+from core.storage import atomic_write_bytes, save_artifact, save_artifact_async
+from core.tracing import span, traced
+from core.diagram_render import DEFAULT_FORMAT, RenderError, render_dot
+from core.dot_repair import repair_dot, repair_stats
+from core.graph_ir import generate_graph_ir, source_text
+
+# Raster image: off | on_demand (generate_mindmap_image) | eager (concurrent with the text map)
+IMAGE_MODES = ("off", "on_demand", "eager")
+IMAGE_MODEL = "gpt-image-1"
 
+_image_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="mindmap-image")
+
+
+def _mindmap_settings() -> dict:
+    settings = load_settings()
+    return settings.get("mindmap", {}) or {}
 
-def run_mindmap_agent(requirement_text: str) -> dict:
+
+def _image_cache_dir() -> Path:
+    settings = load_settings()
+    return Path(_mindmap_settings().get(
+        "image_cache_dir", str(Path(settings.get("paths", {}).get("outputs_dir", "outputs")) / "cache" / "mindmap_images")
+    ))
+
+
+def _image_prompt(requirement_text) -> str:
+    return f"""
+    Create a colorful mind map visualization based on this requirement.
+    - Use distinct colors for each module.
+    - Show parent-child relationships with arrows.
+    - Include labels for each node.
+    - Layout should be clean, centered, and organized.
+    Requirements:
+    {source_text(requirement_text)}
     """
-    Generates both textual (Graphviz DOT) and visual (image) mind map
-    from given requirements using GPT models.
 
+
+def generate_mindmap_image(requirement_text) -> str:
+    """
+    Generate (or reuse) the raster mind map for the current run.
+
+    Images are cached by a hash of the image model and prompt, so the same
+    requirements never pay for a second `gpt-image-1` call.
+
+    Args:
+        requirement_text (str | dict): Requirement text, or the requirement agent output.
     Returns:
-        dict: {"text_map": str, "dot_path": str, "image_path": str}
+        str: Run-local path of the PNG, or "" on failure.
     """
-    settings = load_settings()
-    api_key = settings["env"]["OPENAI_API_KEY"]
-    client = OpenAI(api_key=api_key)
-    vision_model = settings["env"].get("OPENAI_VISION_MODEL", "gpt-4o")
-    text_model = settings["env"].get("OPENAI_MODEL", "gpt-4o-mini")
+    prompt = _image_prompt(requirement_text)
+    digest = hashlib.sha256(f"{IMAGE_MODEL}\0{prompt}".encode("utf-8")).hexdigest()
+    cached = _image_cache_dir() / f"{digest}.png"
 
-    output_dir = Path(settings["paths"]["diagrams_dir"])
-    output_dir.mkdir(parents=True, exist_ok=True)
-    image_path = output_dir / "mindmap.png"
-    dot_path = output_dir / "mindmap.dot"
+    try:
+        if cached.exists():
+            image_path = save_artifact("diagrams/mindmap.png", cached.read_bytes())
+            logger.info(f"[MindMapAgent] Visual mind map reused from cache: {image_path}")
+            return image_path
 
-    # ----------------------------------------------------
-    # 1️⃣ Generate Textual Mind Map (Graphviz DOT)
-    # ----------------------------------------------------
+        logger.info("[MindMapAgent] Generating visual mind map image...")
+        settings = load_settings()
+        client = OpenAI(api_key=settings["env"]["OPENAI_API_KEY"])
+        with span("llm.image", model=IMAGE_MODEL, agent="mindmap_image"):
+            response_img = client.images.generate(
+                model=IMAGE_MODEL,
+                prompt=prompt,
+                size="1024x1024"
+            )
+
+        image_base64 = response_img.data[0].b64_json
+        image_bytes = base64.b64decode(image_base64)
+
+        try:
+            atomic_write_bytes(cached, image_bytes)
+        except OSError as e:
+            logger.warning(f"[MindMapAgent] Could not cache mind map image: {e}")
+        image_path = save_artifact("diagrams/mindmap.png", image_bytes)
+
+        tracker.log_agent("mindmap_image", 0, 300, 0.02, model=IMAGE_MODEL)
+        logger.info(f"[MindMapAgent] Visual mind map saved: {image_path}")
+        return image_path
+
+    except Exception as e:
+        logger.exception(f"[MindMapAgent] Failed to generate visual mind map: {e}")
+        return ""
+
+
+def _freeform_mindmap_dot(client, text_model: str, requirement_text: str):
+    """
+    Ask the model for free-form mind map DOT and repair it locally.
+
+    Returns:
+        tuple: (dot source, whether it validates)
+    """
     prompt_text = f"""
     You are a software architect and visualization expert.
 
@@ -48,8 +120,7 @@ def run_mindmap_agent(requirement_text: str) -> dict:
     Return only valid Graphviz DOT code, no Markdown or explanations.
     """
 
-    text_map = ""
-    try:
+    with span("llm.invoke", model=text_model, agent="mindmap_text"):
         response_text = client.chat.completions.create(
             model=text_model,
             messages=[
@@ -60,61 +131,110 @@ def run_mindmap_agent(requirement_text: str) -> dict:
             max_tokens=1500,
         )
 
-        text_map = response_text.choices[0].message.content.strip()
-        tracker.log_agent("mindmap_text", 800, 500, 0.03)
-
-        # --- Cleanup Markdown formatting ---
-        clean_dot = re.sub(r"^```[a-zA-Z]*\s*", "", text_map)
-        clean_dot = re.sub(r"```$", "", clean_dot)
-        clean_dot = clean_dot.strip("` \n\r\t")
-
-        # --- Ensure valid DOT structure ---
+    text_map = response_text.choices[0].message.content.strip()
+    tracker.log_agent("mindmap_text", 800, 500, 0.03, model=text_model)
+
+    # --- Validate and repair DOT locally (no re-prompt for mind maps) ---
+    repaired = repair_dot(text_map)
+    clean_dot = repaired.dot
+    if repaired.valid:
+        repair_stats.record("mindmap", "repaired" if repaired.fixes else "valid")
+    else:
+        repair_stats.record("mindmap", "failed")
+        logger.warning(f"[MindMapAgent] DOT still invalid after repair: {repaired.errors[0]}")
         if "digraph" not in clean_dot:
             clean_dot = f"digraph MindMap {{\n{clean_dot}\n}}"
+    return clean_dot, repaired.valid
 
-        with open(dot_path, "w", encoding="utf-8") as f:
-            f.write(clean_dot)
 
-        text_map = clean_dot
-        logger.info(f"[MindMapAgent] Text mind map saved: {dot_path}")
-
-    except Exception as e:
-        logger.exception("[MindMapAgent] Failed to generate text mind map.")
-        text_map = "Error generating text mind map."
+@traced("agent.mindmap")
+def run_mindmap_agent(requirement_text, image_mode: str = None, on_text_map=None) -> dict:
+    """
+    Generates the textual (Graphviz DOT) mind map with a local render and,
+    depending on `image_mode`, the raster image from `gpt-image-1`.
+
+    With `diagrams.generator: ir` (default) the DOT map is emitted from the
+    shared graph IR, so a flow diagram for the same input costs no extra call.
+
+    Image modes (`mindmap.image`, overridable per call):
+      - off: local Graphviz render only.
+      - on_demand (default): skip the image; callers use generate_mindmap_image
+        when the user asks for it.
+      - eager: generate the image concurrently with the text map.
+
+    Args:
+        requirement_text (str | dict): Requirement text, or the requirement agent output.
+        image_mode (str): One of IMAGE_MODES; defaults to the configured mode.
+        on_text_map (callable): Called with {"text_map", "dot_path", "render_path"}
+            as soon as the text map is ready, before the image finishes.
+    Returns:
+        dict: {"text_map": str, "dot_path": str, "render_path": str, "image_path": str,
+               "image_mode": str}
+              `render_path` is the local Graphviz render of the DOT map.
+    """
+    settings = load_settings()
+    text_model = settings["env"].get("OPENAI_MODEL", "gpt-4o-mini")
+    generator = settings.get("diagrams", {}).get("generator", "ir")
+    image_mode = image_mode or _mindmap_settings().get("image", "on_demand")
+    if image_mode not in IMAGE_MODES:
+        logger.warning(f"[MindMapAgent] Unknown image mode {image_mode!r}; using 'on_demand'.")
+        image_mode = "on_demand"
+
+    image_path = ""
+    dot_path = ""
+    render_path = ""
+
+    # Start the slow image call first so it overlaps the text map
+    image_future = None
+    if image_mode == "eager":
+        ctx = contextvars.copy_context()
+        image_future = _image_pool.submit(ctx.run, generate_mindmap_image, requirement_text)
 
     # ----------------------------------------------------
-    # 2️⃣ Generate Visual Mind Map (Image)
+    # 1️⃣ Generate Textual Mind Map (Graphviz DOT)
     # ----------------------------------------------------
-    image_prompt = f"""
-    Create a colorful mind map visualization based on this requirement.
-    - Use distinct colors for each module.
-    - Show parent-child relationships with arrows.
-    - Include labels for each node.
-    - Layout should be clean, centered, and organized.
-    Requirements:
-    {requirement_text}
-    """
-
+    text_map = ""
     try:
-        logger.info("[MindMapAgent] Generating visual mind map image...")
-        response_img = client.images.generate(
-            model="gpt-image-1",
-            prompt=image_prompt,
-            size="1024x1024"
-        )
-
-        image_base64 = response_img.data[0].b64_json
-        image_bytes = base64.b64decode(image_base64)
+        clean_dot = None
+        if generator == "ir":
+            try:
+                ir = generate_graph_ir(requirement_text)
+                clean_dot, valid = ir.to_dot("mindmap"), True
+                save_artifact_async("diagrams/mindmap.mmd", ir.to_mermaid("mindmap"))
+            except Exception as e:
+                logger.warning(f"[MindMapAgent] Graph IR unavailable ({e}); requesting free-form DOT.")
+        if clean_dot is None:
+            client = OpenAI(api_key=settings["env"]["OPENAI_API_KEY"])
+            clean_dot, valid = _freeform_mindmap_dot(client, text_model, source_text(requirement_text))
+
+        dot_path = save_artifact_async("diagrams/mindmap.dot", clean_dot).path
 
-        with open(image_path, "wb") as f:
-            f.write(image_bytes)
+        text_map = clean_dot
+        logger.info(f"[MindMapAgent] Text mind map queued: {dot_path}")
 
-        tracker.log_agent("mindmap_image", 0, 300, 0.02)
-        logger.info(f"[MindMapAgent] Visual mind map saved: {image_path}")
+        # --- Local render of the DOT map (shared, cached renderer) ---
+        try:
+            if valid:
+                render_path = save_artifact(f"diagrams/mindmap_dot.{DEFAULT_FORMAT}", render_dot(clean_dot))
+                logger.info(f"[MindMapAgent] DOT mind map rendered: {render_path}")
+        except RenderError as e:
+            logger.warning(f"[MindMapAgent] Local DOT render skipped: {e}")
 
     except Exception as e:
-        logger.exception(f"[MindMapAgent] Failed to generate visual mind map: {e}")
-        image_path = ""
+        logger.exception("[MindMapAgent] Failed to generate text mind map.")
+        text_map = "Error generating text mind map."
+
+    if on_text_map:
+        try:
+            on_text_map({"text_map": text_map, "dot_path": str(dot_path), "render_path": str(render_path)})
+        except Exception as e:
+            logger.warning(f"[MindMapAgent] on_text_map callback failed: {e}")
+
+    # ----------------------------------------------------
+    # 2️⃣ Visual Mind Map (Image) — concurrent, cached
+    # ----------------------------------------------------
+    if image_future is not None:
+        image_path = image_future.result()
 
     # ----------------------------------------------------
     # 3️⃣ Return Combined Output
@@ -122,5 +242,7 @@ def run_mindmap_agent(requirement_text: str) -> dict:
     return {
         "text_map": text_map,
         "dot_path": str(dot_path),
+        "render_path": str(render_path),
         "image_path": str(image_path),
+        "image_mode": image_mode,
     }
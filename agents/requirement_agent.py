@@ -1,60 +1,74 @@
 import json
 import re
+import copy
+import time
+import difflib
+import threading
+import contextvars
+from concurrent.futures import Future
+from core.cancellation import OperationCancelled
+from core.config import load_settings
+from core.json_stream import IncrementalJSONParser
 from core.llm import get_llm
 from core.prompts_loader import load_prompt
 from core.logger import init_logger
+from core.similarity_cache import CACHE_ENABLED, normalize_statement, similarity_cache
+from core.srs_template import numbered
+from core.tracing import span, traced
 
 logger = init_logger()
+settings = load_settings()
+
+# Above this share of new/edited text a delta costs more than a fresh analysis
+MAX_CHANGED_RATIO = float(settings.get("requirements_cache", {}).get("max_changed_ratio", 0.6))
+ID_PREFIXES = {"functional_requirements": "FR", "non_functional_requirements": "NFR"}
+
+REQUIREMENT_KEYS = (
+    "project_name", "functional_requirements", "non_functional_requirements", "actors", "assumptions", "modules",
+)
+
+SYSTEM = (
+    "You are a senior business analyst generating structured requirements "
+    "based on the provided problem statement."
+)
+
 
 # ======================================================
 # 🔹 Requirement Agent
 # ======================================================
-def run_requirement_agent(problem_description: str) -> dict:
+@traced("agent.requirement")
+def run_requirement_agent(problem_description: str, use_cache: bool = None, previous: dict = None) -> dict:
     """
     Generate structured software requirements using LLM.
     Returns both human-readable markdown and parsed JSON.
+
+    Edited input is re-analysed incrementally: against `previous` (the last
+    analysed version) or a near-duplicate from the similarity cache, only
+    the changed paragraphs and the prior JSON are sent, and the model's
+    delta is merged into `parsed_json`. Unchanged statements are reused.
+
+    Args:
+        problem_description (str): Problem statement.
+        use_cache (bool): Consult the similarity cache; defaults to `requirements_cache.enabled`.
+        previous (dict): {"statement", "requirements"} of the last analysis, e.g. from the UI session.
+    Returns:
+        dict: readable_text, parsed_json and analysis ({"mode": full | cached | delta, "source", ...}).
     """
     try:
         if not problem_description or not problem_description.strip():
             raise ValueError("Empty input: problem_description is required.")
 
-        system = (
-            "You are a senior business analyst generating structured requirements "
-            "based on the provided problem statement."
-        )
+        use_cache = CACHE_ENABLED if use_cache is None else use_cache
+        result = _reuse(problem_description, use_cache, previous)
+        if result:
+            if use_cache:
+                similarity_cache.add(problem_description, _cacheable(result))
+            return result
 
-        # ✅ Load prompt dynamically and safely format placeholders
-        template = load_prompt("requirements.md")
-        prompt = template.format_map({
-            "system": system,
-            "problem_description": problem_description.strip()
-        })
-
-        logger.info("[RequirementAgent] Generating requirements...")
-        logger.debug(f"[RequirementAgent] Using dynamic input:\n{problem_description[:500]}")
-
-        # Initialize the model
-        llm = get_llm("requirement")
-
-        # Get clean text output from LLM
-        text = llm.invoke(prompt, agent_name="requirement")
-
-        # Try to extract JSON block
-        json_block = extract_json_from_text(text)
-        parsed_json = safe_parse_json(json_block)
-
-        # Fill missing keys for consistency
-        parsed_json.setdefault("project_name", "Unknown Project")
-        parsed_json.setdefault("functional_requirements", [])
-        parsed_json.setdefault("non_functional_requirements", [])
-        parsed_json.setdefault("actors", [])
-        parsed_json.setdefault("assumptions", [])
-        parsed_json.setdefault("modules", [])
-
-        return {
-            "readable_text": text.strip(),
-            "parsed_json": parsed_json,
-        }
+        result = _extract_full(problem_description)
+        if use_cache and result["parsed_json"].get("functional_requirements"):
+            similarity_cache.add(problem_description, _cacheable(result))
+        return result
 
     except Exception as e:
         logger.exception(f"[RequirementAgent] Failed: {e}")
@@ -72,6 +86,373 @@ def run_requirement_agent(problem_description: str) -> dict:
         }
 
 
+def _extract_full(problem_description: str) -> dict:
+    """One completion over the whole statement."""
+    system = SYSTEM
+
+    # ✅ Load prompt dynamically and safely format placeholders
+    template = load_prompt("requirements.md")
+    prompt = template.format_map({
+        "system": system,
+        "problem_description": problem_description.strip()
+    })
+
+    logger.info("[RequirementAgent] Generating requirements...")
+    logger.opt(lazy=True).debug(
+        "[RequirementAgent] Using dynamic input:\n{}", lambda: problem_description[:500]
+    )
+
+    # Initialize the model
+    llm = get_llm("requirement")
+
+    # Get clean text output from LLM
+    text = llm.invoke(prompt, agent_name="requirement")
+
+    # Try to extract JSON block
+    json_block = extract_json_from_text(text)
+    parsed_json = safe_parse_json(json_block)
+
+    return {
+        "readable_text": text.strip(),
+        "parsed_json": _fill_defaults(parsed_json),
+        "analysis": {"mode": "full"},
+    }
+
+
+# ======================================================
+# 🔹 Pipelined (Streaming) Requirement Agent
+# ======================================================
+class PipelinedRequirements:
+    """
+    Handle for a streaming analysis. `requirements()` resolves as soon as the
+    JSON block is complete (readable_text still empty) so downstream agents
+    can start; `result()` resolves once the readable report has streamed.
+    """
+
+    def __init__(self):
+        self._json = Future()
+        self._final = Future()
+        self.stats = {}
+
+    def requirements(self, timeout: float = None) -> dict:
+        return self._json.result(timeout)
+
+    def result(self, timeout: float = None) -> dict:
+        return self._final.result(timeout)
+
+    def _resolve(self, early: dict = None, final: dict = None, error: BaseException = None):
+        for future, value in ((self._json, early), (self._final, final)):
+            if future.done():
+                continue
+            if error is not None:
+                future.set_exception(error)
+            elif value is not None:
+                future.set_result(value)
+
+
+def stream_requirement_agent(problem_description: str, use_cache: bool = None,
+                             previous: dict = None) -> PipelinedRequirements:
+    """
+    Start the requirement analysis in the background with the JSON block
+    streamed first (prompts/requirements_pipelined.md).
+
+    Reused or delta results (see run_requirement_agent) resolve both stages
+    at once. Otherwise an IncrementalJSONParser watches the stream and
+    releases parsed_json the moment the object closes.
+
+    Returns:
+        PipelinedRequirements: stats gain json_ready_s and total_s.
+    """
+    handle = PipelinedRequirements()
+
+    def work():
+        started = time.perf_counter()
+        try:
+            if not problem_description or not problem_description.strip():
+                raise ValueError("Empty input: problem_description is required.")
+            reuse = CACHE_ENABLED if use_cache is None else use_cache
+            reused = _reuse(problem_description, reuse, previous)
+            if reused:
+                if reuse:
+                    similarity_cache.add(problem_description, _cacheable(reused))
+                elapsed = round(time.perf_counter() - started, 3)
+                handle.stats.update(json_ready_s=elapsed, total_s=elapsed)
+                handle._resolve(reused, reused)
+                return
+            final = _stream_full(problem_description, handle, started)
+            if reuse and final["parsed_json"].get("functional_requirements"):
+                similarity_cache.add(problem_description, _cacheable(final))
+        except OperationCancelled as e:
+            logger.info(f"[RequirementAgent] Pipelined analysis cancelled: {e}")
+            handle._resolve(error=e)
+        except BaseException as e:
+            logger.exception(f"[RequirementAgent] Pipelined analysis failed: {e}")
+            handle._resolve(error=e)
+
+    threading.Thread(
+        target=contextvars.copy_context().run, args=(work,), name="requirement-stream", daemon=True
+    ).start()
+    return handle
+
+
+def _reuse(problem_description: str, use_cache: bool, previous: dict = None):
+    """Reused or delta result from `previous` / the similarity cache, or None."""
+    if previous and previous.get("statement") and previous.get("requirements", {}).get("parsed_json"):
+        result = _from_match(problem_description, {**previous, "similarity": None}, "previous")
+        if result:
+            return result
+    if use_cache:
+        match = similarity_cache.lookup(problem_description)
+        if match:
+            return _from_match(problem_description, match, "cache")
+    return None
+
+
+def _stream_full(problem_description: str, handle: PipelinedRequirements, started: float) -> dict:
+    template = load_prompt("requirements_pipelined.md")
+    prompt = template.format_map({"system": SYSTEM, "problem_description": problem_description.strip()})
+    logger.info("[RequirementAgent] Streaming requirements (JSON first)...")
+
+    parser = IncrementalJSONParser()
+    for chunk in get_llm("requirement").stream(prompt, agent_name="requirement"):
+        if parser.feed(chunk) and not handle._json.done():
+            handle.stats["json_ready_s"] = round(time.perf_counter() - started, 3)
+            logger.info(f"[RequirementAgent] Requirements JSON ready after {handle.stats['json_ready_s']}s")
+            handle._resolve(early={
+                "readable_text": "",
+                "parsed_json": _fill_defaults(dict(parser.value)),
+                "analysis": {"mode": "pipelined", "partial": True},
+            })
+
+    text = parser.text
+    if parser.complete:
+        parsed_json = _fill_defaults(dict(parser.value))
+        report = re.sub(r"^\s*```\s*", "", parser.remainder()).strip()
+    else:
+        # The model ignored the ordering: fall back to the fenced block anywhere in the reply
+        parsed_json = _fill_defaults(safe_parse_json(extract_json_from_text(text)))
+        report = re.sub(r"```json.*?```", "", text, flags=re.DOTALL).strip()
+        handle.stats["json_ready_s"] = round(time.perf_counter() - started, 3)
+    handle.stats["total_s"] = round(time.perf_counter() - started, 3)
+    final = {
+        "readable_text": report or render_requirements_markdown(parsed_json),
+        "parsed_json": parsed_json,
+        "analysis": {"mode": "pipelined", **handle.stats},
+    }
+    handle._resolve(early=final, final=final)
+    return final
+
+
+# ======================================================
+# 🔹 Incremental Re-Analysis (paragraph diff + delta merge)
+# ======================================================
+def _fill_defaults(parsed_json: dict) -> dict:
+    """Fill missing keys for consistency."""
+    parsed_json.setdefault("project_name", "Unknown Project")
+    parsed_json.setdefault("functional_requirements", [])
+    parsed_json.setdefault("non_functional_requirements", [])
+    parsed_json.setdefault("actors", [])
+    parsed_json.setdefault("assumptions", [])
+    parsed_json.setdefault("modules", [])
+    return parsed_json
+
+
+def _cacheable(result: dict) -> dict:
+    return {"readable_text": result["readable_text"], "parsed_json": result["parsed_json"]}
+
+
+def split_sentences(text: str) -> list:
+    return [s.strip() for s in re.split(r"(?<=[.!?])\s+|\n+", text or "") if s.strip()]
+
+
+def split_paragraphs(text: str) -> list:
+    """Blank-line separated paragraphs; lines, then sentences, for text with no paragraph breaks."""
+    blocks = [b.strip() for b in re.split(r"\n\s*\n", text or "") if b.strip()]
+    if len(blocks) <= 1:
+        blocks = [line.strip() for line in (text or "").splitlines() if line.strip()]
+    if len(blocks) <= 1:
+        blocks = split_sentences(text)
+    return blocks
+
+
+def statement_diff(old: str, new: str) -> tuple:
+    """(removed, added) paragraphs between two statements, compared in normalised form."""
+    old_p, new_p = split_paragraphs(old), split_paragraphs(new)
+    matcher = difflib.SequenceMatcher(
+        a=[normalize_statement(p) for p in old_p], b=[normalize_statement(p) for p in new_p], autojunk=False
+    )
+    removed, added = [], []
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag in ("replace", "delete"):
+            removed.extend(old_p[i1:i2])
+        if tag in ("replace", "insert"):
+            added.extend(new_p[j1:j2])
+    return removed, added
+
+
+def _with_ids(parsed_json: dict) -> dict:
+    """FR/NFR items with explicit IDs, so a delta can address them."""
+    parsed_json = copy.deepcopy(parsed_json)
+    for key, prefix in ID_PREFIXES.items():
+        parsed_json[key] = [f"{req_id}: {text}" for req_id, text in numbered(_items(parsed_json, key), prefix)]
+    return parsed_json
+
+
+def _items(parsed_json: dict, key: str) -> list:
+    return [item for item in parsed_json.get(key, []) or [] if str(item).strip()]
+
+
+def _id_of(item: str):
+    match = re.match(r"\s*(N?FR\d+)\b", str(item), flags=re.IGNORECASE)
+    return match.group(1).upper() if match else None
+
+
+def _id_number(item: str, prefix: str):
+    """Number of an item's own-prefix ID ("FR3" → 3 for "FR"); None for no ID or another list's ID."""
+    match = re.fullmatch(rf"{prefix}(\d+)", _id_of(item) or "")
+    return int(match.group(1)) if match else None
+
+
+def _matches(item: str, key: str, target: str) -> bool:
+    """`target` is an FR/NFR ID or an item's text."""
+    target_id = _id_of(target) if re.fullmatch(r"\s*N?FR\d+\s*", str(target), flags=re.IGNORECASE) else None
+    if target_id:
+        return key in ID_PREFIXES and _id_of(item) == target_id
+    return normalize_statement(_strip_id(item)) == normalize_statement(_strip_id(target))
+
+
+def _strip_id(text: str) -> str:
+    return re.sub(r"^\s*N?FR\d+\s*[:.)–-]?\s*", "", str(text), flags=re.IGNORECASE)
+
+
+def merge_requirement_delta(previous: dict, delta: dict) -> tuple:
+    """
+    Apply a delta ({"project_name", "remove", "replace", "add"}) to parsed
+    requirements. FR/NFR IDs are kept stable; added ones get the next free ID.
+
+    Returns:
+        tuple: (merged parsed_json, list of change descriptions)
+    """
+    merged = _with_ids(previous)
+    changes = []
+    list_keys = REQUIREMENT_KEYS[1:]
+
+    if delta.get("project_name") and delta["project_name"] != merged.get("project_name"):
+        merged["project_name"] = delta["project_name"]
+        changes.append(f"Project renamed to {delta['project_name']}")
+
+    for target in delta.get("remove", []) or []:
+        for key in list_keys:
+            kept = [item for item in merged.get(key, []) if not _matches(item, key, target)]
+            if len(kept) != len(merged.get(key, [])):
+                merged[key] = kept
+                changes.append(f"Removed {target}")
+                break
+
+    for target, text in (delta.get("replace", {}) or {}).items():
+        for key in list_keys:
+            items = merged.get(key, [])
+            hit = next((i for i, item in enumerate(items) if _matches(item, key, target)), None)
+            if hit is None:
+                continue
+            old_id = _id_of(items[hit])
+            items[hit] = f"{old_id}: {_strip_id(text)}" if old_id else _strip_id(text)
+            changes.append(f"Updated {old_id or target}")
+            break
+
+    for key in list_keys:
+        for text in (delta.get("add", {}) or {}).get(key, []) or []:
+            items = merged.setdefault(key, [])
+            if not str(text).strip() or any(_matches(item, key, _strip_id(text)) for item in items):
+                continue
+            if key in ID_PREFIXES:
+                prefix = ID_PREFIXES[key]
+                used = [n for n in (_id_number(i, prefix) for i in items) if n is not None]
+                text = f"{prefix}{max(used, default=0) + 1}: {_strip_id(text)}"
+            items.append(text)
+            changes.append(f"Added {text}")
+    return _fill_defaults(merged), changes
+
+
+def _from_match(problem_description: str, match: dict, source: str):
+    """Reused result for an identical statement, or a delta re-analysis of the edits (None to run in full)."""
+    cached = copy.deepcopy(match["requirements"])
+    similarity = match.get("similarity")
+    # Exactness comes from the normalised text (the cache digest), never from the
+    # rounded shingle similarity: repeated or reordered sentences can score 1.0
+    exact = match.get("exact")
+    if exact is None:
+        exact = normalize_statement(match["statement"]) == normalize_statement(problem_description)
+    removed, added = statement_diff(match["statement"], problem_description)
+    if exact or not (removed or added):
+        logger.info(f"[RequirementAgent] Reusing requirements ({source}: statement unchanged).")
+        cached["analysis"] = {"mode": "cached", "source": source, "similarity": 1.0}
+        return cached
+
+    changed = sum(len(p) for p in added) / max(1, len(problem_description))
+    if changed > MAX_CHANGED_RATIO:
+        logger.info(f"[RequirementAgent] {changed:.0%} of the statement changed; running full analysis.")
+        return None
+
+    logger.info(
+        f"[RequirementAgent] Re-analysing {len(removed)} removed / {len(added)} added paragraphs "
+        f"against the {source} analysis."
+    )
+    try:
+        with span("requirement.delta", source=source, removed=len(removed), added=len(added)):
+            result = _extract_delta(cached["parsed_json"], removed, added)
+    except Exception as e:
+        logger.warning(f"[RequirementAgent] Delta extraction failed, running full analysis: {e}")
+        return None
+    if result is None:
+        return None
+    result["analysis"] = {"mode": "delta", "source": source, "removed": len(removed), "added": len(added)}
+    if similarity is not None:
+        result["analysis"]["similarity"] = similarity
+    return result
+
+
+def _extract_delta(previous: dict, removed: list, added: list):
+    """Ask only for the changes caused by the edited paragraphs and merge them; None if unusable."""
+    template = load_prompt("requirements_delta.md")
+    previous = _with_ids(previous)
+    previous_json = {k: previous.get(k) for k in REQUIREMENT_KEYS}
+    prompt = template.format_map({
+        "system": SYSTEM,
+        "previous_json": json.dumps(previous_json, ensure_ascii=False),
+        "removed": "\n\n".join(removed) or "(nothing)",
+        "added": "\n\n".join(added) or "(nothing)",
+    })
+    text = get_llm("requirement").invoke(prompt, agent_name="requirement_delta")
+    delta = safe_parse_json(extract_json_from_text(text))
+    if not isinstance(delta, dict) or not any(k in delta for k in ("add", "remove", "replace", "project_name")):
+        return None
+    parsed_json, changes = merge_requirement_delta(previous, delta)
+    if not parsed_json.get("functional_requirements"):
+        return None
+    readable = render_requirements_markdown(parsed_json)
+    if changes:
+        readable += "\n\n#### Changes Since Previous Analysis\n" + "\n".join(f"- {c}" for c in changes)
+    return {"readable_text": readable, "parsed_json": parsed_json}
+
+
+def render_requirements_markdown(parsed_json: dict) -> str:
+    """Requirements document rendered locally from parsed JSON (same headings as requirements.md)."""
+    sections = [
+        ("Functional Requirements", "functional_requirements"),
+        ("Non-Functional Requirements", "non_functional_requirements"),
+        ("Actors / Stakeholders", "actors"),
+        ("Assumptions & Constraints", "assumptions"),
+        ("Suggested Core Functional Modules", "modules"),
+    ]
+    lines = [f"#### Project\n{parsed_json.get('project_name', 'Unknown Project')}"]
+    for title, key in sections:
+        items = parsed_json.get(key) or []
+        if items:
+            lines.append(f"#### {title}\n" + "\n".join(f"- {item}" for item in items))
+    return "\n\n".join(lines)
+
+
 # ======================================================
 # 🔹 Utility Helpers
 # ======================================================
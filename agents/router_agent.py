@@ -1,17 +1,105 @@
-from agents.requirement_agent import run_requirement_agent
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from agents.requirement_agent import run_requirement_agent, stream_requirement_agent
 from agents.flow_agent import run_flow_agent
 from agents.srs_agent import run_srs_agent
 from agents.jira_story_agent import run_jira_story_agent
-from agents.jira_post_agent import post_stories_to_jira
+from agents.jira_post_agent import attach_artifacts, post_stories_to_jira
 from core.config import load_settings
 from core.logger import init_logger
 from core.llm import tracker  # global token tracker shared across agents
+from core.cancellation import CancellationToken, OperationCancelled, cancel_scope, check_cancelled
+from core.storage import artifact_store
+from core.usage_ledger import usage_scope
+from core.incremental import dependency_store
+from core.tracing import span, traced
 
 logger = init_logger()
 settings = load_settings()
 
+# sequential: each agent waits for the previous one | pipelined: requirements stream
+# JSON-first and flow/SRS/stories start together as soon as the JSON is complete
+PIPELINE_MODE = settings.get("pipeline", {}).get("mode", "sequential")
 
-def run_sequential_pipeline(user_input: str) -> dict:
+
+# ======================================================
+# 🔹 Pipeline Steps
+# ======================================================
+def _check_requirements(requirements: dict):
+    if "error" in requirements:
+        logger.warning("[RouterAgent] Requirement agent returned an error.")
+        raise RuntimeError("Requirement extraction failed")
+
+
+def _flow_step(requirements: dict, incremental: bool = None) -> str:
+    logger.info("[RouterAgent] Step 2: Generating Flow Diagram...")
+    try:
+        return run_flow_agent(requirements, incremental=incremental)
+    except Exception as e:
+        logger.warning(f"[RouterAgent] Flow generation skipped: {e}")
+        return ""
+
+
+def _srs_step(requirements: dict, incremental: bool = None):
+    if not settings["features"].get("enable_pdf_gen", True):
+        return None
+    logger.info("[RouterAgent] Step 3: Generating SRS / Technical Document...")
+    try:
+        return run_srs_agent(requirements, incremental=incremental)
+    except Exception as e:
+        logger.warning(f"[RouterAgent] SRS generation skipped: {e}")
+        return ""
+
+
+def _stories_step(requirements: dict, incremental: bool = None) -> list:
+    logger.info("[RouterAgent] Step 4: Creating JIRA stories...")
+    try:
+        return run_jira_story_agent(requirements, incremental=incremental)
+    except Exception as e:
+        logger.warning(f"[RouterAgent] JIRA story generation skipped: {e}")
+        return []
+
+
+DOWNSTREAM_STEPS = (("diagram_path", _flow_step), ("srs_path", _srs_step), ("jira_stories", _stories_step))
+
+
+def _run_step(key: str, step, requirements: dict, incremental: bool = None):
+    """Run a downstream step unless the pipeline was cancelled before it started."""
+    check_cancelled(key)
+    return step(requirements, incremental)
+
+
+def _run_pipelined(user_input: str, results: dict, incremental: bool = None):
+    """
+    Stream requirements JSON-first and launch flow, SRS and story generation
+    concurrently the moment the JSON block is complete, while the readable
+    report keeps streaming. Fills the same result keys as the sequential path.
+    """
+    logger.info("[RouterAgent] Step 1: Streaming Requirements (pipelined)...")
+    handle = stream_requirement_agent(user_input)
+    early = handle.requirements()
+    _check_requirements(early)
+
+    with span("pipeline.downstream", steps=len(DOWNSTREAM_STEPS)), \
+            ThreadPoolExecutor(max_workers=len(DOWNSTREAM_STEPS), thread_name_prefix="pipeline") as pool:
+        futures = {
+            key: pool.submit(contextvars.copy_context().run, _run_step, key, step, early, incremental)
+            for key, step in DOWNSTREAM_STEPS
+        }
+        results["requirements"] = handle.result()
+        for key, future in futures.items():
+            value = future.result()
+            if value is not None:
+                results[key] = value
+
+    results["pipeline"] = {"mode": "pipelined", **handle.stats}
+    logger.info(f"[RouterAgent] Pipelined: downstream started after {handle.stats.get('json_ready_s')}s, "
+                f"report finished after {handle.stats.get('total_s')}s")
+
+
+@traced("pipeline.sequential")
+def run_sequential_pipeline(user_input: str, incremental: bool = None, pipelined: bool = None,
+                            cancel_token: CancellationToken = None) -> dict:
     """
     Executes the full SDLC pipeline in sequence:
     1. Requirement Extraction
@@ -19,82 +107,98 @@ def run_sequential_pipeline(user_input: str) -> dict:
     3. SRS / Technical Documentation
     4. JIRA Story Creation (and optional posting)
 
+    In pipelined mode steps 2–4 run concurrently, started as soon as the
+    streamed requirements JSON is complete (before the report finishes).
+
+    Cancelling the token aborts in-flight LLM requests and skips the steps
+    not yet started; results["cancelled"] records the reason and where.
+
+    Args:
+        user_input (str): Problem statement.
+        incremental (bool): Regenerate only artifacts whose requirement items
+            changed since the last run; defaults to `incremental.enabled`.
+        pipelined (bool): Defaults to `pipeline.mode == "pipelined"`.
+        cancel_token (CancellationToken): Defaults to the token bound by the
+            caller's cancel_scope, if any.
     Returns:
-        dict: Aggregated results (files, stories, token usage, errors)
+        dict: Aggregated results (files, stories, token usage, errors,
+            incremental report)
     """
-    logger.info("🚀 [RouterAgent] Starting Sequential SDLC Pipeline...")
+    pipelined = PIPELINE_MODE == "pipelined" if pipelined is None else pipelined
+    logger.info(f"🚀 [RouterAgent] Starting {'Pipelined' if pipelined else 'Sequential'} SDLC Pipeline...")
     results = {}
 
-    try:
-        # --------------------------------
-        # 1️⃣ REQUIREMENT GATHERING
-        # --------------------------------
-        logger.info("[RouterAgent] Step 1: Extracting Requirements...")
-        results["requirements"] = run_requirement_agent(user_input)
-
-        if "error" in results["requirements"]:
-            logger.warning("[RouterAgent] Requirement agent returned an error.")
-            raise RuntimeError("Requirement extraction failed")
-
-        # --------------------------------
-        # 2️⃣ FLOW DIAGRAM GENERATION
-        # --------------------------------
-        logger.info("[RouterAgent] Step 2: Generating Flow Diagram...")
-        try:
-            results["diagram_path"] = run_flow_agent(results["requirements"])
-        except Exception as e:
-            logger.warning(f"[RouterAgent] Flow generation skipped: {e}")
-            results["diagram_path"] = ""
-
-        # --------------------------------
-        # 3️⃣ SRS / TECHNICAL DOCUMENTATION
-        # --------------------------------
-        if settings["features"].get("enable_pdf_gen", True):
-            logger.info("[RouterAgent] Step 3: Generating SRS / Technical Document...")
-            try:
-                results["srs_path"] = run_srs_agent(results["requirements"])
-            except Exception as e:
-                logger.warning(f"[RouterAgent] SRS generation skipped: {e}")
-                results["srs_path"] = ""
-
-        # --------------------------------
-        # 4️⃣ JIRA STORY GENERATION
-        # --------------------------------
-        logger.info("[RouterAgent] Step 4: Creating JIRA stories...")
+    # All artifacts of this pipeline land in one run-scoped directory; the run
+    # tracker is bound before the pipeline threads copy the context
+    with artifact_store.run_scope() as run_id, usage_scope(run_id, reuse=True), cancel_scope(cancel_token):
+        results["run_id"] = run_id
+        results["run_dir"] = str(artifact_store.run_dir(run_id))
+
         try:
-            results["jira_stories"] = run_jira_story_agent(results["requirements"])
-        except Exception as e:
-            logger.warning(f"[RouterAgent] JIRA story generation skipped: {e}")
-            results["jira_stories"] = []
-
-        # --------------------------------
-        # 5️⃣ OPTIONAL: POST TO JIRA
-        # --------------------------------
-        if settings["features"].get("enable_jira_post", False):
-            logger.info("[RouterAgent] Step 5: Posting stories to JIRA...")
-            try:
-                results["jira_created"] = post_stories_to_jira(results["jira_stories"])
-            except Exception as e:
-                logger.warning(f"[RouterAgent] Failed to post to JIRA: {e}")
-                results["jira_created"] = []
-
-        # --------------------------------
-        # 6️⃣ TOKEN USAGE SUMMARY
-        # --------------------------------
-        results["token_summary"] = tracker.summary()
-        token_info = results["token_summary"]
-        logger.info(
-            f"[RouterAgent] Total tokens used: "
-            f"input={token_info['total_input_tokens']}, "
-            f"output={token_info['total_output_tokens']}, "
-            f"approx_cost=${token_info['approx_cost_usd']}"
-        )
-
-        logger.success("✅ [RouterAgent] Sequential SDLC pipeline completed successfully.")
-        return results
+            # --------------------------------
+            # 1️⃣–4️⃣ REQUIREMENTS → FLOW / SRS / JIRA STORIES
+            # --------------------------------
+            if pipelined:
+                _run_pipelined(user_input, results, incremental)
+            else:
+                logger.info("[RouterAgent] Step 1: Extracting Requirements...")
+                check_cancelled("requirements")
+                results["requirements"] = run_requirement_agent(user_input)
+                _check_requirements(results["requirements"])
+                for key, step in DOWNSTREAM_STEPS:
+                    value = _run_step(key, step, results["requirements"], incremental)
+                    if value is not None:
+                        results[key] = value
 
-    except Exception as e:
-        logger.exception(f"[RouterAgent] Pipeline failed: {e}")
-        results["error"] = str(e)
-        results["token_summary"] = tracker.summary()
-        return results
+            # --------------------------------
+            # 5️⃣ OPTIONAL: POST TO JIRA
+            # --------------------------------
+            if settings["features"].get("enable_jira_post", False):
+                check_cancelled("jira_created")
+                logger.info("[RouterAgent] Step 5: Posting stories to JIRA...")
+                try:
+                    results["jira_created"] = post_stories_to_jira(results["jira_stories"])
+                except Exception as e:
+                    logger.warning(f"[RouterAgent] Failed to post to JIRA: {e}")
+                    results["jira_created"] = {}
+
+                if settings["features"].get("enable_jira_attachments", False):
+                    logger.info("[RouterAgent] Step 5b: Attaching artifacts to JIRA...")
+                    try:
+                        results["jira_attachments"] = attach_artifacts(
+                            results["jira_created"].get("issue_keys", [])
+                        )
+                    except Exception as e:
+                        logger.warning(f"[RouterAgent] Failed to attach artifacts: {e}")
+                        results["jira_attachments"] = {}
+
+            # --------------------------------
+            # 6️⃣ TOKEN USAGE SUMMARY
+            # --------------------------------
+            results["incremental"] = dependency_store.run_report(run_id)
+            results["token_summary"] = tracker.summary()
+            token_info = results["token_summary"]
+            logger.info(
+                f"[RouterAgent] Total tokens used: "
+                f"input={token_info['total_input_tokens']}, "
+                f"output={token_info['total_output_tokens']}, "
+                f"approx_cost=${token_info['approx_cost_usd']}"
+            )
+
+            logger.success("✅ [RouterAgent] Sequential SDLC pipeline completed successfully.")
+            return results
+
+        except OperationCancelled as e:
+            logger.warning(f"[RouterAgent] Pipeline cancelled: {e}")
+            results["cancelled"] = {"reason": e.reason, "at": e.where, "completed": [
+                key for key in ("requirements", *(k for k, _step in DOWNSTREAM_STEPS)) if key in results
+            ]}
+            results["error"] = f"cancelled: {e.reason}"
+            results["token_summary"] = tracker.summary()
+            return results
+
+        except Exception as e:
+            logger.exception(f"[RouterAgent] Pipeline failed: {e}")
+            results["error"] = str(e)
+            results["token_summary"] = tracker.summary()
+            return results
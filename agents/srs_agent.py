@@ -1,52 +1,267 @@
+import re
 import json
-from pathlib import Path
-import markdown
-from weasyprint import HTML, CSS
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from markdown.extensions.toc import slugify
 from core.llm import get_llm
 from core.prompts_loader import load_prompt
 from core.logger import init_logger
 from core.config import load_settings
-from core.storage import ensure_dirs, save_text
+from core.storage import save_artifact, save_artifact_async
+from core.pdf_render import render_pdf
+from core.tracing import span, traced
+from core.srs_template import numbered, render_local
+from core.incremental import IncrementalBuild, select_fields
 
 logger = init_logger()
 settings = load_settings()
 
+_srs_cfg = settings.get("srs", {})
+# sections: concurrent per-section calls stitched locally | single: one completion
+SRS_MODE = _srs_cfg.get("mode", "sections")
+SECTION_WORKERS = int(_srs_cfg.get("section_workers", 6))
+# Render tables/lists restated from parsed_json locally; the model writes narrative only
+SKELETON = bool(_srs_cfg.get("skeleton", True))
 
-def run_srs_agent(requirements: dict) -> str:
+# (key, title, what the section must cover)
+SRS_SECTIONS = (
+    ("introduction", "Introduction",
+     "A 2–3 sentence project summary, then purpose, scope, intended audience, "
+     "definitions and references."),
+    ("overall_description", "Overall Description",
+     "Product perspective, major functions, user classes and characteristics, "
+     "operating environment, design constraints, assumptions and dependencies."),
+    ("functional", "Functional Requirements",
+     "Every functional requirement (FR-numbered) grouped by module, a Planned Features table "
+     "(Feature ID | Feature Name | Description | Inputs | Outputs | Dependencies) and use cases "
+     "(actors, preconditions, main flow, postconditions)."),
+    ("non_functional", "Non-Functional Requirements",
+     "Performance, security, reliability, maintainability, scalability and usability "
+     "requirements, NFR-numbered, each with a measurable acceptance criterion."),
+    ("interfaces", "External Interfaces",
+     "User, software, hardware and communication interfaces; software needs (OS, frameworks, "
+     "APIs, model dependencies) and hardware needs (CPU, memory, GPU if applicable)."),
+    ("appendices", "Appendices",
+     "Glossary, acronyms and abbreviations, and references."),
+)
+
+# Narrative asked of the model when a section's tables and lists are rendered
+# locally (core/srs_template.py); None means the section is entirely local.
+NARRATIVE_GUIDANCE = {
+    "overall_description":
+        "Product perspective, operating environment and design constraints only. Major functions, "
+        "user classes and assumptions are already listed; do not restate them.",
+    "functional":
+        "Use cases only (actors, preconditions, main flow, postconditions), referencing FR IDs. "
+        "The functional requirements table is already included; do not restate it.",
+    "non_functional":
+        "A table NFR ID | Acceptance criterion | Verification method, one row per NFR ID, "
+        "without repeating the requirement text.",
+}
+
+# Sections whose local tables come before the narrative
+LOCAL_FIRST = {"functional", "non_functional"}
+
+# Requirement items each section is derived from (core/incremental.py selectors);
+# the section prompt only sees these fields, and the section is regenerated only
+# when one of them changes
+SECTION_INPUTS = {
+    "introduction": ("project", "module:*", "actor:*"),
+    "overall_description": ("project", "module:*", "actor:*", "assumption:*", "field:*"),
+    "functional": ("project", "FR*", "module:*", "actor:*"),
+    "non_functional": ("project", "NFR*"),
+    "interfaces": ("project", "module:*", "actor:*", "field:*"),
+    "appendices": ("project", "module:*", "actor:*", "field:*"),
+}
+
+_section_pool = ThreadPoolExecutor(max_workers=max(1, SECTION_WORKERS), thread_name_prefix="srs-section")
+
+# ======================================================
+# 🔹 Markdown generation
+# ======================================================
+def _response_text(resp) -> str:
+    return getattr(resp, "content", str(resp)).strip()
+
+
+def _clean_markdown(md_doc: str) -> str:
+    # Remove accidental code fences or artifacts
+    if md_doc.startswith("```"):
+        md_doc = md_doc.strip("` \n\t")
+    if md_doc.lower().startswith("json"):
+        md_doc = md_doc.replace("json", "", 1).strip()
+    if md_doc.lower().startswith("markdown"):
+        md_doc = md_doc.replace("markdown", "", 1).strip()
+    return md_doc
+
+
+def generate_single_shot(requirements: dict, llm=None) -> str:
+    """Whole SRS in one completion (original mode)."""
+    llm = llm or get_llm("srs")
+    system_prompt = load_prompt("system_base.md")
+    user_prompt = load_prompt("srs.md").format(
+        system=system_prompt,
+        requirements_json=json.dumps(requirements, indent=2),
+    )
+    logger.info("[SRSAgent] Invoking model for SRS generation...")
+    return _clean_markdown(_response_text(llm.invoke(user_prompt, agent_name="srs")))
+
+
+def compact_context(requirements: dict, selectors=("*",)) -> str:
+    """
+    Section context: parsed requirements as minified JSON (no prose duplicate),
+    limited to the fields matching `selectors` (a section's SECTION_INPUTS).
+    """
+    parsed = requirements.get("parsed_json") if isinstance(requirements, dict) else None
+    if not parsed:
+        return json.dumps(requirements, separators=(",", ":"), ensure_ascii=False)
+    context = {k: v for k, v in select_fields(parsed, selectors).items() if v}
+    # Number requirements the same way the local tables do, so narrative IDs match
+    for key, prefix in (("functional_requirements", "FR"), ("non_functional_requirements", "NFR")):
+        if context.get(key):
+            context[key] = [f"{req_id}: {text}" for req_id, text in numbered(context[key], prefix)]
+    return json.dumps(context, separators=(",", ":"), ensure_ascii=False)
+
+
+def _normalise_section(body: str, title: str) -> str:
+    """Drop a heading repeating the section title and demote stray top-level headings."""
+    body = _clean_markdown(body)
+    lines = body.splitlines()
+    while lines and (not lines[0].strip() or (
+        lines[0].lstrip().startswith("#")
+        and (title.lower() in lines[0].lower() or re.match(r"#+\s*\d+\.\s", lines[0].lstrip()))
+    )):
+        lines.pop(0)
+    return re.sub(r"^#{1,2}(?=\s)", "###", "\n".join(lines), flags=re.MULTILINE).strip()
+
+
+def _generate_section(llm, context: str, number: int, key: str, title: str, guidance: str,
+                      parsed_json: dict = None) -> str:
+    """
+    One SRS section. With `parsed_json` (skeleton mode) the restated tables and
+    lists are rendered locally and the model is asked for the narrative only.
+    """
+    local = render_local(key, parsed_json) if parsed_json else ""
+    agent_name = f"srs_{key}"
+    if local:
+        guidance = NARRATIVE_GUIDANCE.get(key, guidance)
+        agent_name += "_narrative"
+        if guidance is None:
+            return local
+
+    prompt = load_prompt("srs_section.md").format(
+        system=load_prompt("system_base.md"),
+        number=number,
+        title=title,
+        guidance=guidance,
+        context=context,
+    )
+    with span("srs.section", section=key, local_chars=len(local)):
+        narrative = _normalise_section(_response_text(llm.invoke(prompt, agent_name=agent_name)), title)
+
+    if not local:
+        return narrative
+    parts = [local, narrative] if key in LOCAL_FIRST else [narrative, local]
+    return "\n\n".join(p for p in parts if p)
+
+
+def _build_section(build, llm, requirements: dict, number: int, key: str, title: str, guidance: str,
+                   parsed_json: dict = None) -> str:
+    """`_generate_section`, reusing the last output when the section's inputs are unchanged."""
+    inputs = SECTION_INPUTS.get(key, ("*",))
+    context = compact_context(requirements, inputs)
+    generate = lambda: _generate_section(llm, context, number, key, title, guidance, parsed_json)
+    if build is None:
+        return generate()
+    return build.build(f"srs:{key}", inputs, generate, extra={"skeleton": parsed_json is not None})
+
+
+def stitch_sections(project_name: str, sections: list) -> str:
+    """
+    Assemble numbered sections under one title with a linked table of contents.
+
+    Args:
+        project_name (str): Document title prefix.
+        sections (list): (title, markdown body) in document order.
+    """
+    headings = [f"{i}. {title}" for i, (title, _) in enumerate(sections, start=1)]
+    parts = [
+        f"# {project_name} — Software Requirements Specification",
+        "## Table of Contents",
+        "\n".join(f"{i}. [{title}](#{slugify(h, '-')})" for i, ((title, _), h) in enumerate(zip(sections, headings), start=1)),
+    ]
+    for heading, (_, body) in zip(headings, sections):
+        parts += [f"## {heading}", body]
+    return "\n\n".join(parts) + "\n"
+
+
+def generate_sectioned(requirements: dict, llm=None, skeleton: bool = None, build: IncrementalBuild = None) -> str:
+    """
+    Generate each SRS section as an independent concurrent call over the
+    compact context of its SECTION_INPUTS, then stitch them with a
+    consistent table of contents.
+
+    With `skeleton` (default `srs.skeleton`) requirement tables, user classes,
+    modules and assumptions are rendered from parsed_json and merged with the
+    model's narrative, so the model never retypes them.
+
+    With `build` only sections whose input requirement items changed since
+    the last run are regenerated (see SECTION_INPUTS).
+    """
+    llm = llm or get_llm("srs")
+    skeleton = SKELETON if skeleton is None else skeleton
+    parsed = requirements.get("parsed_json", {}) if isinstance(requirements, dict) else {}
+    project_name = parsed.get("project_name") or "Project"
+
+    logger.info(f"[SRSAgent] Generating {len(SRS_SECTIONS)} sections concurrently...")
+    local_source = parsed if skeleton and parsed else None
+    futures = [
+        _section_pool.submit(
+            contextvars.copy_context().run, _build_section, build, llm, requirements, i, key, title, guidance, local_source
+        )
+        for i, (key, title, guidance) in enumerate(SRS_SECTIONS, start=1)
+    ]
+
+    sections, failed = [], 0
+    for (key, title, _), future in zip(SRS_SECTIONS, futures):
+        try:
+            sections.append((title, future.result()))
+        except Exception as e:
+            failed += 1
+            logger.exception(f"[SRSAgent] Section '{key}' failed: {e}")
+            sections.append((title, "_This section could not be generated._"))
+    if failed == len(SRS_SECTIONS):
+        raise ValueError("All SRS sections failed to generate.")
+
+    return stitch_sections(project_name, sections)
+
+
+@traced("agent.srs")
+def run_srs_agent(requirements: dict, mode: str = None, incremental: bool = None) -> str:
     """
     Generate an IEEE-style Software Requirements Specification (SRS)
     document as both Markdown and PDF using the LLM.
 
+    Args:
+        requirements (dict): Output from requirement_agent.
+        mode (str): "sections" (concurrent per-section calls) or "single"
+            (one completion); defaults to `srs.mode`.
+        incremental (bool): Reuse sections whose requirement items are
+            unchanged since the last run; defaults to `incremental.enabled`.
     Returns:
         str: Path to the generated SRS PDF file.
     """
     try:
-        logger.info("[SRSAgent] Starting SRS document generation...")
+        mode = mode or SRS_MODE
+        logger.info(f"[SRSAgent] Starting SRS document generation (mode={mode})...")
 
         # ----------------------------------------------------
-        # 1️⃣ Prepare Prompts
+        # 1️⃣ Generate Markdown
         # ----------------------------------------------------
-        system_prompt = load_prompt("system_base.md")
-        user_prompt = load_prompt("srs.md").format(
-            system=system_prompt,
-            requirements_json=json.dumps(requirements, indent=2),
-        )
-
-        # ----------------------------------------------------
-        # 2️⃣ Initialize LLM
-        # ----------------------------------------------------
-        llm = get_llm("srs")
-        logger.info("[SRSAgent] Invoking model for SRS generation...")
-
-        # ----------------------------------------------------
-        # 3️⃣ Invoke LLM with token tracking
-        # ----------------------------------------------------
-        if hasattr(llm, "run_with_usage"):
-            resp = llm.run_with_usage(user_prompt, "SRSAgent")
-            md_doc = getattr(resp, "content", "").strip()
+        build = IncrementalBuild(requirements, enabled=incremental)
+        if mode == "single":
+            md_doc = build.build("srs:single", ("*",), lambda: generate_single_shot(requirements))
         else:
-            resp = llm.invoke(user_prompt)
-            md_doc = getattr(resp, "content", str(resp)).strip()
+            md_doc = generate_sectioned(requirements, build=build)
 
         if not md_doc:
             raise ValueError("Empty response from LLM while generating SRS document.")
@@ -54,54 +269,21 @@ def run_srs_agent(requirements: dict) -> str:
         logger.info(f"[SRSAgent] Markdown generated ({len(md_doc)} characters)")
 
         # ----------------------------------------------------
-        # 4️⃣ Clean Markdown Output
-        # ----------------------------------------------------
-        # Remove accidental code fences or artifacts
-        if md_doc.startswith("```"):
-            md_doc = md_doc.strip("` \n\t")
-        if md_doc.lower().startswith("json"):
-            md_doc = md_doc.replace("json", "", 1).strip()
-
-        # ----------------------------------------------------
-        # 5️⃣ Convert Markdown → HTML
-        # ----------------------------------------------------
-        html_str = markdown.markdown(
-            md_doc,
-            extensions=["tables", "fenced_code", "toc", "attr_list"],
-            output_format="html5",
-        )
-
-        # Basic styling for readability
-        css = CSS(string="""
-            @page { size: A4; margin: 1in; }
-            body { font-family: Arial, sans-serif; line-height: 1.5; font-size: 12px; }
-            h1, h2, h3, h4 { color: #2A4B8D; }
-            h1 { border-bottom: 2px solid #2A4B8D; padding-bottom: 5px; }
-            table { width: 100%; border-collapse: collapse; margin-top: 10px; }
-            th, td { border: 1px solid #666; padding: 6px; text-align: left; }
-            th { background: #f0f4ff; }
-            code { background-color: #f4f4f4; padding: 2px 4px; border-radius: 4px; }
-        """)
-
-        # ----------------------------------------------------
-        # 6️⃣ Save Intermediate Markdown
+        # 2️⃣ Save Intermediate Markdown
         # ----------------------------------------------------
-        ensure_dirs()
-        md_path = Path(settings["paths"]["docs_dir"]) / "SRS.md"
-        save_text(md_path, md_doc)
-        logger.info(f"[SRSAgent] Markdown version saved at: {md_path}")
+        md_path = save_artifact_async("docs/SRS.md", md_doc).path
+        logger.info(f"[SRSAgent] Markdown version queued at: {md_path}")
 
         # ----------------------------------------------------
-        # 7️⃣ Generate PDF from HTML
+        # 3️⃣ Generate PDF (warm worker pool, cached by Markdown hash)
         # ----------------------------------------------------
-        pdf_path = Path(settings["paths"]["docs_dir"]) / "SRS.pdf"
-        HTML(string=html_str).write_pdf(pdf_path, stylesheets=[css])
+        pdf_path = save_artifact("docs/SRS.pdf", render_pdf(md_doc, engine="weasyprint"))
         logger.success(f"[SRSAgent] PDF written successfully: {pdf_path}")
 
         # ----------------------------------------------------
-        # 8️⃣ Return Final Path
+        # 4️⃣ Return Final Path
         # ----------------------------------------------------
-        return str(pdf_path)
+        return pdf_path
 
     except Exception as e:
         logger.exception(f"[SRSAgent] Failed to generate SRS: {e}")
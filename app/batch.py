@@ -0,0 +1,33 @@
+import sys
+import argparse
+import json
+from pathlib import Path
+
+# --- Ensure project root is in PYTHONPATH ---
+root_dir = Path(__file__).resolve().parent.parent
+if str(root_dir) not in sys.path:
+    sys.path.append(str(root_dir))
+
+from agents.batch_agent import load_batch_inputs, run_batch_pipeline
+
+
+# ============================================================
+# Headless Batch Entry Point
+# ============================================================
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Run the SDLC pipeline for a JSONL/CSV of problem statements.")
+    parser.add_argument("input", help="Path to a .jsonl or .csv file of problem statements")
+    parser.add_argument("-c", "--concurrency", type=int, default=None, help="Max pipelines in flight")
+    parser.add_argument("-o", "--output-dir", default=None, help="Root directory for batch outputs")
+    args = parser.parse_args(argv)
+
+    items = load_batch_inputs(args.input)
+    summary = run_batch_pipeline(items, concurrency=args.concurrency, output_dir=args.output_dir)
+
+    printable = {k: v for k, v in summary.items() if k != "items"}
+    print(json.dumps(printable, indent=2))
+    return 0 if summary["failed"] == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -8,28 +8,35 @@ if str(root_dir) not in sys.path:
 
 import time
 import base64
+import threading
+import contextvars
+from concurrent.futures import Future, TimeoutError as FutureTimeout
 import io
 import json
 import csv
 import streamlit as st
+from streamlit.runtime.scriptrunner import add_script_run_ctx
 import fitz  # PyMuPDF for PDF → image
-from reportlab.lib.pagesizes import A4
-from reportlab.lib.styles import getSampleStyleSheet
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
 from openai import OpenAI
 
 # ---- Core Imports ----
 from core.config import load_settings
 from core.logger import init_logger
 from core.llm import tracker
+from core.cancellation import CancellationToken, cancel_scope, check_cancelled
+from core.storage import artifact_store, new_run_id, save_artifact_async
+from core.tracing import span, trace_breakdown, traced
+from core.dot_repair import repair_stats
+from core.pdf_render import pdf_renderer, render_pdf
 
 # ---- Agent Imports ----
 from agents.router_agent import run_sequential_pipeline
 from agents.requirement_agent import run_requirement_agent
+from core.similarity_cache import similarity_cache
 from agents.flow_agent import run_flow_agent
 from agents.srs_agent import run_srs_agent
-from agents.jira_story_agent import run_jira_story_agent
-from agents.mindmap_agent import run_mindmap_agent
+from agents.jira_story_agent import run_jira_story_agent, story_stats
+from agents.mindmap_agent import generate_mindmap_image, run_mindmap_agent
 
 # ---- LangGraph ----
 from graphs.sdlc_graph import run_sdlc_graph
@@ -47,6 +54,9 @@ st.set_page_config(
     initial_sidebar_state="expanded",
 )
 
+# Start PDF workers (fonts/CSS preloaded) while the user types
+pdf_renderer.warm()
+
 st.title(settings["ui"]["title"])
 st.markdown("<h4 style='color:grey'>Multi-Agent SDLC Automation Platform</h4>", unsafe_allow_html=True)
 st.markdown("---")
@@ -72,6 +82,14 @@ agent_option = st.sidebar.selectbox(
 
 st.sidebar.markdown("---")
 enable_jira = st.sidebar.checkbox("Enable JIRA Posting", value=False)
+
+# Any rerun (this click, edited input, a new Execute) interrupts the running script;
+# the click only makes it explicit for runs still finishing in background threads.
+if st.sidebar.button("Cancel Running Pipeline"):
+    running = st.session_state.get("cancel_token")
+    if running is not None:
+        running.cancel("cancelled by user")
+        st.sidebar.info("Pipeline cancelled.")
 st.sidebar.caption("Configure LLM and settings in `.env` or `config/settings.yaml`")
 
 # Token usage monitor
@@ -84,13 +102,15 @@ def update_token_ui(summary: dict):
     total = summary["total_input_tokens"] + summary["total_output_tokens"]
     cost = summary["approx_cost_usd"]
     agent_count = len(summary["agents"])
+    shared = sum(1 for a in summary["agents"] if a.get("status") == "coalesced")
     progress_bar.progress(min(agent_count / 6.0, 1.0))
     token_info.markdown(
         f"""
         Agents Completed: {agent_count}  
         Total Tokens: {total:,}  
         Input: {summary['total_input_tokens']:,} | Output: {summary['total_output_tokens']:,}  
-        Approx. Cost: **${cost}**
+        Approx. Cost: **${cost}**  
+        Shared (coalesced) calls: {shared}
         """
     )
 
@@ -101,6 +121,7 @@ tracker.set_callback(update_token_ui)
 # ============================================================
 # OCR Helpers (Vision Model)
 # ============================================================
+@traced("ocr.page")
 def extract_text_with_vision(file_bytes: bytes, mime_type: str) -> str:
     """Extract readable text from image or PDF using GPT Vision."""
     try:
@@ -138,20 +159,87 @@ def pdf_to_images_bytes(pdf_bytes: bytes) -> list:
         return []
 
 
+def ocr_pages(pages: list) -> list:
+    """
+    OCR page images one by one. Each progress update is a Streamlit interrupt
+    point, so a new upload, edited input or closed tab stops the loop there
+    instead of paying for the remaining pages.
+    """
+    progress = st.progress(0.0, text=f"OCR page 1/{len(pages)}")
+    texts = []
+    with cancel_scope(new_cancel_token("ocr"), cancel_on_error=True):
+        for page_no, page in enumerate(pages, start=1):
+            progress.progress((page_no - 1) / len(pages), text=f"OCR page {page_no}/{len(pages)}")
+            check_cancelled("ocr.page")
+            texts.append(extract_text_with_vision(page, "image/png"))
+    progress.empty()
+    return texts
+
+
+# ============================================================
+# Cancellation (rerun / closed tab stops the run)
+# ============================================================
+def new_cancel_token(name: str) -> CancellationToken:
+    """Cancel this session's previous run, if still going, and start a new token."""
+    previous = st.session_state.get("cancel_token")
+    if previous is not None:
+        previous.cancel("superseded by a new run")
+    token = st.session_state["cancel_token"] = CancellationToken(name=name)
+    return token
+
+
+def run_cancellable(fn, *args, **kwargs):
+    """
+    Run `fn` in a worker thread (copied context: run id, tracker, token) while
+    the script thread polls it. The status updates are Streamlit's interrupt
+    points: on rerun or tab close the script stops there, the enclosing
+    cancel_scope cancels the token, and the pipeline aborts its in-flight
+    LLM calls and skips the remaining steps.
+    """
+    future = Future()
+
+    def work():
+        try:
+            future.set_result(fn(*args, **kwargs))
+        except BaseException as e:
+            future.set_exception(e)
+
+    worker = threading.Thread(target=contextvars.copy_context().run, args=(work,), name="ui-run", daemon=True)
+    add_script_run_ctx(worker)  # token monitor updates from the worker still reach the page
+    worker.start()
+    status = st.empty()
+    started = time.time()
+    while True:
+        try:
+            result = future.result(timeout=0.5)
+            break
+        except FutureTimeout:
+            status.caption(f"Running… {time.time() - started:.0f}s")
+    status.empty()
+    return result
+
+
 # ============================================================
 # Display Requirement Output
 # ============================================================
+def analyze_requirements(user_input: str) -> dict:
+    """Requirement agent run, re-analysing only the paragraphs edited since this session's last run."""
+    result = run_requirement_agent(user_input, previous=st.session_state.get("last_requirements"))
+    if result.get("parsed_json", {}).get("functional_requirements"):
+        st.session_state["last_requirements"] = {"statement": user_input, "requirements": result}
+    return result
+
+
 def display_requirement_output(result: dict):
     """Display structured requirement output, save JSON, and enable downloads."""
     readable_text = result.get("readable_text", "").replace("\\n", "\n").strip()
     parsed_json = result.get("parsed_json", {})
 
-    # Save structured JSON output
-    output_dir = Path("output")
-    output_dir.mkdir(exist_ok=True)
-    json_path = output_dir / "requirements_output.json"
-    with open(json_path, "w", encoding="utf-8") as f:
-        json.dump(parsed_json, f, indent=2, ensure_ascii=False)
+    # Queue structured JSON output (run-scoped artifact, written in background)
+    json_path = save_artifact_async(
+        "requirements_output.json",
+        lambda: json.dumps(parsed_json, indent=2, ensure_ascii=False),
+    ).path
 
     if parsed_json:
         st.markdown("### Structured JSON Output")
@@ -170,18 +258,9 @@ def display_requirement_output(result: dict):
     else:
         st.warning("No readable report text found.")
 
-    # PDF Download for Requirements
-    pdf_buffer = io.BytesIO()
-    styles = getSampleStyleSheet()
-    doc = SimpleDocTemplate(pdf_buffer, pagesize=A4)
-    story = [Paragraph(readable_text, styles["Normal"]), Spacer(1, 12)]
-    doc.build(story)
-    st.download_button(
-        label="Download Requirement Report (PDF)",
-        data=pdf_buffer.getvalue(),
-        file_name="Requirements_Report.pdf",
-        mime="application/pdf",
-    )
+    # PDF is rendered only when requested (see "Requirement Report PDF" below)
+    if readable_text:
+        st.session_state["requirement_report"] = readable_text
 
     st.success(f"Structured JSON saved to: {json_path}")
 
@@ -207,7 +286,7 @@ else:
                 raw_bytes = uploaded_file.read()
                 if uploaded_file.name.lower().endswith(".pdf"):
                     pages = pdf_to_images_bytes(raw_bytes)
-                    user_input = "\n".join(extract_text_with_vision(p, "image/png") for p in pages)
+                    user_input = "\n".join(ocr_pages(pages))
                 else:
                     user_input = extract_text_with_vision(raw_bytes, f"image/{uploaded_file.name.split('.')[-1]}")
                 if user_input:
@@ -232,19 +311,31 @@ if st.button("Execute"):
         st.warning("Please enter or upload input before running.")
     else:
         start_time = time.time()
-        tracker.reset()
+        run_id = new_run_id()
+        tracker.reset(run_id)
 
-        with st.spinner("Running selected agent..."):
+        # Fresh artifact run per Execute so concurrent sessions never collide
+        with st.spinner("Running selected agent..."), artifact_store.run_scope(run_id), \
+                span("ui.execute", agent_mode=agent_option, run_id=run_id) as root_span:
             try:
                 # Requirement Agent
                 if "Requirement" in agent_option:
-                    result = run_requirement_agent(user_input)
+                    result = analyze_requirements(user_input)
                     st.success("Requirements extracted successfully.")
                     display_requirement_output(result)
+                    analysis = result.get("analysis", {})
+                    cache_stats = similarity_cache.summary()
+                    st.caption(
+                        f"Analysis: {analysis.get('mode', 'full')}"
+                        + (f" vs {analysis['source']}" if "source" in analysis else "")
+                        + (f" (similarity {analysis['similarity']})" if "similarity" in analysis else "")
+                        + f" · cache hit rate {cache_stats['hit_rate']:.0%}, {cache_stats['index_size']} statements, "
+                        f"threshold {cache_stats['threshold']}"
+                    )
 
                 # Flow Diagram
                 elif "Flow" in agent_option:
-                    req = run_requirement_agent(user_input)
+                    req = analyze_requirements(user_input)
                     diagram_path = run_flow_agent(req)
                     if diagram_path and Path(diagram_path).exists():
                         st.image(diagram_path, caption="Generated Flow Diagram", use_container_width=True)
@@ -253,16 +344,26 @@ if st.button("Execute"):
 
                 # Mind Map
                 elif "Mind Map" in agent_option:
-                    req = run_requirement_agent(user_input)
+                    req = analyze_requirements(user_input)
                     st.success("Requirements extracted. Generating mind map...")
-                    mindmap = run_mindmap_agent(req.get("readable_text", user_input))
-                    st.code(mindmap["text_map"], language="dot")
+                    mindmap_source = req if req.get("readable_text") else user_input
+
+                    # Text map and local render appear before any image call returns
+                    def show_text_map(partial):
+                        st.code(partial["text_map"], language="dot")
+                        if partial.get("render_path") and Path(partial["render_path"]).exists():
+                            st.image(partial["render_path"], caption="Mind Map (Graphviz)", use_container_width=True)
+
+                    mindmap = run_mindmap_agent(mindmap_source, on_text_map=show_text_map)
                     if mindmap["image_path"] and Path(mindmap["image_path"]).exists():
                         st.image(mindmap["image_path"], caption="Visual Mind Map", use_container_width=True)
+                    elif mindmap["image_mode"] == "on_demand":
+                        # Offered below; survives the rerun triggered by the button
+                        st.session_state["mindmap_image_request"] = {"source": mindmap_source, "run_id": run_id}
 
                 # SRS
                 elif "SRS" in agent_option:
-                    req = run_requirement_agent(user_input)
+                    req = analyze_requirements(user_input)
                     pdf_path = run_srs_agent(req)
                     if pdf_path and Path(pdf_path).exists():
                         with open(pdf_path, "rb") as pdf_file:
@@ -277,13 +378,18 @@ if st.button("Execute"):
 
                 # JIRA Stories
                 elif "JIRA" in agent_option:
-                    req = run_requirement_agent(user_input)
+                    req = analyze_requirements(user_input)
                     stories = run_jira_story_agent(req)
                     st.json(stories)
+                    if story_stats.last:
+                        st.caption(
+                            f"{story_stats.last['stories']} stories from {story_stats.last['calls']} call(s), "
+                            f"{story_stats.last['stories_per_s']} stories/s ({story_stats.last['mode']} mode)"
+                        )
 
                     # ✅ NEW BLOCK: Download as CSV
                     csv_buffer = io.StringIO()
-                    csv_writer = csv.DictWriter(csv_buffer, fieldnames=["summary", "description", "bdd", "role", "labels"])
+                    csv_writer = csv.DictWriter(csv_buffer, fieldnames=["summary", "description", "bdd", "role", "labels", "requirement_ids"])
                     csv_writer.writeheader()
                     for s in stories:
                         csv_writer.writerow(s)
@@ -296,12 +402,18 @@ if st.button("Execute"):
 
                 # Sequential Full Pipeline
                 elif "Sequential" in agent_option:
-                    full_result = run_sequential_pipeline(user_input)
+                    with cancel_scope(new_cancel_token("pipeline"), cancel_on_error=True):
+                        full_result = run_cancellable(run_sequential_pipeline, user_input)
+                    if full_result.get("cancelled"):
+                        st.warning(f"Pipeline cancelled ({full_result['cancelled']['reason']}).")
                     st.json(full_result)
 
                 # LangGraph
                 elif "LangGraph" in agent_option:
-                    graph_result = run_sdlc_graph(user_input)
+                    with cancel_scope(new_cancel_token("langgraph"), cancel_on_error=True):
+                        graph_result = run_cancellable(run_sdlc_graph, user_input)
+                    if graph_result.get("cancelled"):
+                        st.warning(f"Pipeline cancelled ({graph_result['cancelled']['reason']}).")
                     st.json(graph_result)
 
             except Exception as e:
@@ -320,6 +432,43 @@ if st.button("Execute"):
             st.json(summary["agents"])
 
         st.info(f"Execution Time: {round(time.time() - start_time, 2)} seconds")
+        if root_span:
+            with st.expander("Timing Breakdown (spans)"):
+                st.table(trace_breakdown(root_span.trace_id))
+                if repair_stats.summary():
+                    st.caption("DOT repair vs re-prompt")
+                    st.json(repair_stats.summary())
+
+
+# ============================================================
+# Requirement Report PDF (rendered on request, cached by text hash)
+# ============================================================
+report_text = st.session_state.get("requirement_report")
+if report_text and "Requirement" in agent_option:
+    if st.button("Prepare Requirement Report (PDF)") or st.session_state.get("requirement_report_ready") == report_text:
+        with st.spinner("Rendering PDF..."):
+            report_pdf = render_pdf(report_text, engine="reportlab")
+        st.session_state["requirement_report_ready"] = report_text
+        st.download_button(
+            label="Download Requirement Report (PDF)",
+            data=report_pdf,
+            file_name="Requirements_Report.pdf",
+            mime="application/pdf",
+        )
+
+
+# ============================================================
+# On-demand Visual Mind Map
+# ============================================================
+image_request = st.session_state.get("mindmap_image_request")
+if image_request and "Mind Map" in agent_option:
+    if st.button("Generate Visual Mind Map (gpt-image-1)"):
+        with st.spinner("Generating visual mind map..."), artifact_store.run_scope(image_request["run_id"]):
+            image_path = generate_mindmap_image(image_request["source"])
+        if image_path and Path(image_path).exists():
+            st.image(image_path, caption="Visual Mind Map", use_container_width=True)
+        else:
+            st.warning("Visual mind map generation failed.")
 
 
 # ============================================================
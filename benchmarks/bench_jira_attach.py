@@ -0,0 +1,114 @@
+"""
+benchmarks/bench_jira_attach.py
+Attaching run artifacts (flow diagram + SRS PDF) to JIRA issues on a local
+mock (benchmarks/mock_jira.py):
+- naive:    one `requests.post(files=...)` per issue and file, sequential
+            (requests builds the whole multipart body in memory)
+- streamed: attach_artifacts (target="all"), streamed multipart bodies, concurrent across issues
+- rerun:    attach_artifacts again with the same journal: every upload skipped
+
+Peak memory is measured with tracemalloc (Python allocations in this process,
+including the mock, which hashes uploads in 256 KB pieces). The mock's
+sha256 of every received file is checked against the source.
+
+Usage:
+    python benchmarks/bench_jira_attach.py [--issues 8] [--pdf-mb 20] [--png-mb 2] [--workers 4]
+"""
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+import tracemalloc
+import requests
+from pathlib import Path
+
+root_dir = Path(__file__).resolve().parent.parent
+if str(root_dir) not in sys.path:
+    sys.path.append(str(root_dir))
+
+from benchmarks.mock_jira import MockJira
+from core.jira_client import JiraClient, file_sha256
+from core.jira_journal import PostingJournal
+import agents.jira_post_agent as jira_post_agent
+
+
+def make_file(path: Path, megabytes: float) -> Path:
+    with open(path, "wb") as f:
+        for _ in range(int(megabytes * 4)):
+            f.write(os.urandom(256 * 1024))
+    return path
+
+
+def attach_naive(base_url: str, keys: list, artifacts: list) -> dict:
+    uploaded = 0
+    for key in keys:
+        for name, path, _digest in artifacts:
+            with open(path, "rb") as f:
+                resp = requests.post(
+                    f"{base_url}/rest/api/3/issue/{key}/attachments",
+                    files={"file": (Path(path).name, f)},
+                    headers={"X-Atlassian-Token": "no-check"},
+                    auth=("bench", "token"),
+                )
+            uploaded += resp.status_code == 200
+    return {"uploaded": [None] * uploaded, "skipped": 0, "failed": []}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="JIRA attachment upload against a local mock")
+    parser.add_argument("--issues", type=int, default=8)
+    parser.add_argument("--pdf-mb", type=float, default=20)
+    parser.add_argument("--png-mb", type=float, default=2)
+    parser.add_argument("--latency-ms", type=float, default=40)
+    parser.add_argument("--workers", type=int, default=jira_post_agent.WORKERS)
+    args = parser.parse_args()
+
+    workdir = Path(tempfile.mkdtemp(prefix="bench-attach-"))
+    files = [
+        ("diagrams/system_flow.png", make_file(workdir / "system_flow.png", args.png_mb)),
+        ("docs/SRS.pdf", make_file(workdir / "SRS.pdf", args.pdf_mb)),
+    ]
+    artifacts = [(name, str(path), file_sha256(path)) for name, path in files]
+    expected = {Path(path).name: digest for _name, path, digest in artifacts}
+
+    mock = MockJira(latency_ms=args.latency_ms, connect_ms=0).start()
+    keys = [mock.create({"summary": f"Story {i}"})[0]["key"] for i in range(args.issues)]
+    client = JiraClient(mock.url, "bench", "token", pool_size=args.workers)
+    journal = PostingJournal(workdir / "journal.db")
+
+    def streamed():
+        return jira_post_agent.attach_artifacts(keys, artifacts, client=client, workers=args.workers,
+                                                journal=journal, target="all")
+
+    rows = []
+    for label, fn in (("naive", lambda: attach_naive(mock.url, keys, artifacts)),
+                      ("streamed", streamed), ("rerun", streamed)):
+        for key in keys:
+            if label != "rerun":
+                mock.issues[key].pop("attachments", None)
+        mock.reset_stats()
+        tracemalloc.start()
+        started = time.perf_counter()
+        summary = fn()
+        seconds = time.perf_counter() - started
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        received = [a for key in keys for a in mock.issues[key].get("attachments", [])]
+        intact = all(a["sha256"] == expected.get(a["filename"]) for a in received)
+        rows.append((label, seconds, summary, dict(mock.stats), peak, intact))
+    mock.stop()
+
+    total_mb = (args.pdf_mb + args.png_mb) * args.issues
+    print(f"issues: {args.issues}, files/issue: 2 ({args.png_mb} MB png + {args.pdf_mb} MB pdf), "
+          f"workers: {args.workers}")
+    print(f"{'mode':<9} {'seconds':>8} {'uploaded':>9} {'skipped':>8} {'MB sent':>8} {'peak MB':>8} {'intact':>7}")
+    for label, seconds, summary, stats, peak, intact in rows:
+        print(f"{label:<9} {seconds:>8.2f} {len(summary['uploaded']):>9} {summary['skipped']:>8} "
+              f"{stats['attachment_bytes'] / 2**20:>8.1f} {peak / 2**20:>8.1f} {str(intact):>7}")
+    print(f"(payload per full pass: {total_mb:.0f} MB)")
+
+
+if __name__ == "__main__":
+    main()
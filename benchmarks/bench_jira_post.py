@@ -0,0 +1,116 @@
+"""
+benchmarks/bench_jira_post.py
+Stories/second posting to a local mock JIRA (benchmarks/mock_jira.py):
+- per-story: one `requests.post` per story, new connection each time
+  (the previous post_stories_to_jira)
+- session:   one request per story over the pooled keep-alive session
+- bulk:      /issue/bulk in chunks over the pooled session
+
+With --rate-limit the mock answers excess requests with 429 + Retry-After;
+"lost" counts stories neither created nor reported as failed. "rerun" posts
+the same stories again through a fresh posting journal after a first bulk
+pass: every story should be skipped without a request.
+
+Usage:
+    python benchmarks/bench_jira_post.py [--stories 100] [--chunk 50] [--latency-ms 40] [--connect-ms 30]
+    python benchmarks/bench_jira_post.py --rate-limit 10 --workers 4 --chunk 10
+"""
+
+import sys
+import time
+import argparse
+import tempfile
+import requests
+from pathlib import Path
+
+root_dir = Path(__file__).resolve().parent.parent
+if str(root_dir) not in sys.path:
+    sys.path.append(str(root_dir))
+
+from benchmarks.mock_jira import MockJira
+from core.jira_client import JiraClient
+from core.jira_journal import PostingJournal
+import agents.jira_post_agent as jira_post_agent
+
+
+def make_stories(n: int, invalid_every: int = 0) -> list:
+    return [
+        {
+            "summary": f"INVALID story {i}" if invalid_every and i % invalid_every == 0 else f"Story {i}",
+            "bdd": "Given a user\nWhen they act\nThen the system responds",
+            "labels": ["auto", "sdlc"],
+        }
+        for i in range(1, n + 1)
+    ]
+
+
+def post_per_story(base_url: str, stories: list) -> dict:
+    """Previous behaviour: plain requests.post per story, no Session; 429 skips the story."""
+    created, failed = 0, 0
+    for idx, story in enumerate(stories, start=1):
+        payload = {"fields": jira_post_agent.story_fields(story, "SDLC", idx)}
+        resp = requests.post(f"{base_url}/rest/api/3/issue", json=payload, auth=("bench", "token"),
+                             headers={"Accept": "application/json", "Content-Type": "application/json"})
+        if resp.status_code in (200, 201):
+            created += 1
+        elif resp.status_code != 429:
+            failed += 1
+    return {"created_count": created, "failed_count": failed}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="JIRA posting throughput against a local mock")
+    parser.add_argument("--stories", type=int, default=100)
+    parser.add_argument("--chunk", type=int, default=50)
+    parser.add_argument("--latency-ms", type=float, default=40)
+    parser.add_argument("--per-issue-ms", type=float, default=2)
+    parser.add_argument("--connect-ms", type=float, default=30)
+    parser.add_argument("--invalid-every", type=int, default=25, help="reject every Nth story (0 = none)")
+    parser.add_argument("--rate-limit", type=float, default=0, help="mock requests/second before 429 (0 = off)")
+    parser.add_argument("--workers", type=int, default=jira_post_agent.WORKERS)
+    args = parser.parse_args()
+
+    mock = MockJira(latency_ms=args.latency_ms, per_issue_ms=args.per_issue_ms, connect_ms=args.connect_ms,
+                    rate_limit=args.rate_limit).start()
+    stories = make_stories(args.stories, args.invalid_every)
+    jira_post_agent.CHUNK_SIZE = args.chunk
+
+    def run(label, fn):
+        mock.reset_stats()
+        started = time.perf_counter()
+        summary = fn()
+        seconds = time.perf_counter() - started
+        return label, seconds, summary, dict(mock.stats)
+
+    def agent(mode, workers, journal=False):
+        client = JiraClient(mock.url, "bench", "token", pool_size=max(1, workers))
+        return lambda: jira_post_agent.post_stories_to_jira(stories, client=client, mode=mode, workers=workers,
+                                                            journal=journal)
+
+    journal = PostingJournal(Path(tempfile.mkdtemp(prefix="bench-jira-")) / "journal.db")
+
+    rows = [
+        run("per-story", lambda: post_per_story(mock.url, stories)),
+        run("session", agent("single", 1)),
+        run("bulk", agent("bulk", 1)),
+        run(f"session x{args.workers}", agent("single", args.workers)),
+        run(f"bulk x{args.workers}", agent("bulk", args.workers)),
+        run("journal", agent("bulk", args.workers, journal)),
+        run("rerun", agent("bulk", args.workers, journal)),
+    ]
+    mock.stop()
+
+    print(f"stories: {args.stories}, chunk: {args.chunk}, mock latency: {args.latency_ms} ms/request, "
+          f"{args.connect_ms} ms/connection, rate limit: {args.rate_limit or 'off'}")
+    print(f"{'mode':<12} {'seconds':>8} {'created':>8} {'failed':>7} {'lost':>5} {'requests':>9} {'429s':>5} "
+          f"{'conns':>6} {'stories/s':>10}")
+    for label, seconds, summary, stats in rows:
+        created = summary["created_count"] + summary.get("unchanged_count", 0)
+        failed = summary["failed_count"]
+        print(f"{label:<12} {seconds:>8.2f} {created:>8} {failed:>7} {args.stories - created - failed:>5} "
+              f"{stats['requests']:>9} {stats['throttled']:>5} {stats['connections']:>6} {created / seconds:>10.1f}")
+    print("(rerun: created counts stories already posted and skipped)")
+
+
+if __name__ == "__main__":
+    main()
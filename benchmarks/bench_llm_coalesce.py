@@ -0,0 +1,106 @@
+"""
+benchmarks/bench_llm_coalesce.py
+Single-flight coalescing in LLMWrapper: N concurrent callers send the same
+prompt (e.g. several users running the same template, or Flow and Mind Map
+both extracting requirements). Compares upstream completions, wall time
+and saved tokens with coalescing off and on, for threads, asyncio tasks
+and both at once.
+
+The OpenAI client is replaced by a stub that sleeps `--latency` seconds per
+completion, so no API key or network is needed.
+
+Usage:
+    python benchmarks/bench_llm_coalesce.py [--callers 16] [--latency 0.5] [--distinct 2]
+"""
+
+import os
+import sys
+import time
+import asyncio
+import argparse
+import threading
+from types import SimpleNamespace
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+
+root_dir = Path(__file__).resolve().parent.parent
+if str(root_dir) not in sys.path:
+    sys.path.append(str(root_dir))
+os.environ.setdefault("OPENAI_API_KEY", "bench-not-used")
+
+from core.llm import LLMWrapper, SingleFlight
+import core.llm as llm_module
+
+
+class StubCompletions:
+    """chat.completions.create stand-in: fixed latency, counts upstream calls."""
+
+    def __init__(self, latency_s: float):
+        self.latency_s = latency_s
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def create(self, model, messages, **kwargs):
+        with self._lock:
+            self.calls += 1
+        time.sleep(self.latency_s)
+        text = f"Requirements for: {messages[0]['content'][:40]} ..."
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=text))])
+
+
+def make_llm(coalesce: bool, latency_s: float) -> tuple:
+    llm = LLMWrapper("gpt-4o", temperature=0.3, max_tokens=2000, coalesce=coalesce)
+    stub = StubCompletions(latency_s)
+    llm.client = SimpleNamespace(chat=SimpleNamespace(completions=stub))
+    return llm, stub
+
+
+def run_threads(llm, prompts: list) -> list:
+    with ThreadPoolExecutor(max_workers=len(prompts)) as pool:
+        return list(pool.map(lambda p: llm.invoke(p, agent_name="requirement"), prompts))
+
+
+def run_tasks(llm, prompts: list) -> list:
+    async def main():
+        return await asyncio.gather(*(llm.ainvoke(p, agent_name="requirement") for p in prompts))
+    return asyncio.run(main())
+
+
+def run_mixed(llm, prompts: list) -> list:
+    half = len(prompts) // 2
+    results = {}
+    worker = threading.Thread(target=lambda: results.setdefault("tasks", run_tasks(llm, prompts[half:])))
+    worker.start()
+    results["threads"] = run_threads(llm, prompts[:half])
+    worker.join()
+    return results["threads"] + results["tasks"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="LLM single-flight coalescing benchmark")
+    parser.add_argument("--callers", type=int, default=16)
+    parser.add_argument("--latency", type=float, default=0.5, help="seconds per simulated completion")
+    parser.add_argument("--distinct", type=int, default=2, help="distinct prompts among the callers")
+    args = parser.parse_args()
+
+    template = "Extract functional and non-functional requirements for: {} " + "context " * 300
+    prompts = [template.format(f"system {i % args.distinct}") for i in range(args.callers)]
+
+    print(f"callers: {args.callers}, distinct prompts: {args.distinct}, latency: {args.latency}s")
+    print(f"{'scenario':<18} {'coalesce':>8} {'upstream':>9} {'coalesced':>10} {'seconds':>8} {'saved in-tok':>13} "
+          f"{'results ok':>10}")
+    for label, runner in (("threads", run_threads), ("asyncio tasks", run_tasks), ("threads+asyncio", run_mixed)):
+        for coalesce in (False, True):
+            llm_module.llm_flights = SingleFlight()
+            llm, stub = make_llm(coalesce, args.latency)
+            started = time.perf_counter()
+            results = runner(llm, prompts)
+            seconds = time.perf_counter() - started
+            stats = llm_module.coalescing_stats()
+            ok = all(r == f"Requirements for: {p[:40]} ..." for r, p in zip(results, prompts))
+            print(f"{label:<18} {str(coalesce):>8} {stub.calls:>9} {stats['coalesced']:>10} {seconds:>8.2f} "
+                  f"{stats['saved_input_tokens']:>13} {str(ok):>10}")
+
+
+if __name__ == "__main__":
+    main()
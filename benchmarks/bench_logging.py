@@ -0,0 +1,99 @@
+"""
+benchmarks/bench_logging.py
+Per-call logging overhead of LLMWrapper.invoke: legacy synchronous sinks
+(file with backtrace/diagnose + stdout) versus the enqueued JSON sinks of
+core.logger.init_logger. The OpenAI client is replaced by a canned response
+so only local work is timed.
+
+Usage:
+    python benchmarks/bench_logging.py [iterations] [--word-tokens]
+
+--word-tokens counts tokens as words instead of with tiktoken (no encoding
+download needed, e.g. offline); the published numbers were taken this way.
+"""
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+from pathlib import Path
+from types import SimpleNamespace
+
+root_dir = Path(__file__).resolve().parent.parent
+if str(root_dir) not in sys.path:
+    sys.path.append(str(root_dir))
+
+os.environ.setdefault("OPENAI_API_KEY", "bench-key")
+
+import core.llm as core_llm
+import core.logger as core_logger
+from loguru import logger
+from core.llm import LLMWrapper
+from core.tracing import tracer
+from core.usage_ledger import ledger
+
+
+class _CannedCompletions:
+    def create(self, **_):
+        message = SimpleNamespace(content="FR1: The system shall respond within two seconds.")
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+
+def _legacy_sinks(log_dir: Path, devnull):
+    logger.remove()
+    logger.add(log_dir / "app.log", rotation="1 week", level="INFO", backtrace=True, diagnose=True)
+    logger.add(devnull, level="INFO")
+
+
+def _enqueued_sinks(log_dir: Path, devnull):
+    logger.remove()
+    core_logger._INITIALIZED = False
+    stdout, sys.stdout = sys.stdout, devnull
+    try:
+        core_logger.init_logger("INFO", str(log_dir))
+    finally:
+        sys.stdout = stdout
+
+
+def _time_invoke(llm: LLMWrapper, iterations: int) -> float:
+    llm.invoke("warm-up", agent_name="bench")
+    started = time.perf_counter()
+    for _ in range(iterations):
+        llm.invoke("Summarise the attendance tracking requirements.", agent_name="bench")
+    return (time.perf_counter() - started) / iterations * 1e6
+
+
+def main(iterations: int = 2000):
+    tmp = Path(tempfile.mkdtemp(prefix="bench_logging_"))
+    tracer.enabled = False  # isolate logging from span export
+    ledger.db_path = tmp / "usage.db"
+
+    llm = LLMWrapper("gpt-4o-mini")
+    llm.client = SimpleNamespace(chat=SimpleNamespace(completions=_CannedCompletions()))
+
+    with open(os.devnull, "w") as devnull:
+        logger.remove()
+        baseline = _time_invoke(llm, iterations)
+
+        _legacy_sinks(tmp / "legacy", devnull)
+        legacy = _time_invoke(llm, iterations)
+
+        _enqueued_sinks(tmp / "enqueued", devnull)
+        enqueued = _time_invoke(llm, iterations)
+        logger.complete()
+
+    print(f"iterations            : {iterations}")
+    print(f"invoke, no sinks      : {baseline:8.1f} µs/call")
+    print(f"invoke, legacy sinks  : {legacy:8.1f} µs/call  (logging ≈ {legacy - baseline:7.1f} µs)")
+    print(f"invoke, enqueued JSON : {enqueued:8.1f} µs/call  (logging ≈ {enqueued - baseline:7.1f} µs)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Per-call logging overhead of LLMWrapper.invoke")
+    parser.add_argument("iterations", nargs="?", type=int, default=2000)
+    parser.add_argument("--word-tokens", action="store_true", help="count tokens as words instead of tiktoken")
+    args = parser.parse_args()
+    if args.word_tokens:
+        core_llm.num_tokens_from_string = lambda text, model="gpt-4o": len((text or "").split())
+    main(args.iterations)
@@ -0,0 +1,96 @@
+"""
+benchmarks/bench_pdf.py
+PDF render time across document sizes:
+- inline: a fresh stylesheet and render in the calling process per document
+  (the previous behaviour of run_srs_agent / the requirement report)
+- pool:   core.pdf_render.PDFRenderer with warm worker processes, cache miss
+- cached: the same document requested again (cache hit)
+
+Usage:
+    python benchmarks/bench_pdf.py [--engine weasyprint|reportlab] [--repeat 3] [--workers 2]
+"""
+
+import sys
+import time
+import argparse
+import tempfile
+from pathlib import Path
+
+root_dir = Path(__file__).resolve().parent.parent
+if str(root_dir) not in sys.path:
+    sys.path.append(str(root_dir))
+
+from core import pdf_worker
+from core.pdf_render import PDFRenderer
+
+# name → number of SRS-like sections
+SIZES = {"small": 2, "medium": 12, "large": 48}
+
+
+def make_markdown(sections: int, salt: int = 0) -> str:
+    parts = [f"# Benchmark SRS {salt}", "## Table of Contents"]
+    parts += [f"{i}. Section {i}" for i in range(1, sections + 1)]
+    for i in range(1, sections + 1):
+        parts.append(f"## {i}. Section {i}")
+        parts.append("The system shall provide reliable attendance tracking for schools. " * 6)
+        rows = ["| ID | Requirement | Module |", "|----|-------------|--------|"]
+        rows += [f"| FR{i}.{j} | Teachers mark attendance for session {j} | Attendance |" for j in range(1, 9)]
+        parts.append("\n".join(rows))
+    return "\n\n".join(parts)
+
+
+def render_inline(markdown_text: str, engine: str) -> bytes:
+    """Previous behaviour: build the stylesheet and render in-process every time."""
+    if engine == "weasyprint":
+        import markdown
+        from weasyprint import HTML, CSS
+
+        html_str = markdown.markdown(markdown_text, extensions=pdf_worker.MARKDOWN_EXTENSIONS, output_format="html5")
+        return HTML(string=html_str).write_pdf(stylesheets=[CSS(string=pdf_worker.SRS_CSS)])
+    pdf_worker._state.pop("styles", None)
+    return pdf_worker.render_reportlab(markdown_text)
+
+
+def _timed(fn) -> float:
+    started = time.perf_counter()
+    fn()
+    return (time.perf_counter() - started) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="PDF render time across document sizes")
+    parser.add_argument("--engine", default="weasyprint", choices=sorted(pdf_worker.RENDERERS))
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--workers", type=int, default=2)
+    args = parser.parse_args()
+
+    renderer = PDFRenderer(cache_dir=tempfile.mkdtemp(prefix="bench_pdf_"), workers=args.workers)
+    started = time.perf_counter()
+    renderer.warm()
+    # First render waits for the workers' initializer (library import, fonts)
+    renderer.render(make_markdown(1, salt=-1), engine=args.engine)
+    warm_ms = (time.perf_counter() - started) * 1000
+
+    print(f"engine: {args.engine}, workers: {args.workers}, pool start + warm-up: {warm_ms:.0f} ms")
+    print(f"{'size':<8} {'sections':>8} {'inline ms':>10} {'pool ms':>9} {'cached ms':>10} {'pdf KB':>8}")
+    salt = 0
+    for name, sections in SIZES.items():
+        inline, pooled, cached, size = [], [], [], 0
+        for _ in range(args.repeat):
+            salt += 1
+            doc = make_markdown(sections, salt)
+            inline.append(_timed(lambda: render_inline(doc, args.engine)))
+            salt += 1
+            doc = make_markdown(sections, salt)
+            pooled.append(_timed(lambda: renderer.render(doc, engine=args.engine)))
+            cached.append(_timed(lambda: renderer.render(doc, engine=args.engine)))
+            size = len(renderer.render(doc, engine=args.engine)) // 1024
+        print(
+            f"{name:<8} {sections:>8} {min(inline):>10.1f} {min(pooled):>9.1f} {min(cached):>10.2f} {size:>8}"
+        )
+    print(f"renderer stats: {renderer.stats}")
+    renderer.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+"""
+benchmarks/bench_pipeline.py
+Time until the downstream agents (flow, SRS, JIRA stories) start, and
+end-to-end time, for the sequential pipeline vs pipelined mode (requirements
+streamed JSON-first, downstream agents started as soon as the JSON closes).
+
+The requirement model is simulated behind a real LLMWrapper (a stub OpenAI
+client that streams chunks at --tps after --ttft), so the streaming and
+incremental JSON parsing paths are the production ones. Downstream agents
+are simulated as single completions of a fixed size. Latency is scaled by
+--scale and shown unscaled.
+
+Usage:
+    python benchmarks/bench_pipeline.py [--tps 60] [--ttft 0.8] [--scale 0.05]
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+from pathlib import Path
+from types import SimpleNamespace
+
+root_dir = Path(__file__).resolve().parent.parent
+if str(root_dir) not in sys.path:
+    sys.path.append(str(root_dir))
+os.chdir(root_dir)  # prompts/ is resolved relative to the project root
+os.environ.setdefault("OPENAI_API_KEY", "sk-bench")
+
+from core.llm import LLMWrapper, num_tokens_from_string
+import agents.requirement_agent as requirement_agent
+import agents.router_agent as router_agent
+
+PROBLEM = (
+    "Build a smart attendance tracker for a network of secondary schools. Teachers mark attendance "
+    "per session, parents are alerted about absences and administrators get weekly reports."
+)
+
+PARSED = {
+    "project_name": "Smart Attendance Tracker",
+    "functional_requirements": [f"FR{i}: Requirement number {i} of the attendance tracker" for i in range(1, 13)],
+    "non_functional_requirements": [f"NFR{i}: Quality attribute number {i}" for i in range(1, 6)],
+    "actors": ["Teacher", "Student", "Administrator", "Parent"],
+    "assumptions": ["Schools provide devices"],
+    "modules": ["Attendance", "Reporting", "Notifications", "Administration"],
+}
+
+REPORT = (
+    "#### Problem Summary\n" + "The system digitises attendance and keeps every stakeholder informed. " * 20
+    + "\n\n#### Functional Requirements\n" + "\n".join(f"- {r}" for r in PARSED["functional_requirements"])
+    + "\n\n#### Example Use Case\n" + "A teacher opens the class register and marks two students absent. " * 20
+)
+
+# Simulated output tokens of each downstream agent (one completion each)
+DOWNSTREAM_TOKENS = {"flow": 400, "srs": 1500, "stories": 900}
+
+
+class StubCompletions:
+    """chat.completions.create with the latency profile of a streaming model."""
+
+    def __init__(self, tps: float, ttft: float, scale: float):
+        self.tps, self.ttft, self.scale = tps, ttft, scale
+
+    def _reply(self, prompt: str) -> str:
+        block = f"```json\n{json.dumps(PARSED, indent=2)}\n```"
+        if "MUST come first" in prompt:
+            return f"{block}\n\n{REPORT}"
+        return f"{REPORT}\n\n{block}"
+
+    def create(self, model, messages, temperature=None, max_tokens=None, stream=False):
+        text = self._reply(messages[0]["content"])
+        if not stream:
+            time.sleep((self.ttft + num_tokens_from_string(text) / self.tps) * self.scale)
+            return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=text))])
+        return self._stream(text)
+
+    def _stream(self, text: str):
+        time.sleep(self.ttft * self.scale)
+        words = text.split(" ")
+        for i in range(0, len(words), 8):
+            chunk = " ".join(words[i:i + 8]) + (" " if i + 8 < len(words) else "")
+            time.sleep(num_tokens_from_string(chunk) / self.tps * self.scale)
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=chunk))])
+
+
+class DownstreamClock:
+    """Simulated downstream agents; records when each one starts and ends."""
+
+    def __init__(self, tps: float, ttft: float, scale: float):
+        self.tps, self.ttft, self.scale = tps, ttft, scale
+        self.started_at = None
+        self.events = {}
+        self._lock = threading.Lock()
+
+    def agent(self, name: str, result):
+        def run(requirements: dict, incremental: bool = None):
+            assert requirements["parsed_json"]["functional_requirements"], "downstream got no requirements"
+            begin = time.perf_counter() - self.started_at
+            time.sleep((self.ttft + DOWNSTREAM_TOKENS[name] / self.tps) * self.scale)
+            with self._lock:
+                self.events[name] = (begin, time.perf_counter() - self.started_at)
+            return result
+        return run
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sequential vs pipelined SDLC pipeline (simulated model)")
+    parser.add_argument("--tps", type=float, default=60, help="simulated output tokens/second")
+    parser.add_argument("--ttft", type=float, default=0.8, help="simulated time to first token (s)")
+    parser.add_argument("--scale", type=float, default=0.05, help="sleep scale for simulated latency")
+    args = parser.parse_args()
+
+    llm = LLMWrapper("gpt-4o", coalesce=False)
+    llm.client = SimpleNamespace(chat=SimpleNamespace(completions=StubCompletions(args.tps, args.ttft, args.scale)))
+    requirement_agent.get_llm = lambda name="requirement": llm
+    requirement_agent.CACHE_ENABLED = False  # measure fresh analyses, not similarity-cache reuse
+    router_agent.settings = {"features": {"enable_pdf_gen": True, "enable_jira_post": False}}
+
+    rows = []
+    for mode in ("sequential", "pipelined"):
+        clock = DownstreamClock(args.tps, args.ttft, args.scale)
+        router_agent.run_flow_agent = clock.agent("flow", "diagram.png")
+        router_agent.run_srs_agent = clock.agent("srs", "SRS.pdf")
+        router_agent.run_jira_story_agent = clock.agent("stories", [{"summary": "story"}])
+        clock.started_at = time.perf_counter()
+        result = router_agent.run_sequential_pipeline(PROBLEM, incremental=False, pipelined=mode == "pipelined")
+        total = time.perf_counter() - clock.started_at
+        assert "error" not in result, result.get("error")
+        report_ok = "Problem Summary" in result["requirements"]["readable_text"]
+        first_start = min(begin for begin, _end in clock.events.values())
+        rows.append((mode, first_start / args.scale, total / args.scale, report_ok,
+                     len(result["requirements"]["parsed_json"]["functional_requirements"])))
+
+    print(f"simulated model: ttft {args.ttft}s, {args.tps} tokens/s (latency shown unscaled)")
+    print(f"{'mode':<12} {'downstream start (s)':>21} {'total (s)':>10} {'report':>7} {'FRs':>4}")
+    for mode, start, total, report_ok, frs in rows:
+        print(f"{mode:<12} {start:>21.2f} {total:>10.2f} {str(report_ok):>7} {frs:>4}")
+    (_m, seq_start, seq_total, *_r), (_p, pipe_start, pipe_total, *_s) = rows
+    print(f"downstream starts {seq_start - pipe_start:.2f}s earlier; end-to-end {1 - pipe_total / seq_total:.0%} faster")
+
+
+if __name__ == "__main__":
+    main()
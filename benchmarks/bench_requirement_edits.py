@@ -0,0 +1,174 @@
+"""
+benchmarks/bench_requirement_edits.py
+Tokens and latency of a typical edit session on the problem statement: the
+user runs the requirement agent, then edits the text area and runs again
+(typo fix, added paragraph, reformatting only, removed paragraph, rewritten
+paragraph, added constraint). Compares a full analysis on every run with
+incremental re-analysis against the previous version (paragraph diff +
+delta merge).
+
+The model is simulated: every paragraph yields one requirement (NFR when it
+says "must", FR otherwise). A full analysis writes the whole Markdown
+document plus JSON, a delta only the changed items. Latency is
+ttft + output_tokens / tps, scaled by --scale. Each incremental result is
+checked against the full analysis of the same text.
+
+Usage:
+    python benchmarks/bench_requirement_edits.py [--tps 60] [--ttft 0.8] [--scale 0.05]
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import argparse
+from pathlib import Path
+
+root_dir = Path(__file__).resolve().parent.parent
+if str(root_dir) not in sys.path:
+    sys.path.append(str(root_dir))
+os.chdir(root_dir)  # prompts/ is resolved relative to the project root
+
+from core.llm import num_tokens_from_string
+import agents.requirement_agent as requirement_agent
+
+BASE = [
+    "Build a smart attendance tracker for a network of secondary schools.",
+    "Teachers mark attendance for each class session from a tablet or laptop.",
+    "Students view their attendance history and any absences awaiting justification.",
+    "Administrators generate weekly and monthly attendance reports per class and year group.",
+    "Parents receive an SMS or email alert when their child misses a registered session.",
+    "Administrators manage classes, timetables and enrolments for every school.",
+    "Attendance data can be exported to CSV and PDF for inspections.",
+    "The system must keep marking attendance under two seconds at peak times.",
+    "Personal data must be encrypted at rest and in transit.",
+]
+
+
+def statement(paragraphs: list) -> str:
+    return "\n\n".join(paragraphs)
+
+
+def edit_session() -> list:
+    """(label, statement) for each Execute in the session."""
+    steps = [("initial", list(BASE))]
+    p = list(BASE)
+    p[2] = p[2].replace("absences awaiting", "absences still awaiting")
+    steps.append(("typo fix", list(p)))
+    p.insert(5, "Teachers correct a mark within 24 hours, with the change logged for audit.")
+    steps.append(("add paragraph", list(p)))
+    steps.append(("reformat only", [" ".join(x.upper().split()) if i == 0 else x for i, x in enumerate(p)]))
+    p = [x for x in p if "export" not in x.lower()]
+    steps.append(("remove paragraph", list(p)))
+    p[4] = "Parents receive a push notification in the school app when their child misses a session."
+    steps.append(("rewrite paragraph", list(p)))
+    p.append("The system must support 5,000 concurrent users during morning registration.")
+    steps.append(("add constraint", list(p)))
+    return [(label, statement(paras)) for label, paras in steps]
+
+
+def requirement_text(paragraph: str) -> str:
+    return " ".join(paragraph.rstrip(".").split()[:14])
+
+
+class SimulatedLLM:
+    def __init__(self, tps: float, ttft: float, scale: float):
+        self.tps, self.ttft, self.scale = tps, ttft, scale
+        self.input_tokens = self.output_tokens = 0
+
+    def _reply(self, prompt: str, text: str) -> str:
+        out = num_tokens_from_string(text)
+        self.input_tokens += num_tokens_from_string(prompt)
+        self.output_tokens += out
+        time.sleep((self.ttft + out / self.tps) * self.scale)
+        return text
+
+    def invoke(self, prompt: str, agent_name: str = "generic") -> str:
+        if agent_name == "requirement_delta":
+            return self._reply(prompt, self._delta(prompt))
+        body = prompt.split("### Problem Statement", 1)[1].split("\n---", 1)[0]
+        parsed = {"project_name": "Smart Attendance Tracker", "functional_requirements": [],
+                  "non_functional_requirements": [], "actors": ["Teacher", "Student", "Administrator", "Parent"],
+                  "assumptions": ["Schools provide devices"], "modules": ["Attendance", "Reporting", "Notifications"]}
+        for para in requirement_agent.split_paragraphs(body):
+            key = "non_functional_requirements" if " must " in para else "functional_requirements"
+            prefix = "NFR" if key.startswith("non") else "FR"
+            parsed[key].append(f"{prefix}{len(parsed[key]) + 1}: {requirement_text(para)}")
+        narrative = "The system digitises attendance and keeps every stakeholder informed in time. " * 12
+        doc = (f"#### Problem Summary\n{narrative}\n\n#### Functional Requirements\n"
+               + "\n".join(f"- {r}" for r in parsed["functional_requirements"])
+               + "\n\n#### Non-Functional Requirements\n"
+               + "\n".join(f"- {r}" for r in parsed["non_functional_requirements"])
+               + f"\n\n#### Example Use Case\n{narrative}\n\n```json\n{json.dumps(parsed, indent=2)}\n```")
+        return self._reply(prompt, doc)
+
+    def _delta(self, prompt: str) -> str:
+        previous = json.loads(re.search(r"```json\n(.*?)\n```", prompt, re.DOTALL).group(1))
+        removed = prompt.split("### Removed Paragraphs", 1)[1].split("### Added Paragraphs", 1)[0]
+        added = prompt.split("### Added Paragraphs", 1)[1].split("\n---", 1)[0]
+        delta = {"project_name": None, "remove": [], "replace": {}, "add": {}}
+        for para in requirement_agent.split_paragraphs(removed):
+            text = requirement_text(para)
+            for key in ("functional_requirements", "non_functional_requirements"):
+                for item in previous[key]:
+                    if item.split(": ", 1)[1] == text:
+                        delta["remove"].append(item.split(":")[0])
+        for para in requirement_agent.split_paragraphs(added):
+            if para == "(nothing)":
+                continue
+            key = "non_functional_requirements" if " must " in para else "functional_requirements"
+            delta["add"].setdefault(key, []).append(requirement_text(para))
+        return f"```json\n{json.dumps(delta)}\n```"
+
+
+def requirement_set(parsed: dict) -> set:
+    keys = ("functional_requirements", "non_functional_requirements")
+    return {(k, requirement_agent.normalize_statement(requirement_agent._strip_id(v))) for k in keys for v in parsed[k]}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Incremental requirement re-analysis over an edit session")
+    parser.add_argument("--tps", type=float, default=60, help="simulated output tokens/second")
+    parser.add_argument("--ttft", type=float, default=0.8, help="simulated time to first token (s)")
+    parser.add_argument("--scale", type=float, default=0.05, help="sleep scale for simulated latency")
+    args = parser.parse_args()
+
+    session = edit_session()
+    rows = []
+    for mode in ("full", "incremental"):
+        llm = SimulatedLLM(args.tps, args.ttft, args.scale)
+        requirement_agent.get_llm = lambda name="requirement": llm
+        previous = None
+        for label, text in session:
+            before_in, before_out = llm.input_tokens, llm.output_tokens
+            started = time.perf_counter()
+            result = requirement_agent.run_requirement_agent(
+                text, use_cache=False, previous=previous if mode == "incremental" else None
+            )
+            seconds = (time.perf_counter() - started) / args.scale
+            previous = {"statement": text, "requirements": result}
+            rows.append((mode, label, result.get("analysis", {}).get("mode"), llm.input_tokens - before_in,
+                         llm.output_tokens - before_out, seconds, result["parsed_json"]))
+
+    full = {label: parsed for mode, label, *_rest, parsed in rows if mode == "full"}
+    print(f"simulated model: ttft {args.ttft}s, {args.tps} tokens/s (latency shown unscaled)")
+    print(f"{'run':<18} {'mode':<12} {'analysis':<9} {'in-tok':>7} {'out-tok':>8} {'seconds':>8} {'matches full':>13}")
+    totals = {}
+    for mode, label, analysis, tin, tout, seconds, parsed in rows:
+        same = requirement_set(parsed) == requirement_set(full[label])
+        print(f"{label:<18} {mode:<12} {analysis:<9} {tin:>7} {tout:>8} {seconds:>8.2f} {str(same):>13}")
+        t = totals.setdefault(mode, [0, 0, 0.0])
+        t[0] += tin
+        t[1] += tout
+        t[2] += seconds
+    print()
+    for mode, (tin, tout, seconds) in totals.items():
+        print(f"{mode:<12} total in-tok {tin:>6}  out-tok {tout:>6}  seconds {seconds:>6.2f}")
+    f_in, f_out, f_s = totals["full"]
+    i_in, i_out, i_s = totals["incremental"]
+    print(f"saved: {1 - (i_in + i_out) / (f_in + f_out):.0%} tokens, {1 - i_s / f_s:.0%} latency")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+"""
+benchmarks/bench_srs.py
+SRS latency and output tokens on a fixed benchmark input: single-shot
+completion, concurrent per-section generation, and per-section generation
+with the locally rendered skeleton (model writes narrative only).
+
+By default the model is simulated: each call sleeps for a time-to-first-token
+plus output_tokens / tokens_per_s (scaled down by --scale so the run is quick)
+and returns canned Markdown of realistic length. Pass --live to call the
+configured model instead (needs OPENAI_API_KEY).
+
+Usage:
+    python benchmarks/bench_srs.py [--live] [--scale 0.02] [--tps 60] [--ttft 0.8]
+"""
+
+import os
+import sys
+import time
+import argparse
+import threading
+from pathlib import Path
+
+root_dir = Path(__file__).resolve().parent.parent
+if str(root_dir) not in sys.path:
+    sys.path.append(str(root_dir))
+os.chdir(root_dir)  # prompts/ is resolved relative to the project root
+
+from core.llm import num_tokens_from_string
+import agents.srs_agent as srs_agent
+
+BENCH_REQUIREMENTS = {
+    "readable_text": "Smart attendance tracking for schools with teacher, student and admin portals.",
+    "parsed_json": {
+        "project_name": "Smart Attendance Tracker",
+        "functional_requirements": [
+            "FR1: Teachers mark attendance for each class session",
+            "FR2: Students view their attendance history",
+            "FR3: Admins generate weekly and monthly attendance reports",
+            "FR4: Parents receive SMS/email alerts for absences",
+            "FR5: Users authenticate with school SSO",
+            "FR6: Admins manage classes, timetables and enrolments",
+            "FR7: Attendance can be exported to CSV and PDF",
+            "FR8: Teachers correct attendance within 24 hours",
+        ],
+        "non_functional_requirements": [
+            "NFR1: Marking attendance completes within 2 seconds",
+            "NFR2: 99.5% monthly availability during school hours",
+            "NFR3: Personal data encrypted at rest and in transit",
+            "NFR4: Supports 5,000 concurrent users",
+        ],
+        "actors": ["Teacher", "Student", "Admin", "Parent"],
+        "assumptions": ["Schools provide SSO", "SMS gateway is available"],
+        "modules": ["Attendance", "Reporting", "Notifications", "Authentication", "Administration"],
+    },
+}
+
+# Output tokens a typical model writes per section; single-shot writes them all
+SECTION_OUTPUT_TOKENS = {
+    "introduction": 450,
+    "overall_description": 650,
+    "functional": 1300,
+    "non_functional": 600,
+    "interfaces": 500,
+    "appendices": 350,
+}
+
+# Narrative-only output when tables and lists are rendered locally (skeleton)
+NARRATIVE_OUTPUT_TOKENS = {
+    "overall_description": 300,
+    "functional": 700,
+    "non_functional": 250,
+}
+
+
+class SimulatedLLM:
+    """Latency model: ttft + output_tokens / tps, scaled; canned Markdown output."""
+
+    def __init__(self, tps: float, ttft: float, scale: float):
+        self.tps = tps
+        self.ttft = ttft
+        self.scale = scale
+        self.lock = threading.Lock()
+        self.calls = 0
+        self.input_tokens = 0
+        self.output_tokens = 0
+
+    def invoke(self, prompt: str, agent_name: str = "generic") -> str:
+        key = agent_name[len("srs_"):] if agent_name.startswith("srs_") else None
+        if key and key.endswith("_narrative"):
+            out_tokens = NARRATIVE_OUTPUT_TOKENS[key[: -len("_narrative")]]
+        else:
+            out_tokens = SECTION_OUTPUT_TOKENS.get(key) or sum(SECTION_OUTPUT_TOKENS.values())
+        with self.lock:
+            self.calls += 1
+            self.input_tokens += num_tokens_from_string(prompt)
+            self.output_tokens += out_tokens
+        time.sleep((self.ttft + out_tokens / self.tps) * self.scale)
+        return "### Details\n" + "Lorem ipsum dolor sit amet. " * (out_tokens // 6)
+
+
+class CountingLLM:
+    """Wraps the real model to count calls and tokens."""
+
+    def __init__(self, llm):
+        self.llm = llm
+        self.lock = threading.Lock()
+        self.calls = 0
+        self.input_tokens = 0
+        self.output_tokens = 0
+
+    def invoke(self, prompt: str, agent_name: str = "generic") -> str:
+        text = self.llm.invoke(prompt, agent_name=agent_name)
+        with self.lock:
+            self.calls += 1
+            self.input_tokens += num_tokens_from_string(prompt, self.llm.model)
+            self.output_tokens += num_tokens_from_string(text, self.llm.model)
+        return text
+
+
+def _measure(generate, llm) -> dict:
+    started = time.perf_counter()
+    markdown_doc = generate(BENCH_REQUIREMENTS, llm=llm)
+    return {
+        "seconds": time.perf_counter() - started,
+        "calls": llm.calls,
+        "input_tokens": llm.input_tokens,
+        "output_tokens": llm.output_tokens,
+        "chars": len(markdown_doc),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SRS single-shot vs section-parallel latency")
+    parser.add_argument("--live", action="store_true", help="call the configured model")
+    parser.add_argument("--scale", type=float, default=0.02, help="simulated time scale (1.0 = real time)")
+    parser.add_argument("--tps", type=float, default=60.0, help="simulated output tokens per second")
+    parser.add_argument("--ttft", type=float, default=0.8, help="simulated time to first token (s)")
+    args = parser.parse_args()
+
+    def make_llm():
+        if args.live:
+            return CountingLLM(srs_agent.get_llm("srs"))
+        return SimulatedLLM(args.tps, args.ttft, args.scale)
+
+    results = {
+        "single-shot": _measure(srs_agent.generate_single_shot, make_llm()),
+        "sections": _measure(lambda req, llm: srs_agent.generate_sectioned(req, llm=llm, skeleton=False), make_llm()),
+        "skeleton": _measure(lambda req, llm: srs_agent.generate_sectioned(req, llm=llm, skeleton=True), make_llm()),
+    }
+
+    unit = "s" if args.live else f"s (simulated, x{1 / args.scale:g} = real-time estimate)"
+    print(f"{'mode':<12} {'wall':>9} {'calls':>6} {'in tok':>8} {'out tok':>8} {'chars':>8}")
+    for mode, r in results.items():
+        print(f"{mode:<12} {r['seconds']:>9.3f} {r['calls']:>6} {r['input_tokens']:>8} {r['output_tokens']:>8} {r['chars']:>8}")
+    base = results["single-shot"]
+    print(f"wall time unit: {unit}")
+    for mode in ("sections", "skeleton"):
+        r = results[mode]
+        print(
+            f"{mode}: {base['seconds'] / max(r['seconds'], 1e-9):.2f}x faster, "
+            f"{1 - r['output_tokens'] / max(base['output_tokens'], 1):.0%} fewer output tokens than single-shot"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""
+benchmarks/bench_stories.py
+JIRA story generation on a fixed many-module input: one completion for every
+story ("single") vs one concurrent call per module/FR group ("modules").
+Reports wall time, calls, stories and throughput in stories per second.
+
+By default the model is simulated: each call sleeps for a time-to-first-token
+plus output_tokens / tokens_per_s (scaled by --scale) and returns one story
+per requirement ID in the prompt; output beyond --max-tokens is truncated,
+as a real completion would be. Pass --live to call the configured model.
+
+Usage:
+    python benchmarks/bench_stories.py [--live] [--modules 10] [--per-module 4] [--workers 4]
+"""
+
+import os
+import sys
+import re
+import json
+import time
+import argparse
+import threading
+from pathlib import Path
+
+root_dir = Path(__file__).resolve().parent.parent
+if str(root_dir) not in sys.path:
+    sys.path.append(str(root_dir))
+os.chdir(root_dir)  # prompts/ is resolved relative to the project root
+
+from concurrent.futures import ThreadPoolExecutor
+from core.llm import num_tokens_from_string
+import agents.jira_story_agent as jira_story_agent
+
+MODULE_NAMES = [
+    "Attendance", "Reporting", "Notifications", "Authentication", "Administration",
+    "Timetable", "Grading", "Billing", "Messaging", "Library", "Transport", "Inventory",
+]
+
+
+def make_requirements(modules: int, per_module: int) -> dict:
+    names = MODULE_NAMES[:modules]
+    frs = [f"{name} users manage {name.lower()} record {j}" for name in names for j in range(1, per_module + 1)]
+    return {
+        "readable_text": "School management platform.",
+        "parsed_json": {
+            "project_name": "Benchmark School Suite",
+            "functional_requirements": [f"FR{i}: {text}" for i, text in enumerate(frs, start=1)],
+            "non_functional_requirements": ["NFR1: Pages load within 2 seconds", "NFR2: 99.5% availability"],
+            "actors": ["Teacher", "Student", "Admin"],
+            "modules": names,
+        },
+    }
+
+
+class SimulatedLLM:
+    """Latency model: ttft + output_tokens / tps, scaled; truncates past max_tokens."""
+
+    STORY_TOKENS = 170
+
+    def __init__(self, tps: float, ttft: float, scale: float, max_tokens: int):
+        self.tps = tps
+        self.ttft = ttft
+        self.scale = scale
+        self.max_tokens = max_tokens
+        self.lock = threading.Lock()
+        self.calls = 0
+
+    def invoke(self, prompt: str, agent_name: str = "jira"):
+        requirements = prompt.split("### Input Requirements / SRS", 1)[-1].split("### Output Format", 1)[0]
+        ids = list(dict.fromkeys(re.findall(r'"((?:N?FR)\d+):', requirements)))
+        stories = [
+            {
+                "summary": f"Deliver {req_id}",
+                "description": "As a user I want this capability so that my work gets done. " * 2,
+                "bdd": "Given a user\nWhen they act\nThen the system responds",
+                "role": "Developer",
+                "labels": ["auto", "sdlc"],
+                "requirement_ids": [req_id],
+            }
+            for req_id in ids
+        ]
+        out_tokens = len(stories) * self.STORY_TOKENS
+        text = json.dumps(stories)
+        if out_tokens > self.max_tokens:
+            text = text[: int(len(text) * self.max_tokens / out_tokens)]
+            out_tokens = self.max_tokens
+        with self.lock:
+            self.calls += 1
+        time.sleep((self.ttft + out_tokens / self.tps) * self.scale)
+        return text
+
+
+def _measure(mode: str, requirements: dict, llm) -> dict:
+    jira_story_agent.get_llm = lambda *args, **kwargs: llm
+    started = time.perf_counter()
+    stories = jira_story_agent.run_jira_story_agent(requirements, incremental=False, mode=mode)
+    seconds = time.perf_counter() - started
+    drafts = sum(1 for s in stories if s["summary"] == "Draft SDLC Story")
+    return {"seconds": seconds, "calls": getattr(llm, "calls", None), "stories": len(stories), "drafts": drafts}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="JIRA stories: single completion vs per-module concurrent")
+    parser.add_argument("--live", action="store_true", help="call the configured model")
+    parser.add_argument("--modules", type=int, default=10)
+    parser.add_argument("--per-module", type=int, default=4)
+    parser.add_argument("--workers", type=int, default=jira_story_agent.STORY_WORKERS)
+    parser.add_argument("--scale", type=float, default=0.02, help="simulated time scale (1.0 = real time)")
+    parser.add_argument("--tps", type=float, default=60.0, help="simulated output tokens per second")
+    parser.add_argument("--ttft", type=float, default=0.8, help="simulated time to first token (s)")
+    parser.add_argument("--max-tokens", type=int, default=4096, help="simulated completion limit")
+    args = parser.parse_args()
+
+    jira_story_agent.settings.setdefault("features", {})["save_intermediate_json"] = False
+    jira_story_agent._story_pool = ThreadPoolExecutor(max_workers=args.workers, thread_name_prefix="jira-stories")
+    requirements = make_requirements(args.modules, args.per_module)
+    real_llm = jira_story_agent.get_llm
+
+    def make_llm():
+        if args.live:
+            return real_llm()
+        return SimulatedLLM(args.tps, args.ttft, args.scale, args.max_tokens)
+
+    results = {mode: _measure(mode, requirements, make_llm()) for mode in ("single", "modules")}
+
+    unit = "s" if args.live else f"s (simulated, x{1 / args.scale:g} = real-time estimate)"
+    n_reqs = len(requirements["parsed_json"]["functional_requirements"]) + 2
+    print(f"requirements: {n_reqs}, modules: {args.modules}, workers: {args.workers}")
+    print(f"{'mode':<8} {'wall':>8} {'calls':>6} {'stories':>8} {'drafts':>7} {'stories/s':>10}")
+    for mode, r in results.items():
+        print(
+            f"{mode:<8} {r['seconds']:>8.3f} {str(r['calls']):>6} {r['stories']:>8} {r['drafts']:>7} "
+            f"{r['stories'] / max(r['seconds'], 1e-9):>10.1f}"
+        )
+    print(f"wall time unit: {unit}")
+    print(f"story stats: {jira_story_agent.story_stats.summary()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,311 @@
+"""
+benchmarks/mock_jira.py
+Local mock of the JIRA Cloud issue API for benchmarks and manual testing.
+
+Endpoints:
+    POST /rest/api/3/issue        → 201 {"id", "key", "self"}
+    POST /rest/api/3/issue/bulk   → 201 {"issues": [...], "errors": [...]}
+    PUT  /rest/api/3/issue/{key}  → 204 (fields replaced)
+    POST /rest/api/3/issue/{key}/attachments → 200 [{"id", "filename", "size"}]
+         (multipart, requires X-Atlassian-Token: no-check; read in chunks)
+    GET  /rest/api/3/search/jql   → 200 {"issues": [...]} for `labels = "<label>"`
+
+Latency model: `connect_ms` once per TCP connection (stands in for the TLS
+handshake a real server costs), `latency_ms` per request and `per_issue_ms`
+per created issue. Issues whose summary is empty or contains "INVALID" are
+rejected with a per-element error, as JIRA does for bad fields. With
+`bulk=False` the bulk endpoint answers 404, like servers without it.
+
+With `rate_limit` (requests/second, token bucket with a burst of the same
+size) excess requests get 429 with `Retry-After`, and every response carries
+`X-RateLimit-Limit` / `X-RateLimit-Remaining` / `X-RateLimit-NearLimit`.
+
+Usage (standalone):
+    python benchmarks/mock_jira.py [--port 8089] [--latency-ms 40] [--rate-limit 10]
+"""
+
+import re
+import json
+import time
+import hashlib
+import argparse
+import threading
+from urllib.parse import parse_qs, urlsplit
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class MockJira:
+    """Mock server state and configuration; `start()` serves on a background thread."""
+
+    def __init__(self, port: int = 0, latency_ms: float = 40, per_issue_ms: float = 2, connect_ms: float = 30,
+                 project_key: str = "SDLC", rate_limit: float = 0, bulk: bool = True):
+        self.latency_ms = latency_ms
+        self.bulk = bulk
+        self.per_issue_ms = per_issue_ms
+        self.connect_ms = connect_ms
+        self.project_key = project_key
+        self.rate_limit = rate_limit
+        self._tokens = float(rate_limit)
+        self._refilled = time.monotonic()
+        self.lock = threading.Lock()
+        self.stats = {"connections": 0, "requests": 0, "issues": 0, "updated": 0, "rejected": 0, "throttled": 0,
+                      "attachments": 0, "attachment_bytes": 0}
+        self.issues = {}
+        self._next_id = 10000
+        self.server = ThreadingHTTPServer(("127.0.0.1", port), self._handler())
+        self.server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "MockJira":
+        self._thread = threading.Thread(target=self.server.serve_forever, name="mock-jira", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def reset_stats(self):
+        with self.lock:
+            self.stats = {k: 0 for k in self.stats}
+
+    # ---------- Rate limiting ----------
+    def take_token(self):
+        """(allowed, retry_after_s, rate-limit headers) for one request."""
+        if not self.rate_limit:
+            return True, 0, {}
+        with self.lock:
+            now = time.monotonic()
+            self._tokens = min(self.rate_limit, self._tokens + (now - self._refilled) * self.rate_limit)
+            self._refilled = now
+            allowed = self._tokens >= 1
+            if allowed:
+                self._tokens -= 1
+            else:
+                self.stats["throttled"] += 1
+            remaining = int(self._tokens)
+            retry_after = 0 if allowed else round((1 - self._tokens) / self.rate_limit, 3)
+        headers = {
+            "X-RateLimit-Limit": int(self.rate_limit),
+            "X-RateLimit-Remaining": remaining,
+            "X-RateLimit-NearLimit": "true" if remaining < max(1, self.rate_limit * 0.1) else "false",
+        }
+        return allowed, retry_after, headers
+
+    # ---------- Issue handling ----------
+    def create(self, fields: dict):
+        """(issue, None) or (None, element error)."""
+        summary = str(fields.get("summary", "")).strip()
+        if not summary or "INVALID" in summary:
+            with self.lock:
+                self.stats["rejected"] += 1
+            return None, {"errorMessages": [], "errors": {"summary": "Summary is invalid."}}
+        time.sleep(self.per_issue_ms / 1000)
+        with self.lock:
+            self._next_id += 1
+            issue_id = str(self._next_id)
+            key = f"{self.project_key}-{self._next_id - 10000}"
+            self.issues[key] = {"id": issue_id, "fields": fields}
+            self.stats["issues"] += 1
+        return {"id": issue_id, "key": key, "self": f"{self.url}/rest/api/3/issue/{issue_id}"}, None
+
+    def update(self, key: str, fields: dict) -> bool:
+        with self.lock:
+            if key not in self.issues:
+                return False
+            self.issues[key]["fields"].update(fields)
+            self.stats["updated"] += 1
+        return True
+
+    def attach(self, key: str, filename: str, size: int, sha256: str):
+        with self.lock:
+            if key not in self.issues:
+                return None
+            self._next_id += 1
+            attachment = {"id": str(self._next_id), "filename": filename, "size": size, "sha256": sha256}
+            self.issues[key].setdefault("attachments", []).append(attachment)
+            self.stats["attachments"] += 1
+            self.stats["attachment_bytes"] += size
+        return attachment
+
+    def search_label(self, label: str) -> list:
+        with self.lock:
+            return [
+                {"id": issue["id"], "key": key, "fields": {"summary": issue["fields"].get("summary")}}
+                for key, issue in self.issues.items() if label in (issue["fields"].get("labels") or [])
+            ]
+
+    def _handler(self):
+        mock = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # keep-alive
+            # Buffer headers + body into one segment (avoids Nagle/delayed-ACK stalls on keep-alive)
+            wbufsize = 64 * 1024
+
+            def setup(self):
+                super().setup()
+                with mock.lock:
+                    mock.stats["connections"] += 1
+                time.sleep(mock.connect_ms / 1000)
+
+            def log_message(self, *args):
+                pass
+
+            def _send(self, status: int, body: dict, headers: dict = None):
+                data = json.dumps(body).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, str(value))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _json_body(self) -> dict:
+                length = int(self.headers.get("Content-Length") or 0)
+                return json.loads(self.rfile.read(length) or b"{}")
+
+            def _admit(self):
+                """Count, rate-limit and delay one request; (allowed, rate-limit headers)."""
+                with mock.lock:
+                    mock.stats["requests"] += 1
+                allowed, retry_after, limit_headers = mock.take_token()
+                if not allowed:
+                    self._send(
+                        429, {"errorMessages": ["Rate limit exceeded."]}, {"Retry-After": retry_after, **limit_headers}
+                    )
+                    return False, limit_headers
+                time.sleep(mock.latency_ms / 1000)
+                return True, limit_headers
+
+            def _read_multipart(self):
+                """(filename, size, sha256) of the single file part, hashed as it is read."""
+                boundary = self.headers.get("Content-Type", "").partition("boundary=")[2].strip('"')
+                remaining = int(self.headers.get("Content-Length") or 0)
+                tail = len(f"\r\n--{boundary}--\r\n")
+                digest, size, head, buf = hashlib.sha256(), 0, None, b""
+                while remaining:
+                    chunk = self.rfile.read(min(remaining, 256 * 1024))
+                    if not chunk:
+                        break
+                    remaining -= len(chunk)
+                    buf += chunk
+                    if head is None:
+                        if b"\r\n\r\n" not in buf:
+                            continue
+                        head, buf = buf.split(b"\r\n\r\n", 1)
+                    # Hold back what may be the closing boundary
+                    if len(buf) > tail:
+                        digest.update(buf[:-tail])
+                        size += len(buf) - tail
+                        buf = buf[-tail:]
+                match = re.search(rb'filename="([^"]*)"', head or b"")
+                return (match.group(1).decode("utf-8") if match else None), size, digest.hexdigest()
+
+            def do_GET(self):
+                allowed, limit_headers = self._admit()
+                if not allowed:
+                    return
+                url = urlsplit(self.path)
+                if url.path.rstrip("/") == "/rest/api/3/search/jql":
+                    jql = parse_qs(url.query).get("jql", [""])[0]
+                    match = re.fullmatch(r'\s*labels\s*=\s*"([^"]+)"\s*', jql)
+                    if not match:
+                        return self._send(400, {"errorMessages": [f"Unsupported JQL: {jql}"]}, limit_headers)
+                    issues = mock.search_label(match.group(1))
+                    return self._send(200, {"issues": issues}, limit_headers)
+                self._send(404, {"errorMessages": [f"No handler for {self.path}"]})
+
+            def _attachments(self, key: str):
+                if self.headers.get("X-Atlassian-Token") != "no-check":
+                    self.rfile.read(int(self.headers.get("Content-Length") or 0))
+                    return self._send(403, {"errorMessages": ["XSRF check failed"]})
+                if "chunked" in self.headers.get("Transfer-Encoding", ""):
+                    self.close_connection = True
+                    return self._send(411, {"errorMessages": ["Content-Length required"]})
+                filename, size, sha256 = self._read_multipart()
+                allowed, limit_headers = self._admit()
+                if not allowed:
+                    return
+                time.sleep(size / (50 * 1024 * 1024))  # ~50 MB/s ingest
+                attachment = mock.attach(key, filename, size, sha256)
+                if attachment is None:
+                    return self._send(404, {"errorMessages": ["Issue does not exist."]}, limit_headers)
+                self._send(200, [{k: attachment[k] for k in ("id", "filename", "size")}], limit_headers)
+
+            def do_PUT(self):
+                body = self._json_body()
+                allowed, limit_headers = self._admit()
+                if not allowed:
+                    return
+                match = re.fullmatch(r"/rest/api/3/issue/([^/]+)/?", self.path)
+                if not match:
+                    return self._send(404, {"errorMessages": [f"No handler for {self.path}"]})
+                fixed = sorted(set(body.get("fields", {})) & {"project", "issuetype"})
+                if fixed:
+                    # As real JIRA: these are set at creation and cannot be edited
+                    return self._send(400, {"errorMessages": [], "errors": {
+                        name: f"Field '{name}' cannot be set. It is not on the appropriate screen, or unknown."
+                        for name in fixed
+                    }}, limit_headers)
+                if not mock.update(match.group(1), body.get("fields", {})):
+                    return self._send(404, {"errorMessages": ["Issue does not exist."]}, limit_headers)
+                self.send_response(204)
+                for name, value in limit_headers.items():
+                    self.send_header(name, str(value))
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+            def do_POST(self):
+                attach = re.fullmatch(r"/rest/api/3/issue/([^/]+)/attachments/?", self.path)
+                if attach:
+                    return self._attachments(attach.group(1))
+                body = self._json_body()
+                allowed, limit_headers = self._admit()
+                if not allowed:
+                    return
+
+                if self.path.rstrip("/") == "/rest/api/3/issue/bulk" and mock.bulk:
+                    issues, errors = [], []
+                    for i, update in enumerate(body.get("issueUpdates", [])):
+                        issue, error = mock.create(update.get("fields", {}))
+                        if issue:
+                            issues.append(issue)
+                        else:
+                            errors.append({"status": 400, "elementErrors": error, "failedElementNumber": i})
+                    return self._send(201 if issues else 400, {"issues": issues, "errors": errors}, limit_headers)
+
+                if self.path.rstrip("/") == "/rest/api/3/issue":
+                    issue, error = mock.create(body.get("fields", {}))
+                    return self._send(201 if issue else 400, issue or error, limit_headers)
+
+                self._send(404, {"errorMessages": [f"No handler for {self.path}"]})
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local mock JIRA issue API")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--latency-ms", type=float, default=40)
+    parser.add_argument("--per-issue-ms", type=float, default=2)
+    parser.add_argument("--connect-ms", type=float, default=30)
+    parser.add_argument("--rate-limit", type=float, default=0, help="requests/second before 429 (0 = unlimited)")
+    args = parser.parse_args()
+
+    mock = MockJira(args.port, args.latency_ms, args.per_issue_ms, args.connect_ms, rate_limit=args.rate_limit)
+    print(f"Mock JIRA listening on {mock.url} (Ctrl+C to stop)")
+    try:
+        mock.server.serve_forever()
+    except KeyboardInterrupt:
+        mock.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+"""
+core/cancellation.py
+Cooperative cancellation of pipeline runs.
+
+A CancellationToken is bound to the current context (like the run tracker
+and the artifact run id), so it follows work into copied contexts: pipeline
+threads, LangGraph nodes and agent worker pools. Long-running code calls
+`check_cancelled()` between units of work (pipeline steps, OCR pages, PDF
+renders); LLMWrapper registers its open HTTP response with the token so
+`cancel()` aborts the request mid-stream.
+"""
+
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+from core.logger import init_logger
+
+logger = init_logger()
+
+
+class OperationCancelled(BaseException):
+    """
+    Raised inside a cancelled run. Like asyncio.CancelledError it derives from
+    BaseException, so the agents' `except Exception` fallbacks let it through
+    instead of turning it into an empty artifact.
+    """
+
+    def __init__(self, reason: str = "cancelled", where: str = None):
+        super().__init__(f"{reason} (at {where})" if where else reason)
+        self.reason = reason
+        self.where = where
+
+
+class CancellationToken:
+    """
+    Thread-safe cancel flag plus callbacks. `on_cancel` callbacks (e.g. closing
+    an HTTP response) run once, on the cancelling thread; a callback added after
+    cancellation runs immediately.
+    """
+
+    def __init__(self, name: str = None):
+        self.name = name
+        self.reason = None
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._callbacks = {}
+        self._next_id = 0
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def cancel(self, reason: str = "cancelled") -> bool:
+        """Cancel the run; False if it was already cancelled."""
+        with self._lock:
+            if self._event.is_set():
+                return False
+            self.reason = reason
+            self._event.set()
+            callbacks, self._callbacks = list(self._callbacks.values()), {}
+        logger.info(f"[Cancellation] {self.name or 'run'} cancelled: {reason}")
+        for callback in callbacks:
+            self._run(callback)
+        return True
+
+    def on_cancel(self, callback):
+        """Register `callback()`; returns a function that unregisters it."""
+        with self._lock:
+            if not self._event.is_set():
+                key = self._next_id
+                self._next_id += 1
+                self._callbacks[key] = callback
+                return lambda: self._callbacks.pop(key, None)
+        self._run(callback)
+        return lambda: None
+
+    def raise_if_cancelled(self, where: str = None):
+        if self._event.is_set():
+            raise OperationCancelled(self.reason, where)
+
+    def wait(self, timeout: float = None) -> bool:
+        """Block until cancelled (True) or `timeout` passes (False)."""
+        return self._event.wait(timeout)
+
+    @staticmethod
+    def _run(callback):
+        try:
+            callback()
+        except Exception as e:
+            logger.debug(f"[Cancellation] Cancel callback failed: {e}")
+
+
+_current_token: ContextVar = ContextVar("cancellation_token", default=None)
+
+
+def current_token():
+    """Token bound to this thread/task, or None (the run cannot be cancelled)."""
+    return _current_token.get()
+
+
+def is_cancelled() -> bool:
+    token = _current_token.get()
+    return token is not None and token.cancelled
+
+
+def check_cancelled(where: str = None):
+    """Raise OperationCancelled if the current run was cancelled; call between units of work."""
+    token = _current_token.get()
+    if token is not None:
+        token.raise_if_cancelled(where)
+
+
+@contextmanager
+def cancel_scope(token: CancellationToken = None, cancel_on_error: bool = False):
+    """
+    Bind a cancellation token to the current thread/task. Reuses the active
+    token unless an explicit one is given.
+
+    Args:
+        token (CancellationToken): Token to bind; a new one if None and none is active.
+        cancel_on_error (bool): Cancel the token when the block exits with an
+            exception (e.g. Streamlit stopping the script on rerun or tab close),
+            so background work started from the block stops too.
+    """
+    active = _current_token.get()
+    if token is None and active is not None:
+        yield active
+        return
+
+    token = token or CancellationToken()
+    reset = _current_token.set(token)
+    try:
+        yield token
+    except BaseException as e:
+        if cancel_on_error and not isinstance(e, OperationCancelled):
+            token.cancel(f"interrupted ({type(e).__name__})")
+        raise
+    finally:
+        _current_token.reset(reset)
+
+
+def wait_future(future: Future, timeout: float = None, where: str = None):
+    """
+    `future.result(timeout)` that stops waiting when the current run is
+    cancelled (raising OperationCancelled); the future itself keeps running.
+    """
+    token = _current_token.get()
+    if token is None:
+        return future.result(timeout)
+    done = threading.Event()
+    future.add_done_callback(lambda _f: done.set())
+    unregister = token.on_cancel(done.set)
+    try:
+        done.wait(timeout)
+    finally:
+        unregister()
+    if future.done():
+        return future.result()
+    token.raise_if_cancelled(where)
+    raise FutureTimeout()
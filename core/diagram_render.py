@@ -0,0 +1,187 @@
+"""
+core/diagram_render.py
+Shared Graphviz rendering service used by the flow and mind map agents.
+Renders through the public `graphviz.pipe` API on a bounded worker pool,
+enforces a per-render timeout and caches output keyed by the DOT source hash.
+"""
+
+import time
+import hashlib
+import threading
+from pathlib import Path
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+import graphviz
+from core.config import load_settings
+from core.logger import init_logger
+from core.storage import atomic_write_bytes
+from core.tracing import span
+
+logger = init_logger()
+settings = load_settings()
+
+SUPPORTED_FORMATS = ("png", "svg", "pdf")
+
+
+class RenderError(RuntimeError):
+    """Graphviz could not render the given DOT source."""
+
+
+class RenderTimeout(RenderError):
+    """Rendering exceeded the configured timeout (pathological graph)."""
+
+
+class GraphvizNotInstalled(RenderError):
+    """The Graphviz `dot` executable is not on PATH."""
+
+
+class DiagramRenderer:
+    """
+    Renders DOT to PNG/SVG/PDF bytes.
+
+    - `workers` bounds how many `dot` processes run at once.
+    - Results are cached in memory (LRU, `memory_items`) and on disk under
+      `cache_dir/<sha256>.<fmt>`, so identical DOT is rendered once. The disk
+      cache keeps the newest `max_cache_files` renders younger than
+      `max_age_days` (see `gc()`).
+    - Callers stop waiting after `timeout_s` (RenderTimeout). `graphviz.pipe`
+      cannot kill the `dot` process, so a pathological render keeps its
+      worker until it exits; `workers` bounds how many can pile up.
+    """
+
+    def __init__(self, cache_dir: str, workers: int = 2, timeout_s: float = 20, memory_items: int = 128,
+                 max_cache_files: int = 500, max_age_days: float = 30, gc_interval_s: float = 600):
+        self.cache_dir = Path(cache_dir)
+        self.timeout_s = timeout_s
+        self.memory_items = memory_items
+        self.max_cache_files = max_cache_files
+        self.max_age_days = max_age_days
+        self.gc_interval_s = gc_interval_s
+        self._last_gc = 0.0
+        self._pool = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="graphviz")
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "timeouts": 0, "errors": 0}
+
+    @staticmethod
+    def cache_key(dot_source: str, fmt: str, engine: str = "dot") -> str:
+        return hashlib.sha256(f"{engine}\0{fmt}\0{dot_source}".encode("utf-8")).hexdigest()
+
+    def render(self, dot_source: str, fmt: str = "png", engine: str = "dot", timeout_s: float = None) -> bytes:
+        if fmt not in SUPPORTED_FORMATS:
+            raise ValueError(f"Unsupported diagram format: {fmt}")
+
+        key = self.cache_key(dot_source, fmt, engine)
+        cached = self._cached(key, fmt)
+        if cached is not None:
+            return cached
+
+        with self._lock:
+            self.stats["misses"] += 1
+        timeout_s = timeout_s or self.timeout_s
+        with span("render.graphviz", format=fmt, engine=engine, dot_bytes=len(dot_source)):
+            future = self._pool.submit(self._run, dot_source, fmt, engine)
+            try:
+                data = future.result(timeout_s)
+            except FutureTimeout as e:
+                future.cancel()  # drops a queued render; a running `dot` finishes in its worker
+                with self._lock:
+                    self.stats["timeouts"] += 1
+                raise RenderTimeout(f"Graphviz render exceeded {timeout_s}s") from e
+
+        self._store(key, fmt, data)
+        return data
+
+    def _run(self, dot_source: str, fmt: str, engine: str) -> bytes:
+        try:
+            return graphviz.pipe(engine, fmt, dot_source.encode("utf-8"), quiet=True)
+        except graphviz.ExecutableNotFound as e:
+            raise GraphvizNotInstalled(str(e)) from e
+        except graphviz.CalledProcessError as e:
+            with self._lock:
+                self.stats["errors"] += 1
+            stderr = (e.stderr or b"").decode("utf-8", "ignore") if isinstance(e.stderr, bytes) else str(e.stderr)
+            raise RenderError(stderr.strip() or str(e)) from e
+
+    def _cached(self, key: str, fmt: str):
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self.stats["hits"] += 1
+                return self._memory[key]
+
+        path = self.cache_dir / f"{key}.{fmt}"
+        if path.exists():
+            try:
+                data = path.read_bytes()
+                path.touch()  # recently used renders survive gc()
+            except OSError:
+                return None
+            with self._lock:
+                self.stats["hits"] += 1
+            self._remember(key, data)
+            return data
+        return None
+
+    def _remember(self, key: str, data: bytes):
+        with self._lock:
+            self._memory[key] = data
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_items:
+                self._memory.popitem(last=False)
+
+    def _store(self, key: str, fmt: str, data: bytes):
+        self._remember(key, data)
+        try:
+            atomic_write_bytes(self.cache_dir / f"{key}.{fmt}", data)
+        except OSError as e:
+            logger.warning(f"[DiagramRender] Could not write render cache: {e}")
+        self.maybe_gc()
+
+    # ---------- Retention ----------
+    def maybe_gc(self):
+        if time.time() - self._last_gc >= self.gc_interval_s:
+            self.gc()
+
+    def gc(self) -> int:
+        """Delete cached renders older than `max_age_days` or beyond the newest `max_cache_files`."""
+        self._last_gc = time.time()
+        if not self.cache_dir.exists():
+            return 0
+        files = []
+        for path in self.cache_dir.iterdir():
+            try:
+                if path.is_file() and not path.name.startswith("."):
+                    files.append((path.stat().st_mtime, path))
+            except OSError:
+                continue
+        files.sort(reverse=True)
+        cutoff = time.time() - self.max_age_days * 86400
+        removed = 0
+        for idx, (mtime, path) in enumerate(files):
+            if idx >= self.max_cache_files or mtime < cutoff:
+                path.unlink(missing_ok=True)
+                removed += 1
+        if removed:
+            logger.info(f"[DiagramRender] GC removed {removed} cached renders")
+        return removed
+
+
+_diagram_cfg = settings.get("diagrams", {})
+renderer = DiagramRenderer(
+    cache_dir=_diagram_cfg.get(
+        "cache_dir", str(Path(settings.get("paths", {}).get("outputs_dir", "outputs")) / "cache" / "diagrams")
+    ),
+    workers=int(_diagram_cfg.get("render_workers", 2)),
+    timeout_s=float(_diagram_cfg.get("render_timeout_s", 20)),
+    max_cache_files=int(_diagram_cfg.get("max_cache_files", 500)),
+    max_age_days=float(_diagram_cfg.get("cache_max_age_days", 30)),
+)
+
+# Format shown in the UI; set "svg" for smaller files that render faster in the browser
+DEFAULT_FORMAT = _diagram_cfg.get("format", "png")
+
+
+def render_dot(dot_source: str, fmt: str = None, timeout_s: float = None) -> bytes:
+    """Render DOT source to bytes through the shared, cached renderer."""
+    return renderer.render(dot_source, fmt=fmt or DEFAULT_FORMAT, timeout_s=timeout_s)
@@ -0,0 +1,449 @@
+"""
+core/dot_repair.py
+Local Graphviz DOT validation and auto-repair for LLM output.
+
+`validate_dot` runs a small recursive-descent parser over the DOT grammar
+(graphs, subgraphs, node/edge/attribute statements) and returns readable
+errors. `repair_dot` strips markdown fences and surrounding prose, then
+applies targeted fixes (quoting, brace balancing, edge operators) until the
+source validates. Callers only re-prompt the LLM when repair fails.
+"""
+
+import re
+import threading
+from core.logger import init_logger
+
+logger = init_logger()
+
+KEYWORDS = {"strict", "graph", "digraph", "subgraph", "node", "edge"}
+
+_TOKEN_RE = re.compile(
+    r"""
+    (?P<ws>\s+)
+    |(?P<comment>//[^\n]*|/\*.*?\*/|(?m:^\#[^\n]*))
+    |(?P<string>"(?:\\.|[^"\\])*")
+    |(?P<edgeop>->|--)
+    |(?P<punct>[{}\[\];,=:])
+    |(?P<id>-?(?:\.\d+|\d+(?:\.\d*)?)|[A-Za-z_\u0080-￿][\w\u0080-￿]*)
+    """,
+    re.VERBOSE | re.DOTALL,
+)
+
+
+class DotSyntaxError(ValueError):
+    """Raised by the parser; collected into the error list by validate_dot."""
+
+
+# ======================================================
+# 🔹 Tokenizer
+# ======================================================
+def _tokenize(src: str) -> list:
+    """Return (kind, value, line) tuples; raises DotSyntaxError on bad input."""
+    tokens, pos, line = [], 0, 1
+    while pos < len(src):
+        if src[pos] == "<":
+            # HTML-like label: balanced angle brackets
+            depth, end = 0, pos
+            while end < len(src):
+                if src[end] == "<":
+                    depth += 1
+                elif src[end] == ">":
+                    depth -= 1
+                    if depth == 0:
+                        break
+                end += 1
+            if depth != 0:
+                raise DotSyntaxError(f"line {line}: unterminated HTML label")
+            value = src[pos:end + 1]
+            tokens.append(("id", value, line))
+            line += value.count("\n")
+            pos = end + 1
+            continue
+
+        match = _TOKEN_RE.match(src, pos)
+        if not match:
+            if src[pos] == '"':
+                raise DotSyntaxError(f"line {line}: unterminated quoted string")
+            raise DotSyntaxError(f"line {line}: unexpected character {src[pos]!r}")
+        kind, value = match.lastgroup, match.group()
+        if kind == "string":
+            tokens.append(("id", value, line))
+        elif kind in ("edgeop", "punct"):
+            tokens.append((value, value, line))
+        elif kind == "id":
+            tokens.append(("keyword" if value.lower() in KEYWORDS else "id", value, line))
+        line += value.count("\n")
+        pos = match.end()
+    tokens.append(("eof", "", line))
+    return tokens
+
+
+# ======================================================
+# 🔹 Parser
+# ======================================================
+class _Parser:
+    def __init__(self, tokens: list):
+        self.tokens = tokens
+        self.pos = 0
+        self.directed = True
+        self.nodes = set()
+        self.edges = 0
+        self.warnings = []
+
+    def peek(self, offset: int = 0):
+        return self.tokens[min(self.pos + offset, len(self.tokens) - 1)]
+
+    def take(self):
+        tok = self.peek()
+        self.pos += 1
+        return tok
+
+    def expect(self, kind: str, what: str = None):
+        tok = self.peek()
+        if tok[0] != kind:
+            got = tok[1] or "end of input"
+            raise DotSyntaxError(f"line {tok[2]}: expected {what or repr(kind)}, got {got!r}")
+        return self.take()
+
+    def is_keyword(self, word: str) -> bool:
+        tok = self.peek()
+        return tok[0] == "keyword" and tok[1].lower() == word
+
+    def parse(self):
+        if self.is_keyword("strict"):
+            self.take()
+        if self.is_keyword("digraph"):
+            self.directed = True
+        elif self.is_keyword("graph"):
+            self.directed = False
+        else:
+            tok = self.peek()
+            raise DotSyntaxError(f"line {tok[2]}: expected 'digraph' or 'graph', got {tok[1] or 'end of input'!r}")
+        self.take()
+        if self.peek()[0] == "id":
+            self.take()
+        self.expect("{")
+        self.stmt_list()
+        self.expect("}", "'}' to close the graph")
+        tok = self.peek()
+        if tok[0] != "eof":
+            raise DotSyntaxError(f"line {tok[2]}: unexpected content after graph: {tok[1]!r}")
+
+    def stmt_list(self):
+        while self.peek()[0] not in ("}", "eof"):
+            self.stmt()
+            if self.peek()[0] == ";":
+                self.take()
+        if self.peek()[0] == "eof":
+            raise DotSyntaxError(f"line {self.peek()[2]}: missing '}}' (unbalanced braces)")
+
+    def stmt(self):
+        tok = self.peek()
+        if tok[0] == "keyword" and tok[1].lower() in ("graph", "node", "edge"):
+            self.take()
+            self.attr_list(required=True)
+        elif self.is_keyword("subgraph") or tok[0] == "{":
+            self.subgraph()
+            self.edge_rhs()
+            self.attr_list()
+        elif tok[0] == "id" and self.peek(1)[0] == "=":
+            self.take()
+            self.take()
+            self.expect("id", "a value after '='")
+        elif tok[0] == "id":
+            edges = self.edges
+            self.node_id()
+            self.edge_rhs()
+            self.attr_list()
+            # `A B` is two node statements, but a bare id running into an edge
+            # statement on the same line (`User Login -> Auth Service`) is almost
+            # always an unquoted multi-word id from an LLM: valid, yet worth repairing
+            nxt = self.peek()
+            if nxt[0] == "id" and nxt[2] == self.tokens[self.pos - 1][2] and self.peek(1)[0] != "=":
+                if self.edges > edges or self.peek(1)[0] in ("->", "--"):
+                    self.warnings.append(f"line {nxt[2]}: unquoted node id with spaces near {nxt[1]!r}")
+        else:
+            raise DotSyntaxError(f"line {tok[2]}: unexpected {tok[1] or 'end of input'!r}")
+
+    def subgraph(self):
+        if self.is_keyword("subgraph"):
+            self.take()
+            if self.peek()[0] == "id":
+                self.take()
+        self.expect("{", "'{' to open subgraph")
+        self.stmt_list()
+        self.expect("}", "'}' to close subgraph")
+
+    def node_id(self):
+        self.nodes.add(self.expect("id", "a node id")[1].strip('"'))
+        for _ in range(2):
+            if self.peek()[0] != ":":
+                break
+            self.take()
+            self.expect("id", "a port after ':'")
+
+    def edge_rhs(self):
+        while self.peek()[0] in ("->", "--"):
+            op = self.take()
+            if op[1] == "->" and not self.directed:
+                raise DotSyntaxError(f"line {op[2]}: '->' used in an undirected graph")
+            if op[1] == "--" and self.directed:
+                raise DotSyntaxError(f"line {op[2]}: '--' used in a digraph")
+            if self.is_keyword("subgraph") or self.peek()[0] == "{":
+                self.subgraph()
+            else:
+                self.node_id()
+            self.edges += 1
+
+    def attr_list(self, required: bool = False):
+        if required and self.peek()[0] != "[":
+            self.expect("[", "an attribute list")
+        while self.peek()[0] == "[":
+            self.take()
+            while self.peek()[0] != "]":
+                key = self.expect("id", "an attribute name")
+                if self.peek()[0] == "=":
+                    self.take()
+                    value = self.peek()
+                    if value[0] != "id":
+                        raise DotSyntaxError(f"line {value[2]}: missing value for attribute {key[1]!r}")
+                    self.take()
+                    if self.peek()[0] == "id" and self.peek(1)[0] not in ("=",):
+                        raise DotSyntaxError(
+                            f"line {value[2]}: unquoted value with spaces for attribute {key[1]!r}"
+                        )
+                if self.peek()[0] in (",", ";"):
+                    self.take()
+                elif self.peek()[0] == "eof":
+                    raise DotSyntaxError(f"line {self.peek()[2]}: unterminated attribute list")
+            self.take()
+
+
+def _check(src: str) -> tuple:
+    """Return (syntax errors, warnings about valid but suspicious DOT)."""
+    parser = _Parser([])
+    try:
+        parser = _Parser(_tokenize(src or ""))
+        parser.parse()
+        return [], parser.warnings
+    except DotSyntaxError as e:
+        return [str(e)], parser.warnings
+
+
+def validate_dot(src: str) -> list:
+    """Return a list of syntax errors (empty when `src` is valid DOT)."""
+    return _check(src)[0]
+
+
+# ======================================================
+# 🔹 Repairs
+# ======================================================
+_HEADER_RE = re.compile(r"(?:strict\s+)?(?:di)?graph\b[^{\n]*\{", re.IGNORECASE)
+_FENCE_RE = re.compile(r"^\s*```[\w-]*\s*$", re.MULTILINE)
+_UNQUOTED_ATTR_RE = re.compile(r'(\b\w+\s*=\s*)(?!["<])([^,;\[\]"=\n]*?\s[^,;\[\]"=\n]*?)(\s*)(?=[,;\]])')
+_SIMPLE_ID_RE = re.compile(r"^[A-Za-z_][\w]*$|^-?(?:\.\d+|\d+(?:\.\d*)?)$")
+
+
+def _outside_strings(src: str):
+    """Yield (index, char) for characters not inside double-quoted strings."""
+    in_str, escaped = False, False
+    for i, ch in enumerate(src):
+        if in_str:
+            if escaped:
+                escaped = False
+            elif ch == "\\":
+                escaped = True
+            elif ch == '"':
+                in_str = False
+            continue
+        if ch == '"':
+            in_str = True
+            continue
+        yield i, ch
+
+
+def strip_fences_and_prose(text: str) -> str:
+    """Drop markdown fences and any prose before the header / after the closing brace."""
+    text = _FENCE_RE.sub("", text or "").replace("```", "")
+    header = _HEADER_RE.search(text)
+    if not header:
+        return text.strip()
+    text = text[header.start():]
+
+    depth = 0
+    for i, ch in _outside_strings(text):
+        if ch == "{":
+            depth += 1
+        elif ch == "}":
+            depth -= 1
+            if depth == 0:
+                return text[:i + 1].strip()
+    return text.strip()
+
+
+def _wrap_headerless(src: str) -> str:
+    if _HEADER_RE.search(src) or not re.search(r"->|--", src):
+        return src
+    return "digraph G {\n" + src.strip() + "\n}"
+
+
+def _close_quotes(src: str) -> str:
+    """Close a dangling quote before the attribute delimiter that follows it."""
+    lines = []
+    for line in src.split("\n"):
+        quotes = [m.start() for m in re.finditer(r'(?<!\\)"', line)]
+        if len(quotes) % 2:
+            delim = re.search(r"[\],;]", line[quotes[-1] + 1:])
+            at = quotes[-1] + 1 + delim.start() if delim else len(line.rstrip())
+            line = line[:at] + '"' + line[at:]
+        lines.append(line)
+    return "\n".join(lines)
+
+
+def _quote_attr_values(src: str) -> str:
+    return _UNQUOTED_ATTR_RE.sub(lambda m: f'{m.group(1)}"{m.group(2).strip()}"{m.group(3)}', src)
+
+
+def _quote_node_ids(src: str) -> str:
+    """Quote multi-word node ids in node and edge statements (`User Login -> Auth Service`)."""
+    fixed = []
+    for line in src.split("\n"):
+        stripped = line.strip()
+        first_word = stripped.split(" ", 1)[0].lower() if stripped else ""
+        if not stripped or first_word in KEYWORDS or stripped.startswith(("//", "#", "/*")):
+            fixed.append(line)
+            continue
+        head, sep, tail = stripped.partition("[")
+        if "=" in head or "{" in head or "}" in head or not (sep or re.search(r"->|--", head)):
+            fixed.append(line)
+            continue
+        trailing_semicolon = head.rstrip().endswith(";") and not sep
+        head = head.rstrip().rstrip(";")
+        parts = re.split(r"(->|--)", head)
+        out = []
+        for part in parts:
+            token = part.strip()
+            if token in ("->", "--") or not token or token.startswith('"') or _SIMPLE_ID_RE.match(token):
+                out.append(token)
+            else:
+                out.append('"' + token.replace('"', '\\"') + '"')
+        rebuilt = " ".join(out)
+        indent = line[: len(line) - len(line.lstrip())]
+        fixed.append(indent + rebuilt + (" " + sep + tail if sep else "") + (";" if trailing_semicolon else ""))
+    return "\n".join(fixed)
+
+
+def _balance_braces(src: str) -> str:
+    depth, extra = 0, []
+    for i, ch in _outside_strings(src):
+        if ch == "{":
+            depth += 1
+        elif ch == "}":
+            if depth == 0:
+                extra.append(i)
+            else:
+                depth -= 1
+    for i in reversed(extra):
+        src = src[:i] + src[i + 1:]
+    return src.rstrip() + "\n" + "}" * depth if depth else src
+
+
+def _fix_edge_ops(src: str) -> str:
+    header = _HEADER_RE.search(src)
+    if not header:
+        return src
+    directed = "digraph" in header.group().lower()
+    chars = list(src)
+    for i, ch in _outside_strings(src):
+        if ch == "-" and i + 1 < len(src) and src[i + 1] in "->" and (i == 0 or src[i - 1] != "-"):
+            if directed and src[i + 1] == "-":
+                chars[i + 1] = ">"
+    fixed = "".join(chars)
+    if not directed and "->" in fixed:
+        fixed = fixed[:header.start()] + re.sub(r"\bgraph\b", "digraph", header.group(), count=1,
+                                               flags=re.IGNORECASE) + fixed[header.end():]
+    return fixed
+
+
+REPAIRS = (
+    ("wrap_headerless", _wrap_headerless),
+    ("close_quotes", _close_quotes),
+    ("quote_attr_values", _quote_attr_values),
+    ("quote_node_ids", _quote_node_ids),
+    ("balance_braces", _balance_braces),
+    ("fix_edge_ops", _fix_edge_ops),
+)
+
+
+class RepairResult:
+    def __init__(self, dot: str, errors: list, fixes: list):
+        self.dot = dot
+        self.errors = errors
+        self.fixes = fixes
+
+    @property
+    def valid(self) -> bool:
+        return not self.errors
+
+
+def repair_dot(text: str) -> RepairResult:
+    """
+    Clean LLM output into DOT and repair common defects. Repairs are applied
+    in order, cumulatively, until the source validates without warnings (e.g.
+    unquoted multi-word ids in edges); `errors` lists what remains when repair
+    fails. Source that is only suspicious stays valid if no repair helps.
+    """
+    dot = strip_fences_and_prose(text)
+    fixes = ["strip_fences_and_prose"] if dot != (text or "").strip() else []
+    errors, warnings = _check(dot)
+    if not errors and not warnings:
+        return RepairResult(dot, [], fixes)
+
+    original, original_fixes = dot, list(fixes)
+    for name, fix in REPAIRS:
+        candidate = fix(dot)
+        if candidate == dot:
+            continue
+        dot = candidate
+        fixes.append(name)
+        errors, warnings = _check(dot)
+        if not errors and not warnings:
+            break
+    if errors and not validate_dot(original):
+        return RepairResult(original, [], original_fixes)
+    return RepairResult(dot, errors, fixes)
+
+
+# ======================================================
+# 🔹 Repair vs Re-prompt Tracking
+# ======================================================
+class RepairStats:
+    """Counts outcomes per source (flow, mindmap) to track repair-vs-reprompt rates."""
+
+    OUTCOMES = ("valid", "repaired", "reprompted", "failed")
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = {}
+
+    def record(self, source: str, outcome: str):
+        with self._lock:
+            counts = self._counts.setdefault(source, dict.fromkeys(self.OUTCOMES, 0))
+            counts[outcome] += 1
+        logger.info(f"[DotRepair] {source}: {outcome}")
+
+    def summary(self) -> dict:
+        with self._lock:
+            result = {}
+            for source, counts in self._counts.items():
+                total = sum(counts.values()) or 1
+                result[source] = {
+                    **counts,
+                    "total": sum(counts.values()),
+                    "repair_rate": round(counts["repaired"] / total, 3),
+                    "reprompt_rate": round(counts["reprompted"] / total, 3),
+                }
+            return result
+
+
+repair_stats = RepairStats()
@@ -0,0 +1,119 @@
+"""
+core/flow_template.py
+Deterministic flow graph built straight from the requirement agent's
+`parsed_json` (actors → modules → requirements), no LLM call involved.
+"""
+
+import re
+from core.graph_ir import GraphIR
+
+# Words ignored when matching requirements to modules
+_STOPWORDS = {
+    "the", "a", "an", "and", "or", "of", "to", "for", "in", "on", "with", "by", "from",
+    "system", "shall", "should", "must", "will", "be", "is", "are", "can", "able", "allow",
+    "allows", "users", "user", "module", "management", "service", "data", "all", "each",
+}
+
+_MAX_LABEL = 48
+
+
+def _words(text: str) -> set:
+    return {w for w in re.findall(r"[a-z0-9]+", text.lower()) if len(w) > 2 and w not in _STOPWORDS}
+
+
+def _short(text: str, limit: int = _MAX_LABEL) -> str:
+    text = " ".join(str(text).split())
+    return text if len(text) <= limit else text[: limit - 1].rstrip() + "…"
+
+
+def module_name(entry) -> str:
+    """'Module 1 – Attendance: marks presence' → 'Attendance'."""
+    if isinstance(entry, dict):
+        entry = entry.get("name") or entry.get("title") or next(iter(entry.values()), "")
+    text = re.sub(r"^\s*module\s*\d+\s*[–—:-]\s*", "", str(entry), flags=re.IGNORECASE)
+    text = re.sub(r"^\s*name\s*:\s*", "", text, flags=re.IGNORECASE)
+    return re.split(r"\s+[–—-]\s+|:\s", text, maxsplit=1)[0].strip() or str(entry).strip()
+
+
+def requirement_id(text: str, index: int, prefix: str = "FR") -> str:
+    match = re.match(rf"\s*({prefix}\d+)\b", text, flags=re.IGNORECASE)
+    return match.group(1).upper() if match else f"{prefix}{index}"
+
+
+def assign_requirements(modules: list, requirements: list) -> dict:
+    """
+    Assign each requirement to the module sharing the most keywords with it.
+    Requirements matching no module are grouped under "General".
+
+    Returns:
+        dict: module name → list of (req_id, text), in module order.
+    """
+    names = [module_name(m) for m in modules]
+    keywords = [_words(f"{name} {m}") for name, m in zip(names, map(str, modules))]
+    assigned = {name: [] for name in names}
+
+    for i, req in enumerate(requirements, start=1):
+        text = str(req)
+        words = _words(text)
+        scores = [len(words & kw) for kw in keywords]
+        best = max(range(len(scores)), key=scores.__getitem__) if scores else None
+        target = names[best] if best is not None and scores[best] > 0 else "General"
+        body = re.sub(r"^\s*FR\d+\s*[:.)–-]?\s*", "", text, flags=re.IGNORECASE)
+        assigned.setdefault(target, []).append((requirement_id(text, i), body))
+    return assigned
+
+
+def build_flow_ir(parsed_json: dict, title: str = None) -> GraphIR:
+    """
+    Lay out actors (left), modules as groups (middle) and their functional
+    requirements (right). Actors link to the modules whose requirements
+    mention them, or to every module when none do.
+
+    Args:
+        parsed_json (dict): `parsed_json` from run_requirement_agent.
+        title (str): Graph label; defaults to the project name.
+    Returns:
+        GraphIR: Graph for the flow and mind map emitters.
+    """
+    actors = [str(a) for a in parsed_json.get("actors", []) if str(a).strip()]
+    modules = [m for m in parsed_json.get("modules", []) if str(m).strip()]
+    requirements = [r for r in parsed_json.get("functional_requirements", []) if str(r).strip()]
+    ir = GraphIR(title=_short(title or parsed_json.get("project_name") or "System Flow", 80))
+
+    actor_ids = [ir.add_node(f"A{i}", _short(actor), "actor") for i, actor in enumerate(actors, start=1)]
+
+    assigned = assign_requirements(modules, requirements)
+    module_ids = {}
+    used = set()
+    for i, (name, reqs) in enumerate(assigned.items(), start=1):
+        mid = module_ids[name] = ir.add_group(f"M{i}", _short(name))
+        ir.add_node(mid, _short(name), "module", group=mid)
+        for n, (req_id, text) in enumerate(reqs, start=1):
+            # An explicit "FR3" and the unnumbered third requirement share an id;
+            # add_node would merge them, so suffix the position on a repeat
+            node_id = f"{mid}_{req_id}"
+            if node_id in used:
+                node_id = f"{node_id}_{n}"
+            used.add(node_id)
+            node = ir.add_node(node_id, f"{req_id}: {_short(text)}", "requirement", group=mid)
+            ir.add_edge(mid, node)
+
+    for actor, aid in zip(actors, actor_ids):
+        actor_words = _words(actor)
+        targets = [
+            name for name, reqs in assigned.items()
+            if actor_words and any(actor_words & _words(text) for _, text in reqs)
+        ] or list(assigned)
+        for name in targets:
+            ir.add_edge(aid, module_ids[name])
+    return ir
+
+
+def build_flow_dot(parsed_json: dict, title: str = None) -> str:
+    """Graphviz DOT of the template flow (see build_flow_ir)."""
+    return build_flow_ir(parsed_json, title).to_dot("flow")
+
+
+def has_flow_inputs(parsed_json: dict) -> bool:
+    """True when parsed_json carries enough structure for the template."""
+    return bool(parsed_json) and bool(parsed_json.get("modules") or parsed_json.get("functional_requirements"))
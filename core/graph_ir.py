@@ -0,0 +1,418 @@
+"""
+core/graph_ir.py
+Structured graph intermediate representation shared by the flow and mind map
+agents. One LLM call (cached by input hash, coalesced across concurrent
+callers) produces typed nodes, edges and groups; DOT, Mermaid and SVG for both
+views are then emitted locally.
+"""
+
+import re
+import json
+import hashlib
+import threading
+from pathlib import Path
+from collections import OrderedDict
+from concurrent.futures import Future
+from core.cancellation import OperationCancelled, is_cancelled, wait_future
+from core.config import load_settings
+from core.logger import init_logger
+from core.prompts_loader import load_prompt
+from core.storage import atomic_write_bytes
+from core.tracing import span
+
+logger = init_logger()
+settings = load_settings()
+
+KINDS = ("core", "actor", "module", "function", "requirement", "datastore", "api")
+VIEWS = ("flow", "mindmap")
+
+# Graphviz node styles per kind (flow view)
+DOT_STYLES = {
+    "core": 'shape=doublecircle, style=filled, fillcolor=gold',
+    "actor": 'shape=ellipse, style=filled, fillcolor=lightgoldenrod',
+    "module": 'shape=box, style="rounded,filled", fillcolor=lightblue',
+    "function": 'shape=box, style=filled, fillcolor=white',
+    "requirement": 'shape=note, style=filled, fillcolor=white, fontsize=10',
+    "datastore": 'shape=cylinder, style=filled, fillcolor=lightgreen',
+    "api": 'shape=component, style=filled, fillcolor=lightpink',
+}
+
+# Mermaid flowchart shapes per kind: (open, close)
+MERMAID_SHAPES = {
+    "core": ("((", "))"),
+    "actor": ("([", "])"),
+    "module": ("[", "]"),
+    "function": ("(", ")"),
+    "requirement": (">", "]"),
+    "datastore": ("[(", ")]"),
+    "api": ("{{", "}}"),
+}
+
+# Mind map branch colours, cycled per module
+MINDMAP_PALETTE = ("#a6cee3", "#b2df8a", "#fdbf6f", "#cab2d6", "#fb9a99", "#ffff99", "#8dd3c7", "#bebada")
+
+CLUSTER_STYLE = 'style="rounded,filled"; color=lightgrey; fillcolor="#f5f8ff";'
+
+
+def _safe_id(value, fallback: str) -> str:
+    ident = re.sub(r"\W+", "_", str(value or "")).strip("_")
+    if not ident:
+        ident = fallback
+    return f"n_{ident}" if ident[0].isdigit() else ident
+
+
+def _dot_str(text: str) -> str:
+    return '"' + str(text).replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+
+def _mermaid_str(text: str) -> str:
+    return '"' + " ".join(str(text).split()).replace('"', "#quot;") + '"'
+
+
+def _mindmap_text(text: str) -> str:
+    # Mermaid mind map nodes take no quoting; drop characters that open shapes
+    return re.sub(r"[()\[\]{}]", "", " ".join(str(text).split())) or "-"
+
+
+# ======================================================
+# 🔹 Graph IR
+# ======================================================
+class GraphIR:
+    """
+    Typed nodes, edges and groups.
+
+    - node: {"id", "label", "kind", "group"}  (kind ∈ KINDS, group id or None)
+    - edge: {"source", "target", "label"}
+    - group: {"id", "label"}  (one per module; rendered as clusters/branches)
+    """
+
+    def __init__(self, title: str = "System", nodes: list = None, edges: list = None, groups: list = None):
+        self.title = title or "System"
+        self.nodes = list(nodes or [])
+        self.edges = list(edges or [])
+        self.groups = list(groups or [])
+
+    # ---------- Construction ----------
+    def add_group(self, group_id: str, label: str) -> str:
+        self.groups.append({"id": group_id, "label": label})
+        return group_id
+
+    def add_node(self, node_id: str, label: str, kind: str, group: str = None) -> str:
+        self.nodes.append({"id": node_id, "label": label, "kind": kind, "group": group})
+        return node_id
+
+    def add_edge(self, source: str, target: str, label: str = ""):
+        self.edges.append({"source": source, "target": target, "label": label})
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "GraphIR":
+        """
+        Build from (LLM) JSON, normalising ids and kinds. Duplicate nodes,
+        unknown groups and dangling edges are dropped rather than rejected.
+        """
+        if not isinstance(data, dict):
+            raise ValueError("Graph IR must be a JSON object")
+
+        ir = cls(title=str(data.get("title") or "System"))
+        group_ids = {}
+        for i, group in enumerate(data.get("groups") or [], start=1):
+            if not isinstance(group, dict):
+                continue
+            gid = _safe_id(group.get("id") or group.get("label"), f"g{i}")
+            if gid not in group_ids.values():
+                group_ids[str(group.get("id"))] = gid
+                ir.add_group(gid, str(group.get("label") or group.get("id") or gid))
+
+        node_ids = {}
+        for i, node in enumerate(data.get("nodes") or [], start=1):
+            if not isinstance(node, dict):
+                continue
+            nid = _safe_id(node.get("id") or node.get("label"), f"n{i}")
+            if nid in node_ids.values():
+                continue
+            node_ids[str(node.get("id"))] = nid
+            kind = str(node.get("kind") or "function").lower()
+            ir.add_node(
+                nid,
+                str(node.get("label") or node.get("id") or nid),
+                kind if kind in KINDS else "function",
+                group_ids.get(str(node.get("group"))) if node.get("group") else None,
+            )
+
+        for edge in data.get("edges") or []:
+            if not isinstance(edge, dict):
+                continue
+            source = node_ids.get(str(edge.get("source")))
+            target = node_ids.get(str(edge.get("target")))
+            if source and target:
+                ir.add_edge(source, target, str(edge.get("label") or ""))
+
+        if not ir.nodes:
+            raise ValueError("Graph IR has no nodes")
+        return ir
+
+    def to_dict(self) -> dict:
+        return {"title": self.title, "groups": self.groups, "nodes": self.nodes, "edges": self.edges}
+
+    # ---------- Queries ----------
+    def nodes_in(self, group_id: str) -> list:
+        return [n for n in self.nodes if n["group"] == group_id]
+
+    def group_head(self, group_id: str):
+        """The module node of a group, if any."""
+        return next((n for n in self.nodes_in(group_id) if n["kind"] == "module"), None)
+
+    # ---------- Emitters ----------
+    def to_dot(self, view: str = "flow") -> str:
+        if view == "mindmap":
+            return self._mindmap_dot()
+        if view != "flow":
+            raise ValueError(f"Unknown view: {view}")
+
+        lines = [
+            "digraph G {",
+            "  rankdir=LR;",
+            "  fontsize=12;",
+            '  labelloc="t";',
+            f"  label={_dot_str(self.title)};",
+            "  node [fontname=Helvetica];",
+            "",
+        ]
+        for n in self.nodes:
+            if n["group"] is None:
+                lines.append(f'  {_dot_str(n["id"])} [{DOT_STYLES[n["kind"]]}, label={_dot_str(n["label"])}];')
+
+        for g in self.groups:
+            members = self.nodes_in(g["id"])
+            if not members:
+                continue
+            lines += [f'  subgraph {_dot_str("cluster_" + g["id"])} {{', f"    label={_dot_str(g['label'])};", f"    {CLUSTER_STYLE}"]
+            for n in members:
+                lines.append(f'    {_dot_str(n["id"])} [{DOT_STYLES[n["kind"]]}, label={_dot_str(n["label"])}];')
+            lines.append("  }")
+
+        lines.append("")
+        for e in self.edges:
+            attrs = f" [label={_dot_str(e['label'])}]" if e["label"] else ""
+            lines.append(f'  {_dot_str(e["source"])} -> {_dot_str(e["target"])}{attrs};')
+        lines.append("}")
+        return "\n".join(lines)
+
+    def _mindmap_branches(self):
+        """Yield (branch label, children) from the root: modules, then actors and data/integrations."""
+        for g in self.groups:
+            head = self.group_head(g["id"])
+            children = [n for n in self.nodes_in(g["id"]) if n is not head]
+            if head or children:
+                yield (head["label"] if head else g["label"]), children
+        ungrouped_modules = [n for n in self.nodes if n["group"] is None and n["kind"] == "module"]
+        for n in ungrouped_modules:
+            yield n["label"], []
+        actors = [n for n in self.nodes if n["kind"] == "actor"]
+        if actors:
+            yield "Actors", actors
+        externals = [n for n in self.nodes if n["kind"] in ("datastore", "api")]
+        if externals:
+            yield "Data & Integrations", externals
+
+    def _mindmap_dot(self) -> str:
+        lines = [
+            "digraph MindMap {",
+            "  rankdir=LR;",
+            "  node [fontname=Helvetica, style=filled];",
+            f"  root [shape=ellipse, fillcolor=gold, fontsize=14, label={_dot_str(self.title)}];",
+        ]
+        for b, (label, children) in enumerate(self._mindmap_branches(), start=1):
+            color = MINDMAP_PALETTE[(b - 1) % len(MINDMAP_PALETTE)]
+            lines.append(f"  b{b} [shape=box, style=\"rounded,filled\", fillcolor={_dot_str(color)}, label={_dot_str(label)}];")
+            lines.append(f"  root -> b{b};")
+            for c, child in enumerate(children, start=1):
+                lines.append(f"  b{b}_{c} [shape=box, fillcolor=white, color={_dot_str(color)}, label={_dot_str(child['label'])}];")
+                lines.append(f"  b{b} -> b{b}_{c};")
+        lines.append("}")
+        return "\n".join(lines)
+
+    def to_mermaid(self, view: str = "flow") -> str:
+        if view == "mindmap":
+            lines = ["mindmap", f"  root(({_mindmap_text(self.title)}))"]
+            for label, children in self._mindmap_branches():
+                lines.append(f"    {_mindmap_text(label)}")
+                lines += [f"      {_mindmap_text(child['label'])}" for child in children]
+            return "\n".join(lines)
+        if view != "flow":
+            raise ValueError(f"Unknown view: {view}")
+
+        def node(n):
+            open_, close = MERMAID_SHAPES[n["kind"]]
+            return f"{n['id']}{open_}{_mermaid_str(n['label'])}{close}"
+
+        lines = ["flowchart LR"]
+        lines += [f"  {node(n)}" for n in self.nodes if n["group"] is None]
+        for g in self.groups:
+            members = self.nodes_in(g["id"])
+            if members:
+                lines.append(f"  subgraph sg_{g['id']}[{_mermaid_str(g['label'])}]")
+                lines += [f"    {node(n)}" for n in members]
+                lines.append("  end")
+        for e in self.edges:
+            arrow = f"-->|{_mermaid_str(e['label'])}|" if e["label"] else "-->"
+            lines.append(f"  {e['source']} {arrow} {e['target']}")
+        return "\n".join(lines)
+
+    def to_svg(self, view: str = "flow") -> bytes:
+        """Render the view through the shared Graphviz renderer."""
+        from core.diagram_render import render_dot
+        return render_dot(self.to_dot(view), fmt="svg")
+
+
+# ======================================================
+# 🔹 Cached, coalesced generation
+# ======================================================
+def source_text(requirements) -> str:
+    """Canonical requirement text used for the prompt and the cache key."""
+    if isinstance(requirements, dict):
+        text = requirements.get("readable_text") or ""
+        if not text.strip() and requirements.get("parsed_json"):
+            text = json.dumps(requirements["parsed_json"], indent=2, sort_keys=True)
+        return text.strip()
+    return str(requirements or "").strip()
+
+
+def _extract_json(text: str) -> dict:
+    start, end = text.find("{"), text.rfind("}")
+    if start < 0 or end <= start:
+        raise ValueError("No JSON object in model output")
+    return json.loads(text[start:end + 1])
+
+
+class GraphIRGenerator:
+    """
+    Produces a GraphIR per requirement text with one LLM call.
+
+    Results are cached in memory (LRU) and on disk under
+    `cache_dir/<sha256>.json`, keyed by the prompt template and input text.
+    Concurrent callers with the same input wait on the in-flight call instead
+    of issuing their own (flow and mind map generated together share one).
+    """
+
+    def __init__(self, cache_dir: str, memory_items: int = 64):
+        self.cache_dir = Path(cache_dir)
+        self.memory_items = memory_items
+        self._memory = OrderedDict()
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "coalesced": 0, "fallbacks": 0}
+
+    def cache_key(self, text: str) -> str:
+        template = load_prompt("graph_ir.md")
+        return hashlib.sha256(f"{template}\0{text}".encode("utf-8")).hexdigest()
+
+    def get(self, requirements) -> GraphIR:
+        text = source_text(requirements)
+        if not text:
+            raise ValueError("No requirement text for graph generation")
+        key = self.cache_key(text)
+
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self.stats["hits"] += 1
+                return GraphIR.from_dict(self._memory[key])
+            inflight = self._inflight.get(key)
+            if inflight is None or inflight.done():
+                inflight = self._inflight[key] = Future()
+                owner = True
+            else:
+                self.stats["coalesced"] += 1
+                owner = False
+
+        if not owner:
+            try:
+                return GraphIR.from_dict(wait_future(inflight, where="graph_ir"))
+            except OperationCancelled:
+                # The owner's run was cancelled, not ours: generate it ourselves
+                if is_cancelled():
+                    raise
+                return self.get(requirements)
+
+        try:
+            data = self._load_disk(key)
+            if data is None:
+                data = self._generate(text, requirements, key)
+            inflight.set_result(data)
+            return GraphIR.from_dict(data)
+        except BaseException as e:
+            inflight.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                if self._inflight.get(key) is inflight:
+                    del self._inflight[key]
+
+    def _load_disk(self, key: str):
+        path = self.cache_dir / f"{key}.json"
+        if not path.exists():
+            return None
+        try:
+            data = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, json.JSONDecodeError) as e:
+            logger.warning(f"[GraphIR] Ignoring unreadable cache entry {path.name}: {e}")
+            return None
+        with self._lock:
+            self.stats["hits"] += 1
+        self._remember(key, data)
+        return data
+
+    def _generate(self, text: str, requirements, key: str) -> dict:
+        from core.llm import get_llm
+
+        with self._lock:
+            self.stats["misses"] += 1
+        try:
+            prompt = load_prompt("graph_ir.md").format(system=load_prompt("system_base.md"), requirements=text)
+            with span("graph_ir.generate", input_chars=len(text)):
+                response = get_llm("graph_ir").invoke(prompt, agent_name="graph_ir")
+                data = GraphIR.from_dict(_extract_json(getattr(response, "content", str(response)))).to_dict()
+        except Exception as e:
+            fallback = self._fallback(requirements)
+            if fallback is None:
+                raise
+            logger.warning(f"[GraphIR] Generation failed ({e}); using template graph from parsed_json.")
+            with self._lock:
+                self.stats["fallbacks"] += 1
+            # Not cached: the next request retries the model
+            return fallback
+
+        self._remember(key, data)
+        try:
+            atomic_write_bytes(self.cache_dir / f"{key}.json", json.dumps(data, indent=2).encode("utf-8"))
+        except OSError as e:
+            logger.warning(f"[GraphIR] Could not write cache: {e}")
+        logger.info(f"[GraphIR] Generated graph: {len(data['nodes'])} nodes, {len(data['edges'])} edges")
+        return data
+
+    @staticmethod
+    def _fallback(requirements):
+        from core.flow_template import build_flow_ir, has_flow_inputs
+
+        parsed_json = requirements.get("parsed_json", {}) if isinstance(requirements, dict) else {}
+        return build_flow_ir(parsed_json).to_dict() if has_flow_inputs(parsed_json) else None
+
+    def _remember(self, key: str, data: dict):
+        with self._lock:
+            self._memory[key] = data
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_items:
+                self._memory.popitem(last=False)
+
+
+graph_ir_generator = GraphIRGenerator(
+    cache_dir=settings.get("diagrams", {}).get(
+        "ir_cache_dir", str(Path(settings.get("paths", {}).get("outputs_dir", "outputs")) / "cache" / "graph_ir")
+    )
+)
+
+
+def generate_graph_ir(requirements) -> GraphIR:
+    """Shared graph IR for `requirements` (dict from run_requirement_agent or text)."""
+    return graph_ir_generator.get(requirements)
@@ -0,0 +1,254 @@
+"""
+core/incremental.py
+Make-like dependency tracking for generated artifacts.
+
+Every requirement item in `parsed_json` (FR/NFR by ID, modules and actors by
+name, assumptions and other fields by content) gets a content hash. An
+artifact (flow diagram, SRS section, JIRA story) is recorded together with
+the hashes of the items it was derived from; on the next run it is reused
+when none of those hashes changed and rebuilt otherwise.
+"""
+
+import re
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from fnmatch import fnmatch
+from pathlib import Path
+from core.config import load_settings
+from core.logger import init_logger
+from core.storage import active_run_id
+from core.flow_template import module_name
+from core.srs_template import numbered
+
+logger = init_logger()
+settings = load_settings()
+
+_incremental_cfg = settings.get("incremental", {})
+ENABLED = bool(_incremental_cfg.get("enabled", True))
+
+# parsed_json keys that are not requirement content
+IGNORED_FIELDS = {"raw_response"}
+LIST_FIELDS = ("functional_requirements", "non_functional_requirements", "modules", "actors", "assumptions")
+
+
+def _digest(value) -> str:
+    if not isinstance(value, str):
+        value = json.dumps(value, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(" ".join(value.split()).lower().encode("utf-8")).hexdigest()[:16]
+
+
+def requirement_items(parsed_json: dict) -> dict:
+    """
+    Item ID → content hash for every requirement item.
+
+    IDs: "project", "FR3", "NFR1", "module:<name>", "actor:<name>",
+    "assumption:<hash>" and "field:<key>" for any other parsed_json key.
+    """
+    parsed_json = parsed_json or {}
+    items = {"project": _digest(parsed_json.get("project_name") or "")}
+    for key, prefix in (("functional_requirements", "FR"), ("non_functional_requirements", "NFR")):
+        entries = [e for e in parsed_json.get(key, []) or [] if str(e).strip()]
+        for req_id, text in numbered(entries, prefix):
+            items[req_id] = _digest(text)
+    for key, prefix in (("modules", "module"), ("actors", "actor")):
+        for entry in parsed_json.get(key, []) or []:
+            if str(entry).strip():
+                items[f"{prefix}:{module_name(entry)}"] = _digest(entry)
+    for entry in parsed_json.get("assumptions", []) or []:
+        if str(entry).strip():
+            digest = _digest(entry)
+            items[f"assumption:{digest[:8]}"] = digest
+    for key, value in parsed_json.items():
+        if key not in LIST_FIELDS and key not in IGNORED_FIELDS and key != "project_name" and value:
+            items[f"field:{key}"] = _digest(value)
+    return items
+
+
+# parsed_json field → an item ID of that field, to match selectors against fields
+_FIELD_ITEMS = {
+    "project_name": "project",
+    "functional_requirements": "FR1",
+    "non_functional_requirements": "NFR1",
+    "modules": "module:x",
+    "actors": "actor:x",
+    "assumptions": "assumption:x",
+}
+
+
+def select_fields(parsed_json: dict, selectors) -> dict:
+    """
+    The parsed_json fields whose items match the selectors, i.e. what a
+    builder declared with those selectors may read.
+    """
+    return {
+        key: value for key, value in (parsed_json or {}).items()
+        if key not in IGNORED_FIELDS
+        and any(fnmatch(_FIELD_ITEMS.get(key, f"field:{key}"), s) for s in selectors)
+    }
+
+
+def scope_for(requirements) -> str:
+    """Dependency scope of a requirement set: the project name as a slug."""
+    parsed = requirements.get("parsed_json", {}) if isinstance(requirements, dict) else {}
+    name = str(parsed.get("project_name") or "project").lower()
+    return re.sub(r"[^a-z0-9]+", "-", name).strip("-") or "project"
+
+
+# ======================================================
+# 🔹 SQLite Dependency Store
+# ======================================================
+class DependencyStore:
+    """
+    Last build of every artifact per scope: the item hashes it was derived
+    from and its output (JSON). Also keeps a per-run report of which
+    artifacts were reused or rebuilt and why.
+    """
+
+    MAX_TRACKED_RUNS = 64
+
+    def __init__(self, db_path: str):
+        self.db_path = Path(db_path)
+        self._lock = threading.Lock()
+        self._schema_ready = False
+        self._reports = {}
+        self.stats = {"reused": 0, "rebuilt": 0, "partial": 0}
+
+    def _connect(self) -> sqlite3.Connection:
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(self.db_path, timeout=10)
+        if not self._schema_ready:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS artifacts (
+                    scope TEXT NOT NULL,
+                    target TEXT NOT NULL,
+                    deps TEXT NOT NULL,
+                    output TEXT NOT NULL,
+                    updated REAL NOT NULL,
+                    PRIMARY KEY (scope, target)
+                )
+                """
+            )
+            conn.commit()
+            self._schema_ready = True
+        return conn
+
+    def get(self, scope: str, target: str):
+        """(deps, output) of the last build, or None."""
+        try:
+            with self._lock:
+                conn = self._connect()
+                try:
+                    row = conn.execute(
+                        "SELECT deps, output FROM artifacts WHERE scope = ? AND target = ?", (scope, target)
+                    ).fetchone()
+                finally:
+                    conn.close()
+        except Exception as e:
+            logger.warning(f"[Incremental] Could not read {scope}/{target}: {e}")
+            return None
+        return (json.loads(row[0]), json.loads(row[1])) if row else None
+
+    def put(self, scope: str, target: str, deps: dict, output):
+        try:
+            with self._lock:
+                conn = self._connect()
+                try:
+                    conn.execute(
+                        "INSERT OR REPLACE INTO artifacts (scope, target, deps, output, updated) VALUES (?, ?, ?, ?, ?)",
+                        (scope, target, json.dumps(deps, sort_keys=True), json.dumps(output, ensure_ascii=False), time.time()),
+                    )
+                    conn.commit()
+                finally:
+                    conn.close()
+        except Exception as e:
+            logger.warning(f"[Incremental] Could not record {scope}/{target}: {e}")
+
+    def note(self, target: str, status: str, changed=(), run_id: str = None):
+        """Add an entry to the run report (status: reused | rebuilt | partial)."""
+        run_id = run_id or active_run_id() or "-"
+        with self._lock:
+            self.stats[status] = self.stats.get(status, 0) + 1
+            report = self._reports.setdefault(run_id, {})
+            report[target] = {"status": status, "changed": sorted(changed)[:20]}
+            while len(self._reports) > self.MAX_TRACKED_RUNS:
+                self._reports.pop(next(iter(self._reports)))
+
+    def run_report(self, run_id: str = None) -> dict:
+        """target → {status, changed} for one run."""
+        with self._lock:
+            return dict(self._reports.get(run_id or active_run_id() or "-", {}))
+
+
+dependency_store = DependencyStore(
+    db_path=_incremental_cfg.get(
+        "db_path", str(Path(settings.get("paths", {}).get("outputs_dir", "outputs")) / "incremental.db")
+    )
+)
+
+
+# ======================================================
+# 🔹 Incremental Build
+# ======================================================
+def changed_items(old: dict, new: dict) -> list:
+    """Item IDs added, removed or modified between two dependency maps."""
+    return sorted(k for k in set(old) | set(new) if old.get(k) != new.get(k))
+
+
+class IncrementalBuild:
+    """
+    Dependency view of one requirement set, used by the agents to decide
+    what to regenerate.
+
+    Args:
+        requirements (dict): Output from requirement_agent.
+        store (DependencyStore): Defaults to the shared store.
+        enabled (bool): Defaults to `incremental.enabled`; when off every
+            artifact is rebuilt (and still recorded).
+    """
+
+    def __init__(self, requirements, store: DependencyStore = None, enabled: bool = None):
+        parsed = requirements.get("parsed_json", {}) if isinstance(requirements, dict) else {}
+        self.store = store or dependency_store
+        self.scope = scope_for(requirements)
+        self.items = requirement_items(parsed)
+        # Nothing parsed beyond the name: no items to track, always rebuild
+        self.enabled = (ENABLED if enabled is None else enabled) and len(self.items) > 1
+
+    def deps(self, selectors, extra: dict = None) -> dict:
+        """Items matching any glob selector ("FR*", "module:*", "*"), plus pseudo-inputs."""
+        deps = {k: v for k, v in self.items.items() if any(fnmatch(k, s) for s in selectors)}
+        for key, value in (extra or {}).items():
+            deps[f"input:{key}"] = _digest(value)
+        return deps
+
+    def previous(self, target: str):
+        """(deps, output) of the last build of `target`, or None."""
+        return self.store.get(self.scope, target) if self.enabled else None
+
+    def record(self, target: str, deps: dict, output):
+        self.store.put(self.scope, target, deps, output)
+
+    def build(self, target: str, selectors, builder, extra: dict = None):
+        """
+        Return the recorded output of `target` if its inputs are unchanged,
+        otherwise call `builder()` and record the result.
+        """
+        deps = self.deps(selectors, extra)
+        last = self.previous(target)
+        if last is not None and last[0] == deps:
+            logger.info(f"[Incremental] {target}: inputs unchanged, reused.")
+            self.store.note(target, "reused")
+            return last[1]
+
+        changed = changed_items(last[0], deps) if last else ["(new)"]
+        logger.info(f"[Incremental] {target}: rebuilding ({', '.join(changed[:5])}).")
+        output = builder()
+        if output:
+            self.record(target, deps, output)
+        self.store.note(target, "rebuilt", changed)
+        return output
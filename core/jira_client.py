@@ -0,0 +1,417 @@
+"""
+core/jira_client.py
+Pooled JIRA REST client shared by the posting agent.
+
+One keep-alive `requests.Session` per credential set (connection pool sized
+by `jira.pool_size`), so stories no longer pay TCP/TLS setup per request, and
+issue creation through the bulk endpoint (`/rest/api/3/issue/bulk`) with
+per-item results mapped back to the submitted order. Attachments are
+uploaded as streamed multipart bodies, read from disk in chunks.
+"""
+
+import os
+import time
+import uuid
+import hashlib
+import mimetypes
+import threading
+import requests
+from pathlib import Path
+from datetime import datetime
+from email.utils import parsedate_to_datetime
+from requests.adapters import HTTPAdapter
+from core.config import load_settings
+from core.logger import init_logger
+
+logger = init_logger()
+settings = load_settings()
+
+_jira_cfg = settings.get("jira", {})
+# Atlassian accepts at most 50 issues per bulk request
+MAX_BULK = 50
+
+
+class JiraError(RuntimeError):
+    """A JIRA request failed as a whole (network error or unexpected status)."""
+
+    def __init__(self, message: str, status_code: int = None, response=None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.response = response
+        self.retry_after = retry_after_s(response) if response is not None else None
+
+
+# Statuses worth retrying: throttled or temporarily unavailable
+RETRYABLE = {429, 502, 503, 504}
+
+# Fields an edit (PUT /issue/{key}) may set; project and issue type are fixed at creation
+EDITABLE_FIELDS = ("summary", "description", "labels")
+
+
+def retry_after_s(resp):
+    """
+    Seconds to wait before retrying, from `Retry-After` (seconds or HTTP
+    date) or `X-RateLimit-Reset` (ISO timestamp); None when absent.
+    """
+    value = resp.headers.get("Retry-After")
+    if value:
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            try:
+                return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+            except (TypeError, ValueError):
+                pass
+    reset = resp.headers.get("X-RateLimit-Reset")
+    if reset:
+        try:
+            return max(0.0, datetime.fromisoformat(reset.replace("Z", "+00:00")).timestamp() - time.time())
+        except ValueError:
+            pass
+    return None
+
+
+def near_limit(resp) -> bool:
+    """True when rate-limit headers say the quota is almost spent."""
+    if str(resp.headers.get("X-RateLimit-NearLimit", "")).lower() == "true":
+        return True
+    try:
+        limit = float(resp.headers["X-RateLimit-Limit"])
+        remaining = float(resp.headers["X-RateLimit-Remaining"])
+    except (KeyError, ValueError):
+        return False
+    return limit > 0 and remaining / limit < 0.1
+
+
+# ======================================================
+# 🔹 Streamed Multipart Body
+# ======================================================
+class MultipartFile:
+    """
+    multipart/form-data body for one file, produced in `chunk_size` pieces
+    so uploads never hold the whole file in memory. `len()` gives requests a
+    Content-Length (no chunked encoding, which JIRA rejects). Single use:
+    build a new one per attempt.
+    """
+
+    def __init__(self, path, filename: str = None, field: str = "file", chunk_size: int = 256 * 1024):
+        self.path = Path(path)
+        self.chunk_size = chunk_size
+        self.boundary = uuid.uuid4().hex
+        filename = (filename or self.path.name).replace('"', "")
+        content_type = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+        self._head = (
+            f"--{self.boundary}\r\n"
+            f'Content-Disposition: form-data; name="{field}"; filename="{filename}"\r\n'
+            f"Content-Type: {content_type}\r\n\r\n"
+        ).encode("utf-8")
+        self._tail = f"\r\n--{self.boundary}--\r\n".encode("utf-8")
+        self._size = self.path.stat().st_size
+
+    @property
+    def content_type(self) -> str:
+        return f"multipart/form-data; boundary={self.boundary}"
+
+    def __len__(self) -> int:
+        return len(self._head) + self._size + len(self._tail)
+
+    def __iter__(self):
+        yield self._head
+        with open(self.path, "rb") as f:
+            while True:
+                chunk = f.read(self.chunk_size)
+                if not chunk:
+                    break
+                yield chunk
+        yield self._tail
+
+
+def file_sha256(path, chunk_size: int = 1024 * 1024) -> str:
+    """Content hash of a file, read in chunks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class JiraClient:
+    """
+    Args:
+        base_url (str): e.g. https://your-domain.atlassian.net
+        email, token (str): Basic-auth credentials (API token).
+        pool_size (int): Keep-alive connections kept open to the host.
+        timeout_s (float): Per-request timeout.
+    """
+
+    def __init__(self, base_url: str, email: str, token: str, pool_size: int = 4, timeout_s: float = 30):
+        self.base_url = base_url.rstrip("/")
+        self.timeout_s = timeout_s
+        self.session = requests.Session()
+        self.session.auth = (email, token)
+        self.session.headers.update({"Accept": "application/json", "Content-Type": "application/json"})
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max(1, pool_size))
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def url(self, path: str) -> str:
+        return f"{self.base_url}/rest/api/3/{path.lstrip('/')}"
+
+    def close(self):
+        self.session.close()
+
+    # ---------- Issues ----------
+    def _request(self, method: str, path: str, on_response=None, **kwargs):
+        hooks = {"response": [lambda resp, *args, **kw: on_response(resp)]} if on_response else None
+        return self.session.request(method, self.url(path), timeout=self.timeout_s, hooks=hooks, **kwargs)
+
+    def _post(self, path: str, payload: dict, on_response=None):
+        return self._request("POST", path, on_response, json=payload)
+
+    def create_issue(self, fields: dict, on_response=None) -> dict:
+        """
+        Create one issue. `on_response(resp)` sees every response (rate-limit headers).
+
+        Returns:
+            dict: {"ok": True, "key", "id"} or {"ok": False, "status_code", "error"}
+                (plus "retry_after" for throttled responses).
+        """
+        try:
+            resp = self._post("issue", {"fields": fields}, on_response)
+        except requests.RequestException as e:
+            raise JiraError(f"Network error creating issue: {e}") from e
+        if resp.status_code in (200, 201):
+            body = resp.json()
+            return {"ok": True, "key": body.get("key", "UNKNOWN_KEY"), "id": body.get("id")}
+        result = {"ok": False, "status_code": resp.status_code, "error": resp.text[:300]}
+        if resp.status_code in RETRYABLE:
+            result["retry_after"] = retry_after_s(resp)
+        return result
+
+    def update_issue(self, key: str, fields: dict, on_response=None) -> dict:
+        """
+        Overwrite the editable fields (EDITABLE_FIELDS) of an existing issue;
+        others such as project and issuetype are dropped, since JIRA rejects
+        them on edit. Result shaped as in `create_issue`.
+        """
+        fields = {name: value for name, value in fields.items() if name in EDITABLE_FIELDS}
+        try:
+            resp = self._request("PUT", f"issue/{key}", on_response, json={"fields": fields})
+        except requests.RequestException as e:
+            raise JiraError(f"Network error updating {key}: {e}") from e
+        if resp.status_code in (200, 204):
+            return {"ok": True, "key": key}
+        result = {"ok": False, "status_code": resp.status_code, "error": resp.text[:300]}
+        if resp.status_code in RETRYABLE:
+            result["retry_after"] = retry_after_s(resp)
+        return result
+
+    def add_attachment(self, key: str, path, filename: str = None, on_response=None) -> dict:
+        """
+        Attach a file to an issue as a streamed multipart upload.
+
+        Returns:
+            dict: {"ok": True, "key", "id"} or {"ok": False, "status_code", "error"}
+                (plus "retry_after" for throttled responses).
+        """
+        body = MultipartFile(path, filename)
+        headers = {"Content-Type": body.content_type, "X-Atlassian-Token": "no-check"}
+        try:
+            resp = self._request("POST", f"issue/{key}/attachments", on_response, data=body, headers=headers)
+        except requests.RequestException as e:
+            raise JiraError(f"Network error attaching {body.path.name} to {key}: {e}") from e
+        except OSError as e:
+            return {"ok": False, "status_code": None, "error": f"Cannot read {path}: {e}"}
+        if resp.status_code in (200, 201):
+            try:
+                attachments = resp.json()
+            except ValueError:
+                attachments = []
+            return {"ok": True, "key": key, "id": attachments[0].get("id") if attachments else None}
+        result = {"ok": False, "status_code": resp.status_code, "error": resp.text[:300]}
+        if resp.status_code in RETRYABLE:
+            result["retry_after"] = retry_after_s(resp)
+        return result
+
+    def find_by_label(self, label: str):
+        """Key of the issue carrying `label`, or None."""
+        try:
+            resp = self._request(
+                "GET", "search/jql", params={"jql": f'labels = "{label}"', "fields": "summary", "maxResults": 1}
+            )
+        except requests.RequestException as e:
+            raise JiraError(f"Network error searching for {label}: {e}") from e
+        if resp.status_code != 200:
+            raise JiraError(f"Search returned {resp.status_code}: {resp.text[:300]}", resp.status_code, resp)
+        issues = resp.json().get("issues", [])
+        return issues[0].get("key") if issues else None
+
+    def bulk_create(self, fields_list: list, on_response=None) -> list:
+        """
+        Create up to MAX_BULK issues in one request.
+
+        Returns:
+            list: One result per input, in order, shaped as in `create_issue`.
+        Raises:
+            JiraError: The request failed as a whole (network error, 404 when
+                the bulk endpoint is unavailable, 429, 5xx, auth errors).
+        """
+        if len(fields_list) > MAX_BULK:
+            raise ValueError(f"At most {MAX_BULK} issues per bulk request")
+        payload = {"issueUpdates": [{"fields": fields} for fields in fields_list]}
+        try:
+            resp = self._post("issue/bulk", payload, on_response)
+        except requests.RequestException as e:
+            raise JiraError(f"Network error in bulk create: {e}") from e
+
+        # 201: some or all created; 400: all (or some) elements invalid
+        if resp.status_code not in (200, 201, 400):
+            raise JiraError(f"Bulk create returned {resp.status_code}: {resp.text[:300]}", resp.status_code, resp)
+        try:
+            body = resp.json()
+        except ValueError:
+            raise JiraError(f"Bulk create returned non-JSON ({resp.status_code})", resp.status_code, resp)
+        if resp.status_code == 400 and "errors" not in body:
+            raise JiraError(f"Bulk create rejected: {resp.text[:300]}", resp.status_code, resp)
+        return self._map_bulk_results(len(fields_list), body)
+
+    @staticmethod
+    def _map_bulk_results(count: int, body: dict) -> list:
+        """Created issues come back in submission order, skipping the failed element numbers."""
+        results = [None] * count
+        for err in body.get("errors", []) or []:
+            index = err.get("failedElementNumber")
+            if index is None or not 0 <= index < count:
+                continue
+            element = err.get("elementErrors", {}) or {}
+            messages = list(element.get("errorMessages", []) or []) + [
+                f"{field}: {msg}" for field, msg in (element.get("errors", {}) or {}).items()
+            ]
+            results[index] = {
+                "ok": False,
+                "status_code": err.get("status", 400),
+                "error": "; ".join(messages)[:300] or "rejected",
+            }
+
+        issues = iter(body.get("issues", []) or [])
+        for index in range(count):
+            if results[index] is None:
+                issue = next(issues, None)
+                results[index] = (
+                    {"ok": True, "key": issue.get("key", "UNKNOWN_KEY"), "id": issue.get("id")}
+                    if issue else {"ok": False, "status_code": None, "error": "missing from bulk response"}
+                )
+        return results
+
+
+# ======================================================
+# 🔹 Adaptive Concurrency
+# ======================================================
+class AdaptiveLimiter:
+    """
+    Adaptive concurrency and pacing for requests to one JIRA site.
+
+    - A throttled response halves the concurrency limit, pauses every worker
+      until its `Retry-After` has elapsed (exponential backoff if absent) and
+      widens the minimum spacing between request starts.
+    - Responses flagged near the limit (`X-RateLimit-NearLimit`, low
+      `X-RateLimit-Remaining`) lower the limit by one and widen the spacing.
+    - Successes shrink the spacing and, every `limit` in a row, raise the
+      limit by one up to `max_limit`.
+    """
+
+    def __init__(self, max_limit: int = 4, min_limit: int = 1, max_backoff_s: float = 60):
+        self.max_limit = max(1, max_limit)
+        self.min_limit = max(1, min(min_limit, self.max_limit))
+        self.max_backoff_s = max_backoff_s
+        self.limit = self.max_limit
+        self.active = 0
+        self.interval_s = 0.0
+        self._next_start = 0.0
+        self._paused_until = 0.0
+        self._streak = 0
+        self._throttles_in_row = 0
+        self._cond = threading.Condition()
+        self.stats = {"throttled": 0, "near_limit": 0, "min_limit_seen": self.max_limit}
+
+    def acquire(self):
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                wait = max(self._paused_until, self._next_start) - now
+                if wait <= 0 and self.active < self.limit:
+                    self.active += 1
+                    self._next_start = now + self.interval_s
+                    return
+                self._cond.wait(timeout=wait if wait > 0 else None)
+
+    def release(self):
+        with self._cond:
+            self.active -= 1
+            self._cond.notify_all()
+
+    def observe(self, resp):
+        """Response hook: react to rate-limit headers on every response."""
+        if resp.status_code in RETRYABLE:
+            self.throttled(retry_after_s(resp))
+        elif near_limit(resp):
+            with self._cond:
+                self.stats["near_limit"] += 1
+                self.interval_s = min(self.max_backoff_s, max(self.interval_s * 1.25, 0.02))
+                self._set_limit(self.limit - 1)
+        else:
+            self.succeeded()
+
+    def throttled(self, retry_after: float = None):
+        with self._cond:
+            self.stats["throttled"] += 1
+            self._throttles_in_row += 1
+            self._streak = 0
+            self._set_limit(self.limit // 2)
+            backoff = retry_after if retry_after is not None else 2 ** self._throttles_in_row
+            backoff = min(backoff, self.max_backoff_s)
+            self.interval_s = min(self.max_backoff_s, max(self.interval_s * 1.5, backoff, 0.02))
+            self._paused_until = max(self._paused_until, time.monotonic() + backoff)
+            self._cond.notify_all()
+
+    def succeeded(self):
+        with self._cond:
+            self._throttles_in_row = 0
+            self._streak += 1
+            self.interval_s *= 0.95
+            if self._streak >= self.limit and self.limit < self.max_limit:
+                self._streak = 0
+                self._set_limit(self.limit + 1)
+
+    def _set_limit(self, value: int):
+        self.limit = max(self.min_limit, min(self.max_limit, value))
+        self.stats["min_limit_seen"] = min(self.stats["min_limit_seen"], self.limit)
+        self._cond.notify_all()
+
+
+# ======================================================
+# 🔹 Shared Clients (one pooled session per credential set)
+# ======================================================
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_jira_client(base_url: str = None, email: str = None, token: str = None):
+    """Shared client for the given (default: environment) credentials, or None if unset."""
+    base_url = base_url or os.getenv("JIRA_BASE_URL")
+    email = email or os.getenv("JIRA_EMAIL")
+    token = token or os.getenv("JIRA_API_TOKEN")
+    if not (base_url and email and token):
+        return None
+    key = (base_url.rstrip("/"), email, token)
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is None:
+            client = JiraClient(
+                base_url, email, token,
+                pool_size=int(_jira_cfg.get("pool_size", 4)),
+                timeout_s=float(_jira_cfg.get("timeout_s", 30)),
+            )
+            _clients[key] = client
+            logger.info(f"[JiraClient] Opened pooled session to {key[0]}")
+        return client
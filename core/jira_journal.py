@@ -0,0 +1,197 @@
+"""
+core/jira_journal.py
+SQLite journal of posted JIRA stories: story fingerprint → issue key.
+
+Makes posting idempotent and resumable: a story already created with the
+same content is skipped without any network call, a changed one is updated
+in place, and a story left "pending" by a crash is looked up in JIRA (by its
+fingerprint label) before it is created again. Uploaded attachments are
+recorded by (issue key, sha256) so identical artifacts are not re-uploaded.
+"""
+
+import re
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from pathlib import Path
+from core.config import load_settings
+from core.logger import init_logger
+
+logger = init_logger()
+settings = load_settings()
+
+# Label added to every posted issue so a lost response can be recovered by search
+LABEL_PREFIX = "sdlc-"
+
+
+def story_fingerprint(story: dict, project_key: str, occurrence: int = 1) -> str:
+    """
+    Identity of a story within a project: the requirement IDs it covers, so a
+    story regenerated with a new summary after its requirement changed is
+    updated rather than duplicated. Stories without IDs fall back to the
+    normalised summary. `occurrence` keeps several stories with the same
+    identity in one batch apart.
+    """
+    ids = sorted({str(i).strip().upper() for i in story.get("requirement_ids") or [] if str(i).strip()})
+    if ids:
+        identity = "ids:" + ",".join(ids) + (f"#{occurrence}" if occurrence > 1 else "")
+    else:
+        summary = str(story.get("summary", "")) + (f" #{occurrence}" if occurrence > 1 else "")
+        identity = " ".join(re.findall(r"[a-z0-9]+", summary.lower()))
+    return hashlib.sha256(f"{project_key}\0{identity}".encode("utf-8")).hexdigest()[:24]
+
+
+def fingerprint_label(fingerprint: str) -> str:
+    return f"{LABEL_PREFIX}{fingerprint[:12]}"
+
+
+def content_hash(fields: dict) -> str:
+    return hashlib.sha256(json.dumps(fields, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()[:24]
+
+
+class PostingJournal:
+    """
+    One row per story fingerprint: status (pending | created | failed),
+    issue key and the content hash last sent. Every state change is
+    committed immediately so the journal survives a crash mid-post.
+    """
+
+    def __init__(self, db_path: str):
+        self.db_path = Path(db_path)
+        self._lock = threading.Lock()
+        self._schema_ready = False
+
+    def _connect(self) -> sqlite3.Connection:
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(self.db_path, timeout=10)
+        if not self._schema_ready:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS posted_stories (
+                    fingerprint TEXT PRIMARY KEY,
+                    project TEXT NOT NULL,
+                    summary TEXT,
+                    issue_key TEXT,
+                    content_hash TEXT,
+                    status TEXT NOT NULL,
+                    error TEXT,
+                    updated REAL NOT NULL
+                )
+                """
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_posted_project ON posted_stories(project)")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS attachments (
+                    issue_key TEXT NOT NULL,
+                    sha256 TEXT NOT NULL,
+                    filename TEXT,
+                    attachment_id TEXT,
+                    updated REAL NOT NULL,
+                    PRIMARY KEY (issue_key, sha256)
+                )
+                """
+            )
+            conn.commit()
+            self._schema_ready = True
+        return conn
+
+    def _execute(self, sql: str, rows: list):
+        with self._lock:
+            conn = self._connect()
+            try:
+                conn.executemany(sql, rows)
+                conn.commit()
+            finally:
+                conn.close()
+
+    def lookup(self, fingerprints: list) -> dict:
+        """fingerprint → {issue_key, content_hash, status} for known stories."""
+        if not fingerprints:
+            return {}
+        found = {}
+        with self._lock:
+            conn = self._connect()
+            try:
+                for start in range(0, len(fingerprints), 500):
+                    batch = fingerprints[start:start + 500]
+                    rows = conn.execute(
+                        f"SELECT fingerprint, issue_key, content_hash, status FROM posted_stories "
+                        f"WHERE fingerprint IN ({', '.join('?' for _ in batch)})",
+                        batch,
+                    ).fetchall()
+                    for fp, key, digest, status in rows:
+                        found[fp] = {"issue_key": key, "content_hash": digest, "status": status}
+            finally:
+                conn.close()
+        return found
+
+    def mark_pending(self, entries: list):
+        """entries: (fingerprint, project, summary) about to be created."""
+        self._execute(
+            "INSERT INTO posted_stories (fingerprint, project, summary, status, updated) VALUES (?, ?, ?, 'pending', ?) "
+            "ON CONFLICT(fingerprint) DO UPDATE SET status = CASE WHEN issue_key IS NULL THEN 'pending' ELSE status END, "
+            "updated = excluded.updated",
+            [(fp, project, summary, time.time()) for fp, project, summary in entries],
+        )
+
+    def mark_created(self, fingerprint: str, project: str, summary: str, issue_key: str, digest: str):
+        self._execute(
+            "INSERT OR REPLACE INTO posted_stories "
+            "(fingerprint, project, summary, issue_key, content_hash, status, error, updated) "
+            "VALUES (?, ?, ?, ?, ?, 'created', NULL, ?)",
+            [(fingerprint, project, summary, issue_key, digest, time.time())],
+        )
+
+    def mark_failed(self, fingerprint: str, error: str):
+        # Keeps a known issue key: a failed update must not orphan the issue
+        self._execute(
+            "UPDATE posted_stories SET status = CASE WHEN issue_key IS NULL THEN 'failed' ELSE 'created' END, "
+            "error = ?, updated = ? WHERE fingerprint = ?",
+            [(str(error)[:300], time.time(), fingerprint)],
+        )
+
+    def attached(self, issue_keys: list) -> set:
+        """(issue_key, sha256) pairs already uploaded to the given issues."""
+        found = set()
+        with self._lock:
+            conn = self._connect()
+            try:
+                for start in range(0, len(issue_keys), 500):
+                    batch = issue_keys[start:start + 500]
+                    found.update(conn.execute(
+                        f"SELECT issue_key, sha256 FROM attachments "
+                        f"WHERE issue_key IN ({', '.join('?' for _ in batch)})",
+                        batch,
+                    ).fetchall())
+            finally:
+                conn.close()
+        return found
+
+    def mark_attached(self, issue_key: str, sha256: str, filename: str, attachment_id: str = None):
+        self._execute(
+            "INSERT OR REPLACE INTO attachments (issue_key, sha256, filename, attachment_id, updated) "
+            "VALUES (?, ?, ?, ?, ?)",
+            [(issue_key, sha256, filename, attachment_id, time.time())],
+        )
+
+    def summary(self, project: str = None) -> dict:
+        """Story counts by status."""
+        sql = "SELECT status, COUNT(*) FROM posted_stories" + (" WHERE project = ?" if project else "") + " GROUP BY status"
+        with self._lock:
+            conn = self._connect()
+            try:
+                return dict(conn.execute(sql, (project,) if project else ()).fetchall())
+            finally:
+                conn.close()
+
+
+_jira_cfg = settings.get("jira", {})
+posting_journal = PostingJournal(
+    db_path=_jira_cfg.get(
+        "journal_path", str(Path(settings.get("paths", {}).get("outputs_dir", "outputs")) / "jira_journal.db")
+    )
+)
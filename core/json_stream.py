@@ -0,0 +1,102 @@
+"""
+core/json_stream.py
+Incremental detection of a JSON object in streamed model output.
+
+Chunks are fed as they arrive; the parser tracks brace depth outside
+strings (with escapes) from the first "{" and parses the object as soon as
+its closing brace arrives, without waiting for the rest of the response.
+Text after the object (e.g. a Markdown report) keeps accumulating.
+"""
+
+import json
+
+
+class IncrementalJSONParser:
+    """
+    Finds the first complete top-level JSON object in a text stream.
+
+    Usage:
+        parser = IncrementalJSONParser()
+        for chunk in stream:
+            if parser.feed(chunk) and not handled:
+                use(parser.value)
+    """
+
+    def __init__(self):
+        self._parts = []
+        self._joined = ""
+        self._length = 0
+        self._pos = 0
+        self._start = None
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self.value = None
+        self.end = None
+
+    @property
+    def complete(self) -> bool:
+        return self.value is not None
+
+    @property
+    def text(self) -> str:
+        # Chunks are joined on read, not on every feed
+        if self._joined is None:
+            self._joined = "".join(self._parts)
+            self._parts = [self._joined]
+        return self._joined
+
+    def remainder(self) -> str:
+        """Text received after the JSON object (all text while it is incomplete)."""
+        return self.text[self.end:] if self.complete else self.text
+
+    def feed(self, chunk: str) -> bool:
+        """Add streamed text; True once the object is complete (and parsed into `value`)."""
+        chunk = chunk or ""
+        if chunk:
+            self._parts.append(chunk)
+            self._length += len(chunk)
+            self._joined = None
+        if self.complete:
+            return True
+        # Scan only the new chunk; positions are offsets into the whole text
+        text, base = chunk, self._length - len(chunk)
+        i = self._pos
+        while i < self._length:
+            ch = text[i - base]
+            if self._start is None:
+                if ch == "{":
+                    self._start, self._depth = i, 1
+            elif self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+            elif ch == '"':
+                self._in_string = True
+            elif ch == "{":
+                self._depth += 1
+            elif ch == "}":
+                self._depth -= 1
+                if self._depth == 0:
+                    if self._close(i + 1):
+                        self._pos = i + 1
+                        return True
+                    # Not valid JSON after all (e.g. braces in prose): rescan after that "{"
+                    text, base = self.text, 0
+                    i, self._start = self._start, None
+            i += 1
+        self._pos = i
+        return False
+
+    def _close(self, end: int) -> bool:
+        try:
+            value = json.loads(self.text[self._start:end])
+        except json.JSONDecodeError:
+            return False
+        if not isinstance(value, dict):
+            return False
+        self.value, self.end = value, end
+        return True
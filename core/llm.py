@@ -1,52 +1,18 @@
 import os
+import time
+import asyncio
+import hashlib
+import threading
 import tiktoken
+from concurrent.futures import Future
 from loguru import logger
 from openai import OpenAI
-from typing import Any, Dict
 from core.config import load_settings
-
-
-# ======================================================
-# 🔹 Token Tracker (used in Streamlit)
-# ======================================================
-class TokenTracker:
-    def __init__(self):
-        self.reset()
-        self.callback = None
-
-    def reset(self):
-        self.total_input_tokens = 0
-        self.total_output_tokens = 0
-        self.total_cost_usd = 0.0
-        self.agents = []
-
-    def log_agent(self, name: str, input_tokens: int, output_tokens: int, cost: float):
-        """Log per-agent token usage and cost."""
-        self.total_input_tokens += input_tokens
-        self.total_output_tokens += output_tokens
-        self.total_cost_usd += cost
-        self.agents.append({
-            "agent": name,
-            "input_tokens": input_tokens,
-            "output_tokens": output_tokens,
-            "cost_usd": round(cost, 6),
-        })
-        if self.callback:
-            self.callback(self.summary())
-
-    def set_callback(self, cb):
-        self.callback = cb
-
-    def summary(self) -> Dict[str, Any]:
-        return {
-            "total_input_tokens": self.total_input_tokens,
-            "total_output_tokens": self.total_output_tokens,
-            "approx_cost_usd": round(self.total_cost_usd, 4),
-            "agents": self.agents,
-        }
-
-
-tracker = TokenTracker()
+# `tracker` resolves to the current run's RunTracker; every call is also
+# persisted to the SQLite usage ledger (see core/usage_ledger.py).
+from core.usage_ledger import tracker
+from core.tracing import span
+from core.cancellation import OperationCancelled, check_cancelled, current_token, is_cancelled, wait_future
 
 
 # ======================================================
@@ -73,11 +39,82 @@ def estimate_cost(model: str, input_tokens: int, output_tokens: int) -> float:
     return (input_tokens * p["in"]) + (output_tokens * p["out"])
 
 
+# ======================================================
+# 🔹 Single-Flight Coalescing
+# ======================================================
+class SingleFlight:
+    """
+    Coalesces concurrent identical calls: the first caller for a key (the
+    leader) runs the call, later callers wait on the leader's Future and get
+    the same result or exception. Threads and asyncio tasks share one
+    registry; the key is released as soon as the call finishes, so nothing
+    is cached beyond the in-flight window.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flights = {}
+        self.stats = {"leaders": 0, "coalesced": 0, "saved_input_tokens": 0, "max_waiters": 0}
+
+    @staticmethod
+    def key(*parts) -> str:
+        return hashlib.sha256("\0".join(str(p) for p in parts).encode("utf-8")).hexdigest()
+
+    def claim(self, key: str) -> tuple:
+        """(future, is_leader). The leader must call `finish`."""
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is not None:
+                flight["waiters"] += 1
+                self.stats["coalesced"] += 1
+                self.stats["max_waiters"] = max(self.stats["max_waiters"], flight["waiters"])
+                return flight["future"], False
+            future = Future()
+            self._flights[key] = {"future": future, "waiters": 0}
+            self.stats["leaders"] += 1
+            return future, True
+
+    def finish(self, key: str, result=None, error: BaseException = None):
+        with self._lock:
+            flight = self._flights.pop(key, None)
+        if flight is None:
+            return
+        if error is not None:
+            flight["future"].set_exception(error)
+        else:
+            flight["future"].set_result(result)
+
+    def note_saved(self, input_tokens: int):
+        with self._lock:
+            self.stats["saved_input_tokens"] += input_tokens
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._flights)
+
+    def summary(self) -> dict:
+        with self._lock:
+            stats = dict(self.stats)
+            stats["in_flight"] = len(self._flights)
+        total = stats["leaders"] + stats["coalesced"]
+        stats["coalesced_ratio"] = round(stats["coalesced"] / total, 3) if total else 0.0
+        return stats
+
+
+# Process-wide: get_llm() builds a new wrapper per call
+llm_flights = SingleFlight()
+
+
+def coalescing_stats() -> dict:
+    """Leaders, coalesced waiters, saved input tokens and calls in flight."""
+    return llm_flights.summary()
+
+
 # ======================================================
 # 🔹 LLM Wrapper
 # ======================================================
 class LLMWrapper:
-    def __init__(self, model_name: str, temperature: float = 0.3, max_tokens: int = 2000):
+    def __init__(self, model_name: str, temperature: float = 0.3, max_tokens: int = 2000, coalesce: bool = True):
         api_key = os.getenv("OPENAI_API_KEY")
         if not api_key:
             raise EnvironmentError("Missing OPENAI_API_KEY in environment or .env")
@@ -85,38 +122,202 @@ class LLMWrapper:
         self.model = model_name
         self.temperature = temperature
         self.max_tokens = max_tokens
+        self.coalesce = coalesce
+
+    def _flight_key(self, prompt: str) -> str:
+        return SingleFlight.key(self.model, self.temperature, self.max_tokens, prompt)
 
     def invoke(self, prompt: str, agent_name: str = "generic") -> str:
-        """Invoke the LLM and return clean text (not ChatCompletion object)."""
+        """
+        Invoke the LLM and return clean text (not ChatCompletion object).
+
+        Concurrent calls with the same model, prompt and parameters share one
+        request (see SingleFlight); waiters are logged with status "coalesced".
+        Inside a cancel_scope the call is abortable (see `_invoke`).
+        """
+        check_cancelled(f"llm:{agent_name}")
+        if not self.coalesce:
+            return self._invoke(prompt, agent_name)
+        key = self._flight_key(prompt)
+        while True:
+            future, leader = llm_flights.claim(key)
+            if leader:
+                break
+            try:
+                return self._wait(future, prompt, agent_name)
+            except OperationCancelled:
+                # The leader's run was cancelled, not ours: take the call over
+                if is_cancelled():
+                    raise
         try:
-            logger.info(f"[LLM] Invoking {self.model} for agent: {agent_name}")
-            input_tokens = num_tokens_from_string(prompt, self.model)
+            result = self._invoke(prompt, agent_name)
+        except BaseException as e:
+            llm_flights.finish(key, error=e)
+            raise
+        llm_flights.finish(key, result)
+        return result
 
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[{"role": "user", "content": prompt}],
-                temperature=self.temperature,
-                max_tokens=self.max_tokens,
-            )
+    async def ainvoke(self, prompt: str, agent_name: str = "generic") -> str:
+        """Async `invoke`: waiters await the in-flight call without holding a thread."""
+        check_cancelled(f"llm:{agent_name}")
+        if not self.coalesce or current_token() is not None:
+            # Cancellable waits block on the token: run the whole call in a thread
+            return await asyncio.to_thread(self.invoke if self.coalesce else self._invoke, prompt, agent_name)
+        key = self._flight_key(prompt)
+        while True:
+            future, leader = llm_flights.claim(key)
+            if leader:
+                break
+            started = time.perf_counter()
+            with span("llm.invoke", model=self.model, agent=agent_name, coalesced=True):
+                try:
+                    return await asyncio.wrap_future(future)
+                except OperationCancelled:
+                    # The leader's run was cancelled, not ours: take the call over
+                    if is_cancelled():
+                        raise
+                finally:
+                    self._log_coalesced(prompt, agent_name, started)
+        try:
+            result = await asyncio.to_thread(self._invoke, prompt, agent_name)
+        except BaseException as e:
+            llm_flights.finish(key, error=e)
+            raise
+        llm_flights.finish(key, result)
+        return result
 
-            # ✅ Extract only text
-            output_text = response.choices[0].message.content.strip()
-            output_tokens = num_tokens_from_string(output_text, self.model)
-            cost = estimate_cost(self.model, input_tokens, output_tokens)
+    def _wait(self, future: Future, prompt: str, agent_name: str) -> str:
+        started = time.perf_counter()
+        with span("llm.invoke", model=self.model, agent=agent_name, coalesced=True):
+            try:
+                logger.debug("[LLM] Coalesced {} request for agent: {}", self.model, agent_name)
+                return wait_future(future, where=f"llm:{agent_name}")
+            finally:
+                self._log_coalesced(prompt, agent_name, started)
 
-            tracker.log_agent(agent_name, input_tokens, output_tokens, cost)
+    def _log_coalesced(self, prompt: str, agent_name: str, started: float):
+        """A shared call costs nothing extra; record it so per-run usage stays complete."""
+        input_tokens = num_tokens_from_string(prompt, self.model)
+        llm_flights.note_saved(input_tokens)
+        tracker.log_agent(
+            agent_name, 0, 0, 0.0, model=self.model,
+            latency_ms=(time.perf_counter() - started) * 1000, cache_hit=True,
+            status="cancelled" if is_cancelled() else "coalesced",
+        )
 
-            logger.info(
-                f"[LLM] {agent_name} complete | Input: {input_tokens:,} | "
-                f"Output: {output_tokens:,} | Cost: ${cost:.6f}"
-            )
+    def _invoke(self, prompt: str, agent_name: str) -> str:
+        if current_token() is not None:
+            # Streamed so the open response can be closed from the cancelling thread
+            return "".join(self.stream(prompt, agent_name)).strip()
+        with span("llm.invoke", model=self.model, agent=agent_name) as sp:
+            try:
+                logger.debug("[LLM] Invoking {} for agent: {}", self.model, agent_name)
+                input_tokens = num_tokens_from_string(prompt, self.model)
+                started = time.perf_counter()
 
-            # ✅ Return plain text
-            return output_text
+                response = self.client.chat.completions.create(
+                    model=self.model,
+                    messages=[{"role": "user", "content": prompt}],
+                    temperature=self.temperature,
+                    max_tokens=self.max_tokens,
+                )
 
-        except Exception as e:
-            logger.exception(f"[LLM] Failed to invoke model: {e}")
-            raise
+                # ✅ Extract only text
+                output_text = response.choices[0].message.content.strip()
+                latency_ms = (time.perf_counter() - started) * 1000
+                output_tokens = num_tokens_from_string(output_text, self.model)
+                cost = estimate_cost(self.model, input_tokens, output_tokens)
+
+                tracker.log_agent(
+                    agent_name, input_tokens, output_tokens, cost,
+                    model=self.model, latency_ms=latency_ms,
+                )
+                if sp:
+                    sp.set_attribute("input_tokens", input_tokens)
+                    sp.set_attribute("output_tokens", output_tokens)
+
+                logger.info(
+                    f"[LLM] {agent_name} complete | Input: {input_tokens:,} | "
+                    f"Output: {output_tokens:,} | Cost: ${cost:.6f}"
+                )
+
+                # ✅ Return plain text
+                return output_text
+
+            except Exception as e:
+                logger.exception(f"[LLM] Failed to invoke model: {e}")
+                raise
+
+    def stream(self, prompt: str, agent_name: str = "generic"):
+        """
+        Stream the completion as text chunks (no coalescing: every caller gets
+        its own stream). Usage is logged once the stream ends or is closed.
+
+        Inside a cancel_scope, cancelling the token closes the HTTP response;
+        the partial output is logged with status "cancelled" and
+        OperationCancelled is raised.
+        """
+        with span("llm.stream", model=self.model, agent=agent_name) as sp:
+            logger.debug("[LLM] Streaming {} for agent: {}", self.model, agent_name)
+            input_tokens = num_tokens_from_string(prompt, self.model)
+            started = time.perf_counter()
+            token = current_token()
+            unregister = None
+            parts = []
+            status = "ok"
+            try:
+                response = self.client.chat.completions.create(
+                    model=self.model,
+                    messages=[{"role": "user", "content": prompt}],
+                    temperature=self.temperature,
+                    max_tokens=self.max_tokens,
+                    stream=True,
+                )
+                if token is not None:
+                    unregister = token.on_cancel(getattr(response, "close", lambda: None))
+                for chunk in response:
+                    if token is not None:
+                        token.raise_if_cancelled(f"llm:{agent_name}")
+                    if not chunk.choices:
+                        continue
+                    text = chunk.choices[0].delta.content or ""
+                    if text:
+                        if not parts and sp:
+                            sp.set_attribute("ttft_ms", round((time.perf_counter() - started) * 1000, 1))
+                        parts.append(text)
+                        yield text
+                if token is not None:
+                    token.raise_if_cancelled(f"llm:{agent_name}")
+            except GeneratorExit:
+                status = "closed"
+                raise
+            except OperationCancelled:
+                status = "cancelled"
+                raise
+            except Exception as e:
+                if token is not None and token.cancelled:
+                    # Closing the response mid-read surfaces as a transport error
+                    status = "cancelled"
+                    raise OperationCancelled(token.reason, f"llm:{agent_name}") from e
+                status = "error"
+                logger.exception(f"[LLM] Failed to stream model: {e}")
+                raise
+            finally:
+                if unregister is not None:
+                    unregister()
+                output_tokens = num_tokens_from_string("".join(parts), self.model)
+                cost = estimate_cost(self.model, input_tokens, output_tokens)
+                tracker.log_agent(
+                    agent_name, input_tokens, output_tokens, cost, model=self.model,
+                    latency_ms=(time.perf_counter() - started) * 1000, status=status,
+                )
+                if sp:
+                    sp.set_attribute("input_tokens", input_tokens)
+                    sp.set_attribute("output_tokens", output_tokens)
+                logger.info(
+                    f"[LLM] {agent_name} stream {status} | Input: {input_tokens:,} | "
+                    f"Output: {output_tokens:,} | Cost: ${cost:.6f}"
+                )
 
 
 # ======================================================
@@ -154,5 +355,8 @@ def get_llm(agent_name: str = "requirement") -> LLMWrapper:
         or int(os.getenv("OPENAI_MAX_TOKENS", 6000))
     )
 
+    # Share identical in-flight requests across threads/tasks (llm.coalesce)
+    coalesce = bool(llm_cfg.get("coalesce", True))
+
     logger.info(f"[LLM] Using model: {model_name} (agent: {agent_name})")
-    return LLMWrapper(model_name, temperature=temperature, max_tokens=max_tokens)
+    return LLMWrapper(model_name, temperature=temperature, max_tokens=max_tokens, coalesce=coalesce)
@@ -1,28 +1,158 @@
 from loguru import logger
 from pathlib import Path
+from contextlib import contextmanager
+from contextvars import ContextVar
+import os
 import sys
+import time
+import threading
+from core.config import load_settings
 
 _INITIALIZED = False
 
+# Run / agent context merged into every record's `extra` (see log_context)
+_log_context: ContextVar = ContextVar("log_context", default={})
+
+LEVEL_NO = {"TRACE": 5, "DEBUG": 10, "INFO": 20, "SUCCESS": 25, "WARNING": 30, "ERROR": 40, "CRITICAL": 50}
+
+
+@contextmanager
+def log_context(**fields):
+    """Bind fields such as run_id / agent to all log records in this context."""
+    token = _log_context.set({**_log_context.get(), **fields})
+    try:
+        yield
+    finally:
+        _log_context.reset(token)
+
+
+def _patch_context(record):
+    ctx = _log_context.get()
+    if ctx:
+        for key, value in ctx.items():
+            record["extra"].setdefault(key, value)
+
+
+class _LogFilter:
+    """
+    Per-module minimum levels plus rate limiting of repetitive messages.
+
+    Each call site (module:function:line) may emit `burst` records per
+    `window_s`; beyond that only every `sample_every`-th record passes and
+    carries a `suppressed` count (records dropped since the last one) in
+    `extra`. The sampling decision is made once per record in the patcher
+    (`sample`), so every sink emits the same records; the filter itself
+    only reads that decision.
+    """
+
+    DROP = "_rate_limited"
+
+    def __init__(self, level: str, module_levels: dict = None, burst: int = 20,
+                 window_s: float = 10.0, sample_every: int = 100):
+        self.default_no = LEVEL_NO.get(level.upper(), 20)
+        # Longest module prefix wins
+        self.module_levels = sorted(
+            ((mod, LEVEL_NO.get(str(lvl).upper(), 20)) for mod, lvl in (module_levels or {}).items()),
+            key=lambda item: len(item[0]),
+            reverse=True,
+        )
+        self.burst = burst
+        self.window_s = window_s
+        self.sample_every = max(1, sample_every)
+        self._sites = {}
+        self._lock = threading.Lock()
+
+    @property
+    def sink_level(self) -> int:
+        # Lowest level any module may emit; loguru drops anything below
+        # this before building a record, keeping disabled debug calls cheap.
+        return min([self.default_no] + [level_no for _, level_no in self.module_levels])
+
+    def min_level(self, name: str) -> int:
+        for mod, level_no in self.module_levels:
+            if name == mod or name.startswith(mod + "."):
+                return level_no
+        return self.default_no
+
+    def sample(self, record):
+        """Patcher hook: count the record against its call site and mark it if dropped."""
+        if record["level"].no < self.min_level(record["name"] or ""):
+            return
+        if record["level"].no >= LEVEL_NO["ERROR"] or self.burst <= 0:
+            return
+
+        site = (record["name"], record["function"], record["line"])
+        now = time.monotonic()
+        with self._lock:
+            window_start, count, dropped = self._sites.get(site, (now, 0, 0))
+            if now - window_start > self.window_s:
+                window_start, count = now, 0
+            count += 1
+            keep = count <= self.burst or (count - self.burst) % self.sample_every == 0
+            if keep and dropped:
+                record["extra"]["suppressed"] = dropped
+                dropped = 0
+            elif not keep:
+                dropped += 1
+            self._sites[site] = (window_start, count, dropped)
+        if not keep:
+            record["extra"][self.DROP] = True
+
+    def __call__(self, record) -> bool:
+        if record["level"].no < self.min_level(record["name"] or ""):
+            return False
+        return not record["extra"].get(self.DROP)
+
+
+def _logging_settings() -> dict:
+    try:
+        return load_settings().get("logging", {}) or {}
+    except Exception:
+        return {}
+
+
 def init_logger(level: str = "INFO", log_dir: str = "outputs/logs"):
     global _INITIALIZED
     if _INITIALIZED:
         return logger
 
+    cfg = _logging_settings()
+    level = os.getenv("LOG_LEVEL", cfg.get("level", level))
+    log_filter = _LogFilter(
+        level,
+        module_levels=cfg.get("module_levels"),
+        burst=int(cfg.get("rate_limit_burst", 20)),
+        window_s=float(cfg.get("rate_limit_window_s", 10)),
+        sample_every=int(cfg.get("sample_every", 100)),
+    )
+    enqueue = bool(cfg.get("enqueue", True))
+
     Path(log_dir).mkdir(parents=True, exist_ok=True)
     logger.remove()
 
-    # file log
+    def _patch(record):
+        _patch_context(record)
+        log_filter.sample(record)
+
+    logger.configure(patcher=_patch)
+
+    # file log — JSON lines written by loguru's background thread
+    json_mode = bool(cfg.get("json", True))
     logger.add(
-        Path(log_dir) / "app.log",
-        rotation="1 week",
-        level=level,
-        backtrace=True,
-        diagnose=True
+        Path(log_dir) / ("app.jsonl" if json_mode else "app.log"),
+        rotation=cfg.get("rotation", "20 MB"),
+        retention=cfg.get("retention", 10),
+        compression=cfg.get("compression", "gz"),
+        serialize=json_mode,
+        enqueue=enqueue,
+        level=log_filter.sink_level,
+        filter=log_filter,
+        backtrace=bool(cfg.get("backtrace", True)),
+        diagnose=bool(cfg.get("diagnose", False)),
     )
 
     # console log
-    logger.add(sys.stdout, level=level)
+    logger.add(sys.stdout, level=log_filter.sink_level, filter=log_filter, enqueue=enqueue, diagnose=False)
 
     _INITIALIZED = True
     return logger
@@ -0,0 +1,208 @@
+"""
+core/pdf_render.py
+Shared PDF rendering service for the SRS (WeasyPrint) and the requirement
+report (reportlab).
+
+Renders run in a warm worker process pool (libraries, CSS and fonts loaded
+once per worker, see core/pdf_worker.py) and are cached in memory and on disk
+keyed by the Markdown hash, so a document is rendered at most once.
+"""
+
+import hashlib
+import threading
+import multiprocessing
+from pathlib import Path
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+from core.cancellation import OperationCancelled, check_cancelled, wait_future
+from core.config import load_settings
+from core.logger import init_logger
+from core.storage import atomic_write_bytes
+from core.tracing import span
+from core import pdf_worker
+
+logger = init_logger()
+settings = load_settings()
+
+ENGINES = tuple(pdf_worker.RENDERERS)
+
+# Engines worth a process hop: WeasyPrint spends seconds on font setup and
+# pins a core per render; reportlab is cheaper than the IPC and runs inline.
+POOLED_ENGINES = ("weasyprint",)
+
+
+class PDFRenderError(RuntimeError):
+    """A PDF could not be rendered (engine error or timeout)."""
+
+
+class PDFRenderer:
+    """
+    - `workers` warm processes render POOLED_ENGINES concurrently; other
+      engines, or `workers=0`, render in-process.
+    - Output is cached in memory (LRU, `memory_items`) and on disk under
+      `cache_dir/<sha256>.pdf`, keyed by engine, stylesheet and Markdown.
+    - The pool is created on first use (or by `warm()`), never at import.
+    """
+
+    def __init__(self, cache_dir: str, workers: int = 2, timeout_s: float = 120, memory_items: int = 32):
+        self.cache_dir = Path(cache_dir)
+        self.workers = workers
+        self.timeout_s = timeout_s
+        self.memory_items = memory_items
+        self._pool = None
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "pool_renders": 0, "inline_renders": 0, "errors": 0}
+
+    @staticmethod
+    def cache_key(markdown_text: str, engine: str) -> str:
+        style = pdf_worker.SRS_CSS if engine == "weasyprint" else ""
+        return hashlib.sha256(f"{engine}\0{style}\0{markdown_text}".encode("utf-8")).hexdigest()
+
+    # ---------- Pool ----------
+    def _get_pool(self):
+        with self._lock:
+            if self._pool is None and self.workers > 0:
+                # spawn: Streamlit and the background writers run threads, which fork would copy unsafely
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=pdf_worker.warm_worker,
+                    initargs=(POOLED_ENGINES,),
+                )
+                logger.info(f"[PDFRender] Started {self.workers} PDF worker process(es)")
+            return self._pool
+
+    def warm(self):
+        """
+        Start the worker processes ahead of the first render (non-blocking,
+        idempotent). Each worker runs its initializer on spawn and then a tiny
+        throwaway render, so Markdown and the first-document layout are warm too.
+        """
+        if self._pool is not None:
+            return
+        pool = self._get_pool()
+        if pool is not None:
+            for _ in range(self.workers):
+                pool.submit(pdf_worker.render, "# warm-up", POOLED_ENGINES[0])
+
+    def shutdown(self, pool=None):
+        """Shut the pool down (only if it is still `pool`, when given); running renders finish in the background."""
+        with self._lock:
+            if pool is not None and self._pool is not pool:
+                return
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    # ---------- Rendering ----------
+    def render(self, markdown_text: str, engine: str = "weasyprint") -> bytes:
+        """Render Markdown to PDF bytes, from cache when possible."""
+        if engine not in ENGINES:
+            raise ValueError(f"Unsupported PDF engine: {engine}")
+
+        key = self.cache_key(markdown_text, engine)
+        cached = self._cached(key)
+        if cached is not None:
+            return cached
+
+        check_cancelled("render.pdf")
+        with self._lock:
+            self.stats["misses"] += 1
+        with span("render.pdf", engine=engine, markdown_chars=len(markdown_text)):
+            data = self._render_uncached(markdown_text, engine)
+
+        self._store(key, data)
+        return data
+
+    def _render_uncached(self, markdown_text: str, engine: str) -> bytes:
+        """
+        Render in the pool (or inline). On cancel or timeout the caller stops
+        waiting, but `future.cancel()` only drops a render that has not started:
+        a running one cannot be interrupted. A cancelled render is left to finish
+        (renders take seconds); a render that timed out is presumed stuck, so the
+        pool is recycled and later renders get fresh workers instead of queueing
+        behind it (the old worker exits once its render returns).
+        """
+        pool = self._get_pool() if engine in POOLED_ENGINES else None
+        if pool is not None:
+            try:
+                future = pool.submit(pdf_worker.render, markdown_text, engine)
+                data = wait_future(future, timeout=self.timeout_s, where="render.pdf")
+                with self._lock:
+                    self.stats["pool_renders"] += 1
+                return data
+            except OperationCancelled:
+                future.cancel()
+                raise
+            except FutureTimeout as e:
+                if not future.cancel():
+                    logger.warning(f"[PDFRender] Render still running after {self.timeout_s}s; recycling the worker pool.")
+                    self.shutdown(pool)
+                with self._lock:
+                    self.stats["errors"] += 1
+                raise PDFRenderError(f"PDF render exceeded {self.timeout_s}s") from e
+            except BrokenProcessPool as e:
+                logger.warning(f"[PDFRender] Worker pool broken ({e}); rendering in-process.")
+                self.shutdown(pool)
+            except Exception as e:
+                with self._lock:
+                    self.stats["errors"] += 1
+                raise PDFRenderError(f"{engine} render failed: {e}") from e
+
+        try:
+            data = pdf_worker.render(markdown_text, engine)
+        except Exception as e:
+            with self._lock:
+                self.stats["errors"] += 1
+            raise PDFRenderError(f"{engine} render failed: {e}") from e
+        with self._lock:
+            self.stats["inline_renders"] += 1
+        return data
+
+    # ---------- Cache ----------
+    def _cached(self, key: str):
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self.stats["hits"] += 1
+                return self._memory[key]
+
+        path = self.cache_dir / f"{key}.pdf"
+        if path.exists():
+            data = path.read_bytes()
+            with self._lock:
+                self.stats["hits"] += 1
+            self._remember(key, data)
+            return data
+        return None
+
+    def _remember(self, key: str, data: bytes):
+        with self._lock:
+            self._memory[key] = data
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_items:
+                self._memory.popitem(last=False)
+
+    def _store(self, key: str, data: bytes):
+        self._remember(key, data)
+        try:
+            atomic_write_bytes(self.cache_dir / f"{key}.pdf", data)
+        except OSError as e:
+            logger.warning(f"[PDFRender] Could not write PDF cache: {e}")
+
+
+_pdf_cfg = settings.get("pdf", {})
+pdf_renderer = PDFRenderer(
+    cache_dir=_pdf_cfg.get(
+        "cache_dir", str(Path(settings.get("paths", {}).get("outputs_dir", "outputs")) / "cache" / "pdf")
+    ),
+    workers=int(_pdf_cfg.get("workers", 2)),
+    timeout_s=float(_pdf_cfg.get("timeout_s", 120)),
+)
+
+
+def render_pdf(markdown_text: str, engine: str = "weasyprint") -> bytes:
+    """Render Markdown to PDF bytes through the shared, cached renderer."""
+    return pdf_renderer.render(markdown_text, engine=engine)
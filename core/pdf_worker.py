@@ -0,0 +1,94 @@
+"""
+core/pdf_worker.py
+Functions executed inside the PDF rendering worker processes.
+
+Kept free of project imports (settings, logger, tracing) so spawned workers
+start quickly; heavy libraries are imported once per process in `warm_worker`.
+"""
+
+import re
+import io
+from xml.sax.saxutils import escape
+
+SRS_CSS = """
+    @page { size: A4; margin: 1in; }
+    body { font-family: Arial, sans-serif; line-height: 1.5; font-size: 12px; }
+    h1, h2, h3, h4 { color: #2A4B8D; }
+    h1 { border-bottom: 2px solid #2A4B8D; padding-bottom: 5px; }
+    table { width: 100%; border-collapse: collapse; margin-top: 10px; }
+    th, td { border: 1px solid #666; padding: 6px; text-align: left; }
+    th { background: #f0f4ff; }
+    code { background-color: #f4f4f4; padding: 2px 4px; border-radius: 4px; }
+"""
+
+MARKDOWN_EXTENSIONS = ["tables", "fenced_code", "toc", "attr_list"]
+
+# Per-process state built once by warm_worker
+_state = {}
+
+
+def warm_worker(engines=("weasyprint",)):
+    """Pool initializer: import libraries, parse CSS and load fonts once."""
+    if "weasyprint" in engines:
+        try:
+            from weasyprint import HTML, CSS
+            from weasyprint.text.fonts import FontConfiguration
+
+            fonts = FontConfiguration()
+            _state["fonts"] = fonts
+            _state["css"] = CSS(string=SRS_CSS, font_config=fonts)
+            # First layout loads fontconfig/pango caches
+            HTML(string="<p>warm-up</p>").write_pdf(stylesheets=[_state["css"]], font_config=fonts)
+        except Exception as e:  # rendering reports the real error later
+            _state["weasyprint_error"] = f"{type(e).__name__}: {e}"
+    if "reportlab" in engines:
+        try:
+            from reportlab.lib.styles import getSampleStyleSheet
+
+            _state["styles"] = getSampleStyleSheet()
+        except Exception as e:
+            _state["reportlab_error"] = f"{type(e).__name__}: {e}"
+    return True
+
+
+def render_weasyprint(markdown_text: str) -> bytes:
+    """Markdown → HTML → PDF with the SRS stylesheet."""
+    import markdown
+    from weasyprint import HTML, CSS
+
+    if "css" not in _state:
+        _state["css"] = CSS(string=SRS_CSS)
+    html_str = markdown.markdown(markdown_text, extensions=MARKDOWN_EXTENSIONS, output_format="html5")
+    return HTML(string=html_str).write_pdf(stylesheets=[_state["css"]], font_config=_state.get("fonts"))
+
+
+def render_reportlab(markdown_text: str) -> bytes:
+    """Plain report layout: headings and paragraphs from Markdown-ish text."""
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.styles import getSampleStyleSheet
+    from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
+
+    styles = _state.get("styles") or getSampleStyleSheet()
+    buffer = io.BytesIO()
+    story = []
+    for block in re.split(r"\n\s*\n", markdown_text.strip()):
+        heading = re.match(r"^(#{1,4})\s+(.*)", block)
+        if heading:
+            level = min(len(heading.group(1)), 3)
+            story.append(Paragraph(escape(heading.group(2)), styles[f"Heading{level}"]))
+        else:
+            text = escape(block).replace("**", "").replace("\n", "<br/>")
+            story.append(Paragraph(text, styles["Normal"]))
+        story.append(Spacer(1, 8))
+    SimpleDocTemplate(buffer, pagesize=A4).build(story or [Paragraph("", styles["Normal"])])
+    return buffer.getvalue()
+
+
+RENDERERS = {
+    "weasyprint": render_weasyprint,
+    "reportlab": render_reportlab,
+}
+
+
+def render(markdown_text: str, engine: str) -> bytes:
+    return RENDERERS[engine](markdown_text)
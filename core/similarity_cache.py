@@ -0,0 +1,266 @@
+"""
+core/similarity_cache.py
+Local near-duplicate index over analysed problem statements.
+
+Statements are normalised (case, whitespace, punctuation), split into word
+3-shingles and summarised by a MinHash signature. Signatures are banded
+(LSH) so a lookup only compares candidates that share a band bucket; each
+candidate is then scored by exact Jaccard similarity of the shingle sets.
+Everything lives in one SQLite file, no external services.
+"""
+
+import re
+import json
+import time
+import random
+import sqlite3
+import hashlib
+import threading
+import unicodedata
+from pathlib import Path
+from core.config import load_settings
+from core.logger import init_logger
+
+logger = init_logger()
+settings = load_settings()
+
+# Mersenne prime for the universal hash family
+_PRIME = (1 << 61) - 1
+
+
+# ======================================================
+# 🔹 Normalisation / Shingles / MinHash
+# ======================================================
+def normalize_statement(text: str) -> str:
+    """Case-, whitespace- and punctuation-insensitive form of a statement."""
+    text = unicodedata.normalize("NFKC", text or "").lower()
+    return " ".join(re.findall(r"[a-z0-9]+(?:['.][a-z0-9]+)*", text))
+
+
+def shingles(normalized: str, k: int = 3) -> set:
+    words = normalized.split()
+    if len(words) <= k:
+        return {" ".join(words)} if words else set()
+    return {" ".join(words[i:i + k]) for i in range(len(words) - k + 1)}
+
+
+def jaccard(a: set, b: set) -> float:
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+class MinHasher:
+    """`num_perm` seeded hash functions; deterministic across processes."""
+
+    def __init__(self, num_perm: int = 64, seed: int = 1):
+        rng = random.Random(seed)
+        self.num_perm = num_perm
+        self._params = [(rng.randrange(1, _PRIME), rng.randrange(0, _PRIME)) for _ in range(num_perm)]
+
+    def signature(self, items: set) -> list:
+        hashes = [int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=8).digest(), "big") for s in items]
+        if not hashes:
+            return [0] * self.num_perm
+        return [min((a * h + b) % _PRIME for h in hashes) for a, b in self._params]
+
+
+def band_keys(signature: list, bands: int) -> list:
+    rows = max(1, len(signature) // bands)
+    return [
+        (band, hashlib.sha1(",".join(map(str, signature[band * rows:(band + 1) * rows])).encode()).hexdigest()[:16])
+        for band in range(bands)
+    ]
+
+
+# ======================================================
+# 🔹 Similarity Cache
+# ======================================================
+class SimilarityCache:
+    """
+    Past statements and their extracted requirements, looked up by
+    similarity. `lookup` returns the best match at or above `threshold`;
+    `exact` marks a match on the normalised-text digest.
+
+    Args:
+        db_path (str): SQLite file.
+        threshold (float): Minimum Jaccard similarity of word 3-shingles.
+        max_entries (int): Least recently used statements beyond this are evicted.
+        num_perm, bands (int): MinHash size and LSH bands (num_perm / bands rows each).
+    """
+
+    def __init__(self, db_path: str, threshold: float = 0.7, max_entries: int = 1000,
+                 num_perm: int = 64, bands: int = 16):
+        self.db_path = Path(db_path)
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.bands = bands
+        self.hasher = MinHasher(num_perm)
+        self._lock = threading.Lock()
+        self._schema_ready = False
+        self.stats = {"lookups": 0, "exact_hits": 0, "near_hits": 0, "misses": 0}
+
+    def _connect(self) -> sqlite3.Connection:
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(self.db_path, timeout=10)
+        if not self._schema_ready:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS statements (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    digest TEXT UNIQUE NOT NULL,
+                    statement TEXT NOT NULL,
+                    normalized TEXT NOT NULL,
+                    requirements TEXT NOT NULL,
+                    created REAL NOT NULL,
+                    last_used REAL NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS bands (
+                    band INTEGER NOT NULL,
+                    bucket TEXT NOT NULL,
+                    statement_id INTEGER NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS idx_bands_bucket ON bands(band, bucket);
+                CREATE INDEX IF NOT EXISTS idx_bands_statement ON bands(statement_id);
+                """
+            )
+            conn.commit()
+            self._schema_ready = True
+        return conn
+
+    @staticmethod
+    def _digest(normalized: str) -> str:
+        return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+    def lookup(self, statement: str, threshold: float = None):
+        """
+        Best cached match for `statement`.
+
+        Returns:
+            dict | None: {"statement", "requirements", "similarity", "exact"} or None.
+            `exact` is True only when the normalised text (its digest) matches;
+            a near match never reports a similarity of 1.0.
+        """
+        threshold = self.threshold if threshold is None else threshold
+        normalized = normalize_statement(statement)
+        if not normalized:
+            return None
+        digest = self._digest(normalized)
+        with self._lock:
+            self.stats["lookups"] += 1
+            conn = self._connect()
+            try:
+                row = conn.execute(
+                    "SELECT id, statement, requirements FROM statements WHERE digest = ?", (digest,)
+                ).fetchone()
+                if row:
+                    conn.execute("UPDATE statements SET last_used = ? WHERE id = ?", (time.time(), row[0]))
+                    conn.commit()
+                    self.stats["exact_hits"] += 1
+                    return {"statement": row[1], "requirements": json.loads(row[2]), "similarity": 1.0, "exact": True}
+
+                grams = shingles(normalized)
+                keys = band_keys(self.hasher.signature(grams), self.bands)
+                candidates = set()
+                for band, bucket in keys:
+                    candidates.update(
+                        r[0] for r in conn.execute(
+                            "SELECT statement_id FROM bands WHERE band = ? AND bucket = ?", (band, bucket)
+                        )
+                    )
+                best = None
+                for statement_id in candidates:
+                    cand = conn.execute(
+                        "SELECT statement, normalized, requirements FROM statements WHERE id = ?", (statement_id,)
+                    ).fetchone()
+                    if not cand:
+                        continue
+                    score = jaccard(grams, shingles(cand[1]))
+                    if score >= threshold and (best is None or score > best[0]):
+                        best = (score, statement_id, cand)
+                if best is None:
+                    self.stats["misses"] += 1
+                    return None
+                conn.execute("UPDATE statements SET last_used = ? WHERE id = ?", (time.time(), best[1]))
+                conn.commit()
+                self.stats["near_hits"] += 1
+                return {
+                    "statement": best[2][0],
+                    "requirements": json.loads(best[2][2]),
+                    "similarity": min(round(best[0], 4), 0.9999),
+                    "exact": False,
+                }
+            finally:
+                conn.close()
+
+    def add(self, statement: str, requirements: dict):
+        """Index `statement` with its extracted requirements (replaces an identical one)."""
+        normalized = normalize_statement(statement)
+        if not normalized:
+            return
+        digest = self._digest(normalized)
+        keys = band_keys(self.hasher.signature(shingles(normalized)), self.bands)
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            try:
+                old = conn.execute("SELECT id FROM statements WHERE digest = ?", (digest,)).fetchone()
+                if old:
+                    conn.execute("DELETE FROM bands WHERE statement_id = ?", (old[0],))
+                    conn.execute("DELETE FROM statements WHERE id = ?", (old[0],))
+                cur = conn.execute(
+                    "INSERT INTO statements (digest, statement, normalized, requirements, created, last_used) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (digest, statement, normalized, json.dumps(requirements, ensure_ascii=False), now, now),
+                )
+                conn.executemany(
+                    "INSERT INTO bands (band, bucket, statement_id) VALUES (?, ?, ?)",
+                    [(band, bucket, cur.lastrowid) for band, bucket in keys],
+                )
+                self._evict(conn)
+                conn.commit()
+            finally:
+                conn.close()
+
+    def _evict(self, conn: sqlite3.Connection):
+        count = conn.execute("SELECT COUNT(*) FROM statements").fetchone()[0]
+        excess = count - self.max_entries
+        if excess <= 0:
+            return
+        stale = [r[0] for r in conn.execute(
+            "SELECT id FROM statements ORDER BY last_used ASC LIMIT ?", (excess,)
+        )]
+        conn.executemany("DELETE FROM bands WHERE statement_id = ?", [(i,) for i in stale])
+        conn.executemany("DELETE FROM statements WHERE id = ?", [(i,) for i in stale])
+        logger.debug(f"[SimilarityCache] Evicted {len(stale)} statements")
+
+    def size(self) -> int:
+        with self._lock:
+            conn = self._connect()
+            try:
+                return conn.execute("SELECT COUNT(*) FROM statements").fetchone()[0]
+            finally:
+                conn.close()
+
+    def summary(self) -> dict:
+        """Threshold, hit rate (exact + near) and index size."""
+        stats = dict(self.stats)
+        hits = stats["exact_hits"] + stats["near_hits"]
+        stats["hit_rate"] = round(hits / stats["lookups"], 3) if stats["lookups"] else 0.0
+        stats["threshold"] = self.threshold
+        stats["index_size"] = self.size()
+        return stats
+
+
+_cache_cfg = settings.get("requirements_cache", {})
+CACHE_ENABLED = bool(_cache_cfg.get("enabled", True))
+similarity_cache = SimilarityCache(
+    db_path=_cache_cfg.get(
+        "db_path", str(Path(settings.get("paths", {}).get("outputs_dir", "outputs")) / "requirements_cache.db")
+    ),
+    threshold=float(_cache_cfg.get("threshold", 0.7)),
+    max_entries=int(_cache_cfg.get("max_entries", 1000)),
+    num_perm=int(_cache_cfg.get("num_perm", 64)),
+    bands=int(_cache_cfg.get("bands", 16)),
+)
@@ -0,0 +1,96 @@
+"""
+core/srs_template.py
+Deterministic SRS content rendered straight from the requirement agent's
+`parsed_json`: requirement tables, user classes, module listing and
+assumptions. The SRS agent only asks the model for narrative around these.
+"""
+
+import re
+from core.flow_template import assign_requirements, module_name, requirement_id
+
+
+def _cell(text) -> str:
+    """Escape a value for a Markdown table cell."""
+    return " ".join(str(text).split()).replace("|", "\\|")
+
+
+def _strip_id(text: str, prefix: str) -> str:
+    return re.sub(rf"^\s*{prefix}\d+\s*[:.)–-]?\s*", "", str(text), flags=re.IGNORECASE)
+
+
+def _items(parsed_json: dict, key: str) -> list:
+    return [item for item in parsed_json.get(key, []) or [] if str(item).strip()]
+
+
+def numbered(items: list, prefix: str) -> list:
+    """(ID, text) pairs, keeping IDs already present ("NFR2: ...") and numbering the rest."""
+    return [(requirement_id(str(item), i, prefix), _strip_id(item, prefix)) for i, item in enumerate(items, start=1)]
+
+
+# ======================================================
+# 🔹 Blocks
+# ======================================================
+def functional_table(parsed_json: dict) -> str:
+    requirements = _items(parsed_json, "functional_requirements")
+    if not requirements:
+        return ""
+    assigned = assign_requirements(_items(parsed_json, "modules"), requirements)
+    rows = ["| ID | Requirement | Module |", "|----|-------------|--------|"]
+    for module, reqs in assigned.items():
+        rows += [f"| {req_id} | {_cell(text)} | {_cell(module)} |" for req_id, text in reqs]
+    return "\n".join(rows)
+
+
+def non_functional_table(parsed_json: dict) -> str:
+    requirements = _items(parsed_json, "non_functional_requirements")
+    if not requirements:
+        return ""
+    rows = ["| ID | Requirement |", "|----|-------------|"]
+    rows += [f"| {req_id} | {_cell(text)} |" for req_id, text in numbered(requirements, "NFR")]
+    return "\n".join(rows)
+
+
+def user_classes(parsed_json: dict) -> str:
+    return "\n".join(f"- **{_cell(actor)}**" for actor in _items(parsed_json, "actors"))
+
+
+def module_listing(parsed_json: dict) -> str:
+    lines = []
+    for i, entry in enumerate(_items(parsed_json, "modules"), start=1):
+        name = module_name(entry)
+        if isinstance(entry, dict):
+            detail = str(entry.get("description") or entry.get("summary") or "")
+        else:
+            detail = str(entry).split(name, 1)[-1].strip(" :–—-") if name in str(entry) else ""
+        lines.append(f"{i}. **{_cell(name)}**" + (f" — {_cell(detail)}" if detail else ""))
+    return "\n".join(lines)
+
+
+def assumption_list(parsed_json: dict) -> str:
+    return "\n".join(f"- {_cell(item)}" for item in _items(parsed_json, "assumptions"))
+
+
+# Locally rendered subsections per SRS section key: (subsection title, renderer)
+LOCAL_BLOCKS = {
+    "overall_description": (
+        ("Major Functions", module_listing),
+        ("User Classes and Characteristics", user_classes),
+        ("Assumptions and Dependencies", assumption_list),
+    ),
+    "functional": (
+        ("Functional Requirements", functional_table),
+    ),
+    "non_functional": (
+        ("Non-Functional Requirements", non_functional_table),
+    ),
+}
+
+
+def render_local(section_key: str, parsed_json: dict) -> str:
+    """Markdown for the locally rendered subsections of a section ("" if none apply)."""
+    parts = []
+    for title, render in LOCAL_BLOCKS.get(section_key, ()):
+        body = render(parsed_json or {})
+        if body:
+            parts.append(f"### {title}\n\n{body}")
+    return "\n\n".join(parts)
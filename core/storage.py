@@ -1,6 +1,20 @@
+import os
+import json
+import time
+import uuid
+import queue
+import atexit
+import asyncio
+import shutil
+import hashlib
+import tempfile
+import threading
 from pathlib import Path
+from contextlib import contextmanager
+from contextvars import ContextVar
+from concurrent.futures import Future
 from core.config import load_settings
-from core.logger import init_logger
+from core.logger import init_logger, log_context
 
 settings = load_settings()
 logger = init_logger()
@@ -15,13 +29,340 @@ def ensure_dirs():
         logger.exception(f"Error creating directories: {e}")
         raise
 
+def atomic_write_bytes(path, data: bytes):
+    """Write bytes to a temp file in the target directory, then rename over `path`."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        Path(tmp).unlink(missing_ok=True)
+        raise
+    return path
+
+_append_lock = threading.Lock()
+
+
+def append_bytes(path, data: bytes):
+    """Append to `path` (JSON lines logs); one write per call, serialised across threads."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with _append_lock, open(path, "ab") as f:
+        f.write(data)
+    return path
+
 def save_text(path, content: str):
     try:
-        path = Path(path)
-        path.parent.mkdir(parents=True, exist_ok=True)
-        path.write_text(content, encoding="utf-8")
+        path = atomic_write_bytes(path, content.encode("utf-8"))
         logger.info(f"Saved file: {path}")
         return str(path)
     except Exception as e:
         logger.exception(f"Error saving text to {path}: {e}")
         raise
+
+
+# ============================================================
+# 🔹 Run-Scoped, Content-Addressed Artifact Store
+# ============================================================
+_current_run: ContextVar = ContextVar("current_run", default=None)
+
+
+def new_run_id() -> str:
+    return time.strftime("%Y%m%d-%H%M%S") + "-" + uuid.uuid4().hex[:8]
+
+
+def active_run_id():
+    """Run id bound to this thread/task, or None (never starts a run)."""
+    return _current_run.get()
+
+
+class ArtifactStore:
+    """
+    Stores generated artifacts under `<root>/<run_id>/<name>` so concurrent
+    sessions never overwrite each other.
+
+    Content is written once to `<root>/_blobs/<sha256>` (atomic temp-file +
+    rename) and hard-linked into the run directory, so identical artifacts
+    across runs share storage. Each run keeps a `manifest.json` of
+    name → sha256/size. `gc()` applies the retention policy.
+    """
+
+    MANIFEST = "manifest.json"
+
+    def __init__(self, root: str, keep_runs: int = 50, max_age_days: float = 7, gc_interval_s: float = 600):
+        self.root = Path(root)
+        self.blobs_dir = self.root / "_blobs"
+        self.keep_runs = keep_runs
+        self.max_age_days = max_age_days
+        self.gc_interval_s = gc_interval_s
+        self._lock = threading.Lock()
+        self._last_gc = 0.0
+
+    # ---------- Runs ----------
+    def run_dir(self, run_id: str = None) -> Path:
+        path = self.root / (run_id or self.current_run())
+        path.mkdir(parents=True, exist_ok=True)
+        return path
+
+    def current_run(self) -> str:
+        """Return the active run id, starting one for this context if needed."""
+        run_id = _current_run.get()
+        if run_id is None:
+            run_id = new_run_id()
+            _current_run.set(run_id)
+            logger.info(f"[ArtifactStore] Started implicit run {run_id}")
+        return run_id
+
+    @contextmanager
+    def run_scope(self, run_id: str = None):
+        """
+        Bind a run id to the current thread/task. Reuses the active run
+        unless an explicit `run_id` is given.
+        """
+        active = _current_run.get()
+        if active is not None and run_id is None:
+            yield active
+            return
+
+        run_id = run_id or new_run_id()
+        token = _current_run.set(run_id)
+        self.run_dir(run_id)
+        self.maybe_gc()
+        try:
+            with log_context(run_id=run_id):
+                yield run_id
+        finally:
+            _current_run.reset(token)
+
+    # ---------- Writes ----------
+    def write_bytes(self, name: str, data: bytes, run_id: str = None) -> str:
+        """Persist `data` as artifact `name` in the run; returns the run-local path."""
+        digest = hashlib.sha256(data).hexdigest()
+        suffix = Path(name).suffix
+        blob = self.blobs_dir / digest[:2] / f"{digest}{suffix}"
+
+        if blob.exists():
+            logger.debug(f"[ArtifactStore] Dedup hit for {name} ({digest[:12]})")
+        else:
+            atomic_write_bytes(blob, data)
+
+        target = self.run_dir(run_id) / name
+        target.parent.mkdir(parents=True, exist_ok=True)
+        tmp = target.with_name(f".{target.name}.{uuid.uuid4().hex[:6]}.tmp")
+        try:
+            os.link(blob, tmp)
+        except OSError:
+            tmp.write_bytes(data)
+        os.replace(tmp, target)
+
+        self._record(target, name, digest, len(data), run_id)
+        logger.info(f"[ArtifactStore] Saved artifact: {target}")
+        return str(target)
+
+    def write_text(self, name: str, content: str, run_id: str = None) -> str:
+        return self.write_bytes(name, content.encode("utf-8"), run_id=run_id)
+
+    def _record(self, target: Path, name: str, digest: str, size: int, run_id: str = None):
+        manifest_path = self.run_dir(run_id) / self.MANIFEST
+        with self._lock:
+            manifest = self.manifest(run_id)
+            manifest[name] = {"sha256": digest, "size": size, "path": str(target), "created": time.time()}
+            atomic_write_bytes(manifest_path, json.dumps(manifest, indent=2).encode("utf-8"))
+
+    def manifest(self, run_id: str = None) -> dict:
+        path = self.run_dir(run_id) / self.MANIFEST
+        if not path.exists():
+            return {}
+        try:
+            return json.loads(path.read_text(encoding="utf-8"))
+        except json.JSONDecodeError:
+            logger.warning(f"[ArtifactStore] Corrupt manifest ignored: {path}")
+            return {}
+
+    # ---------- Retention ----------
+    def maybe_gc(self):
+        if time.time() - self._last_gc >= self.gc_interval_s:
+            self.gc()
+
+    def gc(self) -> dict:
+        """
+        Delete runs older than `max_age_days` or beyond the newest `keep_runs`,
+        then drop blobs no longer linked from any run.
+        """
+        self._last_gc = time.time()
+        if not self.root.exists():
+            return {"runs_removed": 0, "blobs_removed": 0}
+
+        active = _current_run.get()
+        runs = sorted(
+            (p for p in self.root.iterdir() if p.is_dir() and not p.name.startswith("_")),
+            key=lambda p: p.stat().st_mtime,
+            reverse=True,
+        )
+        cutoff = time.time() - self.max_age_days * 86400
+        runs_removed = 0
+        for idx, run in enumerate(runs):
+            if run.name == active:
+                continue
+            if idx >= self.keep_runs or run.stat().st_mtime < cutoff:
+                shutil.rmtree(run, ignore_errors=True)
+                runs_removed += 1
+
+        # Blobs with a single link are referenced by no run any more
+        blobs_removed = 0
+        if self.blobs_dir.exists():
+            for blob in self.blobs_dir.glob("*/*"):
+                try:
+                    if blob.is_file() and blob.stat().st_nlink <= 1:
+                        blob.unlink()
+                        blobs_removed += 1
+                except OSError:
+                    continue
+
+        if runs_removed or blobs_removed:
+            logger.info(f"[ArtifactStore] GC removed {runs_removed} runs, {blobs_removed} blobs")
+        return {"runs_removed": runs_removed, "blobs_removed": blobs_removed}
+
+
+_storage_cfg = settings.get("storage", {})
+artifact_store = ArtifactStore(
+    root=_storage_cfg.get("runs_dir", str(Path(settings.get("paths", {}).get("outputs_dir", "outputs")) / "runs")),
+    keep_runs=int(_storage_cfg.get("keep_runs", 50)),
+    max_age_days=float(_storage_cfg.get("max_age_days", 7)),
+    gc_interval_s=float(_storage_cfg.get("gc_interval_s", 600)),
+)
+
+
+def save_artifact(name: str, content) -> str:
+    """Save text or bytes as a run-scoped artifact of the active run."""
+    try:
+        if isinstance(content, str):
+            return artifact_store.write_text(name, content)
+        return artifact_store.write_bytes(name, content)
+    except Exception as e:
+        logger.exception(f"Error saving artifact {name}: {e}")
+        raise
+
+
+# ============================================================
+# 🔹 Background Artifact Writer
+# ============================================================
+class WriterQueueFull(RuntimeError):
+    """Raised when the background writer stays full past the submit timeout."""
+
+
+class PendingArtifact:
+    """
+    Handle for a queued write. `path` is known immediately; call `result()`
+    (or `await` the handle) when the file must exist on disk.
+    """
+
+    def __init__(self, path: str, future: Future):
+        self.path = path
+        self.future = future
+
+    def result(self, timeout: float = None) -> str:
+        return self.future.result(timeout)
+
+    def done(self) -> bool:
+        return self.future.done()
+
+    def __await__(self):
+        return asyncio.wrap_future(self.future).__await__()
+
+    def __str__(self):
+        return self.path
+
+
+class BackgroundWriter:
+    """
+    Bounded queue of artifact writes drained by daemon worker threads.
+
+    `content` may be str, bytes or a zero-arg callable producing either, so
+    serialisation (json.dumps, DataFrame.to_csv) also leaves the request path.
+    `submit` blocks when the queue is full (back-pressure) and raises
+    WriterQueueFull if no slot frees up within `put_timeout_s`.
+    """
+
+    def __init__(self, store: ArtifactStore, max_queue: int = 64, workers: int = 2, put_timeout_s: float = 30):
+        self.store = store
+        self.put_timeout_s = put_timeout_s
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._workers = [
+            threading.Thread(target=self._drain, name=f"artifact-writer-{i}", daemon=True)
+            for i in range(max(1, workers))
+        ]
+        for t in self._workers:
+            t.start()
+
+    def submit(self, name: str, content, run_id: str = None) -> PendingArtifact:
+        """Queue a run-scoped artifact; the run id is captured from the caller's context."""
+        run_id = run_id or self.store.current_run()
+        path = str(self.store.root / run_id / name)
+        job = lambda data: self.store.write_bytes(name, data, run_id=run_id)
+        return self._enqueue(path, content, job)
+
+    def submit_path(self, path, content) -> PendingArtifact:
+        """Queue a plain-path write (same semantics as `save_text`)."""
+        return self._enqueue(str(path), content, lambda data: str(atomic_write_bytes(path, data)))
+
+    def submit_append(self, path, content) -> PendingArtifact:
+        """Queue an append to a plain path (e.g. a JSON lines export)."""
+        return self._enqueue(str(path), content, lambda data: str(append_bytes(path, data)))
+
+    def _enqueue(self, path: str, content, job) -> PendingArtifact:
+        future = Future()
+        try:
+            self._queue.put((path, content, job, future), timeout=self.put_timeout_s)
+        except queue.Full:
+            raise WriterQueueFull(f"Background writer queue full; could not queue {path}")
+        return PendingArtifact(path, future)
+
+    def _drain(self):
+        while True:
+            path, content, job, future = self._queue.get()
+            try:
+                if not future.set_running_or_notify_cancel():
+                    continue
+                data = content() if callable(content) else content
+                if isinstance(data, str):
+                    data = data.encode("utf-8")
+                future.set_result(job(data))
+                logger.debug(f"[BackgroundWriter] Persisted {path}")
+            except Exception as e:
+                logger.exception(f"[BackgroundWriter] Failed to persist {path}: {e}")
+                future.set_exception(e)
+            finally:
+                self._queue.task_done()
+
+    def pending(self) -> int:
+        return self._queue.unfinished_tasks
+
+    def flush(self):
+        """Block until every queued write has been persisted (or failed)."""
+        self._queue.join()
+
+
+_writer_cfg = settings.get("storage", {}).get("writer", {})
+background_writer = BackgroundWriter(
+    artifact_store,
+    max_queue=int(_writer_cfg.get("max_queue", 64)),
+    workers=int(_writer_cfg.get("workers", 2)),
+    put_timeout_s=float(_writer_cfg.get("put_timeout_s", 30)),
+)
+atexit.register(background_writer.flush)
+
+
+def save_artifact_async(name: str, content) -> PendingArtifact:
+    """Queue a run-scoped artifact write; returns a handle with the final path."""
+    return background_writer.submit(name, content)
+
+
+def save_text_async(path, content) -> PendingArtifact:
+    """Background counterpart of `save_text`."""
+    return background_writer.submit_path(path, content)
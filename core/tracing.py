@@ -0,0 +1,305 @@
+"""
+core/tracing.py
+Lightweight span tracing with local exporters:
+- JSON lines (one span per line)
+- OTLP/JSON (one ExportTraceServiceRequest per finished trace)
+- Prometheus text-format latency histograms per span name
+"""
+
+import json
+import time
+import uuid
+import functools
+import threading
+from pathlib import Path
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from core.config import load_settings
+from core.logger import init_logger, log_context
+from core.storage import background_writer
+
+logger = init_logger()
+settings = load_settings()
+
+_tracing_cfg = settings.get("tracing", {})
+TRACING_ENABLED = bool(_tracing_cfg.get("enabled", True))
+TRACES_DIR = Path(_tracing_cfg.get(
+    "dir", str(Path(settings.get("paths", {}).get("outputs_dir", "outputs")) / "traces")
+))
+SERVICE_NAME = _tracing_cfg.get("service_name", "sdlc-agent-app")
+
+# Prometheus histogram buckets (seconds)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+
+# ======================================================
+# 🔹 Span
+# ======================================================
+class Span:
+    def __init__(self, name: str, trace_id: str, parent_id: str = None, attributes: dict = None):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent_id
+        self.attributes = dict(attributes or {})
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.status = "ok"
+        self.error = None
+
+    def set_attribute(self, key: str, value):
+        self.attributes[key] = value
+
+    @property
+    def duration_s(self) -> float:
+        end = self.end_ns or time.time_ns()
+        return (end - self.start_ns) / 1e9
+
+    def to_dict(self) -> dict:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start_ns": self.start_ns,
+            "end_ns": self.end_ns,
+            "duration_ms": round(self.duration_s * 1000, 3),
+            "status": self.status,
+            "error": self.error,
+            "attributes": self.attributes,
+        }
+
+    def to_otlp(self) -> dict:
+        span = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": 1,  # SPAN_KIND_INTERNAL
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns),
+            "attributes": [_otlp_attr(k, v) for k, v in self.attributes.items()],
+            "status": {"code": 2, "message": self.error or ""} if self.status == "error" else {"code": 1},
+        }
+        if self.parent_id:
+            span["parentSpanId"] = self.parent_id
+        return span
+
+
+def _otlp_attr(key: str, value) -> dict:
+    if isinstance(value, bool):
+        return {"key": key, "value": {"boolValue": value}}
+    if isinstance(value, int):
+        return {"key": key, "value": {"intValue": str(value)}}
+    if isinstance(value, float):
+        return {"key": key, "value": {"doubleValue": value}}
+    return {"key": key, "value": {"stringValue": str(value)}}
+
+
+# ======================================================
+# 🔹 Latency Histograms
+# ======================================================
+class LatencyHistograms:
+    """Cumulative per-span-name histograms rendered in Prometheus text format."""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._data = {}
+
+    def observe(self, name: str, seconds: float):
+        with self._lock:
+            h = self._data.setdefault(name, {"counts": [0] * len(self.buckets), "sum": 0.0, "count": 0})
+            for i, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    h["counts"][i] += 1
+            h["sum"] += seconds
+            h["count"] += 1
+
+    def quantile(self, name: str, q: float) -> float:
+        """Bucket-resolution quantile estimate (upper bound of the bucket)."""
+        with self._lock:
+            h = self._data.get(name)
+            if not h or not h["count"]:
+                return 0.0
+            target = q * h["count"]
+            for bound, cumulative in zip(self.buckets, h["counts"]):
+                if cumulative >= target:
+                    return bound
+            return float("inf")
+
+    def render_prometheus(self) -> str:
+        metric = "sdlc_span_duration_seconds"
+        lines = [
+            f"# HELP {metric} Latency of traced spans (agents, LLM calls, OCR, rendering).",
+            f"# TYPE {metric} histogram",
+        ]
+        with self._lock:
+            for name in sorted(self._data):
+                h = self._data[name]
+                label = name.replace("\\", "\\\\").replace('"', '\\"')
+                for bound, cumulative in zip(self.buckets, h["counts"]):
+                    lines.append(f'{metric}_bucket{{span="{label}",le="{bound}"}} {cumulative}')
+                lines.append(f'{metric}_bucket{{span="{label}",le="+Inf"}} {h["count"]}')
+                lines.append(f'{metric}_sum{{span="{label}"}} {h["sum"]:.6f}')
+                lines.append(f'{metric}_count{{span="{label}"}} {h["count"]}')
+        return "\n".join(lines) + "\n"
+
+
+# ======================================================
+# 🔹 Tracer
+# ======================================================
+_current_span: ContextVar = ContextVar("current_span", default=None)
+
+
+class Tracer:
+    """
+    Collects finished spans per trace and exports the whole trace once its
+    root span ends. Parent/child links follow the contextvar-held current
+    span, so they survive thread hops that copy the context.
+
+    A child that ends after its root (background refinement, a future that
+    outlives its caller) is exported on its own instead of being buffered
+    for a root that will never end again. Exports go through the background
+    writer, off the request thread.
+    """
+
+    def __init__(self, out_dir: Path, enabled: bool = True):
+        self.out_dir = Path(out_dir)
+        self.enabled = enabled
+        self.histograms = LatencyHistograms()
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._finished = OrderedDict()
+        self._closed = OrderedDict()
+        self.keep_finished = 50
+        self.keep_closed = 1000
+        self.max_pending = 1000
+
+    @contextmanager
+    def span(self, name: str, **attributes):
+        if not self.enabled:
+            yield None
+            return
+
+        parent = _current_span.get()
+        span = Span(
+            name,
+            trace_id=parent.trace_id if parent else uuid.uuid4().hex,
+            parent_id=parent.span_id if parent else None,
+            attributes=attributes,
+        )
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.status = "error"
+            span.error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            _current_span.reset(token)
+            span.end_ns = time.time_ns()
+            self._finish(span, is_root=parent is None)
+
+    def _finish(self, span: Span, is_root: bool):
+        self.histograms.observe(span.name, span.duration_s)
+        with self._lock:
+            if span.trace_id in self._closed:
+                # Late child of an exported trace
+                if span.trace_id in self._finished:
+                    self._finished[span.trace_id].append(span)
+                spans = [span]
+            elif is_root:
+                spans = self._pending.pop(span.trace_id, []) + [span]
+                self._finished[span.trace_id] = spans
+                while len(self._finished) > self.keep_finished:
+                    self._finished.popitem(last=False)
+                self._closed[span.trace_id] = True
+                while len(self._closed) > self.keep_closed:
+                    self._closed.popitem(last=False)
+            else:
+                self._pending.setdefault(span.trace_id, []).append(span)
+                spans = None
+                if len(self._pending) > self.max_pending:
+                    # Oldest open trace whose root never ended: export what it has
+                    _trace_id, spans = next(iter(self._pending.items()))
+                    del self._pending[_trace_id]
+        if spans:
+            self._export(list(spans))
+
+    def finished_trace(self, trace_id: str) -> list:
+        with self._lock:
+            return list(self._finished.get(trace_id, []))
+
+    def _export(self, spans: list):
+        """Queue the spans (JSON lines + OTLP/JSON) and refreshed histograms on the background writer."""
+        try:
+            lines = "".join(json.dumps(s.to_dict(), default=str) + "\n" for s in spans)
+            otlp = {
+                "resourceSpans": [{
+                    "resource": {"attributes": [_otlp_attr("service.name", SERVICE_NAME)]},
+                    "scopeSpans": [{
+                        "scope": {"name": "core.tracing"},
+                        "spans": [s.to_otlp() for s in spans],
+                    }],
+                }]
+            }
+            background_writer.submit_append(self.out_dir / "spans.jsonl", lines)
+            background_writer.submit_append(self.out_dir / "otlp_traces.jsonl", json.dumps(otlp, default=str) + "\n")
+            background_writer.submit_path(self.out_dir / "metrics.prom", self.histograms.render_prometheus)
+        except Exception as e:
+            logger.warning(f"[Tracing] Failed to export trace: {e}")
+
+
+tracer = Tracer(TRACES_DIR, enabled=TRACING_ENABLED)
+
+
+def span(name: str, **attributes):
+    """Open a child span of the current span (or a new trace)."""
+    return tracer.span(name, **attributes)
+
+
+@contextmanager
+def detached_span(name: str, **attributes):
+    """Open a span as the root of a new trace (background work outliving its caller)."""
+    token = _current_span.set(None)
+    try:
+        with tracer.span(name, **attributes) as s:
+            yield s
+    finally:
+        _current_span.reset(token)
+
+
+def traced(name: str = None):
+    """Decorator wrapping a function call in a span."""
+    def decorator(func):
+        span_name = name or f"{func.__module__}.{func.__qualname__}"
+
+        # Agent spans also tag every log line emitted inside them
+        log_fields = {"agent": span_name.split(".", 1)[1]} if span_name.startswith("agent.") else {}
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with tracer.span(span_name), log_context(**log_fields):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def current_span():
+    return _current_span.get()
+
+
+def trace_breakdown(trace_id: str) -> list:
+    """Span name / duration rows of a finished trace, in start order."""
+    spans = tracer.finished_trace(trace_id)
+    depth = {}
+    rows = []
+    for s in sorted(spans, key=lambda s: s.start_ns):
+        depth[s.span_id] = depth.get(s.parent_id, -1) + 1
+        rows.append({
+            "span": "  " * depth[s.span_id] + s.name,
+            "duration_ms": round(s.duration_s * 1000, 1),
+            "status": s.status,
+        })
+    return rows
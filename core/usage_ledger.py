@@ -0,0 +1,311 @@
+"""
+core/usage_ledger.py
+Per-run token usage tracking plus a SQLite ledger of every LLM call.
+"""
+
+import time
+import uuid
+import atexit
+import sqlite3
+import threading
+from pathlib import Path
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import Any, Dict
+from core.config import load_settings
+from core.logger import init_logger
+from core.storage import active_run_id
+
+logger = init_logger()
+settings = load_settings()
+
+
+# ======================================================
+# 🔹 SQLite Ledger (batched writes)
+# ======================================================
+class UsageLedger:
+    """
+    Append-only ledger of LLM calls. Rows are buffered in memory and written
+    with `executemany` once `batch_size` rows are pending or every
+    `flush_interval_s` seconds, whichever comes first.
+    """
+
+    COLUMNS = (
+        "ts", "day", "run_id", "agent", "model", "input_tokens", "output_tokens",
+        "cost_usd", "latency_ms", "cache_hit", "status",
+    )
+    GROUPABLE = {"day", "agent", "model", "run_id", "status"}
+
+    def __init__(self, db_path: str, batch_size: int = 20, flush_interval_s: float = 2.0):
+        self.db_path = Path(db_path)
+        self.batch_size = batch_size
+        self.flush_interval_s = flush_interval_s
+        self._buffer = []
+        self._buffer_lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._schema_ready = False
+        self._flusher = threading.Thread(target=self._flush_loop, name="usage-ledger", daemon=True)
+        self._flusher.start()
+
+    def _connect(self) -> sqlite3.Connection:
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(self.db_path, timeout=10)
+        if not self._schema_ready:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS llm_calls (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    ts REAL NOT NULL,
+                    day TEXT NOT NULL,
+                    run_id TEXT,
+                    agent TEXT,
+                    model TEXT,
+                    input_tokens INTEGER DEFAULT 0,
+                    output_tokens INTEGER DEFAULT 0,
+                    cost_usd REAL DEFAULT 0,
+                    latency_ms REAL,
+                    cache_hit INTEGER DEFAULT 0,
+                    status TEXT DEFAULT 'ok'
+                )
+                """
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_calls_day ON llm_calls(day)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_calls_run ON llm_calls(run_id)")
+            conn.commit()
+            self._schema_ready = True
+        return conn
+
+    def record(self, **row):
+        """Buffer one call; missing columns default to NULL/0."""
+        now = row.get("ts") or time.time()
+        row["ts"] = now
+        row.setdefault("day", datetime.fromtimestamp(now, tz=timezone.utc).strftime("%Y-%m-%d"))
+        row["cache_hit"] = int(bool(row.get("cache_hit")))
+        row.setdefault("status", "ok")
+        values = tuple(row.get(col) for col in self.COLUMNS)
+
+        with self._buffer_lock:
+            self._buffer.append(values)
+            full = len(self._buffer) >= self.batch_size
+        if full:
+            self._wakeup.set()
+
+    def flush(self) -> int:
+        """Write all buffered rows; returns the number written."""
+        with self._buffer_lock:
+            rows, self._buffer = self._buffer, []
+        if not rows:
+            return 0
+        placeholders = ", ".join("?" for _ in self.COLUMNS)
+        try:
+            with self._write_lock:
+                conn = self._connect()
+                try:
+                    conn.executemany(
+                        f"INSERT INTO llm_calls ({', '.join(self.COLUMNS)}) VALUES ({placeholders})", rows
+                    )
+                    conn.commit()
+                finally:
+                    conn.close()
+            return len(rows)
+        except Exception as e:
+            logger.exception(f"[UsageLedger] Failed to persist {len(rows)} rows: {e}")
+            with self._buffer_lock:
+                self._buffer[:0] = rows
+            return 0
+
+    def _flush_loop(self):
+        while True:
+            self._wakeup.wait(self.flush_interval_s)
+            self._wakeup.clear()
+            self.flush()
+
+    def aggregate(self, group_by=("day",), since: str = None, until: str = None, run_id: str = None) -> list:
+        """
+        Aggregate calls grouped by any of day / agent / model / run_id / status.
+        `since` / `until` are inclusive YYYY-MM-DD bounds.
+        """
+        if isinstance(group_by, str):
+            group_by = (group_by,)
+        unknown = set(group_by) - self.GROUPABLE
+        if unknown:
+            raise ValueError(f"Cannot group usage by: {sorted(unknown)}")
+
+        self.flush()
+        where, params = [], []
+        if since:
+            where.append("day >= ?")
+            params.append(since)
+        if until:
+            where.append("day <= ?")
+            params.append(until)
+        if run_id:
+            where.append("run_id = ?")
+            params.append(run_id)
+
+        cols = ", ".join(group_by)
+        sql = (
+            f"SELECT {cols}, COUNT(*), SUM(input_tokens), SUM(output_tokens), SUM(cost_usd), "
+            f"AVG(latency_ms), SUM(cache_hit) FROM llm_calls"
+            + (f" WHERE {' AND '.join(where)}" if where else "")
+            + f" GROUP BY {cols} ORDER BY {cols}"
+        )
+        with self._write_lock:
+            conn = self._connect()
+            try:
+                rows = conn.execute(sql, params).fetchall()
+            finally:
+                conn.close()
+
+        keys = list(group_by) + [
+            "calls", "input_tokens", "output_tokens", "cost_usd", "avg_latency_ms", "cache_hits",
+        ]
+        return [dict(zip(keys, row)) for row in rows]
+
+
+_usage_cfg = settings.get("usage", {})
+ledger = UsageLedger(
+    db_path=_usage_cfg.get(
+        "db_path", str(Path(settings.get("paths", {}).get("outputs_dir", "outputs")) / "usage.db")
+    ),
+    batch_size=int(_usage_cfg.get("batch_size", 20)),
+    flush_interval_s=float(_usage_cfg.get("flush_interval_s", 2.0)),
+)
+atexit.register(ledger.flush)
+
+
+# ======================================================
+# 🔹 Per-Run Tracker
+# ======================================================
+class RunTracker:
+    """
+    Thread-safe token/cost totals for a single run. Only the most recent
+    `max_entries` per-call entries are kept; totals cover every call.
+    """
+
+    def __init__(self, run_id: str = None, callback=None, max_entries: int = 200):
+        self.run_id = run_id or uuid.uuid4().hex[:12]
+        self.callback = callback
+        self._lock = threading.Lock()
+        self.total_input_tokens = 0
+        self.total_output_tokens = 0
+        self.total_cost_usd = 0.0
+        self.calls = 0
+        self.agents = deque(maxlen=max_entries)
+
+    def log_agent(self, name: str, input_tokens: int, output_tokens: int, cost: float,
+                  model: str = None, latency_ms: float = None, cache_hit: bool = False, status: str = "ok"):
+        """Log per-agent token usage and cost, and persist the call to the ledger."""
+        with self._lock:
+            self.total_input_tokens += input_tokens
+            self.total_output_tokens += output_tokens
+            self.total_cost_usd += cost
+            self.calls += 1
+            self.agents.append({
+                "agent": name,
+                "model": model,
+                "input_tokens": input_tokens,
+                "output_tokens": output_tokens,
+                "cost_usd": round(cost, 6),
+                "latency_ms": round(latency_ms, 1) if latency_ms is not None else None,
+                "cache_hit": cache_hit,
+                "status": status,
+            })
+            summary = self._summary()
+
+        ledger.record(
+            run_id=self.run_id, agent=name, model=model, input_tokens=input_tokens,
+            output_tokens=output_tokens, cost_usd=cost, latency_ms=latency_ms,
+            cache_hit=cache_hit, status=status,
+        )
+        if self.callback:
+            self.callback(summary)
+
+    def set_callback(self, cb):
+        self.callback = cb
+
+    def _summary(self) -> Dict[str, Any]:
+        return {
+            "run_id": self.run_id,
+            "calls": self.calls,
+            "total_input_tokens": self.total_input_tokens,
+            "total_output_tokens": self.total_output_tokens,
+            "approx_cost_usd": round(self.total_cost_usd, 4),
+            "agents": list(self.agents),
+        }
+
+    def summary(self) -> Dict[str, Any]:
+        with self._lock:
+            return self._summary()
+
+
+_current_tracker: ContextVar = ContextVar("current_tracker", default=None)
+
+
+def _default_run_id() -> str:
+    # Share the artifact run id when one is bound, so ledger rows and
+    # run directories line up.
+    return active_run_id()
+
+
+def current_tracker() -> RunTracker:
+    """Return the tracker bound to this thread/task, creating one if needed."""
+    current = _current_tracker.get()
+    if current is None:
+        current = RunTracker(run_id=_default_run_id())
+        _current_tracker.set(current)
+    return current
+
+
+@contextmanager
+def usage_scope(run_id: str = None, reuse: bool = False):
+    """
+    Bind a fresh RunTracker for the duration of a run. Bind it before starting
+    threads: a copied context without a tracker creates its own, and the
+    parent never sees that usage.
+
+    Args:
+        run_id (str): Ledger run id; defaults to the active artifact run id.
+        reuse (bool): Keep the tracker already bound by the caller (UI session,
+            batch) instead of starting a new one.
+    """
+    active = _current_tracker.get()
+    if reuse and active is not None:
+        yield active
+        return
+
+    scoped = RunTracker(run_id=run_id or _default_run_id())
+    token = _current_tracker.set(scoped)
+    try:
+        yield scoped
+    finally:
+        _current_tracker.reset(token)
+
+
+class _TrackerProxy:
+    """
+    Module-level `tracker` kept for existing call sites; every method acts on
+    the current context's RunTracker, so concurrent sessions never mix.
+    """
+
+    def log_agent(self, *args, **kwargs):
+        current_tracker().log_agent(*args, **kwargs)
+
+    def set_callback(self, cb):
+        current_tracker().set_callback(cb)
+
+    def summary(self) -> Dict[str, Any]:
+        return current_tracker().summary()
+
+    def reset(self, run_id: str = None):
+        """Start a new run tracker in this context, keeping the UI callback."""
+        previous = _current_tracker.get()
+        callback = previous.callback if previous else None
+        _current_tracker.set(RunTracker(run_id=run_id or _default_run_id(), callback=callback))
+
+
+tracker = _TrackerProxy()
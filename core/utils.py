@@ -0,0 +1,35 @@
+"""
+core/utils.py
+Small text helpers shared across agents and core modules.
+"""
+
+import re
+
+# Words are compared by prefix so "Teachers"/"Teacher" or "marks"/"mark" count
+# as the same term
+STEM_LENGTH = 5
+
+
+def stem(word: str) -> str:
+    """Crude prefix stem of a lower-case word; words containing digits (IDs like fr12) are kept whole."""
+    if any(c.isdigit() for c in word):
+        return word
+    if word.endswith("s") and not word.endswith("ss"):
+        word = word[:-1]
+    return word[:STEM_LENGTH]
+
+
+def stem_words(text: str, stopwords=()) -> set:
+    """
+    Stemmed words of `text`, for comparing two phrasings of the same thing
+    (story summaries in JIRA dedupe).
+
+    Args:
+        text (str): Text to split.
+        stopwords (Iterable[str]): Lower-case words to ignore before stemming.
+
+    Returns:
+        set: Stems of the words longer than two characters.
+    """
+    words = re.findall(r"[a-z0-9]+", str(text).lower())
+    return {stem(w) for w in words if len(w) > 2 and w not in stopwords}
@@ -8,6 +8,8 @@ import fitz  # PyMuPDF for PDF rendering
 from openai import OpenAI
 from core.logger import init_logger
 from core.config import load_settings
+from core.tracing import span
+from core.cancellation import check_cancelled
 
 logger = init_logger()
 settings = load_settings()
@@ -61,11 +63,13 @@ def extract_text_from_pdf(pdf_bytes: bytes) -> str:
             return ""
 
         all_text = ""
-        for page in doc:
-            pix = page.get_pixmap(dpi=180)
-            image_bytes = pix.tobytes("png")
-            page_text = extract_text_from_image_bytes(image_bytes)
-            all_text += "\n" + page_text
+        for page_no, page in enumerate(doc, start=1):
+            check_cancelled("ocr.page")  # skip the remaining pages of a cancelled run
+            with span("ocr.page", page=page_no):
+                pix = page.get_pixmap(dpi=180)
+                image_bytes = pix.tobytes("png")
+                page_text = extract_text_from_image_bytes(image_bytes)
+                all_text += "\n" + page_text
 
         return all_text.strip()
 
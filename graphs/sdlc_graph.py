@@ -1,30 +1,57 @@
+import functools
 from langgraph.graph import StateGraph, END
 from core.logger import init_logger
 from core.config import load_settings
 from core.llm import tracker
+from core.usage_ledger import usage_scope
+from core.cancellation import CancellationToken, OperationCancelled, cancel_scope, check_cancelled
+from core.tracing import traced
 from agents.requirement_agent import run_requirement_agent
 from agents.flow_agent import run_flow_agent
 from agents.srs_agent import run_srs_agent
 from agents.jira_story_agent import run_jira_story_agent
-from agents.jira_post_agent import post_stories_to_jira
-from pathlib import Path
+from agents.jira_post_agent import attach_artifacts, post_stories_to_jira
+from core.storage import artifact_store, save_artifact
+from core.incremental import dependency_store
 
 logger = init_logger()
 settings = load_settings()
 
 
 class SDLCState:
-    def __init__(self, user_input: str):
+    def __init__(self, user_input: str, incremental: bool = None):
         self.user_input = user_input
+        self.incremental = incremental
         self.requirements = {}
         self.diagram_path = None
         self.srs_path = None
         self.jira_stories = []
-        self.jira_created = []
+        self.jira_created = {}
+        self.jira_attachments = {}
         self.error = None
+        self.cancelled = None
+
+
+def cancellable(node):
+    """Skip the node once the run is cancelled; a cancellation inside it stops the remaining nodes."""
+    @functools.wraps(node)
+    def run(state: SDLCState):
+        if state.cancelled:
+            logger.info(f"[LangGraph] Skipping {node.__name__}: run cancelled")
+            return state
+        try:
+            check_cancelled(node.__name__)
+            return node(state)
+        except OperationCancelled as e:
+            logger.warning(f"[LangGraph] Cancelled in {node.__name__}: {e}")
+            state.cancelled = {"reason": e.reason, "at": e.where or node.__name__}
+            state.error = f"cancelled: {e.reason}"
+            return state
+    return run
 
 
 # ---------- Graph Nodes ----------
+@cancellable
 def requirement_node(state: SDLCState):
     logger.info("[LangGraph] Node: RequirementAgent")
     try:
@@ -35,42 +62,48 @@ def requirement_node(state: SDLCState):
     return state
 
 
+@cancellable
 def flow_node(state: SDLCState):
     logger.info("[LangGraph] Node: FlowAgent")
     try:
-        state.diagram_path = run_flow_agent(state.requirements)
+        state.diagram_path = run_flow_agent(state.requirements, incremental=state.incremental)
     except Exception as e:
         state.error = str(e)
         logger.exception(e)
     return state
 
 
+@cancellable
 def srs_node(state: SDLCState):
     logger.info("[LangGraph] Node: SRSAgent")
     try:
         if settings["features"].get("enable_pdf_gen", True):
-            state.srs_path = run_srs_agent(state.requirements)
+            state.srs_path = run_srs_agent(state.requirements, incremental=state.incremental)
     except Exception as e:
         state.error = str(e)
         logger.exception(e)
     return state
 
 
+@cancellable
 def jira_story_node(state: SDLCState):
     logger.info("[LangGraph] Node: JiraStoryAgent")
     try:
-        state.jira_stories = run_jira_story_agent(state.requirements)
+        state.jira_stories = run_jira_story_agent(state.requirements, incremental=state.incremental)
     except Exception as e:
         state.error = str(e)
         logger.exception(e)
     return state
 
 
+@cancellable
 def jira_post_node(state: SDLCState):
     logger.info("[LangGraph] Node: JiraPostAgent")
     try:
         if settings["features"].get("enable_jira_post", False):
             state.jira_created = post_stories_to_jira(state.jira_stories)
+            if settings["features"].get("enable_jira_attachments", False):
+                state.jira_attachments = attach_artifacts(state.jira_created.get("issue_keys", []))
     except Exception as e:
         state.error = str(e)
         logger.exception(e)
@@ -98,40 +131,46 @@ def build_sdlc_graph() -> StateGraph:
 
 
 # ---------- Runner + Visualizer ----------
-def run_sdlc_graph(user_input: str) -> dict:
+@traced("pipeline.langgraph")
+def run_sdlc_graph(user_input: str, incremental: bool = None, cancel_token: CancellationToken = None) -> dict:
     logger.info("[LangGraph] Executing SDLC Graph pipeline...")
-    state = SDLCState(user_input)
+    state = SDLCState(user_input, incremental=incremental)
     graph = build_sdlc_graph()
     app = graph.compile()
 
-    # Generate visual diagram (PNG)
-    try:
-        graph_dir = Path(settings["paths"]["diagrams_dir"])
-        graph_dir.mkdir(parents=True, exist_ok=True)
-        graph_image = graph_dir / "langgraph_pipeline.png"
-        app.get_graph().draw(graph_image)
-        logger.info(f"[LangGraph] Graph visualization saved at {graph_image}")
-    except Exception as e:
-        logger.warning(f"[LangGraph] Graph visualization skipped: {e}")
-        graph_image = None
+    # Bind one run directory for every node's artifacts, and the run tracker
+    # before nodes copy the context
+    with artifact_store.run_scope() as run_id, usage_scope(run_id, reuse=True), cancel_scope(cancel_token):
+        # Generate visual diagram (PNG)
+        try:
+            graph_image = save_artifact("diagrams/langgraph_pipeline.png", app.get_graph().draw_png())
+            logger.info(f"[LangGraph] Graph visualization saved at {graph_image}")
+        except Exception as e:
+            logger.warning(f"[LangGraph] Graph visualization skipped: {e}")
+            graph_image = None
+
+        # Run the pipeline
+        final_state = app.invoke(state)
 
-    # Run the pipeline
-    final_state = app.invoke(state)
+        # Summarize token usage
+        token_summary = tracker.summary()
 
-    # Summarize token usage
-    token_summary = tracker.summary()
     logger.info(
         f"[LangGraph] Tokens used: input={token_summary['total_input_tokens']}, "
         f"output={token_summary['total_output_tokens']}, cost=${token_summary['approx_cost_usd']}"
     )
 
     return {
+        "run_id": run_id,
         "requirements": final_state.requirements,
         "diagram_path": final_state.diagram_path,
         "srs_path": final_state.srs_path,
         "jira_stories": final_state.jira_stories,
         "jira_created": final_state.jira_created,
+        "jira_attachments": final_state.jira_attachments,
         "error": final_state.error,
+        "cancelled": final_state.cancelled,
+        "incremental": dependency_store.run_report(run_id),
         "token_summary": token_summary,
         "graph_image": str(graph_image) if graph_image else None,
     }
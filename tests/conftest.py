@@ -0,0 +1,34 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+# --- Ensure project root is in PYTHONPATH ---
+root_dir = Path(__file__).resolve().parent.parent
+if str(root_dir) not in sys.path:
+    sys.path.append(str(root_dir))
+
+from benchmarks.mock_jira import MockJira  # noqa: E402
+from core.jira_client import JiraClient  # noqa: E402
+from core.jira_journal import PostingJournal  # noqa: E402
+
+
+@pytest.fixture
+def mock_jira():
+    """Factory for a started MockJira with no simulated latency; stopped after the test."""
+    started = []
+
+    def start(**options):
+        options = {"latency_ms": 0, "per_issue_ms": 0, "connect_ms": 0, **options}
+        mock = MockJira(**options).start()
+        started.append(mock)
+        return mock, JiraClient(mock.url, "test", "token", pool_size=4)
+
+    yield start
+    for mock in started:
+        mock.stop()
+
+
+@pytest.fixture
+def journal(tmp_path):
+    return PostingJournal(tmp_path / "jira_journal.db")
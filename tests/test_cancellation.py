@@ -0,0 +1,156 @@
+"""
+Cooperative cancellation (core/cancellation.py): token callbacks, binding a
+token with cancel_scope, and waiting on a future that stops when the run is
+cancelled.
+"""
+
+import threading
+import contextvars
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+import pytest
+
+from core.cancellation import (
+    CancellationToken, OperationCancelled, cancel_scope, check_cancelled, current_token, is_cancelled, wait_future,
+)
+
+
+# ======================================================
+# 🔹 CancellationToken
+# ======================================================
+def test_cancel_runs_callbacks_once():
+    token, calls = CancellationToken("run"), []
+    token.on_cancel(lambda: calls.append("a"))
+    unregister = token.on_cancel(lambda: calls.append("b"))
+    unregister()
+
+    assert token.cancel("stop") is True
+    assert token.cancel("again") is False
+    assert calls == ["a"]
+    assert token.cancelled and token.reason == "stop" and token.wait(0)
+
+
+def test_callback_added_after_cancel_runs_immediately():
+    token, calls = CancellationToken(), []
+    token.cancel()
+    token.on_cancel(lambda: calls.append("late"))()
+    assert calls == ["late"]
+
+
+def test_failing_callback_does_not_stop_the_others():
+    token, calls = CancellationToken(), []
+    token.on_cancel(lambda: 1 / 0)
+    token.on_cancel(lambda: calls.append("ok"))
+    token.cancel()
+    assert calls == ["ok"]
+
+
+def test_raise_if_cancelled_carries_reason_and_location():
+    token = CancellationToken()
+    token.raise_if_cancelled("step")  # not cancelled: no-op
+    token.cancel("user pressed stop")
+    with pytest.raises(OperationCancelled) as info:
+        token.raise_if_cancelled("step")
+    assert info.value.reason == "user pressed stop" and info.value.where == "step"
+    # BaseException: the agents' `except Exception` fallbacks must not swallow it
+    assert not isinstance(info.value, Exception)
+
+
+# ======================================================
+# 🔹 cancel_scope
+# ======================================================
+def test_no_scope_means_not_cancellable():
+    assert current_token() is None and not is_cancelled()
+    check_cancelled("anywhere")
+
+
+def test_scope_binds_and_resets_the_token():
+    token = CancellationToken()
+    with cancel_scope(token) as bound:
+        assert bound is token and current_token() is token
+        token.cancel()
+        assert is_cancelled()
+        with pytest.raises(OperationCancelled):
+            check_cancelled("step")
+    assert current_token() is None
+
+
+def test_nested_scope_reuses_the_active_token():
+    with cancel_scope() as outer:
+        with cancel_scope() as inner:
+            assert inner is outer
+        assert current_token() is outer
+        explicit = CancellationToken()
+        with cancel_scope(explicit) as bound:
+            assert bound is explicit
+        assert current_token() is outer
+
+
+def test_scope_follows_copied_contexts_into_threads():
+    token = CancellationToken()
+    with cancel_scope(token), ThreadPoolExecutor(1) as pool:
+        seen = pool.submit(contextvars.copy_context().run, current_token).result(5)
+    assert seen is token
+
+
+@pytest.mark.parametrize("cancel_on_error, cancelled", [(True, True), (False, False)])
+def test_cancel_on_error(cancel_on_error, cancelled):
+    token = CancellationToken()
+    with pytest.raises(KeyboardInterrupt):
+        with cancel_scope(token, cancel_on_error=cancel_on_error):
+            raise KeyboardInterrupt()
+    assert token.cancelled is cancelled
+    assert current_token() is None
+    if cancelled:
+        assert token.reason == "interrupted (KeyboardInterrupt)"
+
+
+def test_cancellation_itself_does_not_rename_the_reason():
+    token = CancellationToken()
+    with pytest.raises(OperationCancelled):
+        with cancel_scope(token, cancel_on_error=True):
+            token.cancel("user pressed stop")
+            check_cancelled()
+    assert token.reason == "user pressed stop"
+
+
+# ======================================================
+# 🔹 wait_future
+# ======================================================
+def test_wait_future_without_a_token_is_future_result():
+    future = Future()
+    future.set_result(42)
+    assert wait_future(future) == 42
+    with pytest.raises(FutureTimeout):
+        wait_future(Future(), timeout=0.01)
+
+
+def test_wait_future_returns_result_and_errors():
+    with cancel_scope(CancellationToken()):
+        future = Future()
+        threading.Timer(0.02, future.set_result, ["done"]).start()
+        assert wait_future(future, timeout=5) == "done"
+
+        failed = Future()
+        failed.set_exception(ValueError("boom"))
+        with pytest.raises(ValueError, match="boom"):
+            wait_future(failed)
+
+
+def test_wait_future_stops_when_the_run_is_cancelled():
+    token, future = CancellationToken(), Future()
+    with cancel_scope(token):
+        threading.Timer(0.02, token.cancel, ["user pressed stop"]).start()
+        with pytest.raises(OperationCancelled) as info:
+            wait_future(future, timeout=5, where="render")
+    assert info.value.where == "render"
+    assert not future.done()  # the future itself keeps running
+    assert token._callbacks == {}  # the wake-up callback was unregistered
+
+
+def test_wait_future_times_out_while_not_cancelled():
+    token = CancellationToken()
+    with cancel_scope(token):
+        with pytest.raises(FutureTimeout):
+            wait_future(Future(), timeout=0.02)
+    assert not token.cancelled and token._callbacks == {}
@@ -0,0 +1,123 @@
+"""
+Local DOT validation and repair (core/dot_repair.py) and the flow agent's
+repair-then-reprompt path.
+"""
+
+from types import SimpleNamespace
+
+import pytest
+
+import agents.flow_agent as flow_agent
+from core.dot_repair import RepairStats, repair_dot, validate_dot
+
+
+class ScriptedLLM:
+    """invoke() returns the queued replies in order and records the prompts."""
+
+    def __init__(self, *replies):
+        self.replies = list(replies)
+        self.prompts = []
+
+    def invoke(self, prompt, agent_name=None):
+        self.prompts.append(prompt)
+        return SimpleNamespace(content=self.replies.pop(0))
+
+
+@pytest.fixture
+def stats(monkeypatch):
+    fresh = RepairStats()
+    monkeypatch.setattr(flow_agent, "repair_stats", fresh)
+    return fresh
+
+
+# ======================================================
+# 🔹 Validation
+# ======================================================
+@pytest.mark.parametrize("src", [
+    'digraph G {\n rankdir=LR;\n A [label="x y", shape=box];\n subgraph cluster_a { label="Agents"; B; C }\n'
+    ' A -> B -> C;\n B:p1 -> D [color=red];\n label=<<b>hi</b>>;\n}',
+    "digraph G { A B }",
+    "digraph G {\n A B;\n C D [shape=box]\n}",
+    "graph { a b c; a -- b }",
+    'strict digraph { "User Login" -> "Auth Service" }',
+])
+def test_valid_dot_has_no_errors(src):
+    assert validate_dot(src) == []
+
+
+@pytest.mark.parametrize("src, message", [
+    ("digraph G { A -> B;", "missing '}'"),
+    ("graph G { A -> B; }", "'->' used in an undirected graph"),
+    ("digraph G { A -- B; }", "'--' used in a digraph"),
+    ('digraph G { A [label="open]; }', "unterminated"),
+    ("digraph { A -> }", "expected a node id"),
+    ("A -> B;", "expected 'digraph' or 'graph'"),
+])
+def test_invalid_dot_reports_a_readable_error(src, message):
+    errors = validate_dot(src)
+    assert len(errors) == 1 and message in errors[0]
+
+
+# ======================================================
+# 🔹 Repair
+# ======================================================
+@pytest.mark.parametrize("src, fix", [
+    ("Here is your diagram:\n```dot\ndigraph G {\n A -> B;\n}\n```\nThis shows the flow.", "strip_fences_and_prose"),
+    ("digraph G {\n subgraph cluster_x {\n  A -> B;\n }\n C -> A;\n", "balance_braces"),
+    ("digraph G {\n A [label=Start Process, shape=box];\n A -> B [label=calls the api];\n}", "quote_attr_values"),
+    ("graph G { A -> B; }", "fix_edge_ops"),
+    ("digraph G { A -- B; }", "fix_edge_ops"),
+    ("A -> B;\nB -> C;", "wrap_headerless"),
+    ('digraph G {\n A [label="hello];\n A -> B;\n}', "close_quotes"),
+])
+def test_common_llm_defects_are_repaired(src, fix):
+    result = repair_dot(src)
+    assert result.valid, result.errors
+    assert fix in result.fixes
+    assert validate_dot(result.dot) == []
+
+
+def test_multi_word_ids_in_edges_are_quoted():
+    result = repair_dot("digraph G {\n User Login -> Auth Service;\n Auth Service [shape=box];\n}")
+    assert result.valid and result.fixes == ["quote_node_ids"]
+    assert '"User Login" -> "Auth Service";' in result.dot
+    assert '"Auth Service" [shape=box];' in result.dot
+
+
+def test_valid_dot_is_returned_unchanged():
+    src = "digraph G {\n A B;\n A -> B;\n}"
+    result = repair_dot(src)
+    assert result.valid and result.fixes == [] and result.dot == src
+
+
+def test_hopeless_input_keeps_its_errors():
+    result = repair_dot("I cannot produce a diagram for this.")
+    assert not result.valid and result.errors
+
+
+# ======================================================
+# 🔹 Repair vs re-prompt (flow agent)
+# ======================================================
+def test_local_repair_skips_the_reprompt(stats):
+    llm = ScriptedLLM()
+    dot = flow_agent._repair_or_reprompt(llm, "```dot\ndigraph G { A -> B; \n```")
+    assert validate_dot(dot) == [] and llm.prompts == []
+    assert stats.summary()["flow"]["repaired"] == 1
+
+
+def test_reprompt_sends_the_parser_errors(stats, monkeypatch):
+    monkeypatch.setattr(flow_agent, "MAX_REPROMPTS", 1)
+    llm = ScriptedLLM("digraph G { A -> B; }")
+    dot = flow_agent._repair_or_reprompt(llm, "digraph G { A -> ; }")
+    assert dot == "digraph G { A -> B; }"
+    assert "expected a node id" in llm.prompts[0]
+    assert stats.summary()["flow"]["reprompted"] == 1
+
+
+def test_fallback_after_failed_reprompts(stats, monkeypatch):
+    monkeypatch.setattr(flow_agent, "MAX_REPROMPTS", 2)
+    llm = ScriptedLLM("still not dot ;", "nor this ;")
+    assert flow_agent._repair_or_reprompt(llm, "nothing useful ;") == flow_agent.FALLBACK_DOT
+    assert len(llm.prompts) == 2
+    summary = stats.summary()["flow"]
+    assert summary["failed"] == 1 and summary["total"] == 1
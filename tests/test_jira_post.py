@@ -0,0 +1,158 @@
+"""
+Posting and attaching against the local mock JIRA (benchmarks/mock_jira.py):
+bulk result mapping, the 404 → single-issue fallback, the retry queue under
+429s, journal reruns and attachment de-duplication.
+"""
+
+from agents.jira_post_agent import attach_artifacts, post_stories_to_jira, story_fields
+from core.jira_journal import fingerprint_label, story_fingerprint
+
+
+def make_stories(n: int, invalid: tuple = ()) -> list:
+    return [
+        {"summary": f"INVALID story {i}" if i in invalid else f"Story {i}", "bdd": f"Given {i}",
+         "requirement_ids": [f"FR{i}"]}
+        for i in range(n)
+    ]
+
+
+def assert_keys_match(mock, stories: list, issue_keys: list):
+    for story, key in zip(stories, issue_keys):
+        if key:
+            assert mock.issues[key]["fields"]["summary"] == story["summary"]
+
+
+# ======================================================
+# 🔹 Bulk create
+# ======================================================
+def test_partial_bulk_failure_maps_errors_to_their_stories(mock_jira):
+    mock, client = mock_jira()
+    stories = make_stories(12, invalid=(3, 7))
+
+    result = post_stories_to_jira(stories, client=client, mode="bulk", journal=False)
+
+    assert result["created_count"] == 10
+    assert [f["summary"] for f in result["failed"]] == ["INVALID story 3", "INVALID story 7"]
+    assert all(f["status_code"] == 400 for f in result["failed"])
+    assert result["issue_keys"][3] is None and result["issue_keys"][7] is None
+    assert_keys_match(mock, stories, result["issue_keys"])
+    assert mock.stats["requests"] == 1
+
+
+def test_missing_bulk_endpoint_falls_back_to_single_posts(mock_jira):
+    mock, client = mock_jira(bulk=False)
+    stories = make_stories(6)
+
+    result = post_stories_to_jira(stories, client=client, mode="bulk", journal=False)
+
+    assert result["created_count"] == 6 and result["failed_count"] == 0
+    assert mock.stats["requests"] == 1 + 6  # one 404 from /issue/bulk, then one POST per story
+    assert_keys_match(mock, stories, result["issue_keys"])
+
+
+def test_throttled_stories_are_retried_not_dropped(mock_jira):
+    mock, client = mock_jira(rate_limit=20)
+    stories = make_stories(40)
+
+    result = post_stories_to_jira(stories, client=client, mode="single", workers=8, journal=False)
+
+    assert mock.stats["throttled"] > 0
+    assert result["retried"] > 0
+    assert result["created_count"] == 40 and result["failed_count"] == 0
+    assert len(mock.issues) == 40
+    assert_keys_match(mock, stories, result["issue_keys"])
+
+
+# ======================================================
+# 🔹 Journal
+# ======================================================
+def test_rerun_skips_posted_stories_without_requests(mock_jira, journal):
+    mock, client = mock_jira()
+    stories = make_stories(5)
+    first = post_stories_to_jira(stories, client=client, journal=journal)
+    mock.reset_stats()
+
+    rerun = post_stories_to_jira(stories, client=client, journal=journal)
+
+    assert rerun["created_count"] == 0 and rerun["unchanged_count"] == 5
+    assert rerun["issue_keys"] == first["issue_keys"]
+    assert mock.stats["requests"] == 0
+
+
+def test_regenerated_story_updates_its_issue_in_place(mock_jira, journal):
+    mock, client = mock_jira()
+    stories = make_stories(3)
+    first = post_stories_to_jira(stories, client=client, journal=journal)
+
+    # Requirement FR1 changed: the story comes back with a new summary and body
+    stories[1] = {"summary": "Story 1 reworded", "bdd": "Given a change", "requirement_ids": ["FR1"]}
+    rerun = post_stories_to_jira(stories, client=client, journal=journal)
+
+    key = first["issue_keys"][1]
+    assert rerun["created_count"] == 0 and rerun["failed_count"] == 0
+    assert rerun["updated_keys"] == [key] and rerun["unchanged_count"] == 2
+    assert mock.issues[key]["fields"]["summary"] == "Story 1 reworded"
+    assert mock.issues[key]["fields"]["project"] == {"key": "SDLC"}
+    assert len(mock.issues) == 3
+
+
+def test_pending_story_is_recovered_by_label(mock_jira, journal):
+    mock, client = mock_jira()
+    story = make_stories(1)[0]
+    fp = story_fingerprint(story, "SDLC")
+    # A previous run created the issue but died before journalling it
+    issue, _ = mock.create(story_fields(story, "SDLC", 1, fingerprint_label(fp)))
+    journal.mark_pending([(fp, "SDLC", story["summary"])])
+
+    result = post_stories_to_jira([story], client=client, journal=journal)
+
+    assert result["recovered"] == 1
+    assert result["created_count"] == 0
+    assert result["issue_keys"] == [issue["key"]]
+    assert len(mock.issues) == 1
+
+
+# ======================================================
+# 🔹 Attachments
+# ======================================================
+def artifacts(tmp_path) -> list:
+    files = {"diagrams/system_flow.png": b"\x89PNG" + b"x" * 4096, "docs/SRS.pdf": b"%PDF" + b"y" * 300_000}
+    out = []
+    for name, data in files.items():
+        path = tmp_path / name.replace("/", "_")
+        path.write_bytes(data)
+        out.append((name, str(path), None))
+    return out
+
+
+def test_attachments_go_to_one_issue_by_default_and_are_not_reuploaded(mock_jira, journal, tmp_path):
+    mock, client = mock_jira()
+    keys = [mock.create({"summary": f"Story {i}"})[0]["key"] for i in range(3)]
+    files = artifacts(tmp_path)
+
+    first = attach_artifacts(keys, files, client=client, journal=journal)
+    rerun = attach_artifacts(keys, files, client=client, journal=journal)
+
+    assert len(first["uploaded"]) == 2 and not first["failed"]
+    assert [a["size"] for a in mock.issues[keys[0]]["attachments"]] == [4100, 300_004]
+    assert all("attachments" not in mock.issues[k] for k in keys[1:])
+    assert rerun["uploaded"] == [] and rerun["skipped"] == 2
+    assert mock.stats["attachments"] == 2
+
+
+def test_attachment_fan_out_is_opt_in(mock_jira, journal, tmp_path):
+    mock, client = mock_jira()
+    keys = [mock.create({"summary": f"Story {i}"})[0]["key"] for i in range(3)]
+
+    result = attach_artifacts(keys, artifacts(tmp_path), client=client, journal=journal, target="all")
+
+    assert len(result["uploaded"]) == 6
+    assert all(len(mock.issues[k]["attachments"]) == 2 for k in keys)
+
+
+def test_journal_disabled_always_creates(mock_jira):
+    mock, client = mock_jira()
+    stories = make_stories(2)
+    post_stories_to_jira(stories, client=client, journal=False)
+    post_stories_to_jira(stories, client=client, journal=False)
+    assert len(mock.issues) == 4
@@ -0,0 +1,95 @@
+"""
+Incremental JSON detection in streamed model output (core/json_stream.py):
+the same object must be found at whatever chunk boundaries the stream uses.
+"""
+
+import json
+
+import pytest
+
+from core.json_stream import IncrementalJSONParser
+
+OBJECT = {
+    "project_name": "Attendance {Tracker}",
+    "functional_requirements": ['FR1: Teachers mark "present" or "absent"', "FR2: Paths like C:\\data\\{id}"],
+    "nested": {"depth": [1, {"two": 2}], "empty": {}},
+}
+REPORT = "\n\n## Report\nThe system has {two} modules."
+CHUNK_SIZES = [1, 3, 7, 1000]
+
+
+def feed_in_chunks(text: str, size: int):
+    """Feed `text` in `size`-character chunks; returns the parser and the chunk index that completed it."""
+    parser, completed_at = IncrementalJSONParser(), None
+    for n, start in enumerate(range(0, len(text), size)):
+        if parser.feed(text[start:start + size]) and completed_at is None:
+            completed_at = n
+    return parser, completed_at
+
+
+# ======================================================
+# 🔹 Chunk boundaries
+# ======================================================
+@pytest.mark.parametrize("size", CHUNK_SIZES)
+def test_object_found_at_any_chunk_size(size):
+    body = json.dumps(OBJECT)
+    parser, completed_at = feed_in_chunks("Here you go:\n" + body + REPORT, size)
+    assert parser.value == OBJECT
+    assert parser.text[:parser.end].endswith(body)
+    # Completes on the chunk holding the closing brace, not at end of stream
+    assert completed_at == (len("Here you go:\n") + len(body) - 1) // size
+
+
+@pytest.mark.parametrize("size", CHUNK_SIZES)
+def test_braces_quotes_and_escapes_inside_strings(size):
+    value = {"a": "}}}{", "b": 'say \\"}\\" ok', "c": "\\\\", "d": "\\u007b"}
+    parser, _ = feed_in_chunks(json.dumps(value), size)
+    assert parser.value == value
+
+
+@pytest.mark.parametrize("size", CHUNK_SIZES)
+def test_prose_braces_before_the_object(size):
+    text = "Fill in {placeholders} and {not: json} first.\n" + json.dumps(OBJECT) + REPORT
+    parser, _ = feed_in_chunks(text, size)
+    assert parser.value == OBJECT
+
+
+# ======================================================
+# 🔹 No object / non-object JSON
+# ======================================================
+@pytest.mark.parametrize("text", [
+    "Plain Markdown with no JSON at all.",
+    '{"unterminated": "value", "list": [1, 2',
+    "[1, 2, 3]",
+])
+def test_incomplete_or_missing_object(text):
+    parser, completed_at = feed_in_chunks(text, 3)
+    assert completed_at is None and not parser.complete and parser.value is None
+    assert parser.remainder() == text
+
+
+def test_first_object_inside_a_top_level_list():
+    parser, _ = feed_in_chunks('[{"x": 1}] then {"a": 1}', 2)
+    assert parser.value == {"x": 1}
+    assert parser.remainder() == '] then {"a": 1}'
+
+
+# ======================================================
+# 🔹 Text after completion
+# ======================================================
+@pytest.mark.parametrize("size", CHUNK_SIZES)
+def test_text_and_remainder_keep_accumulating(size):
+    body = json.dumps(OBJECT)
+    parser, _ = feed_in_chunks(body + REPORT, size)
+    assert parser.text == body + REPORT
+    assert parser.remainder() == REPORT
+    assert parser.feed(" More.") is True
+    assert parser.remainder() == REPORT + " More."
+    assert parser.value == OBJECT
+
+
+def test_empty_and_none_chunks_are_ignored():
+    parser = IncrementalJSONParser()
+    assert parser.feed("") is False and parser.feed(None) is False
+    assert parser.feed('{"a": 1}') is True and parser.feed(None) is True
+    assert parser.text == '{"a": 1}' and parser.remainder() == ""
@@ -0,0 +1,109 @@
+"""
+Incremental re-analysis of edited statements (agents/requirement_agent.py):
+the paragraph diff and merging a model delta into the previous requirements
+with stable FR/NFR IDs.
+"""
+
+from agents.requirement_agent import _id_number, merge_requirement_delta, split_paragraphs, statement_diff
+
+PREVIOUS = {
+    "project_name": "Attendance Tracker",
+    "functional_requirements": ["FR1: Teachers mark attendance", "FR2: Parents get absence alerts",
+                                "FR5: Admins export reports"],
+    "non_functional_requirements": ["NFR1: Pages load in under 2 seconds"],
+    "actors": ["Teacher", "Parent", "Administrator"],
+    "assumptions": ["Schools provide devices"],
+    "modules": ["Attendance", "Notifications"],
+}
+
+
+# ======================================================
+# 🔹 Paragraph diff
+# ======================================================
+def test_split_paragraphs_falls_back_to_lines_then_sentences():
+    assert split_paragraphs("One.\n\nTwo.\n\n\nThree.") == ["One.", "Two.", "Three."]
+    assert split_paragraphs("One.\nTwo.") == ["One.", "Two."]
+    assert len(split_paragraphs("Teachers mark attendance. Parents get alerts.")) == 2
+
+
+def test_diff_reports_only_edited_paragraphs():
+    old = "Teachers mark attendance.\n\nParents get alerts.\n\nAdmins see weekly reports."
+    new = "Teachers mark attendance.\n\nParents get SMS alerts.\n\nAdmins see weekly reports.\n\nStudents see history."
+    removed, added = statement_diff(old, new)
+    assert removed == ["Parents get alerts."]
+    assert added == ["Parents get SMS alerts.", "Students see history."]
+
+
+def test_diff_ignores_case_whitespace_and_punctuation():
+    old = "Teachers mark attendance.\n\nParents get alerts."
+    assert statement_diff(old, "  teachers   MARK attendance\n\nParents get alerts!") == ([], [])
+
+
+def test_diff_of_a_deleted_paragraph():
+    removed, added = statement_diff("A first part.\n\nA second part.", "A first part.")
+    assert removed == ["A second part."] and added == []
+
+
+# ======================================================
+# 🔹 Delta merge
+# ======================================================
+def test_remove_replace_and_add_keep_ids_stable():
+    delta = {
+        "remove": ["FR2"],
+        "replace": {"FR1": "Teachers mark attendance per session"},
+        "add": {"functional_requirements": ["Students view their attendance history"],
+                "non_functional_requirements": ["Data is retained for 5 years"]},
+    }
+    merged, changes = merge_requirement_delta(PREVIOUS, delta)
+    assert merged["functional_requirements"] == [
+        "FR1: Teachers mark attendance per session",
+        "FR5: Admins export reports",
+        "FR6: Students view their attendance history",
+    ]
+    assert merged["non_functional_requirements"] == [
+        "NFR1: Pages load in under 2 seconds", "NFR2: Data is retained for 5 years",
+    ]
+    assert changes == [
+        "Removed FR2", "Updated FR1",
+        "Added FR6: Students view their attendance history", "Added NFR2: Data is retained for 5 years",
+    ]
+
+
+def test_remove_and_replace_by_text_in_plain_lists():
+    delta = {"remove": ["parent"], "replace": {"Schools provide devices": "Students bring their own devices"},
+             "project_name": "Smart Attendance"}
+    merged, changes = merge_requirement_delta(PREVIOUS, delta)
+    assert merged["actors"] == ["Teacher", "Administrator"]
+    assert merged["assumptions"] == ["Students bring their own devices"]
+    assert merged["project_name"] == "Smart Attendance"
+    assert changes[0] == "Project renamed to Smart Attendance"
+
+
+def test_duplicate_or_empty_additions_are_skipped():
+    delta = {"add": {"functional_requirements": ["FR9: teachers mark attendance", " "], "actors": ["Teacher"]}}
+    merged, changes = merge_requirement_delta(PREVIOUS, delta)
+    assert merged["functional_requirements"] == PREVIOUS["functional_requirements"]
+    assert merged["actors"] == PREVIOUS["actors"] and changes == []
+
+
+def test_previous_is_not_mutated():
+    before = {k: list(v) if isinstance(v, list) else v for k, v in PREVIOUS.items()}
+    merge_requirement_delta(PREVIOUS, {"remove": ["FR1"], "add": {"modules": ["Reporting"]}})
+    assert PREVIOUS == before
+
+
+def test_nfr_style_id_in_the_fr_list():
+    previous = {**PREVIOUS, "functional_requirements": ["FR1: Teachers mark attendance", "NFR7: Works offline"]}
+    merged, _changes = merge_requirement_delta(
+        previous, {"add": {"functional_requirements": ["Parents get absence alerts"]}}
+    )
+    ids = [item.split(":", 1)[0] for item in merged["functional_requirements"]]
+    assert ids == ["FR1", "FR2", "FR3"]
+    assert "Works offline" in merged["functional_requirements"][1]
+
+
+def test_id_number_only_reads_the_lists_own_prefix():
+    assert _id_number("FR12: x", "FR") == 12
+    assert _id_number("NFR2: x", "FR") is None
+    assert _id_number("NFR2: x", "NFR") == 2
+    assert _id_number("No id here", "FR") is None
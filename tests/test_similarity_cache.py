@@ -0,0 +1,120 @@
+"""
+Near-duplicate statement index (core/similarity_cache.py): normalisation,
+MinHash/LSH candidate lookup with exact Jaccard rescoring, digest-based
+exact hits and LRU eviction; and how the requirement agent reuses a match.
+"""
+
+import pytest
+
+import agents.requirement_agent as requirement_agent
+from core.similarity_cache import MinHasher, SimilarityCache, jaccard, normalize_statement, shingles
+
+BASE = (
+    "Teachers mark attendance for every class session in the school. "
+    "Parents receive alerts when a student is absent from class today. "
+    "Administrators review weekly attendance reports for every school in the network."
+)
+EDITED = BASE.replace("weekly attendance reports", "monthly attendance reports")
+UNRELATED = "A recipe sharing app where home cooks publish dishes and followers rate them with stars."
+
+
+def requirements(tag: str) -> dict:
+    return {"parsed_json": {"functional_requirements": [f"FR1: {tag}"]}, "readable_text": tag}
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return SimilarityCache(str(tmp_path / "cache.db"), threshold=0.7)
+
+
+# ======================================================
+# 🔹 Normalisation / MinHash
+# ======================================================
+def test_normalisation_ignores_case_whitespace_and_punctuation():
+    assert normalize_statement("  Teachers, MARK\nattendance! ") == "teachers mark attendance"
+    assert shingles("a b c d") == {"a b c", "b c d"}
+    assert shingles("a b") == {"a b"}
+
+
+def test_minhash_estimates_jaccard():
+    a, b = shingles(normalize_statement(BASE)), shingles(normalize_statement(EDITED))
+    hasher = MinHasher(num_perm=256)
+    sig_a, sig_b = hasher.signature(a), hasher.signature(b)
+    estimate = sum(x == y for x, y in zip(sig_a, sig_b)) / len(sig_a)
+    assert abs(estimate - jaccard(a, b)) < 0.15
+    assert hasher.signature(a) == MinHasher(num_perm=256).signature(a)  # deterministic
+
+
+# ======================================================
+# 🔹 Lookup
+# ======================================================
+def test_exact_hit_matches_on_the_normalised_digest(cache):
+    cache.add(BASE, requirements("base"))
+    match = cache.lookup("  " + BASE.upper().replace(".", " ."))
+    assert match["exact"] is True and match["similarity"] == 1.0
+    assert match["requirements"] == requirements("base")
+    assert cache.stats["exact_hits"] == 1
+
+
+def test_near_hit_is_rescored_exactly(cache):
+    cache.add(BASE, requirements("base"))
+    match = cache.lookup(EDITED)
+    expected = jaccard(shingles(normalize_statement(BASE)), shingles(normalize_statement(EDITED)))
+    assert match["exact"] is False
+    assert match["similarity"] == round(expected, 4)
+    assert match["statement"] == BASE
+
+
+def test_best_candidate_wins(cache):
+    cache.add(EDITED.replace("Parents receive alerts", "Guardians get messages"), requirements("far"))
+    cache.add(EDITED, requirements("near"))
+    assert cache.lookup(BASE)["requirements"] == requirements("near")
+
+
+def test_unrelated_or_below_threshold_is_a_miss(cache):
+    cache.add(BASE, requirements("base"))
+    assert cache.lookup(UNRELATED) is None
+    assert cache.lookup(EDITED, threshold=0.99) is None
+    assert cache.stats["misses"] == 2
+
+
+def test_near_match_never_reports_exact_similarity(cache):
+    # Same shingle set, different text: Jaccard is 1.0 but the digest differs
+    cache.add("Teachers mark attendance daily. Teachers mark attendance daily.", requirements("twice"))
+    match = cache.lookup("Teachers mark attendance daily. " * 3)
+    assert match["exact"] is False and match["similarity"] < 1.0
+
+
+def test_add_replaces_identical_and_evicts_least_recently_used(tmp_path):
+    cache = SimilarityCache(str(tmp_path / "cache.db"), max_entries=2)
+    cache.add(BASE, requirements("v1"))
+    cache.add(BASE + " ", requirements("v2"))
+    assert cache.size() == 1 and cache.lookup(BASE)["requirements"] == requirements("v2")
+
+    cache.add(UNRELATED, requirements("other"))
+    cache.lookup(BASE)  # BASE is now the most recently used
+    cache.add("An inventory tracker for a small hardware store with barcode scanning.", requirements("third"))
+    assert cache.size() == 2
+    assert cache.lookup(UNRELATED) is None
+    assert cache.lookup(BASE) is not None
+
+
+# ======================================================
+# 🔹 Reuse in the requirement agent
+# ======================================================
+def test_only_an_exact_match_is_reused_as_is(cache, monkeypatch):
+    deltas = []
+    monkeypatch.setattr(
+        requirement_agent, "_extract_delta",
+        lambda previous, removed, added: deltas.append((removed, added)) or requirements("delta"),
+    )
+    twice = "Teachers mark attendance daily.\n\nTeachers mark attendance daily."
+    cache.add(twice, requirements("cached"))
+
+    reused = requirement_agent._from_match(twice, cache.lookup(twice), "cache")
+    assert reused["analysis"]["mode"] == "cached" and deltas == []
+
+    thrice = twice + "\n\nTeachers mark attendance daily."
+    result = requirement_agent._from_match(thrice, cache.lookup(thrice), "cache")
+    assert result["analysis"]["mode"] == "delta"
+    assert deltas == [([], ["Teachers mark attendance daily."])]
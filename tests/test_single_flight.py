@@ -0,0 +1,199 @@
+"""
+Coalescing of concurrent identical LLM calls (core/llm.py): SingleFlight
+claim/finish, shared results and errors, and waiters taking the call over
+when the leader's run is cancelled (threads and asyncio).
+"""
+
+import time
+import asyncio
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+import core.llm
+from core.cancellation import CancellationToken, OperationCancelled, cancel_scope
+from core.llm import LLMWrapper, SingleFlight, llm_flights
+
+
+class StubCompletions:
+    """chat.completions.create that counts calls; plain calls block until `release` is set."""
+
+    def __init__(self, reply: str = "done"):
+        self.reply = reply
+        self.calls = 0
+        self.release = threading.Event()
+        self._lock = threading.Lock()
+
+    def create(self, model, messages, temperature=None, max_tokens=None, stream=False):
+        with self._lock:
+            self.calls += 1
+        if stream:
+            return self._stream()
+        assert self.release.wait(5), "stub call never released"
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=self.reply))])
+
+    def _stream(self):
+        # Cancellable (streamed) leader: slow chunks until the response is closed
+        for _ in range(250):
+            time.sleep(0.02)
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content="w "))])
+
+
+@pytest.fixture
+def llm(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "sk-test")
+    # Token counts only feed usage logging; avoid tiktoken's encoding download
+    monkeypatch.setattr(core.llm, "num_tokens_from_string", lambda text, model="gpt-4o": len(str(text).split()))
+    wrapper = LLMWrapper("gpt-4o")
+    wrapper.client = SimpleNamespace(chat=SimpleNamespace(completions=StubCompletions()))
+    return wrapper
+
+
+def wait_for_waiters(key: str, count: int, timeout: float = 5):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        with llm_flights._lock:
+            flight = llm_flights._flights.get(key)
+            if flight and flight["waiters"] >= count:
+                return
+        time.sleep(0.005)
+    raise AssertionError(f"{count} waiter(s) never joined the flight")
+
+
+# ======================================================
+# 🔹 SingleFlight
+# ======================================================
+def test_claim_and_finish_share_one_result():
+    flights = SingleFlight()
+    future, leader = flights.claim("k")
+    waiter_future, waiter_leader = flights.claim("k")
+
+    assert leader and not waiter_leader and waiter_future is future
+    flights.finish("k", "result")
+    assert future.result(0) == "result"
+    assert flights.in_flight() == 0
+
+    # Released on finish: the next caller leads a new call
+    _future, leader = flights.claim("k")
+    assert leader
+    assert flights.summary()["leaders"] == 2 and flights.summary()["coalesced"] == 1
+
+
+def test_finish_with_error_reaches_every_waiter():
+    flights = SingleFlight()
+    future, _ = flights.claim("k")
+    flights.claim("k")
+    flights.finish("k", error=ValueError("boom"))
+    with pytest.raises(ValueError, match="boom"):
+        future.result(0)
+    assert flights.in_flight() == 0
+
+
+def test_keys_separate_parameters():
+    assert SingleFlight.key("gpt-4o", 0.3, "p") != SingleFlight.key("gpt-4o", 0.7, "p")
+    assert SingleFlight.key("gpt-4o", 0.3, "p") == SingleFlight.key("gpt-4o", 0.3, "p")
+
+
+# ======================================================
+# 🔹 LLMWrapper coalescing
+# ======================================================
+def test_concurrent_identical_invokes_make_one_call(llm):
+    completions = llm.client.chat.completions
+    prompt = "coalesce: identical"
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(llm.invoke(prompt, "t"))) for _ in range(4)]
+    for t in threads:
+        t.start()
+    wait_for_waiters(llm._flight_key(prompt), 3)
+    completions.release.set()
+    for t in threads:
+        t.join(5)
+
+    assert results == ["done"] * 4
+    assert completions.calls == 1
+    assert llm_flights.in_flight() == 0
+
+
+def test_sync_waiter_takes_over_a_cancelled_leader(llm):
+    completions = llm.client.chat.completions
+    completions.release.set()
+    prompt = "coalesce: sync takeover"
+    token, out = CancellationToken(), {}
+
+    def leader():
+        with cancel_scope(token):
+            try:
+                llm.invoke(prompt, "leader")
+            except OperationCancelled:
+                out["leader"] = "cancelled"
+
+    t = threading.Thread(target=leader)
+    t.start()
+    waiter = threading.Thread(target=lambda: out.setdefault("waiter", llm.invoke(prompt, "waiter")))
+    while llm_flights.in_flight() == 0:
+        time.sleep(0.005)
+    waiter.start()
+    wait_for_waiters(llm._flight_key(prompt), 1)
+    token.cancel("user pressed stop")
+    t.join(5)
+    waiter.join(5)
+
+    assert out == {"leader": "cancelled", "waiter": "done"}
+    assert completions.calls == 2  # the cancelled stream, then the waiter's own call
+
+
+def test_async_waiter_takes_over_a_cancelled_leader(llm):
+    completions = llm.client.chat.completions
+    completions.release.set()
+    prompt = "coalesce: async takeover"
+    token, out = CancellationToken(), {}
+
+    def leader():
+        with cancel_scope(token):
+            try:
+                llm.invoke(prompt, "leader")
+            except OperationCancelled:
+                out["leader"] = "cancelled"
+
+    async def waiter():
+        while llm_flights.in_flight() == 0:
+            await asyncio.sleep(0.005)
+        task = asyncio.ensure_future(llm.ainvoke(prompt, "waiter"))
+        await asyncio.to_thread(wait_for_waiters, llm._flight_key(prompt), 1)
+        token.cancel("user pressed stop")
+        out["waiter"] = await task
+
+    t = threading.Thread(target=leader)
+    t.start()
+    asyncio.run(waiter())
+    t.join(5)
+
+    assert out == {"leader": "cancelled", "waiter": "done"}
+
+
+def test_cancelled_waiter_does_not_take_over(llm):
+    prompt = "coalesce: waiter cancelled"
+    token, out = CancellationToken(), {}
+    leader = threading.Thread(target=lambda: out.setdefault("leader", llm.invoke(prompt, "leader")))
+    leader.start()
+    while llm_flights.in_flight() == 0:
+        time.sleep(0.005)
+
+    def waiter():
+        with cancel_scope(token):
+            try:
+                llm.invoke(prompt, "waiter")
+            except OperationCancelled:
+                out["waiter"] = "cancelled"
+
+    w = threading.Thread(target=waiter)
+    w.start()
+    wait_for_waiters(llm._flight_key(prompt), 1)
+    token.cancel()
+    w.join(5)
+    llm.client.chat.completions.release.set()
+    leader.join(5)
+
+    assert out == {"leader": "done", "waiter": "cancelled"}
+    assert llm.client.chat.completions.calls == 1